@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Benchmark Rappel / Latence de l'Index HNSW
+===========================================
+
+Mesure le compromis de chaque niveau d'effort de recherche
+(`hnsw.ef_search`) sur un corpus synthétique, comparé à une vérité
+terrain calculée par force brute (NumPy, distances exactes).
+
+- corpus : vecteurs normalisés regroupés en clusters (plus réaliste
+  qu'un bruit uniforme, où tous les voisins sont équidistants), chargés
+  dans une table temporaire avec un index HNSW (`--m`,
+  `--ef-construction`)
+- requêtes : perturbations de points du corpus
+- pour chaque ef_search (niveaux `search_effort_ef_search` des settings,
+  ou `--ef`) : rappel@k et latences p50/p95, via `SET LOCAL` comme dans
+  `match_document_candidates`
+- référence : parcours exact en SQL (index désactivé)
+- `--metric` : distance cosinus (`<=>`, `vector_cosine_ops`) et/ou
+  produit scalaire (`<#>`, `vector_ip_ops`, embeddings normalisés,
+  migration 014), mesurés sur le même corpus
+
+Nécessite DATABASE_URL (ou --dsn) et l'extension pgvector ; aucune
+table permanente n'est modifiée.
+
+Usage:
+    python -m scripts.bench_hnsw
+    python -m scripts.bench_hnsw --docs 50000 --dim 256 --k 10 --ef 10 20 40 80 200
+    python -m scripts.bench_hnsw --metric both
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Ajouter src au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.services import similarity
+
+
+TABLE = "bench_hnsw_vectors"
+
+# Opérateur de distance et classe d'opérateurs de l'index, par métrique
+METRICS = {
+    "cosine": ("<=>", "vector_cosine_ops"),
+    "ip": ("<#>", "vector_ip_ops"),
+}
+
+# Lignes insérées par requête lors du chargement du corpus
+LOAD_BATCH = 2_000
+
+
+def vector_literal(vector: np.ndarray) -> str:
+    """Vecteur au format texte pgvector."""
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def synthetic_corpus(
+    rng: np.random.Generator,
+    docs: int,
+    dim: int,
+    clusters: int,
+) -> np.ndarray:
+    """Vecteurs normalisés (docs × dim) autour de `clusters` centres."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=docs)
+    noise = rng.normal(scale=0.35, size=(docs, dim)).astype(np.float32)
+    return similarity.as_matrix(centers[labels] + noise)
+
+
+def percentile(values: list[float], p: float) -> float:
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+async def load_corpus(conn, corpus: np.ndarray) -> None:
+    """Charge le corpus dans une table temporaire."""
+    dim = corpus.shape[1]
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TEMP TABLE {TABLE} (id INT PRIMARY KEY, embedding vector({dim}))")
+    
+    for start in range(0, len(corpus), LOAD_BATCH):
+        block = corpus[start:start + LOAD_BATCH]
+        await conn.execute(
+            f"INSERT INTO {TABLE} SELECT * FROM unnest($1::int[], $2::text[]::vector[])",
+            list(range(start, start + len(block))),
+            [vector_literal(v) for v in block],
+        )
+    await conn.execute(f"ANALYZE {TABLE}")
+    
+
+async def build_index(conn, opclass: str, m: int, ef_construction: int) -> float:
+    """(Re)construit l'index HNSW de la table (durée en s)."""
+    await conn.execute(f"DROP INDEX IF EXISTS {TABLE}_hnsw")
+    started = time.perf_counter()
+    await conn.execute(
+        f"CREATE INDEX {TABLE}_hnsw ON {TABLE} USING hnsw (embedding {opclass}) "
+        f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    )
+    return time.perf_counter() - started
+
+
+async def search(
+    conn,
+    queries: list[str],
+    k: int,
+    operator: str,
+    settings_sql: list[str],
+) -> tuple[list[list[int]], list[float]]:
+    """Exécute chaque requête dans sa transaction (SET LOCAL) ; ids et latences (ms)."""
+    results: list[list[int]] = []
+    latencies: list[float] = []
+    sql = f"SELECT id FROM {TABLE} ORDER BY embedding {operator} $1::text::vector LIMIT $2"
+    for query in queries:
+        async with conn.transaction():
+            for statement in settings_sql:
+                await conn.execute(statement)
+            started = time.perf_counter()
+            rows = await conn.fetch(sql, query, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        results.append([row["id"] for row in rows])
+    return results, latencies
+
+
+def recall(found: list[list[int]], expected: list[set[int]]) -> float:
+    """Rappel@k moyen."""
+    return float(np.mean([
+        len(expected_ids.intersection(ids)) / len(expected_ids)
+        for ids, expected_ids in zip(found, expected)
+    ]))
+
+
+def report(name: str, recall_at_k: float, latencies: list[float]) -> None:
+    print(
+        f"   {name:<22} {recall_at_k:>8.3f}"
+        f"   {percentile(latencies, 50):>8.2f} ms   {percentile(latencies, 95):>8.2f} ms"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    import asyncpg
+    
+    dsn = args.dsn or get_settings().database_url
+    if not dsn:
+        print("❌ DATABASE_URL (ou --dsn) requis")
+        sys.exit(1)
+    
+    rng = np.random.default_rng(args.seed)
+    corpus = synthetic_corpus(rng, args.docs, args.dim, args.clusters)
+    seeds = corpus[rng.integers(0, args.docs, size=args.queries)]
+    query_matrix = similarity.as_matrix(
+        seeds + rng.normal(scale=0.2, size=seeds.shape).astype(np.float32)
+    )
+    
+    # Vérité terrain : top-k exact par force brute
+    expected = [
+        set(similarity.top_k(similarity.one_to_many(q, corpus), args.k)[0].tolist())
+        for q in query_matrix
+    ]
+    queries = [vector_literal(q) for q in query_matrix]
+    
+    levels: list[tuple[str, int]]
+    if args.ef:
+        levels = [(f"ef_search={ef}", ef) for ef in args.ef]
+    else:
+        levels = [
+            (f"{effort} ({ef})", ef)
+            for effort, ef in sorted(
+                get_settings().search_effort_ef_search.items(), key=lambda item: item[1],
+            )
+        ]
+    
+    metrics = list(METRICS) if args.metric == "both" else [args.metric]
+    
+    conn = await asyncpg.connect(dsn)
+    try:
+        await load_corpus(conn, corpus)
+        
+        for metric in metrics:
+            operator, opclass = METRICS[metric]
+            build = await build_index(conn, opclass, args.m, args.ef_construction)
+        
+            print("\n" + "=" * 64)
+            print(
+                f"📊 HNSW {metric} ({args.docs} vecteurs, dimension {args.dim}, "
+                f"m={args.m}, ef_construction={args.ef_construction})"
+            )
+            print("=" * 64)
+            print(f"   Construction de l'index : {build:.1f} s")
+            print(f"   {'niveau':<22} {f'rappel@{args.k}':>8}   {'p50':>11}   {'p95':>11}")
+        
+            # Échauffement (cache de l'index)
+            await search(conn, queries[:10], args.k, operator, [])
+            
+            for name, ef in levels:
+                found, latencies = await search(
+                    conn, queries, args.k, operator, [f"SET LOCAL hnsw.ef_search = {int(ef)}"],
+                )
+                report(name, recall(found, expected), latencies)
+            
+            found, latencies = await search(
+                conn,
+                queries,
+                args.k,
+                operator,
+                ["SET LOCAL enable_indexscan = off", "SET LOCAL enable_bitmapscan = off"],
+            )
+            report("exact (sans index)", recall(found, expected), latencies)
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+
+def main() -> None:
+    """Point d'entrée principal du script."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark rappel/latence de hnsw.ef_search (pgvector)",
+    )
+    parser.add_argument("--dsn", default="", help="DSN Postgres (défaut : DATABASE_URL)")
+    parser.add_argument("--docs", type=int, default=20_000, help="Taille du corpus synthétique")
+    parser.add_argument("--dim", type=int, default=1024, help="Dimension des vecteurs")
+    parser.add_argument("--clusters", type=int, default=100, help="Nombre de clusters du corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes mesurées")
+    parser.add_argument("--k", type=int, default=10, help="Taille du top-k")
+    parser.add_argument(
+        "--ef",
+        type=int,
+        nargs="+",
+        help="Valeurs de ef_search à mesurer (défaut : niveaux d'effort des settings)",
+    )
+    parser.add_argument("--m", type=int, default=16, help="Paramètre m de HNSW")
+    parser.add_argument(
+        "--ef-construction",
+        type=int,
+        default=64,
+        help="Paramètre ef_construction de HNSW",
+    )
+    parser.add_argument(
+        "--metric",
+        choices=[*METRICS, "both"],
+        default="ip",
+        help="Distance mesurée (both : cosinus puis produit scalaire, avant/après migration 014)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur")
+    
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Benchmark des Middlewares
+==========================
+
+Compare le débit de la pile de middlewares de la gateway
+(`RateLimitMiddleware` + `RequestLoggingMiddleware`) en ASGI pur avec
+l'ancienne implémentation `BaseHTTPMiddleware`.
+
+Deux endpoints sont mesurés :
+- `/ping` : réponse JSON triviale (surcoût fixe par requête)
+- `/sse` : flux SSE de N événements (débit et time-to-first-event)
+
+Les applications sont appelées directement (sans serveur HTTP ni
+réseau) : seul le coût des middlewares et de Starlette est mesuré.
+
+Usage:
+    python -m scripts.bench_middleware
+    python -m scripts.bench_middleware --requests 20000 --concurrency 50 --events 20
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ajouter src au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import structlog
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.api.middleware import RateLimitMiddleware, RequestLoggingMiddleware, logger
+from src.services.rate_limiter import RateLimitResult
+
+
+# ===== Ancienne pile (référence) =====
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Headers de rate limiting via BaseHTTPMiddleware."""
+    
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        response = await call_next(request)
+        rate_limit = getattr(request.state, "rate_limit", None)
+        if rate_limit is not None:
+            response.headers["X-RateLimit-Limit"] = str(rate_limit.limit)
+            response.headers["X-RateLimit-Remaining"] = str(rate_limit.remaining)
+            response.headers["X-RateLimit-Reset"] = str(rate_limit.reset_at)
+        return response
+
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    """Temps de réponse via BaseHTTPMiddleware."""
+    
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        start_time = time.time()
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logger.info("Request completed", path=request.url.path, status=response.status_code)
+        response.headers["X-Response-Time"] = f"{process_time:.3f}s"
+        return response
+
+
+# ===== Application de test =====
+
+RATE_LIMIT = RateLimitResult(True, limit=100, remaining=99, retry_after=0, reset_at=int(time.time()) + 60)
+
+
+def _build_app(middleware: list[Middleware], events: int) -> Starlette:
+    async def ping(request: Request) -> Response:
+        request.state.rate_limit = RATE_LIMIT
+        return JSONResponse({"status": "ok"})
+    
+    async def sse(request: Request) -> Response:
+        request.state.rate_limit = RATE_LIMIT
+        
+        async def stream():
+            for i in range(events):
+                yield f"event: chunk\ndata: {i}\n\n"
+                await asyncio.sleep(0)
+        
+        return StreamingResponse(stream(), media_type="text/event-stream")
+    
+    return Starlette(
+        routes=[Route("/ping", ping), Route("/sse", sse)],
+        middleware=middleware,
+    )
+
+
+def build_apps(events: int) -> dict[str, Starlette]:
+    """Applications identiques, seule la pile de middlewares change."""
+    return {
+        "BaseHTTPMiddleware": _build_app(
+            [Middleware(LegacyRequestLoggingMiddleware), Middleware(LegacyRateLimitMiddleware)],
+            events,
+        ),
+        "ASGI pur": _build_app(
+            [Middleware(RequestLoggingMiddleware), Middleware(RateLimitMiddleware)],
+            events,
+        ),
+    }
+
+
+# ===== Mesure =====
+
+async def _call(app: Starlette, path: str) -> tuple[float, float]:
+    """
+    Appelle l'application comme un serveur ASGI.
+    
+    Returns:
+        (time-to-first-byte, durée totale) en secondes.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    start = time.perf_counter()
+    first_byte: float | None = None
+    request_sent = False
+    response_done = asyncio.Event()
+    
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Comme un serveur : la déconnexion n'arrive qu'après la réponse
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message: dict) -> None:
+        nonlocal first_byte
+        if first_byte is None and message["type"] == "http.response.body" and message.get("body"):
+            first_byte = time.perf_counter()
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            response_done.set()
+    
+    await app(scope, receive, send)
+    response_done.set()
+    end = time.perf_counter()
+    return (first_byte or end) - start, end - start
+
+
+async def run_scenario(
+    app: Starlette,
+    path: str,
+    total_requests: int,
+    concurrency: int,
+) -> dict[str, float]:
+    """Exécute `total_requests` appels avec `concurrency` appels simultanés."""
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfb: list[float] = []
+    
+    async def one() -> None:
+        async with semaphore:
+            first, _ = await _call(app, path)
+            ttfb.append(first)
+    
+    # Échauffement
+    for _ in range(min(200, total_requests)):
+        await _call(app, path)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "rps": total_requests / elapsed,
+        "ttfb_p50_ms": statistics.median(ttfb) * 1000,
+        "ttfb_p95_ms": sorted(ttfb)[int(0.95 * (len(ttfb) - 1))] * 1000,
+    }
+
+
+def main() -> None:
+    """Point d'entrée principal du script."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark des middlewares (ASGI pur vs BaseHTTPMiddleware)",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=5000,
+        help="Nombre de requêtes par scénario",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=20,
+        help="Nombre de requêtes simultanées",
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        default=10,
+        help="Nombre d'événements par flux SSE",
+    )
+    
+    args = parser.parse_args()
+    
+    # Les logs par requête fausseraient la mesure
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    
+    apps = build_apps(args.events)
+    for path in ("/ping", "/sse"):
+        print("\n" + "=" * 60)
+        print(f"📊 {path} ({args.requests} requêtes, concurrence {args.concurrency})")
+        print("=" * 60)
+        results = {}
+        for name, app in apps.items():
+            results[name] = asyncio.run(run_scenario(app, path, args.requests, args.concurrency))
+            r = results[name]
+            print(
+                f"   {name:<20}: {r['rps']:>9.0f} req/s"
+                f" | TTFB p50 {r['ttfb_p50_ms']:.3f} ms"
+                f" | p95 {r['ttfb_p95_ms']:.3f} ms"
+            )
+        
+        legacy, pure = results["BaseHTTPMiddleware"], results["ASGI pur"]
+        print(f"   Gain débit          : x{pure['rps'] / legacy['rps']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark des Noyaux de Similarité
+===================================
+
+Compare l'ancienne similarité cosinus en Python pur (boucles `zip`/`sum`
+sur des listes) avec les noyaux NumPy de `src.services.similarity`.
+
+Scénarios (vecteurs aléatoires, dimension de mistral-embed) :
+- un-contre-un : `EmbeddingService.compute_similarity`
+- un-contre-plusieurs : une requête contre N documents + top-k
+- plusieurs-contre-plusieurs : matrice des similarités de C candidats (MMR)
+- int8 : même recherche sur la matrice quantifiée (mémoire, rappel@k)
+
+Usage:
+    python -m scripts.bench_similarity
+    python -m scripts.bench_similarity --docs 50000 --dim 1024 --k 10
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+# Ajouter src au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from src.services import similarity
+
+
+# ===== Ancienne implémentation (référence) =====
+
+def legacy_cosine(embedding1: list[float], embedding2: list[float]) -> float:
+    """Similarité cosinus en Python pur (ancienne `compute_similarity`)."""
+    dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
+    norm1 = math.sqrt(sum(a * a for a in embedding1))
+    norm2 = math.sqrt(sum(b * b for b in embedding2))
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return dot_product / (norm1 * norm2)
+
+
+# ===== Mesure =====
+
+def measure(fn: Callable[[], object], min_time: float = 0.5) -> float:
+    """Durée médiane d'un appel (secondes), répété pendant au moins `min_time`."""
+    fn()  # Échauffement
+    timings: list[float] = []
+    deadline = time.perf_counter() + min_time
+    while time.perf_counter() < deadline or len(timings) < 3:
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def report(name: str, legacy: float | None, vectorized: float) -> None:
+    legacy_text = f"{legacy * 1000:>10.3f} ms" if legacy is not None else " " * 13
+    gain = f"x{legacy / vectorized:,.0f}" if legacy is not None else ""
+    print(f"   {name:<28}: {legacy_text} → {vectorized * 1000:>9.3f} ms  {gain}")
+
+
+def main() -> None:
+    """Point d'entrée principal du script."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark des noyaux de similarité (NumPy vs Python pur)",
+    )
+    parser.add_argument("--docs", type=int, default=10_000, help="Nombre de documents")
+    parser.add_argument("--dim", type=int, default=1024, help="Dimension des vecteurs")
+    parser.add_argument("--candidates", type=int, default=40, help="Candidats de la MMR")
+    parser.add_argument("--k", type=int, default=10, help="Taille du top-k")
+    parser.add_argument(
+        "--legacy-docs",
+        type=int,
+        default=1_000,
+        help="Documents mesurés en Python pur (extrapolé à --docs)",
+    )
+    
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(42)
+    docs_array = rng.normal(size=(args.docs, args.dim)).astype(np.float32)
+    query_array = rng.normal(size=args.dim).astype(np.float32)
+    docs_list = docs_array[:args.legacy_docs].tolist()
+    query_list = query_array.tolist()
+    
+    print("\n" + "=" * 72)
+    print(f"📊 Similarité cosinus ({args.docs} documents, dimension {args.dim})")
+    print("=" * 72)
+    print(f"   {'scénario':<28}   {'Python pur':>13}   {'NumPy':>12}")
+    
+    # Un-contre-un
+    report(
+        "un-contre-un",
+        measure(lambda: legacy_cosine(query_list, docs_list[0])),
+        measure(lambda: similarity.cosine(query_array, docs_array[0])),
+    )
+    
+    # Préparation de la matrice (une fois, à la construction d'un index)
+    prepare = measure(lambda: similarity.as_matrix(docs_array))
+    docs = similarity.as_matrix(docs_array)
+    report("normalisation (une fois)", None, prepare)
+    
+    # Un-contre-plusieurs + top-k (Python pur extrapolé depuis --legacy-docs)
+    def legacy_search() -> list[float]:
+        scores = [legacy_cosine(query_list, doc) for doc in docs_list]
+        return sorted(scores, reverse=True)[:args.k]
+    
+    legacy = measure(legacy_search) * args.docs / len(docs_list)
+    report(
+        f"1 × {args.docs} + top-{args.k}",
+        legacy,
+        measure(lambda: similarity.top_k(similarity.one_to_many(query_array, docs), args.k)),
+    )
+    
+    scores = similarity.one_to_many(query_array, docs)
+    report(
+        f"top-{args.k} : argpartition vs tri",
+        measure(lambda: np.argsort(scores)[::-1][:args.k]),
+        measure(lambda: similarity.top_k(scores, args.k)),
+    )
+    
+    # Plusieurs-contre-plusieurs (matrice de la MMR)
+    candidates_list = docs_list[:args.candidates]
+    candidates = docs[:args.candidates]
+    report(
+        f"{args.candidates} × {args.candidates} (MMR)",
+        measure(lambda: [[legacy_cosine(a, b) for b in candidates_list] for a in candidates_list]),
+        measure(lambda: similarity.many_to_many(candidates)),
+    )
+    
+    # Chemin int8
+    quantized = similarity.QuantizedMatrix.from_matrix(docs)
+    report(
+        f"int8 : 1 × {args.docs} + top-{args.k}",
+        None,
+        measure(lambda: similarity.top_k(quantized.one_to_many(query_array), args.k)),
+    )
+    
+    recalls = []
+    for query in rng.normal(size=(50, args.dim)).astype(np.float32):
+        expected = set(similarity.top_k(similarity.one_to_many(query, docs), args.k)[0])
+        found = set(similarity.top_k(quantized.one_to_many(query), args.k)[0])
+        recalls.append(len(expected & found) / len(expected))
+    
+    print(
+        f"\n   Mémoire float32 : {docs.nbytes / 1e6:.1f} Mo"
+        f" | int8 : {quantized.nbytes / 1e6:.1f} Mo"
+        f" | rappel@{args.k} int8 : {np.mean(recalls):.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
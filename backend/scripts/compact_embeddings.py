@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Embeddings Compacts
+====================
+
+Outils du mode compact (migration 015, `src/services/compact_embeddings.py`).
+
+- `fit` : ajuste une projection PCA sur un échantillon du corpus et
+  l'enregistre (.npz, setting `compact_embedding_projection`)
+- `backfill` : écrit `embedding_compact` des documents existants avec
+  la projection configurée (`--all` : réécrit tout, après un changement
+  de projection) ; la double écriture couvre les nouveaux documents
+- `report` : rappel / latence / stockage du mode compact
+  - rappel@k hors ligne (NumPy) sur un échantillon : premier passage
+    compact (arrondi float16 comme halfvec) seul, puis re-scoré en
+    pleine précision, contre le top-k exact complet
+  - latences p50/p95 de `match_document_ids` avec et sans premier
+    passage compact, et accord@k entre les deux
+  - stockage : octets par vecteur (colonnes) et taille des index HNSW
+
+Nécessite DATABASE_URL (ou --dsn) ; seul `backfill` écrit en base.
+
+Usage:
+    python -m scripts.compact_embeddings fit --sample 20000 --output compact_pca.npz
+    python -m scripts.compact_embeddings backfill --batch 500
+    python -m scripts.compact_embeddings report --sample 5000 --queries 200 --k 10
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Ajouter src au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.services import similarity
+from src.services.compact_embeddings import CompactProjection
+
+
+FULL_INDEX = "idx_documents_embedding_ip"
+COMPACT_INDEX = "idx_documents_embedding_compact"
+
+SEARCH_SQL = (
+    "SELECT id FROM match_document_ids($1::text::vector, 0, $2, NULL, NULL, NULL, NULL, "
+    "$3::text::halfvec, $4)"
+)
+
+
+def vector_literal(vector: np.ndarray) -> str:
+    """Vecteur au format texte pgvector."""
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def percentile(values: list[float], p: float) -> float:
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def configured_projection() -> CompactProjection:
+    """Projection des settings (PCA si configurée, troncature sinon)."""
+    settings = get_settings()
+    if settings.compact_embedding_projection:
+        return CompactProjection.load(settings.compact_embedding_projection)
+    return CompactProjection.truncation(settings.compact_embedding_dimension)
+
+
+async def sample_embeddings(conn, size: int) -> np.ndarray:
+    """Échantillon aléatoire d'embeddings (size × d)."""
+    rows = await conn.fetch(
+        "SELECT embedding::text AS embedding FROM documents "
+        "WHERE embedding IS NOT NULL ORDER BY random() LIMIT $1",
+        size,
+    )
+    return similarity.as_matrix([json.loads(row["embedding"]) for row in rows])
+
+
+def compact_recall(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    projection: CompactProjection,
+    k: int,
+    multiplier: int,
+) -> tuple[float, float]:
+    """
+    Rappel@k hors ligne du premier passage compact.
+    
+    Returns:
+        Rappel du passage compact seul et après re-scoring de
+        k × multiplier candidats en pleine précision.
+    """
+    # Arrondi float16 : précision de la colonne halfvec
+    compact_corpus = projection.project_many(corpus).astype(np.float16).astype(np.float32)
+    compact_queries = projection.project_many(queries)
+    
+    compact_only: list[float] = []
+    rescored: list[float] = []
+    for query, compact_query in zip(queries, compact_queries):
+        expected = set(similarity.top_k(similarity.one_to_many(query, corpus), k)[0].tolist())
+        
+        compact_scores = similarity.one_to_many(compact_query, compact_corpus)
+        candidates, _ = similarity.top_k(compact_scores, k * multiplier)
+        compact_only.append(len(expected.intersection(candidates[:k].tolist())) / k)
+        
+        full_scores = similarity.one_to_many(query, corpus[candidates])
+        order, _ = similarity.top_k(full_scores, k)
+        rescored.append(len(expected.intersection(candidates[order].tolist())) / k)
+    
+    return float(np.mean(compact_only)), float(np.mean(rescored))
+
+
+async def timed_search(
+    conn,
+    queries: list[tuple[str, str | None]],
+    k: int,
+    rescore_count: int | None,
+) -> tuple[list[list[str]], list[float]]:
+    """Appels de match_document_ids ; ids et latences (ms)."""
+    results: list[list[str]] = []
+    latencies: list[float] = []
+    for query, compact in queries:
+        started = time.perf_counter()
+        rows = await conn.fetch(SEARCH_SQL, query, k, compact, rescore_count if compact else None)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([str(row["id"]) for row in rows])
+    return results, latencies
+
+
+async def fit(conn, args: argparse.Namespace) -> None:
+    dimension = args.dimension or get_settings().compact_embedding_dimension
+    sample = await sample_embeddings(conn, args.sample)
+    print(f"\n📐 PCA {sample.shape[1]} → {dimension} sur {len(sample)} embeddings")
+    projection = CompactProjection.fit(sample, dimension)
+    projection.save(args.output)
+    print(f"✅ Projection enregistrée : {args.output}")
+    print("   (compact_embedding_projection, puis backfill --all)")
+
+
+async def backfill(conn, args: argparse.Namespace) -> None:
+    projection = configured_projection()
+    condition = "" if args.all else "AND embedding_compact IS NULL"
+    last_id = "00000000-0000-0000-0000-000000000000"
+    updated = 0
+    
+    while True:
+        rows = await conn.fetch(
+            f"SELECT id, embedding::text AS embedding FROM documents "
+            f"WHERE id > $1 AND embedding IS NOT NULL {condition} "
+            f"ORDER BY id LIMIT $2",
+            last_id,
+            args.batch,
+        )
+        if not rows:
+            break
+        compact = projection.project_many([json.loads(row["embedding"]) for row in rows])
+        await conn.execute(
+            "UPDATE documents d SET embedding_compact = v.compact::halfvec "
+            "FROM unnest($1::uuid[], $2::text[]) AS v(id, compact) WHERE d.id = v.id",
+            [row["id"] for row in rows],
+            [vector_literal(vector) for vector in compact],
+        )
+        updated += len(rows)
+        last_id = str(rows[-1]["id"])
+        print(f"   {updated} documents")
+    
+    print(f"✅ Backfill terminé : {updated} documents ({projection.dimension} dimensions)")
+
+
+async def report(conn, args: argparse.Namespace) -> None:
+    settings = get_settings()
+    projection = configured_projection()
+    multiplier = args.multiplier or settings.compact_rescore_multiplier
+    rng = np.random.default_rng(args.seed)
+    
+    corpus = await sample_embeddings(conn, args.sample)
+    seeds = corpus[rng.integers(0, len(corpus), size=args.queries)]
+    queries = similarity.as_matrix(
+        seeds + rng.normal(scale=0.02, size=seeds.shape).astype(np.float32)
+    )
+    
+    kind = "PCA" if projection.components is not None else "troncature"
+    print("\n" + "=" * 64)
+    print(
+        f"📊 Mode compact : {corpus.shape[1]} → {projection.dimension} dimensions ({kind}), "
+        f"re-scoring de {multiplier} × k"
+    )
+    print("=" * 64)
+    
+    # Rappel hors ligne
+    compact_only, rescored = compact_recall(corpus, queries, projection, args.k, multiplier)
+    print(f"\n   Rappel@{args.k} (échantillon de {len(corpus)} documents)")
+    print(f"   {'compact seul':<28} {compact_only:>8.3f}")
+    print(f"   {'compact + re-scoring':<28} {rescored:>8.3f}")
+    
+    # Latences en base
+    full_queries = [(vector_literal(q), None) for q in queries]
+    compact_queries = [
+        (vector_literal(q), vector_literal(c))
+        for q, c in zip(queries, projection.project_many(queries))
+    ]
+    await timed_search(conn, full_queries[:10], args.k, None)
+    full_ids, full_latencies = await timed_search(conn, full_queries, args.k, None)
+    await timed_search(conn, compact_queries[:10], args.k, args.k * multiplier)
+    compact_ids, compact_latencies = await timed_search(
+        conn, compact_queries, args.k, args.k * multiplier,
+    )
+    agreement = float(np.mean([
+        len(set(full).intersection(compact)) / max(len(full), 1)
+        for full, compact in zip(full_ids, compact_ids)
+    ]))
+    print(f"\n   Latence de match_document_ids (k={args.k})")
+    print(f"   {'index':<28} {'p50':>11}   {'p95':>11}")
+    for name, latencies in (("complet", full_latencies), ("compact + re-scoring", compact_latencies)):
+        print(
+            f"   {name:<28} {percentile(latencies, 50):>8.2f} ms"
+            f"   {percentile(latencies, 95):>8.2f} ms"
+        )
+    print(f"   Accord@{args.k} compact / complet : {agreement:.3f}")
+    
+    # Stockage
+    sizes = await conn.fetchrow(
+        "SELECT avg(pg_column_size(embedding)) AS full_bytes, "
+        "avg(pg_column_size(embedding_compact)) AS compact_bytes, "
+        "count(embedding_compact) AS compact_rows, count(*) AS rows "
+        "FROM documents"
+    )
+    indexes = {
+        row["name"]: row["bytes"]
+        for row in await conn.fetch(
+            "SELECT relname AS name, pg_relation_size(oid) AS bytes "
+            "FROM pg_class WHERE relname = ANY($1::text[])",
+            [FULL_INDEX, COMPACT_INDEX],
+        )
+    }
+    print(f"\n   Stockage ({sizes['compact_rows']}/{sizes['rows']} documents compacts)")
+    print(f"   {'':<28} {'vecteur':>11}   {'index HNSW':>11}")
+    for name, column_bytes, index in (
+        ("complet (vector)", sizes["full_bytes"], FULL_INDEX),
+        ("compact (halfvec)", sizes["compact_bytes"], COMPACT_INDEX),
+    ):
+        print(
+            f"   {name:<28} {float(column_bytes or 0):>8.0f} o"
+            f"   {indexes.get(index, 0) / 1024 / 1024:>8.1f} Mo"
+        )
+
+
+COMMANDS = {"fit": fit, "backfill": backfill, "report": report}
+
+
+async def run(args: argparse.Namespace) -> None:
+    import asyncpg
+    
+    dsn = args.dsn or get_settings().database_url
+    if not dsn:
+        print("❌ DATABASE_URL (ou --dsn) requis")
+        sys.exit(1)
+    
+    conn = await asyncpg.connect(dsn)
+    try:
+        await COMMANDS[args.command](conn, args)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    """Point d'entrée principal du script."""
+    parser = argparse.ArgumentParser(
+        description="Mode compact des embeddings : PCA, backfill, rapport",
+    )
+    parser.add_argument("--dsn", default="", help="DSN Postgres (défaut : DATABASE_URL)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    fit_parser = subparsers.add_parser("fit", help="Ajuster une projection PCA")
+    fit_parser.add_argument("--sample", type=int, default=20_000, help="Taille de l'échantillon")
+    fit_parser.add_argument(
+        "--dimension",
+        type=int,
+        default=None,
+        help="Dimension compacte (défaut : compact_embedding_dimension)",
+    )
+    fit_parser.add_argument("--output", default="compact_pca.npz", help="Fichier de la projection")
+    
+    backfill_parser = subparsers.add_parser("backfill", help="Écrire embedding_compact")
+    backfill_parser.add_argument("--batch", type=int, default=500, help="Documents par lot")
+    backfill_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Réécrire tous les documents (changement de projection)",
+    )
+    
+    report_parser = subparsers.add_parser("report", help="Rappel, latence et stockage")
+    report_parser.add_argument("--sample", type=int, default=5_000, help="Documents de l'échantillon")
+    report_parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes")
+    report_parser.add_argument("--k", type=int, default=10, help="Taille du top-k")
+    report_parser.add_argument(
+        "--multiplier",
+        type=int,
+        default=None,
+        help="Candidats re-scorés par résultat (défaut : compact_rescore_multiplier)",
+    )
+    report_parser.add_argument("--seed", type=int, default=42, help="Graine du générateur")
+    
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Script de Test de Charge
+=========================
+
+Envoie des requêtes concurrentes sur /query et /query/stream
+et mesure latence, time-to-first-token et taux d'erreur.
+
+Pour un test sans clés Mistral/Perplexity, démarrer l'API
+avec le provider simulé :
+    DEFAULT_LLM_PROVIDER=local EMBEDDING_BACKEND=local uvicorn src.api.main:app
+
+Usage:
+    python -m scripts.load_test --api-key sk-xxx --concurrency 20 --requests 200
+    python -m scripts.load_test --api-key sk-xxx --endpoint stream
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import httpx
+
+
+QUESTIONS = [
+    "Quels sont mes projets Python ?",
+    "Résume mon expérience professionnelle.",
+    "Quelles technologies j'utilise le plus ?",
+    "Explique le fonctionnement du RAG.",
+    "Quelles sont mes compétences principales ?",
+]
+
+
+@dataclass
+class LoadTestResult:
+    """Mesures agrégées d'un scénario."""
+    
+    endpoint: str
+    latencies_ms: list[float] = field(default_factory=list)
+    ttft_ms: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    elapsed_s: float = 0.0
+    
+    @staticmethod
+    def _percentile(values: list[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def report(self) -> None:
+        """Affiche le rapport du scénario."""
+        total = sum(self.statuses.values())
+        ok = self.statuses.get(200, 0)
+        
+        print("\n" + "=" * 50)
+        print(f"📊 {self.endpoint}")
+        print("=" * 50)
+        print(f"   Requêtes        : {total} ({ok} OK)")
+        if self.elapsed_s:
+            print(f"   Débit           : {total / self.elapsed_s:.1f} req/s")
+        print(f"   Statuts         : {dict(self.statuses)}")
+        if self.latencies_ms:
+            print(f"   Latence p50     : {self._percentile(self.latencies_ms, 50):.0f} ms")
+            print(f"   Latence p95     : {self._percentile(self.latencies_ms, 95):.0f} ms")
+            print(f"   Latence p99     : {self._percentile(self.latencies_ms, 99):.0f} ms")
+            print(f"   Latence moyenne : {statistics.mean(self.latencies_ms):.0f} ms")
+        if self.ttft_ms:
+            print(f"   TTFT p50        : {self._percentile(self.ttft_ms, 50):.0f} ms")
+            print(f"   TTFT p95        : {self._percentile(self.ttft_ms, 95):.0f} ms")
+
+
+async def _run_query(
+    client: httpx.AsyncClient,
+    payload: dict,
+    result: LoadTestResult,
+) -> None:
+    """Une requête /query (réponse complète)."""
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/v1/query", json=payload)
+        result.statuses[response.status_code] += 1
+        if response.status_code == 200:
+            result.latencies_ms.append((time.perf_counter() - start) * 1000)
+    except httpx.HTTPError as e:
+        result.statuses[type(e).__name__] += 1
+
+
+async def _run_stream(
+    client: httpx.AsyncClient,
+    payload: dict,
+    result: LoadTestResult,
+) -> None:
+    """Une requête /query/stream (mesure du premier chunk)."""
+    start = time.perf_counter()
+    first_chunk: float | None = None
+    try:
+        async with client.stream("POST", "/api/v1/query/stream", json=payload) as response:
+            result.statuses[response.status_code] += 1
+            if response.status_code != 200:
+                await response.aread()
+                return
+            async for line in response.aiter_lines():
+                if first_chunk is None and line.startswith("event: chunk"):
+                    first_chunk = time.perf_counter()
+        
+        result.latencies_ms.append((time.perf_counter() - start) * 1000)
+        if first_chunk is not None:
+            result.ttft_ms.append((first_chunk - start) * 1000)
+    except httpx.HTTPError as e:
+        result.statuses[type(e).__name__] += 1
+
+
+async def run_scenario(
+    base_url: str,
+    api_key: str,
+    endpoint: str,
+    total_requests: int,
+    concurrency: int,
+    timeout: float,
+) -> LoadTestResult:
+    """
+    Exécute un scénario de charge sur un endpoint.
+    
+    Args:
+        base_url: URL de l'API.
+        api_key: Clé API (header X-API-Key).
+        endpoint: "query" ou "stream".
+        total_requests: Nombre total de requêtes.
+        concurrency: Requêtes simultanées.
+        timeout: Timeout par requête (secondes).
+    """
+    result = LoadTestResult(endpoint=f"/query{'/stream' if endpoint == 'stream' else ''}")
+    runner = _run_stream if endpoint == "stream" else _run_query
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        headers={"X-API-Key": api_key},
+        timeout=timeout,
+        limits=limits,
+    ) as client:
+        async def one(index: int) -> None:
+            async with semaphore:
+                payload = {"question": QUESTIONS[index % len(QUESTIONS)]}
+                await runner(client, payload, result)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total_requests)))
+        result.elapsed_s = time.perf_counter() - start
+    
+    return result
+
+
+def main() -> None:
+    """Point d'entrée principal du script."""
+    parser = argparse.ArgumentParser(
+        description="Test de charge des endpoints /query et /query/stream",
+    )
+    
+    parser.add_argument(
+        "--url",
+        default="http://localhost:8000",
+        help="URL de base de l'API",
+    )
+    parser.add_argument(
+        "--api-key",
+        required=True,
+        help="Clé API utilisée pour les requêtes",
+    )
+    parser.add_argument(
+        "--endpoint",
+        choices=["query", "stream", "both"],
+        default="both",
+        help="Endpoint(s) à tester",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=100,
+        help="Nombre total de requêtes par endpoint",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Nombre de requêtes simultanées",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="Timeout par requête en secondes",
+    )
+    
+    args = parser.parse_args()
+    
+    endpoints = ["query", "stream"] if args.endpoint == "both" else [args.endpoint]
+    for endpoint in endpoints:
+        result = asyncio.run(run_scenario(
+            args.url,
+            args.api_key,
+            endpoint,
+            args.requests,
+            args.concurrency,
+            args.timeout,
+        ))
+        result.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+-- ============================================
+-- Migration 008: Batched API Key Usage Write-Back
+-- RAG Agent IA - Cache de validation des clés API
+-- ============================================
+--
+-- Les validations de clés sont désormais servies depuis un cache
+-- (mémoire + Redis). Seul le premier appel passe par validate_api_key ;
+-- l'usage des requêtes servies par le cache est agrégé côté API puis
+-- écrit par lots via record_api_key_usage_batch.
+--
+-- Prérequis : Migration 005 (validate_api_key, usage_records)
+-- ============================================
+
+-- ============================================
+-- Fonction: increment_user_requests_by
+-- Variante de increment_user_requests pour N requêtes
+-- ============================================
+CREATE OR REPLACE FUNCTION increment_user_requests_by(
+    p_user_id UUID,
+    p_count INT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_period VARCHAR(7);
+    v_usage RECORD;
+    v_plan RECORD;
+    v_subscription_id UUID;
+    v_plan_id UUID;
+BEGIN
+    IF p_count IS NULL OR p_count <= 0 THEN
+        RETURN;
+    END IF;
+
+    v_period := TO_CHAR(NOW(), 'YYYY-MM');
+
+    SELECT s.id, s.plan_id INTO v_subscription_id, v_plan_id
+    FROM subscriptions s
+    WHERE s.user_id = p_user_id AND s.status = 'active';
+
+    IF v_subscription_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT * INTO v_plan FROM plans WHERE id = v_plan_id;
+
+    INSERT INTO usage_records (user_id, subscription_id, period, requests_count)
+    VALUES (p_user_id, v_subscription_id, v_period, p_count)
+    ON CONFLICT (user_id, period)
+    DO UPDATE SET
+        requests_count = usage_records.requests_count + p_count,
+        updated_at = NOW()
+    RETURNING * INTO v_usage;
+
+    -- Overage (-1 = illimité)
+    IF v_plan.requests_per_month > 0
+        AND v_usage.requests_count > v_plan.requests_per_month
+        AND v_plan.overage_price_cents > 0 THEN
+        UPDATE usage_records
+        SET
+            overage_requests = requests_count - v_plan.requests_per_month,
+            overage_amount_cents = (requests_count - v_plan.requests_per_month) * v_plan.overage_price_cents
+        WHERE id = v_usage.id;
+    END IF;
+END;
+$$;
+
+-- ============================================
+-- Fonction: record_api_key_usage_batch
+-- Écrit un lot d'usages agrégés par clé
+--
+-- p_usage: [{"key_id": uuid, "user_id": uuid|null, "requests": int,
+--            "last_used_at": timestamptz, "last_used_ip": text|null}]
+-- ============================================
+CREATE OR REPLACE FUNCTION record_api_key_usage_batch(p_usage JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_item JSONB;
+    v_current_month VARCHAR(7);
+    v_count INT := 0;
+BEGIN
+    v_current_month := TO_CHAR(NOW(), 'YYYY-MM');
+
+    FOR v_item IN SELECT * FROM jsonb_array_elements(p_usage)
+    LOOP
+        UPDATE api_keys SET
+            monthly_usage = CASE
+                WHEN usage_reset_month IS DISTINCT FROM v_current_month
+                    THEN (v_item->>'requests')::INT
+                ELSE monthly_usage + (v_item->>'requests')::INT
+            END,
+            usage_reset_month = v_current_month,
+            last_used_at = GREATEST(
+                COALESCE(last_used_at, (v_item->>'last_used_at')::TIMESTAMPTZ),
+                (v_item->>'last_used_at')::TIMESTAMPTZ
+            ),
+            last_used_ip = COALESCE(v_item->>'last_used_ip', last_used_ip)
+        WHERE id = (v_item->>'key_id')::UUID;
+
+        IF v_item->>'user_id' IS NOT NULL THEN
+            PERFORM increment_user_requests_by(
+                (v_item->>'user_id')::UUID,
+                (v_item->>'requests')::INT
+            );
+        END IF;
+
+        v_count := v_count + 1;
+    END LOOP;
+
+    RETURN v_count;
+END;
+$$;
+
+COMMENT ON FUNCTION increment_user_requests_by IS 'Incrémente le compteur de requêtes d''un utilisateur de N';
+COMMENT ON FUNCTION record_api_key_usage_batch IS 'Écriture par lots de l''usage des clés API servies par le cache';
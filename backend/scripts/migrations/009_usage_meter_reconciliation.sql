@@ -0,0 +1,214 @@
+-- ============================================
+-- Migration 009: Usage Meter Reconciliation
+-- RAG Agent IA - Compteurs d'usage Redis
+-- ============================================
+--
+-- L'usage (requêtes, documents, clés) est compté dans Redis et
+-- reporté périodiquement dans usage_records par lots de deltas.
+--
+-- Chaque lot porte un identifiant unique : un lot rejoué (worker
+-- arrêté avant l'acquittement, reprise par un autre worker) n'est
+-- appliqué qu'une seule fois.
+--
+-- validate_api_key accepte p_count_usage : l'API le désactive quand
+-- le compteur Redis fait foi, pour ne pas compter deux fois.
+--
+-- Prérequis : Migration 005 (usage_records), Migration 008
+-- ============================================
+
+-- ============================================
+-- Table: usage_reconciliation_batches
+-- Lots de deltas déjà appliqués (idempotence)
+-- ============================================
+CREATE TABLE IF NOT EXISTS usage_reconciliation_batches (
+    batch_id VARCHAR(64) PRIMARY KEY,
+    entries INT NOT NULL DEFAULT 0,
+    applied_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_reconciliation_batches_applied
+ON usage_reconciliation_batches(applied_at);
+
+ALTER TABLE usage_reconciliation_batches ENABLE ROW LEVEL SECURITY;
+
+-- ============================================
+-- Fonction: apply_usage_deltas
+-- Applique un lot de deltas une seule fois
+--
+-- p_deltas: [{"user_id": uuid, "period": "YYYY-MM",
+--             "type": "requests"|"documents"|"api_keys", "amount": int}]
+-- Retourne FALSE si le lot avait déjà été appliqué.
+-- ============================================
+CREATE OR REPLACE FUNCTION apply_usage_deltas(
+    p_batch_id VARCHAR(64),
+    p_deltas JSONB
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_item JSONB;
+    v_user_id UUID;
+    v_period VARCHAR(7);
+    v_type VARCHAR(20);
+    v_amount INT;
+BEGIN
+    INSERT INTO usage_reconciliation_batches (batch_id, entries)
+    VALUES (p_batch_id, jsonb_array_length(p_deltas))
+    ON CONFLICT (batch_id) DO NOTHING;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    FOR v_item IN SELECT * FROM jsonb_array_elements(p_deltas)
+    LOOP
+        v_user_id := (v_item->>'user_id')::UUID;
+        v_period := v_item->>'period';
+        v_type := v_item->>'type';
+        v_amount := (v_item->>'amount')::INT;
+
+        IF v_amount IS NULL OR v_amount = 0 THEN
+            CONTINUE;
+        END IF;
+
+        INSERT INTO usage_records (
+            user_id, subscription_id, period,
+            requests_count, documents_count, api_keys_count
+        )
+        VALUES (
+            v_user_id,
+            (SELECT s.id FROM subscriptions s
+             WHERE s.user_id = v_user_id AND s.status = 'active'
+             LIMIT 1),
+            v_period,
+            CASE WHEN v_type = 'requests' THEN v_amount ELSE 0 END,
+            CASE WHEN v_type = 'documents' THEN v_amount ELSE 0 END,
+            CASE WHEN v_type = 'api_keys' THEN v_amount ELSE 0 END
+        )
+        ON CONFLICT (user_id, period)
+        DO UPDATE SET
+            requests_count = usage_records.requests_count + EXCLUDED.requests_count,
+            documents_count = usage_records.documents_count + EXCLUDED.documents_count,
+            api_keys_count = usage_records.api_keys_count + EXCLUDED.api_keys_count,
+            updated_at = NOW();
+
+        -- Overage (-1 = illimité)
+        IF v_type = 'requests' THEN
+            UPDATE usage_records ur
+            SET
+                overage_requests = GREATEST(ur.requests_count - p.requests_per_month, 0),
+                overage_amount_cents = GREATEST(ur.requests_count - p.requests_per_month, 0)
+                    * p.overage_price_cents
+            FROM subscriptions s
+            JOIN plans p ON p.id = s.plan_id
+            WHERE ur.user_id = v_user_id
+                AND ur.period = v_period
+                AND s.user_id = v_user_id
+                AND s.status = 'active'
+                AND p.requests_per_month > 0
+                AND p.overage_price_cents > 0;
+        END IF;
+    END LOOP;
+
+    RETURN TRUE;
+END;
+$$;
+
+-- ============================================
+-- Fonction: validate_api_key (p_count_usage)
+-- ============================================
+DROP FUNCTION IF EXISTS validate_api_key(VARCHAR, VARCHAR);
+
+CREATE OR REPLACE FUNCTION validate_api_key(
+    p_key_hash VARCHAR(64),
+    p_client_ip VARCHAR(45) DEFAULT NULL,
+    p_count_usage BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (
+    id UUID,
+    name VARCHAR(100),
+    scopes TEXT[],
+    rate_limit_per_minute INT,
+    is_valid BOOLEAN,
+    rejection_reason VARCHAR(50),
+    user_id UUID
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_key RECORD;
+    v_current_month VARCHAR(7);
+    v_user_limits JSONB;
+BEGIN
+    v_current_month := TO_CHAR(NOW(), 'YYYY-MM');
+
+    -- Rechercher la clé
+    SELECT * INTO v_key
+    FROM api_keys ak
+    WHERE ak.key_hash = p_key_hash;
+
+    -- Clé non trouvée
+    IF v_key IS NULL THEN
+        RETURN QUERY SELECT
+            NULL::UUID, NULL::VARCHAR, NULL::TEXT[], 0, FALSE, 'invalid_key'::VARCHAR, NULL::UUID;
+        RETURN;
+    END IF;
+
+    -- Clé désactivée
+    IF NOT v_key.is_active THEN
+        RETURN QUERY SELECT
+            v_key.id, v_key.name, v_key.scopes, v_key.rate_limit_per_minute,
+            FALSE, 'key_revoked'::VARCHAR, v_key.user_id;
+        RETURN;
+    END IF;
+
+    -- Clé expirée
+    IF v_key.expires_at IS NOT NULL AND v_key.expires_at < NOW() THEN
+        RETURN QUERY SELECT
+            v_key.id, v_key.name, v_key.scopes, v_key.rate_limit_per_minute,
+            FALSE, 'key_expired'::VARCHAR, v_key.user_id;
+        RETURN;
+    END IF;
+
+    -- Vérifier les limites utilisateur (si user_id existe)
+    IF v_key.user_id IS NOT NULL THEN
+        v_user_limits := check_user_limits(v_key.user_id, 'request');
+
+        IF NOT (v_user_limits->>'allowed')::BOOLEAN THEN
+            RETURN QUERY SELECT
+                v_key.id, v_key.name, v_key.scopes, v_key.rate_limit_per_minute,
+                FALSE, (v_user_limits->>'reason')::VARCHAR, v_key.user_id;
+            RETURN;
+        END IF;
+
+        -- Incrémenter l'usage (sauf si compté par le compteur Redis)
+        IF p_count_usage THEN
+            PERFORM increment_user_requests(v_key.user_id);
+        END IF;
+    END IF;
+
+    -- Reset mensuel si nécessaire (pour rate limiting par clé)
+    IF v_key.usage_reset_month IS NULL OR v_key.usage_reset_month != v_current_month THEN
+        UPDATE api_keys SET
+            monthly_usage = 0,
+            usage_reset_month = v_current_month
+        WHERE api_keys.id = v_key.id;
+    END IF;
+
+    -- Mettre à jour l'utilisation
+    UPDATE api_keys SET
+        last_used_at = NOW(),
+        last_used_ip = p_client_ip,
+        monthly_usage = monthly_usage + 1
+    WHERE api_keys.id = v_key.id;
+
+    -- Clé valide
+    RETURN QUERY SELECT
+        v_key.id, v_key.name, v_key.scopes, v_key.rate_limit_per_minute,
+        TRUE, NULL::VARCHAR, v_key.user_id;
+END;
+$$;
+
+COMMENT ON TABLE usage_reconciliation_batches IS 'Lots de deltas d''usage déjà appliqués (idempotence du reconciler)';
+COMMENT ON FUNCTION apply_usage_deltas IS 'Applique un lot de deltas d''usage une seule fois';
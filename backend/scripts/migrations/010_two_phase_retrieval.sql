@@ -0,0 +1,61 @@
+-- ============================================
+-- Migration 010: Two-Phase Retrieval
+-- RAG Agent IA - Recherche vectorielle en deux temps
+-- ============================================
+--
+-- match_documents renvoie le contenu complet et les métadonnées de
+-- chaque résultat, alors que seuls les fragments retenus dans le
+-- contexte du LLM sont utilisés.
+--
+-- Phase 1 : match_document_ids renvoie identifiants, scores, taille du
+-- contenu et métadonnées compactes. octet_length() lit la taille dans
+-- l'en-tête TOAST, sans décompresser le contenu.
+--
+-- Phase 2 : le contenu des fragments retenus est lu en une requête
+-- (documents.id = ANY(...)), via la clé primaire.
+--
+-- Prérequis : Migration 006
+-- ============================================
+
+CREATE OR REPLACE FUNCTION match_document_ids(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    similarity FLOAT,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    content_bytes INT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        1 - (d.embedding <=> query_embedding) AS similarity,
+        d.source_type,
+        d.source_id,
+        octet_length(d.content) AS content_bytes,
+        jsonb_strip_nulls(jsonb_build_object(
+            'title', d.metadata->'title',
+            'url', d.metadata->'url',
+            'file_path', d.metadata->'file_path'
+        )) AS metadata
+    FROM documents d
+    WHERE 1 - (d.embedding <=> query_embedding) > match_threshold
+    AND (filter_source_type IS NULL OR d.source_type = filter_source_type)
+    AND (filter_user_id IS NULL OR d.user_id = filter_user_id)
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+COMMENT ON FUNCTION match_document_ids IS
+'Recherche vectorielle compacte (phase 1) : identifiants, scores et taille du contenu, sans le contenu';
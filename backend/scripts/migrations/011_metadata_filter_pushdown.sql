@@ -0,0 +1,190 @@
+-- ============================================
+-- Migration 011: Metadata Filter Pushdown
+-- RAG Agent IA - Filtres de métadonnées dans la recherche vectorielle
+-- ============================================
+--
+-- match_documents et match_document_ids ne filtraient que par
+-- source_type et user_id : un filtre sur les tags, la langue, le
+-- repository, la date ou is_cv devait être appliqué après coup, sur
+-- des résultats sur-échantillonnés puis en partie jetés.
+--
+-- Les deux fonctions reçoivent un paramètre `filters` (JSONB, construit
+-- par `DocumentFilter.to_params()`), évalué dans la même requête que le
+-- parcours de l'index HNSW :
+--   tags_any        metadata->'tags' ?| [...]      (GIN sur les tags)
+--   tags_all        metadata->'tags' @> [...]      (GIN sur les tags)
+--   contains        metadata @> {...}              (GIN sur metadata)
+--   excludes        NOT metadata @> {...}
+--   source_types    source_type = ANY([...])       (btree source_type)
+--   created_after   created_at >= ...              (btree created_at)
+--   created_before  created_at <  ...              (btree created_at)
+--
+-- Filtre sélectif : le planificateur lit les candidats par les index
+-- GIN/btree et trie les distances exactes. Filtre large : parcours HNSW
+-- filtré ; avec pgvector >= 0.8, le parcours itératif (strict_order)
+-- continue jusqu'à obtenir match_count résultats qui satisfont le filtre.
+--
+-- Les signatures changent : les anciennes surcharges (002 : filtre
+-- metadata seul, 006 : user_id) sont supprimées pour éviter les appels
+-- ambigus. match_documents renvoie de nouveau created_at (DocumentMatch).
+--
+-- Prérequis : Migrations 006 et 010
+-- ============================================
+
+DROP FUNCTION IF EXISTS match_documents(vector, FLOAT, INT, VARCHAR, JSONB);
+DROP FUNCTION IF EXISTS match_documents(vector, FLOAT, INT, VARCHAR, UUID);
+DROP FUNCTION IF EXISTS match_document_ids(vector, FLOAT, INT, VARCHAR, UUID);
+
+-- ============================================
+-- Index des prédicats
+-- ============================================
+
+-- Tags (?| et @> sur le tableau metadata->'tags')
+CREATE INDEX IF NOT EXISTS idx_documents_metadata_tags
+ON documents USING gin((metadata->'tags'));
+
+-- Intervalles de dates
+CREATE INDEX IF NOT EXISTS idx_documents_created_at
+ON documents(created_at);
+
+-- La contenance (langue, repository, is_cv, metadata) s'appuie sur
+-- idx_documents_metadata (GIN, migration 001).
+
+-- ============================================
+-- Fonction: match_documents
+-- ============================================
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    content TEXT,
+    metadata JSONB,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    similarity FLOAT,
+    user_id UUID,
+    created_at TIMESTAMPTZ
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    tags_any TEXT[] := CASE WHEN filters ? 'tags_any'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'tags_any')) END;
+    source_types TEXT[] := CASE WHEN filters ? 'source_types'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'source_types')) END;
+    created_after TIMESTAMPTZ := (filters->>'created_after')::TIMESTAMPTZ;
+    created_before TIMESTAMPTZ := (filters->>'created_before')::TIMESTAMPTZ;
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.content,
+        d.metadata,
+        d.source_type,
+        d.source_id,
+        1 - (d.embedding <=> query_embedding) AS similarity,
+        d.user_id,
+        d.created_at
+    FROM documents d
+    WHERE 1 - (d.embedding <=> query_embedding) > match_threshold
+    AND (filter_source_type IS NULL OR d.source_type = filter_source_type)
+    AND (filter_user_id IS NULL OR d.user_id = filter_user_id)
+    AND (tags_any IS NULL OR d.metadata->'tags' ?| tags_any)
+    AND (filters->'tags_all' IS NULL OR d.metadata->'tags' @> filters->'tags_all')
+    AND (filters->'contains' IS NULL OR d.metadata @> filters->'contains')
+    AND (filters->'excludes' IS NULL OR NOT d.metadata @> filters->'excludes')
+    AND (source_types IS NULL OR d.source_type = ANY(source_types))
+    AND (created_after IS NULL OR d.created_at >= created_after)
+    AND (created_before IS NULL OR d.created_at < created_before)
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- ============================================
+-- Fonction: match_document_ids (phase 1, migration 010)
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_ids(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    similarity FLOAT,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    content_bytes INT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    tags_any TEXT[] := CASE WHEN filters ? 'tags_any'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'tags_any')) END;
+    source_types TEXT[] := CASE WHEN filters ? 'source_types'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'source_types')) END;
+    created_after TIMESTAMPTZ := (filters->>'created_after')::TIMESTAMPTZ;
+    created_before TIMESTAMPTZ := (filters->>'created_before')::TIMESTAMPTZ;
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        1 - (d.embedding <=> query_embedding) AS similarity,
+        d.source_type,
+        d.source_id,
+        octet_length(d.content) AS content_bytes,
+        jsonb_strip_nulls(jsonb_build_object(
+            'title', d.metadata->'title',
+            'url', d.metadata->'url',
+            'file_path', d.metadata->'file_path'
+        )) AS metadata
+    FROM documents d
+    WHERE 1 - (d.embedding <=> query_embedding) > match_threshold
+    AND (filter_source_type IS NULL OR d.source_type = filter_source_type)
+    AND (filter_user_id IS NULL OR d.user_id = filter_user_id)
+    AND (tags_any IS NULL OR d.metadata->'tags' ?| tags_any)
+    AND (filters->'tags_all' IS NULL OR d.metadata->'tags' @> filters->'tags_all')
+    AND (filters->'contains' IS NULL OR d.metadata @> filters->'contains')
+    AND (filters->'excludes' IS NULL OR NOT d.metadata @> filters->'excludes')
+    AND (source_types IS NULL OR d.source_type = ANY(source_types))
+    AND (created_after IS NULL OR d.created_at >= created_after)
+    AND (created_before IS NULL OR d.created_at < created_before)
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- ============================================
+-- Parcours HNSW itératif (pgvector >= 0.8)
+-- ============================================
+-- Sans parcours itératif, un filtre large est appliqué aux seuls
+-- hnsw.ef_search plus proches voisins : moins de match_count résultats.
+DO $$
+BEGIN
+    IF (SELECT string_to_array(extversion, '.')::INT[] >= ARRAY[0, 8]
+        FROM pg_extension WHERE extname = 'vector') THEN
+        ALTER FUNCTION match_documents(vector, FLOAT, INT, VARCHAR, UUID, JSONB)
+            SET hnsw.iterative_scan = 'strict_order';
+        ALTER FUNCTION match_document_ids(vector, FLOAT, INT, VARCHAR, UUID, JSONB)
+            SET hnsw.iterative_scan = 'strict_order';
+    END IF;
+END;
+$$;
+
+COMMENT ON FUNCTION match_documents IS
+'Recherche vectorielle filtrée (source, utilisateur, tags, métadonnées JSONB, dates)';
+
+COMMENT ON FUNCTION match_document_ids IS
+'Recherche vectorielle compacte (phase 1), avec les mêmes filtres que match_documents';
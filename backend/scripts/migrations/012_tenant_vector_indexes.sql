@@ -0,0 +1,223 @@
+-- ============================================
+-- Migration 012: Tenant Vector Indexes
+-- RAG Agent IA - Index vectoriels par tenant
+-- ============================================
+--
+-- L'index HNSW global (idx_documents_embedding) est parcouru puis filtré
+-- par user_id : pour un petit tenant dans une grande table, la plupart
+-- des hnsw.ef_search voisins appartiennent à d'autres tenants, et le
+-- rappel au seuil s'effondre (ou exige un ef_search très élevé).
+--
+-- Organisation :
+-- - gros tenants : index HNSW partiel dédié (WHERE user_id = '...'),
+--   créé par `scripts/tenant_indexes.py` (CREATE INDEX CONCURRENTLY) et
+--   enregistré dans tenant_vector_indexes une fois construit
+-- - petits tenants (pool partagé) : parcours exact de leurs documents
+--   via idx_documents_user (btree), rappel de 100 %
+-- - sans utilisateur : index HNSW global
+--
+-- match_document_candidates choisit le chemin. La requête est construite
+-- dynamiquement : l'identifiant du tenant y figure en littéral, seule
+-- forme sous laquelle le planificateur peut prouver le prédicat d'un
+-- index partiel. Elle est planifiée à chaque appel avec les valeurs
+-- réelles des filtres (migration 011).
+--
+-- match_documents et match_document_ids (signatures inchangées) lisent
+-- les colonnes des seuls candidats retenus, par la clé primaire.
+--
+-- Prérequis : Migration 011
+-- ============================================
+
+-- ============================================
+-- Table: tenant_vector_indexes
+-- Tenants servis par un index HNSW partiel dédié
+-- ============================================
+CREATE TABLE IF NOT EXISTS tenant_vector_indexes (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+
+    -- Nom de l'index partiel (idx_documents_embedding_t_<uuid hex>)
+    index_name TEXT NOT NULL UNIQUE,
+
+    -- Nombre de documents du tenant lors du dernier passage du script
+    document_count INT NOT NULL DEFAULT 0,
+
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE tenant_vector_indexes IS
+'Tenants disposant d''un index HNSW partiel (routage de match_documents)';
+
+-- ============================================
+-- Fonction: match_document_candidates
+-- Identifiants et distances, routés par tenant
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_candidates(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    distance FLOAT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    tags_any TEXT[] := CASE WHEN filters ? 'tags_any'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'tags_any')) END;
+    source_types TEXT[] := CASE WHEN filters ? 'source_types'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'source_types')) END;
+    created_after TIMESTAMPTZ := (filters->>'created_after')::TIMESTAMPTZ;
+    created_before TIMESTAMPTZ := (filters->>'created_before')::TIMESTAMPTZ;
+    -- $1 embedding, $2 seuil, $3 limite, $4 source, $5 filtres,
+    -- $6 tags_any, $7 source_types, $8 created_after, $9 created_before,
+    -- $10 user_id
+    predicates CONSTANT TEXT := $p$
+        1 - (d.embedding <=> $1) > $2
+        AND ($4::VARCHAR IS NULL OR d.source_type = $4)
+        AND ($6::TEXT[] IS NULL OR d.metadata->'tags' ?| $6)
+        AND ($5->'tags_all' IS NULL OR d.metadata->'tags' @> ($5->'tags_all'))
+        AND ($5->'contains' IS NULL OR d.metadata @> ($5->'contains'))
+        AND ($5->'excludes' IS NULL OR NOT d.metadata @> ($5->'excludes'))
+        AND ($7::TEXT[] IS NULL OR d.source_type = ANY($7))
+        AND ($8::TIMESTAMPTZ IS NULL OR d.created_at >= $8)
+        AND ($9::TIMESTAMPTZ IS NULL OR d.created_at < $9)
+    $p$;
+    sql_text TEXT;
+BEGIN
+    IF filter_user_id IS NULL THEN
+        -- Tous les documents : index HNSW global
+        sql_text := 'SELECT d.id, (d.embedding <=> $1)::FLOAT FROM documents d'
+            || ' WHERE ' || predicates
+            || ' ORDER BY d.embedding <=> $1 LIMIT $3';
+    ELSIF EXISTS (
+        SELECT 1 FROM tenant_vector_indexes t WHERE t.user_id = filter_user_id
+    ) THEN
+        -- Gros tenant : index HNSW partiel (user_id en littéral)
+        sql_text := 'SELECT d.id, (d.embedding <=> $1)::FLOAT FROM documents d'
+            || format(' WHERE d.user_id = %L AND ', filter_user_id) || predicates
+            || ' ORDER BY d.embedding <=> $1 LIMIT $3';
+    ELSE
+        -- Pool partagé : parcours exact des documents du tenant (btree
+        -- user_id) ; MATERIALIZED écarte l'index HNSW global
+        sql_text := 'WITH tenant AS MATERIALIZED ('
+            || 'SELECT d.id, (d.embedding <=> $1)::FLOAT AS distance FROM documents d'
+            || ' WHERE d.user_id = $10 AND ' || predicates
+            || ') SELECT tenant.id, tenant.distance FROM tenant'
+            || ' ORDER BY tenant.distance LIMIT $3';
+    END IF;
+
+    RETURN QUERY EXECUTE sql_text
+    USING query_embedding, match_threshold, match_count, filter_source_type, filters,
+        tags_any, source_types, created_after, created_before, filter_user_id;
+END;
+$$;
+
+COMMENT ON FUNCTION match_document_candidates IS
+'Candidats de la recherche vectorielle (id, distance), routés vers l''index du tenant';
+
+-- ============================================
+-- Fonction: match_documents
+-- ============================================
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    content TEXT,
+    metadata JSONB,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    similarity FLOAT,
+    user_id UUID,
+    created_at TIMESTAMPTZ
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.content,
+        d.metadata,
+        d.source_type,
+        d.source_id,
+        1 - c.distance AS similarity,
+        d.user_id,
+        d.created_at
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
+
+-- ============================================
+-- Fonction: match_document_ids (phase 1, migration 010)
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_ids(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    similarity FLOAT,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    content_bytes INT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        1 - c.distance AS similarity,
+        d.source_type,
+        d.source_id,
+        octet_length(d.content) AS content_bytes,
+        jsonb_strip_nulls(jsonb_build_object(
+            'title', d.metadata->'title',
+            'url', d.metadata->'url',
+            'file_path', d.metadata->'file_path'
+        )) AS metadata
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
+
+-- ============================================
+-- Parcours HNSW itératif (pgvector >= 0.8, voir migration 011)
+-- ============================================
+DO $$
+BEGIN
+    IF (SELECT string_to_array(extversion, '.')::INT[] >= ARRAY[0, 8]
+        FROM pg_extension WHERE extname = 'vector') THEN
+        ALTER FUNCTION match_document_candidates(vector, FLOAT, INT, VARCHAR, UUID, JSONB)
+            SET hnsw.iterative_scan = 'strict_order';
+    END IF;
+END;
+$$;
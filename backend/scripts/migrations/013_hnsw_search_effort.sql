@@ -0,0 +1,205 @@
+-- ============================================
+-- Migration 013: HNSW Search Effort
+-- RAG Agent IA - Compromis rappel / latence par requête
+-- ============================================
+--
+-- hnsw.ef_search (taille de la liste de candidats parcourue dans
+-- l'index HNSW, 40 par défaut) n'était réglable que pour tout le
+-- serveur. Les fonctions de recherche reçoivent un paramètre search_ef,
+-- appliqué en SET LOCAL (set_config(..., true)) avant le parcours :
+-- l'application choisit le compromis par requête ou par plan
+-- (`SearchEffort`, settings `search_effort_*`). NULL : réglage du
+-- serveur.
+--
+-- Le rappel et la latence de chaque niveau se mesurent avec
+-- `scripts/bench_hnsw.py`.
+--
+-- Prérequis : Migration 012
+-- ============================================
+
+DROP FUNCTION IF EXISTS match_document_candidates(vector, FLOAT, INT, VARCHAR, UUID, JSONB);
+DROP FUNCTION IF EXISTS match_documents(vector, FLOAT, INT, VARCHAR, UUID, JSONB);
+DROP FUNCTION IF EXISTS match_document_ids(vector, FLOAT, INT, VARCHAR, UUID, JSONB);
+
+-- ============================================
+-- Fonction: match_document_candidates
+-- Identifiants et distances, routés par tenant
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_candidates(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    distance FLOAT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    tags_any TEXT[] := CASE WHEN filters ? 'tags_any'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'tags_any')) END;
+    source_types TEXT[] := CASE WHEN filters ? 'source_types'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'source_types')) END;
+    created_after TIMESTAMPTZ := (filters->>'created_after')::TIMESTAMPTZ;
+    created_before TIMESTAMPTZ := (filters->>'created_before')::TIMESTAMPTZ;
+    -- $1 embedding, $2 seuil, $3 limite, $4 source, $5 filtres,
+    -- $6 tags_any, $7 source_types, $8 created_after, $9 created_before,
+    -- $10 user_id
+    predicates CONSTANT TEXT := $p$
+        1 - (d.embedding <=> $1) > $2
+        AND ($4::VARCHAR IS NULL OR d.source_type = $4)
+        AND ($6::TEXT[] IS NULL OR d.metadata->'tags' ?| $6)
+        AND ($5->'tags_all' IS NULL OR d.metadata->'tags' @> ($5->'tags_all'))
+        AND ($5->'contains' IS NULL OR d.metadata @> ($5->'contains'))
+        AND ($5->'excludes' IS NULL OR NOT d.metadata @> ($5->'excludes'))
+        AND ($7::TEXT[] IS NULL OR d.source_type = ANY($7))
+        AND ($8::TIMESTAMPTZ IS NULL OR d.created_at >= $8)
+        AND ($9::TIMESTAMPTZ IS NULL OR d.created_at < $9)
+    $p$;
+    sql_text TEXT;
+BEGIN
+    -- Effort de recherche : liste de candidats de l'index HNSW, limitée
+    -- à la transaction de l'appel (SET LOCAL)
+    IF search_ef IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', search_ef::TEXT, true);
+    END IF;
+    
+    IF filter_user_id IS NULL THEN
+        -- Tous les documents : index HNSW global
+        sql_text := 'SELECT d.id, (d.embedding <=> $1)::FLOAT FROM documents d'
+            || ' WHERE ' || predicates
+            || ' ORDER BY d.embedding <=> $1 LIMIT $3';
+    ELSIF EXISTS (
+        SELECT 1 FROM tenant_vector_indexes t WHERE t.user_id = filter_user_id
+    ) THEN
+        -- Gros tenant : index HNSW partiel (user_id en littéral)
+        sql_text := 'SELECT d.id, (d.embedding <=> $1)::FLOAT FROM documents d'
+            || format(' WHERE d.user_id = %L AND ', filter_user_id) || predicates
+            || ' ORDER BY d.embedding <=> $1 LIMIT $3';
+    ELSE
+        -- Pool partagé : parcours exact des documents du tenant (btree
+        -- user_id) ; MATERIALIZED écarte l'index HNSW global
+        sql_text := 'WITH tenant AS MATERIALIZED ('
+            || 'SELECT d.id, (d.embedding <=> $1)::FLOAT AS distance FROM documents d'
+            || ' WHERE d.user_id = $10 AND ' || predicates
+            || ') SELECT tenant.id, tenant.distance FROM tenant'
+            || ' ORDER BY tenant.distance LIMIT $3';
+    END IF;
+    
+    RETURN QUERY EXECUTE sql_text
+    USING query_embedding, match_threshold, match_count, filter_source_type, filters,
+        tags_any, source_types, created_after, created_before, filter_user_id;
+END;
+$$;
+
+COMMENT ON FUNCTION match_document_candidates IS
+'Candidats de la recherche vectorielle (id, distance), routés vers l''index du tenant';
+
+-- ============================================
+-- Fonction: match_documents
+-- ============================================
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    content TEXT,
+    metadata JSONB,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    similarity FLOAT,
+    user_id UUID,
+    created_at TIMESTAMPTZ
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.content,
+        d.metadata,
+        d.source_type,
+        d.source_id,
+        1 - c.distance AS similarity,
+        d.user_id,
+        d.created_at
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters, search_ef
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
+
+-- ============================================
+-- Fonction: match_document_ids (phase 1)
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_ids(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    similarity FLOAT,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    content_bytes INT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        1 - c.distance AS similarity,
+        d.source_type,
+        d.source_id,
+        octet_length(d.content) AS content_bytes,
+        jsonb_strip_nulls(jsonb_build_object(
+            'title', d.metadata->'title',
+            'url', d.metadata->'url',
+            'file_path', d.metadata->'file_path'
+        )) AS metadata
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters, search_ef
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
+
+-- ============================================
+-- Parcours HNSW itératif (pgvector >= 0.8, voir migration 011)
+-- ============================================
+DO $$
+BEGIN
+    IF (SELECT string_to_array(extversion, '.')::INT[] >= ARRAY[0, 8]
+        FROM pg_extension WHERE extname = 'vector') THEN
+        ALTER FUNCTION match_document_candidates(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT)
+            SET hnsw.iterative_scan = 'strict_order';
+    END IF;
+END;
+$$;
@@ -0,0 +1,154 @@
+-- ============================================
+-- Migration 014: Inner Product Search
+-- RAG Agent IA - Embeddings normalisés et produit scalaire
+-- ============================================
+--
+-- La distance cosinus (<=>) recalcule les normes des deux vecteurs à
+-- chaque comparaison. Les embeddings sont désormais normalisés (norme 1)
+-- à l'ingestion (`VectorizationService`) : pour des vecteurs unitaires,
+-- le produit scalaire est la similarité cosinus, et l'opérateur <#>
+-- (produit scalaire négatif) avec l'index vector_ip_ops l'évalue sans
+-- calcul de norme.
+--
+-- - documents existants : normalisés en place (seuls ceux dont la norme
+--   s'écarte de 1 sont réécrits ; mistral-embed est déjà quasi unitaire)
+-- - index HNSW global reconstruit en vector_ip_ops ; les index partiels
+--   des tenants (migration 012) sont supprimés et désenregistrés, puis
+--   reconstruits en vector_ip_ops par `scripts/tenant_indexes.py`
+-- - match_document_candidates normalise la requête (l2_normalize) et
+--   trie par <#> ; la distance renvoyée reste 1 - cosinus :
+--   match_documents et match_document_ids (inchangées) renvoient la
+--   même similarité qu'avant, le seuil garde la même échelle
+--
+-- Latences avant / après : `python -m scripts.bench_hnsw --metric both`.
+--
+-- Prérequis : Migration 013, pgvector >= 0.7 (l2_normalize)
+-- ============================================
+
+-- ============================================
+-- Normalisation des embeddings existants
+-- ============================================
+UPDATE documents
+SET embedding = l2_normalize(embedding)
+WHERE embedding IS NOT NULL
+AND abs(vector_norm(embedding) - 1) > 1e-4;
+
+-- ============================================
+-- Index HNSW en produit scalaire
+-- ============================================
+CREATE INDEX IF NOT EXISTS idx_documents_embedding_ip
+ON documents USING hnsw(embedding vector_ip_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- ============================================
+-- Fonction: match_document_candidates
+-- Identifiants et distances, routés par tenant
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_candidates(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    distance FLOAT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    tags_any TEXT[] := CASE WHEN filters ? 'tags_any'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'tags_any')) END;
+    source_types TEXT[] := CASE WHEN filters ? 'source_types'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'source_types')) END;
+    created_after TIMESTAMPTZ := (filters->>'created_after')::TIMESTAMPTZ;
+    created_before TIMESTAMPTZ := (filters->>'created_before')::TIMESTAMPTZ;
+    -- $1 embedding, $2 seuil, $3 limite, $4 source, $5 filtres,
+    -- $6 tags_any, $7 source_types, $8 created_after, $9 created_before,
+    -- $10 user_id
+    predicates CONSTANT TEXT := $p$
+        (d.embedding <#> $1) * -1 > $2
+        AND ($4::VARCHAR IS NULL OR d.source_type = $4)
+        AND ($6::TEXT[] IS NULL OR d.metadata->'tags' ?| $6)
+        AND ($5->'tags_all' IS NULL OR d.metadata->'tags' @> ($5->'tags_all'))
+        AND ($5->'contains' IS NULL OR d.metadata @> ($5->'contains'))
+        AND ($5->'excludes' IS NULL OR NOT d.metadata @> ($5->'excludes'))
+        AND ($7::TEXT[] IS NULL OR d.source_type = ANY($7))
+        AND ($8::TIMESTAMPTZ IS NULL OR d.created_at >= $8)
+        AND ($9::TIMESTAMPTZ IS NULL OR d.created_at < $9)
+    $p$;
+    sql_text TEXT;
+BEGIN
+    -- Requête normalisée : le produit scalaire est la similarité cosinus
+    query_embedding := l2_normalize(query_embedding);
+
+    -- Effort de recherche : liste de candidats de l'index HNSW, limitée
+    -- à la transaction de l'appel (SET LOCAL)
+    IF search_ef IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', search_ef::TEXT, true);
+    END IF;
+    
+    IF filter_user_id IS NULL THEN
+        -- Tous les documents : index HNSW global (produit scalaire)
+        sql_text := 'SELECT d.id, (1 + (d.embedding <#> $1))::FLOAT FROM documents d'
+            || ' WHERE ' || predicates
+            || ' ORDER BY d.embedding <#> $1 LIMIT $3';
+    ELSIF EXISTS (
+        SELECT 1 FROM tenant_vector_indexes t WHERE t.user_id = filter_user_id
+    ) THEN
+        -- Gros tenant : index HNSW partiel (user_id en littéral)
+        sql_text := 'SELECT d.id, (1 + (d.embedding <#> $1))::FLOAT FROM documents d'
+            || format(' WHERE d.user_id = %L AND ', filter_user_id) || predicates
+            || ' ORDER BY d.embedding <#> $1 LIMIT $3';
+    ELSE
+        -- Pool partagé : parcours exact des documents du tenant (btree
+        -- user_id) ; MATERIALIZED écarte l'index HNSW global
+        sql_text := 'WITH tenant AS MATERIALIZED ('
+            || 'SELECT d.id, (1 + (d.embedding <#> $1))::FLOAT AS distance FROM documents d'
+            || ' WHERE d.user_id = $10 AND ' || predicates
+            || ') SELECT tenant.id, tenant.distance FROM tenant'
+            || ' ORDER BY tenant.distance LIMIT $3';
+    END IF;
+    
+    RETURN QUERY EXECUTE sql_text
+    USING query_embedding, match_threshold, match_count, filter_source_type, filters,
+        tags_any, source_types, created_after, created_before, filter_user_id;
+END;
+$$;
+
+COMMENT ON FUNCTION match_document_candidates IS
+'Candidats de la recherche vectorielle (id, distance), routés vers l''index du tenant';
+
+-- ============================================
+-- Parcours HNSW itératif (pgvector >= 0.8, voir migration 011)
+-- ============================================
+DO $$
+BEGIN
+    IF (SELECT string_to_array(extversion, '.')::INT[] >= ARRAY[0, 8]
+        FROM pg_extension WHERE extname = 'vector') THEN
+        ALTER FUNCTION match_document_candidates(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT)
+            SET hnsw.iterative_scan = 'strict_order';
+    END IF;
+END;
+$$;
+
+-- ============================================
+-- Suppression des index cosinus
+-- ============================================
+DROP INDEX IF EXISTS idx_documents_embedding;
+
+-- Index partiels des tenants : le routage repasse par le pool partagé
+-- (parcours exact) jusqu'à leur reconstruction en vector_ip_ops
+DO $$
+DECLARE
+    tenant_index RECORD;
+BEGIN
+    FOR tenant_index IN DELETE FROM tenant_vector_indexes RETURNING index_name LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', tenant_index.index_name);
+    END LOOP;
+END;
+$$;
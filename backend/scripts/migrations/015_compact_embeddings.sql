@@ -0,0 +1,272 @@
+-- ============================================
+-- Migration 015: Compact Embeddings
+-- RAG Agent IA - Premier passage ANN sur des embeddings réduits
+-- ============================================
+--
+-- Un embedding complet occupe 4 Ko (1024 × float32) dans la table et
+-- dans chaque index HNSW. Mode compact (optionnel) :
+-- - colonne embedding_compact : halfvec(256) (float16, 512 octets),
+--   troncature ou projection PCA de l'embedding, normalisée
+--   (`src/services/compact_embeddings.py`)
+-- - index HNSW halfvec_ip_ops, ≈ 8x plus petit que l'index complet
+-- - match_document_candidates reçoit la requête compacte
+--   (query_compact) : parcours de l'index compact (rescore_count
+--   candidats, sans le seuil), puis re-scoring exact sur l'embedding
+--   complet, seuil appliqué et top match_count
+--
+-- Transition :
+-- 1. migration : colonne vide, fonctions inchangées tant que
+--    query_compact est NULL
+-- 2. `compact_embedding_enabled` : double écriture à l'ingestion
+-- 3. backfill des documents existants
+--    (`python -m scripts.compact_embeddings backfill`) ; en troncature,
+--    l'UPDATE ci-dessous suffit
+-- 4. rapport rappel / latence / stockage
+--    (`python -m scripts.compact_embeddings report`)
+-- 5. `compact_search_enabled` : premier passage compact ; les documents
+--    sans embedding_compact n'apparaissent plus dans la recherche
+--
+-- Dimension : celle de `compact_embedding_dimension` (256 par défaut).
+-- Le pool partagé (petits tenants, parcours exact) garde le chemin
+-- complet ; les gros tenants utilisent leur index partiel compact
+-- (`scripts/tenant_indexes.py --compact`), à défaut l'index compact
+-- global filtré.
+--
+-- Prérequis : Migration 014, pgvector >= 0.7 (halfvec, subvector)
+-- ============================================
+
+DROP FUNCTION IF EXISTS match_document_candidates(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT);
+DROP FUNCTION IF EXISTS match_documents(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT);
+DROP FUNCTION IF EXISTS match_document_ids(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT);
+
+-- ============================================
+-- Colonne et index compacts
+-- ============================================
+ALTER TABLE documents
+ADD COLUMN IF NOT EXISTS embedding_compact halfvec(256);
+
+COMMENT ON COLUMN documents.embedding_compact IS
+'Embedding réduit et normalisé (premier passage de la recherche, migration 015)';
+
+-- Backfill par troncature (projection PCA : script de backfill)
+UPDATE documents
+SET embedding_compact = l2_normalize(subvector(embedding, 1, 256))::halfvec(256)
+WHERE embedding IS NOT NULL
+AND embedding_compact IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_documents_embedding_compact
+ON documents USING hnsw(embedding_compact halfvec_ip_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- ============================================
+-- Fonction: match_document_candidates
+-- Identifiants et distances, routés par tenant
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_candidates(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL,
+    query_compact halfvec DEFAULT NULL,
+    rescore_count INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    distance FLOAT
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    tags_any TEXT[] := CASE WHEN filters ? 'tags_any'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'tags_any')) END;
+    source_types TEXT[] := CASE WHEN filters ? 'source_types'
+        THEN ARRAY(SELECT jsonb_array_elements_text(filters->'source_types')) END;
+    created_after TIMESTAMPTZ := (filters->>'created_after')::TIMESTAMPTZ;
+    created_before TIMESTAMPTZ := (filters->>'created_before')::TIMESTAMPTZ;
+    -- $1 embedding, $2 seuil, $3 limite, $4 source, $5 filtres,
+    -- $6 tags_any, $7 source_types, $8 created_after, $9 created_before,
+    -- $10 user_id, $11 requête compacte, $12 candidats re-scorés
+    threshold CONSTANT TEXT := '(d.embedding <#> $1) * -1 > $2';
+    predicates CONSTANT TEXT := $p$
+        ($4::VARCHAR IS NULL OR d.source_type = $4)
+        AND ($6::TEXT[] IS NULL OR d.metadata->'tags' ?| $6)
+        AND ($5->'tags_all' IS NULL OR d.metadata->'tags' @> ($5->'tags_all'))
+        AND ($5->'contains' IS NULL OR d.metadata @> ($5->'contains'))
+        AND ($5->'excludes' IS NULL OR NOT d.metadata @> ($5->'excludes'))
+        AND ($7::TEXT[] IS NULL OR d.source_type = ANY($7))
+        AND ($8::TIMESTAMPTZ IS NULL OR d.created_at >= $8)
+        AND ($9::TIMESTAMPTZ IS NULL OR d.created_at < $9)
+    $p$;
+    tenant TEXT;
+    sql_text TEXT;
+BEGIN
+    -- Requête normalisée : le produit scalaire est la similarité cosinus
+    query_embedding := l2_normalize(query_embedding);
+    IF query_compact IS NOT NULL THEN
+        query_compact := l2_normalize(query_compact);
+        rescore_count := GREATEST(COALESCE(rescore_count, match_count * 4), match_count);
+    END IF;
+
+    -- Effort de recherche : liste de candidats de l'index HNSW, limitée
+    -- à la transaction de l'appel (SET LOCAL)
+    IF search_ef IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', search_ef::TEXT, true);
+    END IF;
+
+    IF filter_user_id IS NULL THEN
+        -- Tous les documents : index HNSW global
+        tenant := 'TRUE';
+    ELSIF EXISTS (
+        SELECT 1 FROM tenant_vector_indexes t WHERE t.user_id = filter_user_id
+    ) THEN
+        -- Gros tenant : index HNSW partiel (user_id en littéral)
+        tenant := format('d.user_id = %L', filter_user_id);
+    ELSE
+        -- Pool partagé : parcours exact des documents du tenant (btree
+        -- user_id) ; MATERIALIZED écarte l'index HNSW global
+        sql_text := 'WITH tenant AS MATERIALIZED ('
+            || 'SELECT d.id, (1 + (d.embedding <#> $1))::FLOAT AS distance FROM documents d'
+            || ' WHERE d.user_id = $10 AND ' || threshold || ' AND ' || predicates
+            || ') SELECT tenant.id, tenant.distance FROM tenant'
+            || ' ORDER BY tenant.distance LIMIT $3';
+    END IF;
+
+    IF sql_text IS NULL AND query_compact IS NULL THEN
+        -- Index complet (produit scalaire)
+        sql_text := 'SELECT d.id, (1 + (d.embedding <#> $1))::FLOAT FROM documents d'
+            || ' WHERE ' || tenant || ' AND ' || threshold || ' AND ' || predicates
+            || ' ORDER BY d.embedding <#> $1 LIMIT $3';
+    ELSIF sql_text IS NULL THEN
+        -- Index compact : rescore_count candidats, re-scorés sur
+        -- l'embedding complet (le seuil porte sur le score complet)
+        sql_text := 'SELECT d.id, (1 + (d.embedding <#> $1))::FLOAT FROM ('
+            || 'SELECT d.id FROM documents d'
+            || ' WHERE ' || tenant || ' AND ' || predicates
+            || ' ORDER BY d.embedding_compact <#> $11 LIMIT $12'
+            || ') candidates JOIN documents d ON d.id = candidates.id'
+            || ' WHERE ' || threshold
+            || ' ORDER BY d.embedding <#> $1 LIMIT $3';
+    END IF;
+
+    RETURN QUERY EXECUTE sql_text
+    USING query_embedding, match_threshold, match_count, filter_source_type, filters,
+        tags_any, source_types, created_after, created_before, filter_user_id,
+        query_compact, rescore_count;
+END;
+$$;
+
+COMMENT ON FUNCTION match_document_candidates IS
+'Candidats de la recherche vectorielle (id, distance), routés vers l''index du tenant';
+
+-- ============================================
+-- Fonction: match_documents
+-- ============================================
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL,
+    query_compact halfvec DEFAULT NULL,
+    rescore_count INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    content TEXT,
+    metadata JSONB,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    similarity FLOAT,
+    user_id UUID,
+    created_at TIMESTAMPTZ
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.content,
+        d.metadata,
+        d.source_type,
+        d.source_id,
+        1 - c.distance AS similarity,
+        d.user_id,
+        d.created_at
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters, search_ef,
+        query_compact, rescore_count
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
+
+-- ============================================
+-- Fonction: match_document_ids (phase 1)
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_ids(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL,
+    query_compact halfvec DEFAULT NULL,
+    rescore_count INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    similarity FLOAT,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    content_bytes INT,
+    metadata JSONB
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        1 - c.distance AS similarity,
+        d.source_type,
+        d.source_id,
+        octet_length(d.content) AS content_bytes,
+        jsonb_strip_nulls(jsonb_build_object(
+            'title', d.metadata->'title',
+            'url', d.metadata->'url',
+            'file_path', d.metadata->'file_path'
+        )) AS metadata
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters, search_ef,
+        query_compact, rescore_count
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
+
+-- ============================================
+-- Parcours HNSW itératif (pgvector >= 0.8, voir migration 011)
+-- ============================================
+DO $$
+BEGIN
+    IF (SELECT string_to_array(extversion, '.')::INT[] >= ARRAY[0, 8]
+        FROM pg_extension WHERE extname = 'vector') THEN
+        ALTER FUNCTION match_document_candidates(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT, halfvec, INT)
+            SET hnsw.iterative_scan = 'strict_order';
+    END IF;
+END;
+$$;
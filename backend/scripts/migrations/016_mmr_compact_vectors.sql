@@ -0,0 +1,77 @@
+-- ============================================
+-- Migration 016: MMR Compact Vectors
+-- RAG Agent IA - Vecteurs compacts des candidats en phase 1
+-- ============================================
+--
+-- La diversification MMR compare les candidats entre eux
+-- (fetch_multiplier × k). Lire leur embedding complet en seconde
+-- requête coûte ≈ 10 Ko par candidat (vector en texte), plus que ce
+-- que la recherche en deux temps économise sur le contenu.
+--
+-- match_document_ids renvoie désormais un vecteur compact par
+-- candidat (embedding_compact, real[256], ≈ 1 Ko en binaire) :
+-- - premier passage compact (query_compact) : colonne
+--   embedding_compact (migration 015), même espace pour tous les
+--   candidats
+-- - sinon : troncature normalisée de l'embedding complet
+--
+-- La MMR ne compare que les candidats entre eux : une approximation
+-- commune suffit à détecter les fragments redondants.
+--
+-- Prérequis : Migration 015, pgvector >= 0.7 (halfvec vers real[])
+-- ============================================
+
+DROP FUNCTION IF EXISTS match_document_ids(vector, FLOAT, INT, VARCHAR, UUID, JSONB, INT, halfvec, INT);
+
+-- ============================================
+-- Fonction: match_document_ids (phase 1)
+-- ============================================
+CREATE OR REPLACE FUNCTION match_document_ids(
+    query_embedding vector(1024),
+    match_threshold FLOAT,
+    match_count INT,
+    filter_source_type VARCHAR DEFAULT NULL,
+    filter_user_id UUID DEFAULT NULL,
+    filters JSONB DEFAULT NULL,
+    search_ef INT DEFAULT NULL,
+    query_compact halfvec DEFAULT NULL,
+    rescore_count INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    similarity FLOAT,
+    source_type VARCHAR,
+    source_id VARCHAR,
+    content_bytes INT,
+    metadata JSONB,
+    embedding_compact REAL[]
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id,
+        1 - c.distance AS similarity,
+        d.source_type,
+        d.source_id,
+        octet_length(d.content) AS content_bytes,
+        jsonb_strip_nulls(jsonb_build_object(
+            'title', d.metadata->'title',
+            'url', d.metadata->'url',
+            'file_path', d.metadata->'file_path'
+        )) AS metadata,
+        CASE WHEN query_compact IS NULL
+            THEN l2_normalize(subvector(d.embedding, 1, 256))::halfvec(256)
+            ELSE d.embedding_compact
+        END::REAL[] AS embedding_compact
+    FROM match_document_candidates(
+        query_embedding, match_threshold, match_count,
+        filter_source_type, filter_user_id, filters, search_ef,
+        query_compact, rescore_count
+    ) c
+    JOIN documents d ON d.id = c.id
+    ORDER BY c.distance;
+END;
+$$;
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Index Vectoriels par Tenant
+============================
+
+Crée ou supprime les index HNSW partiels des gros tenants (migration 012,
+produit scalaire depuis la migration 014).
+
+- tenant ≥ `--min-documents` : index partiel dédié
+  (`CREATE INDEX CONCURRENTLY ... WHERE user_id = '...'`), enregistré dans
+  `tenant_vector_indexes` une fois construit ; `match_documents` l'utilise
+  dès l'enregistrement
+- tenant indexé < `--drop-below` : retiré du registre (retour au pool
+  partagé, parcours exact) puis index supprimé
+- l'écart entre les deux seuils évite de reconstruire un index pour un
+  tenant qui oscille autour de la limite
+- `--compact` : index partiel supplémentaire sur `embedding_compact`
+  (halfvec_ip_ops, migration 015), parcouru par le premier passage
+  compact de la recherche
+
+À lancer périodiquement (cron) ; nécessite DATABASE_URL.
+
+Usage:
+    python -m scripts.tenant_indexes --dry-run
+    python -m scripts.tenant_indexes --min-documents 20000 --drop-below 10000
+    python -m scripts.tenant_indexes --compact
+"""
+
+import argparse
+import asyncio
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from uuid import UUID
+
+# Ajouter src au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.logging_config import setup_logging, get_logger
+from src.config.settings import get_settings
+
+
+logger = get_logger("tenant_indexes")
+
+INDEX_PREFIX = "idx_documents_embedding_t_"
+
+COMPACT_INDEX_PREFIX = "idx_documents_compact_t_"
+
+
+def index_name(user_id: UUID) -> str:
+    """Nom de l'index partiel d'un tenant (63 caractères au plus)."""
+    return f"{INDEX_PREFIX}{user_id.hex}"
+
+
+def compact_index_name(user_id: UUID) -> str:
+    """Nom de l'index partiel compact d'un tenant (migration 015)."""
+    return f"{COMPACT_INDEX_PREFIX}{user_id.hex}"
+
+
+@dataclass
+class IndexPlan:
+    """Changements à appliquer aux index des tenants."""
+    
+    create: list[UUID] = field(default_factory=list)
+    drop: list[UUID] = field(default_factory=list)
+    keep: list[UUID] = field(default_factory=list)
+
+
+def plan_indexes(
+    counts: dict[UUID, int],
+    indexed: set[UUID],
+    min_documents: int,
+    drop_below: int,
+) -> IndexPlan:
+    """
+    Tenants à indexer, à désindexer ou à conserver.
+    
+    Args:
+        counts: Nombre de documents par tenant.
+        indexed: Tenants déjà enregistrés dans `tenant_vector_indexes`.
+        min_documents: Seuil de création d'un index dédié.
+        drop_below: Seuil de suppression (≤ min_documents).
+    """
+    plan = IndexPlan()
+    for user_id in sorted(set(counts) | indexed, key=str):
+        count = counts.get(user_id, 0)
+        if user_id in indexed:
+            (plan.keep if count >= drop_below else plan.drop).append(user_id)
+        elif count >= min_documents:
+            plan.create.append(user_id)
+    return plan
+
+
+async def apply_plan(
+    conn,
+    plan: IndexPlan,
+    counts: dict[UUID, int],
+    m: int,
+    ef_construction: int,
+    compact: bool = False,
+) -> None:
+    """Construit et supprime les index (hors transaction, sans bloquer les écritures)."""
+    with_params = f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    
+    for user_id in plan.drop:
+        name = index_name(user_id)
+        # Désenregistrer d'abord : les requêtes repassent par le pool partagé
+        await conn.execute("DELETE FROM tenant_vector_indexes WHERE user_id = $1", user_id)
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {compact_index_name(user_id)}")
+        logger.info("Tenant index dropped", user_id=str(user_id), index=name)
+    
+    for user_id in plan.create:
+        name = index_name(user_id)
+        # Un build concurrent interrompu laisse un index invalide
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        logger.info("Building tenant index", user_id=str(user_id), documents=counts[user_id])
+        await conn.execute(
+            f"CREATE INDEX CONCURRENTLY {name} ON documents "
+            f"USING hnsw (embedding vector_ip_ops) {with_params} "
+            f"WHERE user_id = '{user_id}'"
+        )
+        await conn.execute(
+            """
+            INSERT INTO tenant_vector_indexes (user_id, index_name, document_count)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (user_id) DO UPDATE
+            SET index_name = EXCLUDED.index_name,
+                document_count = EXCLUDED.document_count,
+                updated_at = NOW()
+            """,
+            user_id,
+            name,
+            counts[user_id],
+        )
+        logger.info("Tenant index ready", user_id=str(user_id), index=name)
+    
+    if compact:
+        # Tenants indexés sans index compact (nouveaux ou antérieurs au mode)
+        for user_id in plan.create + plan.keep:
+            name = compact_index_name(user_id)
+            valid = await conn.fetchval(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = $1",
+                name,
+            )
+            if valid:
+                continue
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            logger.info("Building tenant compact index", user_id=str(user_id))
+            await conn.execute(
+                f"CREATE INDEX CONCURRENTLY {name} ON documents "
+                f"USING hnsw (embedding_compact halfvec_ip_ops) {with_params} "
+                f"WHERE user_id = '{user_id}'"
+            )
+            logger.info("Tenant compact index ready", user_id=str(user_id), index=name)
+    
+    for user_id in plan.keep:
+        await conn.execute(
+            "UPDATE tenant_vector_indexes SET document_count = $2, updated_at = NOW() "
+            "WHERE user_id = $1",
+            user_id,
+            counts.get(user_id, 0),
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    import asyncpg
+    
+    settings = get_settings()
+    if not settings.database_url:
+        logger.error("DATABASE_URL is required")
+        sys.exit(1)
+    
+    conn = await asyncpg.connect(settings.database_url)
+    try:
+        rows = await conn.fetch(
+            "SELECT user_id, count(*) AS documents FROM documents "
+            "WHERE user_id IS NOT NULL GROUP BY user_id"
+        )
+        counts = {row["user_id"]: row["documents"] for row in rows}
+        indexed = {
+            row["user_id"]
+            for row in await conn.fetch("SELECT user_id FROM tenant_vector_indexes")
+        }
+        
+        plan = plan_indexes(counts, indexed, args.min_documents, args.drop_below)
+        
+        print(f"\n📊 {len(counts)} tenants, {len(indexed)} index dédiés")
+        for label, user_ids in (("créer", plan.create), ("supprimer", plan.drop)):
+            for user_id in user_ids:
+                print(f"   {label:<10} {index_name(user_id)}  ({counts.get(user_id, 0)} documents)")
+        
+        if args.dry_run:
+            print("\n(dry run : aucun changement)")
+            return
+        
+        await apply_plan(conn, plan, counts, args.m, args.ef_construction, compact=args.compact)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    """Point d'entrée principal du script."""
+    setup_logging()
+    
+    parser = argparse.ArgumentParser(
+        description="Index HNSW partiels des gros tenants",
+    )
+    parser.add_argument(
+        "--min-documents",
+        type=int,
+        default=20_000,
+        help="Documents à partir desquels un tenant a son propre index",
+    )
+    parser.add_argument(
+        "--drop-below",
+        type=int,
+        default=None,
+        help="Documents en deçà desquels l'index est supprimé (défaut : moitié du seuil)",
+    )
+    parser.add_argument("--m", type=int, default=16, help="Paramètre m de HNSW")
+    parser.add_argument(
+        "--ef-construction",
+        type=int,
+        default=64,
+        help="Paramètre ef_construction de HNSW",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Construire aussi les index partiels compacts (embedding_compact, migration 015)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Afficher le plan sans l'appliquer")
+    
+    args = parser.parse_args()
+    if args.drop_below is None:
+        args.drop_below = args.min_documents // 2
+    if args.drop_below > args.min_documents:
+        parser.error("--drop-below must not exceed --min-documents")
+    
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
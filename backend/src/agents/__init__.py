@@ -1,8 +1,9 @@
 """Agents module - External search agents."""
 
-from src.agents.perplexity_agent import PerplexityAgent, WebSearchResult
+from src.agents.perplexity_agent import PerplexityAgent, WebSearchChunk, WebSearchResult
 
 __all__ = [
     "PerplexityAgent",
     "WebSearchResult",
+    "WebSearchChunk",
 ]
@@ -6,8 +6,9 @@ Agent de recherche web en temps réel utilisant l'API Perplexity.
 Fournit un contexte actualisé pour enrichir les réponses du RAG.
 """
 
-from dataclasses import dataclass
-from typing import Any
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
 
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -33,6 +34,23 @@ class WebSearchResult:
     tokens_used: int
 
 
+@dataclass
+class WebSearchChunk:
+    """
+    Fragment d'une recherche web en streaming.
+    
+    Attributes:
+        content: Texte ajouté depuis le fragment précédent.
+        sources: URLs sources connues à ce stade.
+        is_final: True pour le dernier fragment du flux.
+        tokens_used: Tokens consommés (renseigné sur le fragment final).
+    """
+    content: str
+    sources: list[str] = field(default_factory=list)
+    is_final: bool = False
+    tokens_used: int = 0
+
+
 class PerplexityAgent(LoggerMixin):
     """
     Agent de recherche web via Perplexity API.
@@ -56,6 +74,14 @@ class PerplexityAgent(LoggerMixin):
         "research": "sonar-deep-research",   # Recherche approfondie
     }
     
+    DEFAULT_SYSTEM_PROMPT = """Tu es un assistant de recherche. Donne des réponses courtes et factuelles.
+
+Règles :
+- Va droit au but, pas de blabla
+- Cite tes sources naturellement dans le texte
+- Donne l'info la plus récente et fiable
+- Réponds dans la langue de la question"""
+    
     def __init__(
         self,
         model_size: str = "small",
@@ -84,6 +110,35 @@ class PerplexityAgent(LoggerMixin):
         """Vérifie si l'agent est activé."""
         return self._enabled
     
+    def _build_payload(
+        self,
+        query: str,
+        system_prompt: str | None,
+        max_tokens: int,
+        stream: bool = False,
+    ) -> dict[str, Any]:
+        """Construit le corps de la requête Perplexity."""
+        payload: dict[str, Any] = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt or self.DEFAULT_SYSTEM_PROMPT},
+                {"role": "user", "content": query},
+            ],
+            "max_tokens": max_tokens,
+            "return_citations": True,
+            "return_related_questions": False,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    def _headers(self) -> dict[str, str]:
+        """Headers d'authentification de l'API."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+    
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
@@ -108,36 +163,14 @@ class PerplexityAgent(LoggerMixin):
         if not self._enabled:
             return None
         
-        default_system = """Tu es un assistant de recherche. Donne des réponses courtes et factuelles.
-
-Règles :
-- Va droit au but, pas de blabla
-- Cite tes sources naturellement dans le texte
-- Donne l'info la plus récente et fiable
-- Réponds dans la langue de la question"""
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": system_prompt or default_system},
-                {"role": "user", "content": query},
-            ],
-            "max_tokens": max_tokens,
-            "return_citations": True,
-            "return_related_questions": False,
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        payload = self._build_payload(query, system_prompt, max_tokens)
         
         try:
             async with httpx.AsyncClient(timeout=self.timeout) as client:
                 response = await client.post(
                     self.API_URL,
                     json=payload,
-                    headers=headers,
+                    headers=self._headers(),
                 )
                 response.raise_for_status()
                 data = response.json()
@@ -178,6 +211,109 @@ Règles :
             self.logger.error("Web search failed", error=str(e))
             return None
     
+    async def search_stream(
+        self,
+        query: str,
+        system_prompt: str | None = None,
+        max_tokens: int = 1024,
+    ) -> AsyncIterator[WebSearchChunk]:
+        """
+        Effectue une recherche web en consommant la réponse en streaming.
+        
+        Les fragments sont émis dès leur réception, ce qui permet
+        d'afficher la progression et de démarrer la génération
+        sans attendre la fin de la réponse Perplexity.
+        
+        Pas de retry automatique : un flux partiellement émis
+        ne peut pas être rejoué. En cas d'erreur, le flux s'arrête
+        simplement (même contrat que `search` qui retourne None).
+        
+        Args:
+            query: Question ou requête de recherche.
+            system_prompt: Prompt système personnalisé.
+            max_tokens: Nombre maximum de tokens en réponse.
+            
+        Yields:
+            WebSearchChunk progressifs, le dernier avec is_final=True.
+        """
+        if not self._enabled:
+            return
+        
+        payload = self._build_payload(query, system_prompt, max_tokens, stream=True)
+        sources: list[str] = []
+        tokens = 0
+        content_length = 0
+        
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                async with client.stream(
+                    "POST",
+                    self.API_URL,
+                    json=payload,
+                    headers=self._headers(),
+                ) as response:
+                    response.raise_for_status()
+                    
+                    async for line in response.aiter_lines():
+                        data = self._parse_stream_line(line)
+                        if data is None:
+                            continue
+                        
+                        if data.get("citations"):
+                            sources = data["citations"]
+                        if data.get("usage"):
+                            tokens = data["usage"].get("total_tokens", tokens)
+                        
+                        choices = data.get("choices") or []
+                        delta = choices[0].get("delta", {}).get("content") if choices else None
+                        if delta:
+                            content_length += len(delta)
+                            yield WebSearchChunk(content=delta, sources=sources)
+            
+            self.logger.info(
+                "Web search stream completed",
+                query_length=len(query),
+                content_length=content_length,
+                sources_count=len(sources),
+                tokens=tokens,
+            )
+            
+            yield WebSearchChunk(
+                content="",
+                sources=sources,
+                is_final=True,
+                tokens_used=tokens,
+            )
+            
+        except httpx.HTTPStatusError as e:
+            self.logger.error(
+                "Perplexity API error",
+                status=e.response.status_code,
+            )
+        except Exception as e:
+            self.logger.error("Web search stream failed", error=str(e))
+    
+    @staticmethod
+    def _parse_stream_line(line: str) -> dict[str, Any] | None:
+        """
+        Parse une ligne SSE du flux Perplexity (format OpenAI).
+        
+        Returns:
+            Données JSON de l'événement, ou None (ligne vide, keep-alive, [DONE]).
+        """
+        line = line.strip()
+        if not line.startswith("data:"):
+            return None
+        
+        raw = line[len("data:"):].strip()
+        if not raw or raw == "[DONE]":
+            return None
+        
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+    
     def search_sync(
         self,
         query: str,
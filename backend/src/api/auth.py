@@ -24,6 +24,7 @@ Usage:
     ...     pass
 """
 
+import json
 import time
 from typing import Callable
 
@@ -34,7 +35,8 @@ from src.config.logging_config import get_logger
 from src.config.settings import get_settings
 from src.models.api_key import ApiKeyScope, ApiKeyValidation
 from src.repositories.api_key_repository import ApiKeyRepository
-from src.services.rate_limiter import get_rate_limiter
+from src.services.api_key_cache import get_api_key_cache
+from src.services.gateway import get_gateway
 
 logger = get_logger(__name__)
 
@@ -115,11 +117,10 @@ async def get_api_key(
             )
         return None
     
-    # Valider la clé
-    repo = get_api_key_repo()
+    # Valider la clé (cache mémoire/Redis, puis Supabase)
     client_ip = _get_client_ip(request)
     
-    validation = repo.validate(key, client_ip)
+    validation = await get_api_key_cache().validate(key, client_ip)
     
     if validation is None:
         logger.warning("API key validation failed", client_ip=client_ip)
@@ -156,42 +157,58 @@ async def get_api_key(
             },
         )
     
-    # ===== 3. Rate Limiting =====
-    rate_limiter = get_rate_limiter()
+    # ===== 3. Admission (rate limits + quota, un seul appel Redis) =====
+    reflection = await _requests_reflection(request)
+    decision = await get_gateway().admit(validation, client_ip, reflection=reflection)
+    rate_limit = decision.rate_limit
     
-    # On limite par ID de clé si présent, sinon par IP (fallback/public)
-    limit_id = f"key:{validation.id}" if validation else f"ip:{client_ip}"
-    limit_value = validation.rate_limit if validation else settings.rate_limit_requests
-    
-    allowed, count, retry_after = await rate_limiter.is_allowed(
-        key=limit_id,
-        limit=limit_value
-    )
-    
-    if not allowed:
+    if not decision.allowed:
+        retry_after = decision.retry_after
+        if decision.reason == "quota_exceeded":
+            raise HTTPException(
+                status_code=403,
+                detail={
+                    "error": "quota_exceeded",
+                    "message": "Quota mensuel dépassé pour cette clé.",
+                },
+            )
+        
+        if decision.reason == "REFLECTION_LIMIT_EXCEEDED":
+            message = f"Limite de réflexion atteinte. Réessayez dans {retry_after}s."
+        else:
+            message = f"Limite de requêtes dépassée. Réessayez dans {retry_after} secondes."
+        
         raise HTTPException(
             status_code=429,
             detail={
-                "error": "rate_limit_exceeded",
-                "message": f"Limite de requêtes dépassée. Réessayez dans {retry_after} secondes.",
+                "error": decision.reason,
+                "message": message,
                 "retry_after": retry_after
             },
-            headers={"Retry-After": str(retry_after)}
+            headers={
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Limit": str(rate_limit.limit),
+                "X-RateLimit-Remaining": str(rate_limit.remaining),
+                "X-RateLimit-Reset": str(rate_limit.reset_at),
+            }
         )
     
     # Stocker les infos dans request.state pour logging et middleware
     request.state.api_key = validation
     request.state.request_start_time = time.time()
-    request.state.rate_limit_count = count
-    request.state.rate_limit_max = limit_value
-    request.state.rate_limit_retry_after = retry_after
+    request.state.admission = decision
+    request.state.rate_limit = rate_limit
+    request.state.rate_limit_count = rate_limit.count
+    request.state.rate_limit_max = rate_limit.limit
+    request.state.rate_limit_retry_after = rate_limit.retry_after
     
     if validation:
         logger.debug(
             "API key validated",
             key_id=str(validation.id),
             scopes=validation.scopes,
-            rate_count=count
+            rate_count=rate_limit.count,
+            admission_ms=round(decision.latency_ms, 3),
         )
     
     return validation
@@ -321,6 +338,29 @@ def require_any_scope(*scopes: str | ApiKeyScope) -> Callable:
 
 # ===== Helpers =====
 
+async def _requests_reflection(request: Request) -> bool:
+    """
+    Indique si le corps JSON demande le mode réflexion.
+    
+    Le corps est déjà lu et mis en cache par FastAPI avant
+    la résolution des dépendances.
+    """
+    if request.method != "POST":
+        return False
+    if "application/json" not in request.headers.get("content-type", ""):
+        return False
+    
+    body = await request.body()
+    if b"enable_reflection" not in body:
+        return False
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and payload.get("enable_reflection") is True
+
+
 def _get_client_ip(request: Request) -> str:
     """
     Extrait l'adresse IP du client.
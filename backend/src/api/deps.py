@@ -12,12 +12,15 @@ from fastapi.security import APIKeyHeader
 from jose import jwt
 
 from src.config.settings import get_settings
+from src.repositories.async_repositories import AsyncUserRepository
 from src.repositories.user_repository import UserRepository
 from src.models.user import UserWithSubscription
+from src.services.session_cache import get_session_cache
 from src.api.auth import api_key_header as api_master_key_header
 
 # Repository singleton
 _user_repo: UserRepository | None = None
+_async_user_repo: AsyncUserRepository | None = None
 
 def get_user_repo() -> UserRepository:
     global _user_repo
@@ -25,17 +28,27 @@ def get_user_repo() -> UserRepository:
         _user_repo = UserRepository()
     return _user_repo
 
+def get_async_user_repo() -> AsyncUserRepository:
+    global _async_user_repo
+    if _async_user_repo is None:
+        _async_user_repo = AsyncUserRepository(get_user_repo())
+    return _async_user_repo
+
 async def get_current_user(
     request: Request,
 ) -> UserWithSubscription:
     """
     Récupère l'utilisateur authentifié via le token de session avec validation JWT.
+    
+    L'identité composée (utilisateur + abonnement + usage) est mise en cache
+    par session jusqu'à l'expiration du token (voir `session_cache`).
     """
-    repo = get_user_repo()
+    repo = get_async_user_repo()
     
     # 1. Vérifier le header Authorization (Bearer Token)
     auth_header = request.headers.get("Authorization")
     user_email = None
+    payload: dict = {}
     
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
@@ -58,28 +71,39 @@ async def get_current_user(
     user_id_header = request.headers.get("X-User-ID")
     
     user = None
+    cache = get_session_cache()
     
     if user_email:
-        user = repo.get_by_email(user_email)
+        async def load_by_email() -> UserWithSubscription | None:
+            info = await repo.get_by_email(user_email)
+            if not info:
+                return None
+            # Le repo.get_by_email retourne UserInfo, on veut UserWithSubscription
+            full = await repo.get_user_with_subscription(str(info.id))
+            if not full:
+                raise HTTPException(
+                    status_code=401,
+                    detail={"error": "user_not_found", "message": "Utilisateur introuvable"}
+                )
+            return full
+        
+        exp = payload.get("exp")
+        user = await cache.resolve(
+            f"jwt:{payload.get('sub', '')}:{user_email.lower()}",
+            load_by_email,
+            expires_at=float(exp) if isinstance(exp, (int, float)) else None,
+        )
     elif user_id_header:
-        user = repo.get_user_with_subscription(user_id_header)
+        user = await cache.resolve(
+            f"id:{user_id_header}",
+            lambda: repo.get_user_with_subscription(user_id_header),
+        )
         
     if not user:
         raise HTTPException(
             status_code=401,
             detail={"error": "not_authenticated", "message": "Authentification requise"}
         )
-        
-    # Si on a trouvé l'user par email, on charge les infos de subscription
-    if user_email and not isinstance(user, UserWithSubscription):
-         # Le repo.get_by_email retourne UserInfo, on veut UserWithSubscription
-         user = repo.get_user_with_subscription(str(user.id))
-         
-    if not user:
-         raise HTTPException(
-            status_code=401,
-            detail={"error": "user_not_found", "message": "Utilisateur introuvable"}
-        )
 
     return user
 
@@ -39,7 +39,13 @@ from src.api.schemas import HealthResponse, ErrorResponse, SourceResponse
 from src.api.middleware import RateLimitMiddleware, RequestLoggingMiddleware
 from src.config.logging_config import setup_logging, get_logger
 from src.config.settings import get_settings
+from src.config.database import close_db_pool, get_db_pool
 from src.config.redis import close_redis, get_redis_client
+from src.services.api_key_cache import get_api_key_cache
+from src.services.batch_writer import get_conversation_log_writer, get_usage_log_writer
+from src.services.session_cache import get_session_cache
+from src.services.session_memory import get_session_memory
+from src.services.usage_meter import get_usage_meter
 
 
 @asynccontextmanager
@@ -53,10 +59,40 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Préchauffer Redis (optionnel)
     await get_redis_client()
     
+    # Préchauffer le pool Postgres (optionnel, sinon client Supabase)
+    await get_db_pool()
+    
+    # Cache de validation des clés API (invalidations + usage par lots)
+    api_key_cache = get_api_key_cache()
+    await api_key_cache.start()
+    
+    # Cache des identités de session (console)
+    session_cache = get_session_cache()
+    await session_cache.start()
+    
+    # Compteurs d'usage Redis (réconciliation vers usage_records)
+    usage_meter = get_usage_meter()
+    await usage_meter.start()
+    
+    # Logs d'usage écrits par lots
+    usage_log_writer = get_usage_log_writer()
+    await usage_log_writer.start()
+    
+    # Journal des conversations écrit par lots (hors chemin critique)
+    conversation_log_writer = get_conversation_log_writer()
+    await conversation_log_writer.start()
+    
     yield
     
     # Shutdown
     logger.info("API shutting down")
+    await usage_log_writer.stop()
+    await conversation_log_writer.stop()
+    await get_session_memory().stop()
+    await api_key_cache.stop()
+    await session_cache.stop()
+    await usage_meter.stop()
+    await close_db_pool()
     await close_redis()
 
 
@@ -3,58 +3,99 @@ API Gateway Middlewares
 =======================
 
 Middlewares pour la gestion du rate limiting, du logging et des headers de sécurité.
+
+Middlewares ASGI purs (sans `BaseHTTPMiddleware`) : les headers sont
+injectés dans le message `http.response.start` et le corps de la réponse
+est transmis tel quel, chunk par chunk. Le streaming SSE (`/query/stream`)
+n'est ni bufferisé ni retardé, et aucune tâche supplémentaire n'est créée
+par requête.
 """
 
 import time
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.auth import _get_client_ip
 from src.config.logging_config import get_logger
-from src.services.rate_limiter import get_rate_limiter
+from src.services.batch_writer import get_usage_log_writer
 from src.config.settings import get_settings
 
 logger = get_logger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# Chemins sans headers de rate limiting
+RATE_LIMIT_EXEMPT_PATHS = frozenset({"/health", "/", "/api/v1/health"})
+
+
+class RateLimitMiddleware:
     """
     Middleware pour ajouter les headers de Rate Limiting aux réponses.
     """
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+    
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # On ne limite pas le health check ou la racine
-        if request.url.path in ["/health", "/", "/api/v1/health"]:
-            return await call_next(request)
-            
-        response = await call_next(request)
+        if scope["type"] != "http" or scope["path"] in RATE_LIMIT_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        # Partagé avec request.state (renseigné par get_api_key)
+        state = scope.setdefault("state", {})
         
-        # Ajouter les headers si les infos sont présentes (injectées par get_api_key)
-        if hasattr(request.state, "rate_limit_count") and hasattr(request.state, "rate_limit_max"):
-            limit = request.state.rate_limit_max
-            count = request.state.rate_limit_count
-            remaining = max(0, limit - count)
-            
-            response.headers["X-RateLimit-Limit"] = str(limit)
-            response.headers["X-RateLimit-Remaining"] = str(remaining)
-            
-            # Reset simple (fin de la minute actuelle)
-            reset = 60 - (int(time.time()) % 60)
-            response.headers["X-RateLimit-Reset"] = str(reset)
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                rate_limit = state.get("rate_limit")
+                if rate_limit is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-RateLimit-Limit"] = str(rate_limit.limit)
+                    headers["X-RateLimit-Remaining"] = str(rate_limit.remaining)
+                    # Timestamp Unix exact calculé par le limiter
+                    headers["X-RateLimit-Reset"] = str(rate_limit.reset_at)
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_wrapper)
+
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """
     Middleware pour logger les requêtes et leur temps d'exécution.
+    
+    `X-Response-Time` mesure le temps jusqu'à l'envoi des headers ; le log
+    et l'usage de la clé portent la durée totale, corps (stream) compris.
     """
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        start_time = time.time()
+    
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Extraire les infos utiles avant
-        method = request.method
-        path = request.url.path
+        start_time = time.perf_counter()
+        state = scope.setdefault("state", {})
+        status_code = 500
         
-        response = await call_next(request)
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Response-Time"] = f"{time.perf_counter() - start_time:.3f}s"
+            await send(message)
         
-        process_time = time.time() - start_time
-        status_code = response.status_code
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._log(scope, state, status_code, time.perf_counter() - start_time)
+    
+    @staticmethod
+    def _log(scope: Scope, state: dict, status_code: int, process_time: float) -> None:
+        method = scope["method"]
+        path = scope["path"]
         
         # Logger
         logger.info(
@@ -65,7 +106,18 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             duration=f"{process_time:.3f}s"
         )
         
-        # Ajouter le header de temps d'exécution
-        response.headers["X-Response-Time"] = f"{process_time:.3f}s"
+        # Log d'usage de la clé (écrit par lots, hors chemin critique)
+        api_key = state.get("api_key")
+        if api_key is None or api_key.id is None or not get_settings().usage_log_enabled:
+            return
         
-        return response
+        request = Request(scope)
+        get_usage_log_writer().append({
+            "api_key_id": str(api_key.id),
+            "endpoint": path,
+            "method": method,
+            "status_code": status_code,
+            "response_time_ms": int(process_time * 1000),
+            "client_ip": _get_client_ip(request),
+            "user_agent": (request.headers.get("user-agent") or "")[:500] or None,
+        })
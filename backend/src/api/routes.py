@@ -11,15 +11,18 @@ Scopes requis par endpoint:
 - `/query`, `/session/new`: `query`
 - `/feedback`, `/analytics`: `feedback`
 - `/ingest/*`: `ingest`
-- `/training/*`: `admin`
+- `/training/*`, `/metrics/*`: `admin`
 """
 
+import asyncio
+import time
+from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, status
 
 from src.api.auth import require_api_key, require_scope, require_any_scope
-from src.services.rate_limiter import get_rate_limiter
+from src.services.gateway import get_gateway
 from src.api.schemas import (
     QueryRequest,
     QueryResponse,
@@ -32,10 +35,17 @@ from src.api.schemas import (
     AnalyticsResponse,
 )
 from src.config.logging_config import get_logger
+from src.config.settings import get_settings
 from src.models.api_key import ApiKeyValidation
-from src.models.document import DocumentCreate, DocumentMetadata, SourceType
+from src.models.document import DocumentCreate, DocumentMetadata, SearchEffort, SourceType
 from src.providers import GithubProvider, PDFProvider
+from src.providers.llm import ProviderQueueTimeout
 from src.services import RAGEngine, FeedbackService, VectorizationService
+from src.services.batch_writer import get_conversation_log_writer
+from src.services.chunk_cache import get_chunk_body_cache
+from src.services.query_context import QueryContext, QueryDeadlineExceeded, new_session_id
+from src.services.usage_meter import get_usage_meter
+from src.services.vectorization_service import IngestionStats
 
 logger = get_logger(__name__)
 
@@ -72,6 +82,71 @@ def get_vectorization() -> VectorizationService:
     return _vectorization
 
 
+def _query_context(
+    request: QueryRequest,
+    http_request: Request,
+    api_key: ApiKeyValidation,
+) -> QueryContext:
+    """Contexte propre à la requête (le RAG Engine est partagé)."""
+    return QueryContext.create(
+        session_id=request.session_id,
+        user_id=str(api_key.user_id) if api_key.user_id else None,
+        request_id=http_request.headers.get("X-Request-ID"),
+        timeout=get_settings().query_timeout,
+        filters=request.filters,
+        search_effort=_search_effort(request, http_request),
+    )
+
+
+def _search_effort(request: QueryRequest, http_request: Request) -> SearchEffort | None:
+    """Effort de recherche : celui de la requête, sinon celui du plan (settings)."""
+    if request.search_effort is not None:
+        return request.search_effort
+    admission = getattr(http_request.state, "admission", None)
+    plan = admission.plan_slug if admission is not None else None
+    effort = get_settings().search_effort_by_plan.get(plan) if plan else None
+    return SearchEffort(effort) if effort else None
+
+
+# Attente entre deux tentatives de feedback (conversation pas encore écrite)
+FEEDBACK_RETRY_DELAY = 0.2
+
+
+async def _add_feedback(feedback: FeedbackService, request: FeedbackRequest) -> bool:
+    """
+    Enregistre un feedback, en attendant brièvement la conversation.
+    
+    Si la conversation est encore détenue par le writer de ce worker
+    (en attente ou en cours d'écriture), elle est écrite d'abord ; on
+    réessaie tant que ce writer la détient (écriture en échec), au plus
+    deux intervalles d'écriture. Sinon une seule tentative. Les appels
+    Supabase (synchrones) sont déportés dans un thread.
+    """
+    conversation_log = get_conversation_log_writer()
+    conversation_id = str(request.conversation_id)
+    deadline = time.monotonic() + 2 * get_settings().conversation_log_flush_interval
+    
+    while True:
+        if conversation_log.holds("id", conversation_id):
+            await conversation_log.flush()
+        if await asyncio.to_thread(
+            feedback.add_feedback, request.conversation_id, request.score, request.comment,
+        ):
+            return True
+        if not conversation_log.holds("id", conversation_id) or time.monotonic() >= deadline:
+            logger.warning("Conversation not found for feedback", conversation_id=conversation_id)
+            return False
+        await asyncio.sleep(FEEDBACK_RETRY_DELAY)
+
+
+async def _meter_documents(api_key: ApiKeyValidation, stats: IngestionStats) -> None:
+    """Compte les documents créés dans `usage_records` (documents_count)."""
+    if api_key.user_id and stats.total_created:
+        await get_usage_meter().increment(
+            str(api_key.user_id), "documents", stats.total_created,
+        )
+
+
 # ===== Query Endpoints =====
 
 @router.post(
@@ -104,6 +179,7 @@ Le système utilise un **routage intelligent** pour optimiser la latence :
 )
 async def query_rag(
     request: QueryRequest,
+    http_request: Request,
     api_key: ApiKeyValidation = Depends(require_scope("query")),
 ) -> QueryResponse:
     """
@@ -115,27 +191,9 @@ async def query_rag(
     - Si une réflexion approfondie est nécessaire
     """
     try:
-        # 1. Rate limiting pour le mode réflexion (si activé)
-        if request.enable_reflection:
-            limiter = get_rate_limiter()
-            allowed, count, retry_after = await limiter.check_reflection_limit(
-                str(api_key.user_id) if api_key.user_id else str(api_key.id)
-            )
-            if not allowed:
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail={
-                        "error": "REFLECTION_LIMIT_EXCEEDED",
-                        "message": f"Limite de réflexion atteinte. Réessayez dans {retry_after}s.",
-                        "retry_after": retry_after
-                    }
-                )
-
+        # La limite de réflexion est vérifiée à l'admission (get_api_key)
         rag = get_rag_engine()
-        
-        # Utiliser la session existante si fournie
-        if request.session_id:
-            rag._session_id = request.session_id
+        context = _query_context(request, http_request, api_key)
         
         response = await rag.query_async(
             question=request.question,
@@ -143,7 +201,7 @@ async def query_rag(
             use_web=request.use_web_search,
             use_rag=request.use_rag,
             enable_reflection=request.enable_reflection,
-            user_id=str(api_key.user_id) if api_key.user_id else None,
+            context=context,
         )
         
         # Convertir les sources
@@ -180,12 +238,29 @@ async def query_rag(
             answer=response.answer,
             sources=sources,
             conversation_id=response.conversation_id,
-            session_id=rag.session_id,
+            session_id=context.session_id,
             metadata=response.metadata,
             thought_process=response.thought_process,
             routing=routing_info,
         )
         
+    except QueryDeadlineExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={
+                "error": "QUERY_TIMEOUT",
+                "message": "La requête a dépassé le délai maximal de traitement.",
+            },
+        )
+    except ProviderQueueTimeout as e:
+        logger.warning("Query rejected, provider saturated", provider=e.provider)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error": "PROVIDER_BUSY",
+                "message": "Service momentanément saturé, réessayez dans quelques secondes.",
+            },
+        )
     except Exception as e:
         logger.error("Query failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
@@ -201,9 +276,7 @@ async def new_session(
     api_key: ApiKeyValidation = Depends(require_scope("query")),
 ) -> dict:
     """Crée une nouvelle session de conversation."""
-    rag = get_rag_engine()
-    session_id = rag.new_session()
-    return {"session_id": session_id}
+    return {"session_id": new_session_id()}
 
 
 @router.post(
@@ -217,6 +290,7 @@ Retourne un flux d'événements permettant un feedback temps réel :
 - `routing`: Décision de routage (intent, use_rag, use_web)
 - `search_start`: Début d'une recherche (type: rag ou web)
 - `search_complete`: Fin d'une recherche avec résultats
+- `web_chunk`: Fragment de la recherche web, diffusé au fil de l'eau
 - `generation_start`: Début de la génération
 - `chunk`: Morceau de réponse (contenu progressif)
 - `thought`: Pensée interne (si mode réflexion activé)
@@ -227,6 +301,7 @@ Retourne un flux d'événements permettant un feedback temps réel :
 )
 async def query_rag_stream(
     request: QueryRequest,
+    http_request: Request,
     api_key: ApiKeyValidation = Depends(require_scope("query")),
 ):
     """
@@ -240,25 +315,9 @@ async def query_rag_stream(
     
     async def generate_events():
         try:
-            # 1. Rate limiting pour le mode réflexion (si activé)
-            if request.enable_reflection:
-                limiter = get_rate_limiter()
-                allowed, count, retry_after = await limiter.check_reflection_limit(
-                    str(api_key.user_id) if api_key.user_id else str(api_key.id)
-                )
-                if not allowed:
-                    error_data = json.dumps({
-                        "error": "REFLECTION_LIMIT_EXCEEDED",
-                        "message": f"Limite de réflexion atteinte. Réessayez dans {retry_after}s.",
-                        "retry_after": retry_after
-                    })
-                    yield f"event: error\ndata: {error_data}\n\n"
-                    return
-
+            # La limite de réflexion est vérifiée à l'admission (get_api_key)
             rag = get_rag_engine()
-            
-            if request.session_id:
-                rag._session_id = request.session_id
+            context = _query_context(request, http_request, api_key)
             
             async for event in rag.query_stream(
                 question=request.question,
@@ -266,13 +325,26 @@ async def query_rag_stream(
                 use_web=request.use_web_search,
                 use_rag=request.use_rag,
                 enable_reflection=request.enable_reflection,
-                user_id=str(api_key.user_id) if api_key.user_id else None,
+                context=context,
             ):
                 # Format SSE
                 event_type = event.get("event", "message")
                 data = json.dumps(event.get("data", {}))
                 yield f"event: {event_type}\ndata: {data}\n\n"
                 
+        except QueryDeadlineExceeded:
+            error_data = json.dumps({
+                "error": "QUERY_TIMEOUT",
+                "message": "La requête a dépassé le délai maximal de traitement.",
+            })
+            yield f"event: error\ndata: {error_data}\n\n"
+        except ProviderQueueTimeout as e:
+            logger.warning("Streaming query rejected, provider saturated", provider=e.provider)
+            error_data = json.dumps({
+                "error": "PROVIDER_BUSY",
+                "message": "Service momentanément saturé, réessayez dans quelques secondes.",
+            })
+            yield f"event: error\ndata: {error_data}\n\n"
         except Exception as e:
             logger.error("Streaming query failed", error=str(e))
             error_data = json.dumps({"error": str(e)})
@@ -315,12 +387,8 @@ async def submit_feedback(
     try:
         feedback = get_feedback_service()
         
-        # Ajouter le feedback
-        success = feedback.add_feedback(
-            request.conversation_id,
-            request.score,
-            request.comment,
-        )
+        # Ajouter le feedback (la conversation peut être encore en attente d'écriture)
+        success = await _add_feedback(feedback, request)
         
         # Flaguer si demandé
         if success and request.flag_for_training:
@@ -357,6 +425,45 @@ async def get_analytics(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/metrics/cascade",
+    tags=["Monitoring"],
+    summary="Statistiques de la cascade de modèles",
+    description="Taux d'escalade vers le grand modèle et latence économisée.",
+)
+async def get_cascade_metrics(
+    api_key: ApiKeyValidation = Depends(require_scope("admin")),
+) -> dict[str, Any]:
+    """Retourne les statistiques de la cascade de modèles."""
+    return get_rag_engine().cascade_stats()
+
+
+@router.get(
+    "/metrics/chunk-cache",
+    tags=["Monitoring"],
+    summary="Statistiques du cache des fragments",
+    description="Taille et taux de succès du cache des contenus lus en phase 2 de la recherche vectorielle.",
+)
+async def get_chunk_cache_metrics(
+    api_key: ApiKeyValidation = Depends(require_scope("admin")),
+) -> dict[str, Any]:
+    """Retourne les statistiques du cache des fragments."""
+    return get_chunk_body_cache().stats()
+
+
+@router.get(
+    "/metrics/gateway",
+    tags=["Monitoring"],
+    summary="Statistiques d'admission",
+    description="Latence d'admission (rate limits + quota) et rejets par motif.",
+)
+async def get_gateway_metrics(
+    api_key: ApiKeyValidation = Depends(require_scope("admin")),
+) -> dict[str, Any]:
+    """Retourne les statistiques de l'admission gateway."""
+    return get_gateway().stats.snapshot()
+
+
 # ===== Ingestion Endpoints =====
 
 @router.post(
@@ -387,6 +494,7 @@ async def ingest_github(
             skip_duplicates=request.skip_duplicates,
             user_id=str(api_key.user_id) if api_key.user_id else None,
         )
+        await _meter_documents(api_key, stats)
         
         logger.info(
             "GitHub ingestion completed",
@@ -436,6 +544,7 @@ async def ingest_text(
             [doc],
             user_id=str(api_key.user_id) if api_key.user_id else None,
         )
+        await _meter_documents(api_key, stats)
         
         return IngestResponse(
             success=stats.total_created > 0,
@@ -486,6 +595,7 @@ async def ingest_pdf(
             doc_creates,
             user_id=str(api_key.user_id) if api_key.user_id else None,
         )
+        await _meter_documents(api_key, stats)
         
         return IngestResponse(
             success=stats.total_created > 0,
@@ -526,3 +636,4 @@ async def process_training_queue(
     except Exception as e:
         logger.error("Training process failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+
@@ -10,6 +10,8 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field
 
+from src.models.document import DocumentFilter, SearchEffort
+
 
 # ===== Query Schemas =====
 
@@ -67,6 +69,14 @@ class QueryRequest(BaseModel):
         default=None,
         description="Modèle spécifique à utiliser",
     )
+    filters: DocumentFilter | None = Field(
+        default=None,
+        description="Filtre des documents personnels (tags, langue, repository, dates...)",
+    )
+    search_effort: SearchEffort | None = Field(
+        default=None,
+        description="Compromis rappel/latence de la recherche (fast, balanced, thorough ; défaut : plan)",
+    )
 
 
 class SourceResponse(BaseModel):
@@ -0,0 +1,167 @@
+"""
+Database Configuration
+======================
+
+Pool de connexions Postgres asynchrone (asyncpg), en accès direct à la base.
+
+Optionnel : sans `DATABASE_URL` (ou sans le package asyncpg), les
+repositories asynchrones passent par le client Supabase (PostgREST),
+exécuté dans un thread.
+
+Les requêtes chaudes (`match_documents`, `validate_api_key`) sont
+préparées une fois par connexion puis réutilisées (`fetch_prepared`).
+Avec un pooler en mode transaction (PgBouncer, Supavisor port 6543),
+les statements préparés ne sont pas supportés : utiliser la connexion
+directe (port 5432) ou `DB_STATEMENT_CACHE_SIZE=0` et
+`DB_PREPARE_HOT_QUERIES=false`.
+"""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+from src.config.settings import get_settings
+from src.config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Pool asyncpg (lazy loading)
+_pool: Any = None
+_pool_lock: asyncio.Lock | None = None
+# Échec de connexion : ne pas réessayer à chaque requête
+_pool_failed_at: float | None = None
+
+# Délai avant une nouvelle tentative de connexion (secondes)
+_RETRY_AFTER = 30.0
+
+
+async def _init_connection(conn: Any) -> None:
+    """Codecs JSON : les colonnes json/jsonb sont lues et écrites en objets Python."""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog",
+        )
+
+
+async def get_db_pool() -> Optional[Any]:
+    """
+    Retourne le pool asyncpg.
+    Initialise le pool si nécessaire.
+    
+    Returns:
+        asyncpg.Pool, ou None si non configuré ou indisponible.
+    """
+    global _pool, _pool_lock, _pool_failed_at
+    
+    settings = get_settings()
+    if not settings.database_url:
+        return None
+    
+    if _pool is not None:
+        return _pool
+    
+    loop = asyncio.get_running_loop()
+    if _pool_failed_at is not None and loop.time() - _pool_failed_at < _RETRY_AFTER:
+        return None
+    
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    
+    async with _pool_lock:
+        if _pool is not None:
+            return _pool
+        
+        try:
+            import asyncpg
+        except ImportError:
+            logger.warning("asyncpg package not installed, using Supabase client")
+            _pool_failed_at = loop.time()
+            return None
+        
+        try:
+            logger.info("Creating Postgres pool", max_size=settings.db_pool_max_size)
+            _pool = await asyncpg.create_pool(
+                dsn=settings.database_url,
+                min_size=settings.db_pool_min_size,
+                max_size=settings.db_pool_max_size,
+                command_timeout=settings.db_command_timeout,
+                statement_cache_size=settings.db_statement_cache_size,
+                init=_init_connection,
+                connection_class=_connection_class(asyncpg),
+            )
+            _pool_failed_at = None
+            logger.info("Postgres pool ready")
+        except Exception as e:
+            logger.error("Failed to create Postgres pool", error=str(e))
+            _pool = None
+            _pool_failed_at = loop.time()
+    
+    return _pool
+
+
+async def fetch_prepared(conn: Any, query: str, *args: Any) -> list[Any]:
+    """
+    Exécute une requête chaude via un statement préparé de la connexion.
+    
+    Le statement est préparé au premier appel sur la connexion, puis
+    réutilisé par les appels suivants. Sans préparation
+    (`db_prepare_hot_queries=False`), la requête est envoyée telle quelle.
+    
+    Args:
+        conn: Connexion acquise sur le pool.
+        query: Requête SQL paramétrée ($1, $2...).
+        *args: Paramètres.
+    
+    Returns:
+        Lignes (asyncpg.Record).
+    """
+    if not get_settings().db_prepare_hot_queries:
+        return await conn.fetch(query, *args)
+    
+    import asyncpg
+    
+    statement = await conn.prepare_hot(query)
+    try:
+        return await statement.fetch(*args)
+    except asyncpg.InvalidCachedStatementError:
+        # Fonction recréée par une migration : préparer à nouveau
+        conn.forget_hot(query)
+        statement = await conn.prepare_hot(query)
+        return await statement.fetch(*args)
+
+
+def _connection_class(asyncpg: Any) -> type:
+    """Classe de connexion conservant les statements des requêtes chaudes."""
+    
+    class HotStatementConnection(asyncpg.Connection):
+        __slots__ = ("_hot_statements",)
+        
+        async def prepare_hot(self, query: str) -> Any:
+            try:
+                statements = self._hot_statements
+            except AttributeError:
+                statements = self._hot_statements = {}
+            statement = statements.get(query)
+            if statement is None:
+                statement = statements[query] = await self.prepare(query)
+            return statement
+        
+        def forget_hot(self, query: str) -> None:
+            try:
+                self._hot_statements.pop(query, None)
+            except AttributeError:
+                pass
+    
+    return HotStatementConnection
+
+
+async def close_db_pool() -> None:
+    """Ferme le pool Postgres."""
+    global _pool, _pool_failed_at
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+    _pool_failed_at = None
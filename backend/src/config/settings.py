@@ -78,7 +78,61 @@ class Settings(BaseSettings):
     )
     default_llm_provider: str = Field(
         default="mistral",
-        description="Provider LLM par défaut (mistral, openai, gemini)",
+        description="Provider LLM par défaut (mistral, openai, gemini, local)",
+    )
+    provider_max_concurrency: int = Field(
+        default=32,
+        description="Nombre maximum d'appels simultanés par provider",
+        ge=1,
+        le=1024,
+    )
+    provider_queue_timeout: float = Field(
+        default=30.0,
+        description="Attente maximale (secondes) pour obtenir un slot provider",
+        ge=0.0,
+    )
+    provider_limits: dict[str, dict[str, float]] = Field(
+        default_factory=dict,
+        description=(
+            "Budgets par provider en JSON "
+            '(ex: {"mistral": {"requests_per_minute": 300, "tokens_per_minute": 500000}})'
+        ),
+    )
+    
+    # ===== Local Simulation (tests de charge) =====
+    embedding_backend: Literal["mistral", "local"] = Field(
+        default="mistral",
+        description="Backend d'embeddings (local = vecteurs simulés déterministes)",
+    )
+    local_embedding_latency_ms: int = Field(
+        default=30,
+        description="Latence simulée d'un appel d'embedding local (ms)",
+        ge=0,
+    )
+    local_llm_ttft_ms: int = Field(
+        default=400,
+        description="Délai simulé avant le premier token du provider local (ms)",
+        ge=0,
+    )
+    local_llm_tokens_per_second: float = Field(
+        default=60.0,
+        description="Débit simulé du provider local (tokens/seconde)",
+        gt=0.0,
+    )
+    local_llm_response_tokens: int = Field(
+        default=250,
+        description="Longueur des réponses simulées (tokens)",
+        ge=1,
+    )
+    local_llm_error_rate: float = Field(
+        default=0.0,
+        description="Probabilité d'erreur 429 simulée par appel",
+        ge=0.0,
+        le=1.0,
+    )
+    local_llm_seed: int = Field(
+        default=42,
+        description="Graine du tirage des erreurs simulées",
     )
     
     # ===== OAuth Settings =====
@@ -115,6 +169,41 @@ class Settings(BaseSettings):
         description="URL Redis pour le rate limiting (ex: redis://localhost:6379)",
     )
     
+    # ===== Postgres Direct (asyncpg) =====
+    database_url: str = Field(
+        default="",
+        description="DSN Postgres pour l'accès direct asynchrone (vide : client Supabase)",
+    )
+    db_pool_min_size: int = Field(
+        default=1,
+        description="Connexions Postgres ouvertes au minimum",
+        ge=0,
+    )
+    db_pool_max_size: int = Field(
+        default=10,
+        description="Connexions Postgres ouvertes au maximum",
+        ge=1,
+    )
+    db_pool_acquire_timeout: float = Field(
+        default=2.0,
+        description="Attente maximale d'une connexion du pool avant repli sur Supabase (secondes)",
+        gt=0.0,
+    )
+    db_command_timeout: float = Field(
+        default=10.0,
+        description="Timeout d'une requête Postgres (secondes)",
+        gt=0.0,
+    )
+    db_statement_cache_size: int = Field(
+        default=100,
+        description="Taille du cache de statements asyncpg (0 derrière un pooler en mode transaction)",
+        ge=0,
+    )
+    db_prepare_hot_queries: bool = Field(
+        default=True,
+        description="Préparer match_documents et validate_api_key une fois par connexion",
+    )
+    
     # ===== Application Settings =====
     app_env: Literal["development", "staging", "production"] = Field(
         default="development",
@@ -152,6 +241,74 @@ class Settings(BaseSettings):
         ge=1,
         le=100,
     )
+    rerank_enabled: bool = Field(
+        default=True,
+        description="Diversifier les résultats vectoriels (MMR) et les re-ranker",
+    )
+    rerank_fetch_multiplier: int = Field(
+        default=4,
+        description="Candidats lus avant diversification (multiple de max_results)",
+        ge=1,
+        le=20,
+    )
+    rerank_mmr_lambda: float = Field(
+        default=0.7,
+        description="Compromis pertinence/diversité de la MMR (1.0 = pertinence seule)",
+        ge=0.0,
+        le=1.0,
+    )
+    rerank_time_budget_ms: float = Field(
+        default=150.0,
+        description="Budget de temps de la diversification et du re-ranking (ms)",
+        ge=0.0,
+    )
+    chunk_cache_max_mb: float = Field(
+        default=64.0,
+        description="Taille du cache mémoire des contenus de fragments (Mo, 0 = désactivé)",
+        ge=0.0,
+    )
+    chunk_embedding_cache_max_mb: float = Field(
+        default=32.0,
+        description="Taille du cache mémoire des embeddings de fragments (Mo, diversification MMR)",
+        ge=0.0,
+    )
+    chunk_cache_ttl: float = Field(
+        default=600.0,
+        description="Durée de vie d'un contenu de fragment en cache (secondes)",
+        ge=0.0,
+    )
+    search_effort_ef_search: dict[str, int] = Field(
+        default_factory=lambda: {"fast": 20, "balanced": 40, "thorough": 120},
+        description='hnsw.ef_search par niveau d\'effort de recherche en JSON (ex: {"fast": 20, "thorough": 120})',
+    )
+    search_effort_by_plan: dict[str, Literal["fast", "balanced", "thorough"]] = Field(
+        default_factory=dict,
+        description='Effort de recherche par défaut par plan en JSON (ex: {"free": "fast", "enterprise": "thorough"})',
+    )
+    compact_embedding_enabled: bool = Field(
+        default=False,
+        description="Écrire aussi l'embedding compact (halfvec, migration 015) à l'ingestion",
+    )
+    compact_embedding_dimension: int = Field(
+        default=256,
+        description="Dimension des embeddings compacts (celle de la colonne embedding_compact)",
+        ge=1,
+        le=4096,
+    )
+    compact_embedding_projection: str = Field(
+        default="",
+        description="Projection PCA des embeddings compacts (.npz, vide = troncature)",
+    )
+    compact_search_enabled: bool = Field(
+        default=False,
+        description="Premier passage de la recherche sur l'index compact (après backfill)",
+    )
+    compact_rescore_multiplier: int = Field(
+        default=4,
+        description="Candidats compacts re-scorés en pleine précision (multiple de la limite)",
+        ge=1,
+        le=20,
+    )
     
     # ===== LLM Settings =====
     llm_model: str = Field(
@@ -170,6 +327,71 @@ class Settings(BaseSettings):
         ge=1,
         le=32768,
     )
+    context_token_budget: int = Field(
+        default=6000,
+        description="Budget de tokens du contexte (RAG + web) envoyé au LLM",
+        ge=256,
+    )
+    context_model_budgets: dict[str, int] = Field(
+        default_factory=dict,
+        description='Budgets de contexte par modèle (préfixe) en JSON (ex: {"mistral-small": 3000})',
+    )
+    context_dedup_threshold: float = Field(
+        default=0.85,
+        description="Recouvrement au-delà duquel deux fragments sont dédupliqués",
+        ge=0.0,
+        le=1.0,
+    )
+    query_timeout: float = Field(
+        default=120.0,
+        description="Échéance d'une requête RAG en secondes (0 = illimitée)",
+        ge=0.0,
+    )
+    
+    # ===== Model Cascade =====
+    cascade_enabled: bool = Field(
+        default=False,
+        description="Petit modèle d'abord pour les intentions simples, escalade sinon",
+    )
+    cascade_intent_models: dict[str, str] = Field(
+        default_factory=dict,
+        description=(
+            "Modèle par intention en JSON (vide = petit modèle du provider) "
+            '(ex: {"greeting": "mistral-small-latest", "general": "mistral-small-latest"})'
+        ),
+    )
+    cascade_min_confidence: float = Field(
+        default=0.7,
+        description="Confiance minimale du routeur pour rester sur le petit modèle",
+        ge=0.0,
+        le=1.0,
+    )
+    
+    # ===== Session Memory =====
+    session_memory_enabled: bool = Field(
+        default=True,
+        description="Injecter l'historique de la session (échanges récents + résumé) dans le prompt",
+    )
+    session_memory_turns: int = Field(
+        default=6,
+        description="Échanges conservés tels quels avant résumé glissant",
+        ge=1,
+        le=50,
+    )
+    session_memory_token_budget: int = Field(
+        default=1500,
+        description="Budget de tokens de l'historique injecté",
+        ge=0,
+    )
+    session_memory_summary_model: str = Field(
+        default="",
+        description="Modèle économique du résumé glissant (vide = petit modèle du provider)",
+    )
+    session_memory_ttl: float = Field(
+        default=86400.0,
+        description="Expiration d'une session inactive (secondes)",
+        gt=0.0,
+    )
     
     # ===== API Settings =====
     api_host: str = Field(
@@ -206,6 +428,78 @@ class Settings(BaseSettings):
         ge=0,
         le=10000,
     )
+    api_key_cache_ttl: float = Field(
+        default=60.0,
+        description="Durée de cache d'une validation de clé API (secondes)",
+        ge=0.0,
+    )
+    api_key_negative_cache_ttl: float = Field(
+        default=10.0,
+        description="Durée de cache d'une clé inconnue ou rejetée (secondes)",
+        ge=0.0,
+    )
+    api_key_usage_flush_interval: float = Field(
+        default=5.0,
+        description="Période d'écriture par lots de l'usage des clés API (secondes)",
+        gt=0.0,
+    )
+    session_cache_ttl: float = Field(
+        default=60.0,
+        description="Durée maximale de cache d'une identité de session (bornée par l'expiration du token, secondes)",
+        ge=0.0,
+    )
+    usage_meter_enabled: bool = Field(
+        default=True,
+        description="Compter l'usage dans Redis et le réconcilier par lots (si Redis est configuré)",
+    )
+    usage_reconcile_interval: float = Field(
+        default=10.0,
+        description="Période de réconciliation des compteurs d'usage (secondes)",
+        gt=0.0,
+    )
+    usage_claim_lease: float = Field(
+        default=60.0,
+        description="Délai avant reprise d'un lot d'usage non acquitté (secondes)",
+        gt=0.0,
+    )
+    usage_log_enabled: bool = Field(
+        default=True,
+        description="Journaliser chaque requête authentifiée dans api_key_usage_logs",
+    )
+    usage_log_batch_size: int = Field(
+        default=500,
+        description="Nombre maximal de lignes par insert de logs d'usage",
+        ge=1,
+    )
+    usage_log_flush_interval: float = Field(
+        default=2.0,
+        description="Délai maximal avant écriture des logs d'usage (secondes)",
+        gt=0.0,
+    )
+    usage_log_max_pending: int = Field(
+        default=10000,
+        description="Nombre maximal de logs d'usage en mémoire",
+        ge=1,
+    )
+    usage_log_spill_dir: str = Field(
+        default="",
+        description="Répertoire de débordement des logs d'usage (vide = abandon)",
+    )
+    usage_log_max_attempts: int = Field(
+        default=3,
+        description="Échecs consécutifs d'un lot avant isolement des lignes refusées",
+        ge=1,
+    )
+    conversation_log_batch_size: int = Field(
+        default=100,
+        description="Nombre maximal de conversations par insert",
+        ge=1,
+    )
+    conversation_log_flush_interval: float = Field(
+        default=1.0,
+        description="Délai maximal avant écriture des conversations (secondes)",
+        gt=0.0,
+    )
     
     # ===== CORS Settings =====
     cors_origins: str = Field(
@@ -11,7 +11,7 @@ from enum import Enum
 from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class SourceType(str, Enum):
@@ -24,6 +24,19 @@ class SourceType(str, Enum):
     CONVERSATION = "conversation"
 
 
+class SearchEffort(str, Enum):
+    """
+    Effort de la recherche vectorielle (compromis rappel / latence).
+    
+    Chaque niveau correspond à une valeur de `hnsw.ef_search` (settings
+    `search_effort_ef_search`), appliquée par la fonction de recherche.
+    """
+    
+    FAST = "fast"
+    BALANCED = "balanced"
+    THOROUGH = "thorough"
+
+
 class DocumentMetadata(BaseModel):
     """
     Métadonnées flexibles pour un document.
@@ -175,6 +188,145 @@ class DocumentMatch(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class DocumentHit(BaseModel):
+    """
+    Résultat compact d'une recherche par similarité (phase 1).
+    
+    Sans `content` : le corps n'est lu (`get_contents`) que pour les
+    fragments retenus dans le contexte.
+    
+    Attributes:
+        id: Identifiant du document.
+        similarity: Score de similarité (0-1).
+        source_type: Type de source.
+        source_id: Identifiant de la source.
+        content_bytes: Taille du contenu en octets (estimation des tokens).
+        metadata: Métadonnées compactes (titre, url, fichier).
+        embedding_compact: Vecteur compact normalisé (diversification MMR).
+    """
+    
+    id: UUID = Field(..., description="Identifiant du document")
+    similarity: float = Field(
+        ...,
+        description="Score de similarité cosinus",
+        ge=0.0,
+        le=1.0,
+    )
+    source_type: SourceType = Field(..., description="Type de source")
+    source_id: str | None = Field(default=None)
+    content_bytes: int = Field(default=0, ge=0, description="Taille du contenu (octets)")
+    metadata: dict[str, Any] = Field(default_factory=dict)
+    embedding_compact: list[float] | None = Field(
+        default=None,
+        description="Vecteur compact (migration 016), comparé entre candidats par la MMR",
+    )
+    
+    model_config = {"from_attributes": True}
+
+
+class DocumentFilter(BaseModel):
+    """
+    Filtre de recherche sur les métadonnées, évalué en SQL.
+    
+    Les prédicats sont passés à `match_documents` / `match_document_ids`
+    (paramètre `filters`) et appliqués pendant le parcours de l'index
+    HNSW, appuyés sur les index GIN/btree de la migration 011 : les
+    résultats satisfont déjà le filtre, sans sur-échantillonnage ni
+    filtrage côté Python. Tous les critères renseignés doivent être
+    satisfaits.
+    
+    Attributes:
+        tags_any: Au moins un de ces tags.
+        tags_all: Tous ces tags.
+        language: Langue du contenu (`metadata.language`).
+        repository: Repository GitHub (`metadata.extra.repo`, "owner/name").
+        is_cv: True : CV uniquement ; False : CV exclus.
+        source_types: Types de source acceptés.
+        created_after: Documents créés à partir de cette date.
+        created_before: Documents créés avant cette date.
+        metadata: Sous-document JSONB que les métadonnées doivent contenir.
+    """
+    
+    tags_any: list[str] = Field(
+        default_factory=list,
+        description="Au moins un de ces tags",
+        max_length=20,
+    )
+    tags_all: list[str] = Field(
+        default_factory=list,
+        description="Tous ces tags",
+        max_length=20,
+    )
+    language: str | None = Field(default=None, description="Langue du contenu", max_length=32)
+    repository: str | None = Field(
+        default=None,
+        description="Repository GitHub (owner/name)",
+        max_length=200,
+    )
+    is_cv: bool | None = Field(default=None, description="CV uniquement (True) ou exclus (False)")
+    source_types: list[SourceType] = Field(
+        default_factory=list,
+        description="Types de source acceptés",
+    )
+    created_after: datetime | None = Field(default=None, description="Créés à partir de")
+    created_before: datetime | None = Field(default=None, description="Créés avant")
+    metadata: dict[str, Any] = Field(
+        default_factory=dict,
+        description="Contenance JSONB sur les métadonnées (@>)",
+    )
+    
+    @model_validator(mode="after")
+    def check_dates(self) -> "DocumentFilter":
+        """Vérifie que l'intervalle de dates n'est pas vide."""
+        if (
+            self.created_after is not None
+            and self.created_before is not None
+            and self.created_after >= self.created_before
+        ):
+            raise ValueError("created_after must be earlier than created_before")
+        return self
+    
+    def to_params(self) -> dict[str, Any] | None:
+        """
+        Paramètre `filters` (JSONB) des fonctions de recherche.
+        
+        language, repository, is_cv=True et `metadata` sont regroupés en
+        une seule contenance (`metadata @> ...`, index GIN) ; is_cv=False
+        devient une exclusion (les documents sans `extra.is_cv` restent
+        retenus).
+        
+        Returns:
+            Dictionnaire sérialisable en JSON, None si le filtre est vide.
+        """
+        contains: dict[str, Any] = dict(self.metadata)
+        extra: dict[str, Any] = dict(contains.get("extra") or {})
+        if self.language:
+            contains["language"] = self.language
+        if self.repository:
+            extra["repo"] = self.repository
+        if self.is_cv:
+            extra["is_cv"] = True
+        if extra:
+            contains["extra"] = extra
+        
+        params: dict[str, Any] = {}
+        if self.tags_any:
+            params["tags_any"] = list(self.tags_any)
+        if self.tags_all:
+            params["tags_all"] = list(self.tags_all)
+        if contains:
+            params["contains"] = contains
+        if self.is_cv is False:
+            params["excludes"] = {"extra": {"is_cv": True}}
+        if self.source_types:
+            params["source_types"] = [source.value for source in self.source_types]
+        if self.created_after is not None:
+            params["created_after"] = self.created_after.isoformat()
+        if self.created_before is not None:
+            params["created_before"] = self.created_before.isoformat()
+        return params or None
+
+
 class DocumentStats(BaseModel):
     """
     Statistiques sur les documents.
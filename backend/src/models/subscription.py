@@ -198,6 +198,9 @@ class UsageStats(BaseModel):
     overage_requests: int = Field(default=0, description="Requêtes au-delà du quota")
     overage_amount_cents: int = Field(default=0, description="Montant overage")
     
+    # Plan (le plan gratuit n'autorise pas d'overage)
+    plan_slug: str | None = Field(default=None, description="Slug du plan")
+    
     @property
     def requests_percentage(self) -> int:
         """Pourcentage de requêtes utilisées."""
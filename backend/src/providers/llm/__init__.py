@@ -9,6 +9,14 @@ Mistral, OpenAI, Gemini, DeepSeek, etc.
 from .base_llm import BaseLLMProvider, LLMResponse, LLMConfig, StreamChunk, LLMProvider
 from .factory import LLMProviderFactory, get_llm_provider
 from .mistral_provider import MistralLLMProvider
+from .local_provider import LocalEmbeddingClient, LocalSimulatedProvider
+from .limiter import (
+    AdaptiveConcurrencyLimiter,
+    ProviderLimits,
+    ProviderQueueTimeout,
+    get_provider_limiter,
+)
+from .tokenizer import TokenCounter, TokenUsage, get_token_counter
 
 __all__ = [
     "BaseLLMProvider",
@@ -19,5 +27,14 @@ __all__ = [
     "LLMProviderFactory",
     "get_llm_provider",
     "MistralLLMProvider",
+    "LocalSimulatedProvider",
+    "LocalEmbeddingClient",
+    "AdaptiveConcurrencyLimiter",
+    "ProviderLimits",
+    "ProviderQueueTimeout",
+    "get_provider_limiter",
+    "TokenCounter",
+    "TokenUsage",
+    "get_token_counter",
 ]
 
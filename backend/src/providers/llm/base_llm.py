@@ -6,12 +6,15 @@ Classe abstraite définissant l'interface pour tous les providers LLM.
 Implémente le Pattern Strategy pour permettre le switching dynamique.
 """
 
+import functools
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import AsyncIterator, Any
 
 from src.config.logging_config import LoggerMixin
+from .limiter import AdaptiveConcurrencyLimiter, get_provider_limiter
+from .tokenizer import StreamTokenCounter, TokenCounter, TokenUsage, get_token_counter
 
 
 class LLMProvider(str, Enum):
@@ -21,6 +24,7 @@ class LLMProvider(str, Enum):
     GEMINI = "gemini"
     DEEPSEEK = "deepseek"
     ANTHROPIC = "anthropic"
+    LOCAL = "local"  # Provider simulé (tests de charge)
 
 
 @dataclass
@@ -72,6 +76,38 @@ class StreamChunk:
     is_thought: bool = False  # True si c'est une pensée interne
     is_final: bool = False
     tokens_so_far: int = 0
+    
+    # Consommation totale, renseignée sur le chunk final
+    usage: TokenUsage | None = None
+
+
+def _limited_generate(func):
+    """Enveloppe `generate` avec le limiter du provider."""
+    @functools.wraps(func)
+    async def wrapper(self, messages, system_prompt=None):
+        estimated = self._estimate_request_tokens(messages, system_prompt)
+        async with self._get_limiter().slot(estimated) as permit:
+            response = await func(self, messages, system_prompt)
+            permit.record_tokens(response.total_tokens)
+            return response
+    
+    wrapper._limited = True
+    return wrapper
+
+
+def _limited_generate_stream(func):
+    """Enveloppe `generate_stream` : le slot est tenu pendant tout le flux."""
+    @functools.wraps(func)
+    async def wrapper(self, messages, system_prompt=None):
+        estimated = self._estimate_request_tokens(messages, system_prompt)
+        async with self._get_limiter().slot(estimated) as permit:
+            async for chunk in func(self, messages, system_prompt):
+                if chunk.usage is not None:
+                    permit.record_tokens(chunk.usage.total_tokens)
+                yield chunk
+    
+    wrapper._limited = True
+    return wrapper
 
 
 class BaseLLMProvider(ABC, LoggerMixin):
@@ -80,8 +116,21 @@ class BaseLLMProvider(ABC, LoggerMixin):
     
     Tous les providers LLM doivent implémenter cette interface.
     Supporte le mode synchrone, asynchrone et streaming.
+    
+    Les implémentations de `generate` et `generate_stream` sont
+    automatiquement placées derrière le limiter adaptatif du provider
+    (budgets RPM/TPM, concurrence AIMD, file avec deadline).
     """
     
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        generate = cls.__dict__.get("generate")
+        if generate is not None and not getattr(generate, "_limited", False):
+            cls.generate = _limited_generate(generate)
+        generate_stream = cls.__dict__.get("generate_stream")
+        if generate_stream is not None and not getattr(generate_stream, "_limited", False):
+            cls.generate_stream = _limited_generate_stream(generate_stream)
+    
     def __init__(self, config: LLMConfig) -> None:
         """
         Initialise le provider avec sa configuration.
@@ -210,6 +259,78 @@ Commence maintenant."""
             latency_ms=response.latency_ms,
         )
     
+    def _get_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """Limiter partagé par toutes les instances du provider."""
+        return get_provider_limiter(self.provider_name.value)
+    
+    def _estimate_request_tokens(
+        self,
+        messages: list[dict[str, str]],
+        system_prompt: str | None = None,
+    ) -> int:
+        """
+        Réservation TPM d'un appel : prompt + max_tokens.
+        
+        Comme les providers, on réserve la sortie maximale puis on
+        rembourse la différence avec l'usage réel en fin d'appel.
+        """
+        counter = self._get_token_counter()
+        prompt_tokens = counter.count_messages(messages)
+        if system_prompt:
+            prompt_tokens += counter.count(system_prompt)
+        return prompt_tokens + self.config.max_tokens
+    
+    def _get_token_counter(self) -> TokenCounter:
+        """Compteur de tokens associé au modèle configuré."""
+        return get_token_counter(self.config.model)
+    
+    def _final_stream_chunk(
+        self,
+        prompt_messages: list[dict[str, str]],
+        completion: StreamTokenCounter,
+        reported_input: int | None = None,
+        reported_output: int | None = None,
+    ) -> StreamChunk:
+        """
+        Construit le chunk final d'un flux avec la consommation de tokens.
+        
+        L'usage rapporté par le provider est prioritaire ; à défaut,
+        le prompt est tokenisé localement et la complétion provient
+        du compteur incrémental.
+        
+        Args:
+            prompt_messages: Messages envoyés au modèle.
+            completion: Compteur incrémental de la réponse.
+            reported_input: Tokens d'entrée rapportés par l'API.
+            reported_output: Tokens de sortie rapportés par l'API.
+        """
+        if reported_input is not None and reported_output is not None:
+            usage = TokenUsage(
+                input_tokens=reported_input,
+                output_tokens=reported_output,
+                source="provider",
+            )
+        else:
+            usage = TokenUsage(
+                input_tokens=(
+                    reported_input
+                    if reported_input is not None
+                    else self._get_token_counter().count_messages(prompt_messages)
+                ),
+                output_tokens=(
+                    reported_output
+                    if reported_output is not None
+                    else completion.total
+                ),
+            )
+        
+        return StreamChunk(
+            content="",
+            is_final=True,
+            tokens_so_far=usage.output_tokens,
+            usage=usage,
+        )
+    
     def build_messages(
         self,
         user_query: str,
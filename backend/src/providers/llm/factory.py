@@ -63,6 +63,9 @@ class LLMProviderFactory:
             _PROVIDER_REGISTRY[LLMProvider.GEMINI] = GeminiLLMProvider
         except ImportError:
             logger.debug("Gemini provider not available")
+        
+        from .local_provider import LocalSimulatedProvider
+        _PROVIDER_REGISTRY[LLMProvider.LOCAL] = LocalSimulatedProvider
     
     @property
     def available_providers(self) -> list[LLMProvider]:
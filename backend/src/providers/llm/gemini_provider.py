@@ -248,13 +248,20 @@ class GeminiLLMProvider(BaseLLMProvider):
                 stream=True,
             )
             
-            tokens_count = 0
+            completion = self._get_token_counter().stream()
             in_thought_block = False
+            reported_input: int | None = None
+            reported_output: int | None = None
             
             async for chunk in response:
+                usage_metadata = getattr(chunk, "usage_metadata", None)
+                if usage_metadata and usage_metadata.candidates_token_count:
+                    reported_input = usage_metadata.prompt_token_count
+                    reported_output = usage_metadata.candidates_token_count
+                
                 if chunk.text:
                     chunk_content = chunk.text
-                    tokens_count += len(chunk_content) // 4
+                    tokens_count = completion.add(chunk_content)
                     
                     # Détecter les blocs de pensée
                     if "<thought>" in chunk_content:
@@ -270,11 +277,11 @@ class GeminiLLMProvider(BaseLLMProvider):
                     )
             
             # Chunk final
-            yield StreamChunk(
-                content="",
-                is_thought=False,
-                is_final=True,
-                tokens_so_far=tokens_count,
+            yield self._final_stream_chunk(
+                messages,
+                completion,
+                reported_input,
+                reported_output,
             )
                     
         except Exception as e:
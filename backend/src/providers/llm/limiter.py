@@ -0,0 +1,409 @@
+"""
+Provider Concurrency Limiter
+=============================
+
+Contrôle adaptatif de la charge envoyée à chaque provider (LLM, embeddings).
+
+Chaque provider dispose :
+- d'un budget requêtes/minute et tokens/minute (token buckets)
+- d'une limite de concurrence AIMD : +1 par fenêtre de succès,
+  division sur 429 / timeout
+- d'une file d'attente avec deadline : une requête patiente au lieu
+  d'échouer, jusqu'à expiration de son délai
+
+L'état est protégé par un verrou de thread pour servir à la fois
+le code async (providers LLM) et le code sync exécuté dans des threads
+(client d'embeddings).
+
+Usage:
+    >>> limiter = get_provider_limiter("mistral")
+    >>> async with limiter.slot(estimated_tokens=1200) as permit:
+    ...     response = await call_api()
+    ...     permit.record_tokens(response.total_tokens)
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field, fields
+from typing import AsyncIterator, Iterator
+
+from src.config.logging_config import LoggerMixin
+from src.config.settings import get_settings
+
+
+# Intervalle maximal entre deux tentatives d'acquisition (secondes)
+_POLL_INTERVAL_S = 0.05
+
+
+class ProviderQueueTimeout(TimeoutError):
+    """Levée quand une requête n'a pas obtenu de slot avant sa deadline."""
+
+    def __init__(self, provider: str, waited_s: float) -> None:
+        self.provider = provider
+        self.waited_s = waited_s
+        super().__init__(
+            f"Provider {provider} saturé : pas de slot après {waited_s:.1f}s"
+        )
+
+
+@dataclass
+class ProviderLimits:
+    """
+    Budgets d'un provider.
+
+    Les budgets à 0 sont illimités.
+    """
+
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+    # Concurrence adaptative (AIMD)
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 32
+    decrease_factor: float = 0.5
+    # Une seule réduction par fenêtre : une rafale de 429 simultanés
+    # ne doit pas effondrer la limite jusqu'au minimum
+    decrease_cooldown_s: float = 2.0
+
+    # Attente maximale dans la file
+    queue_timeout_s: float = 30.0
+
+
+class _TokenBucket:
+    """Token bucket simple, non thread-safe (protégé par le limiter)."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.refill_per_s = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_s)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Secondes à attendre avant de pouvoir consommer `amount`."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_s
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass
+class Permit:
+    """Autorisation d'appel délivrée par le limiter."""
+
+    limiter: "AdaptiveConcurrencyLimiter"
+    estimated_tokens: int
+    queued_ms: int = 0
+    actual_tokens: int | None = field(default=None)
+
+    def record_tokens(self, tokens: int) -> None:
+        """Enregistre la consommation réelle (ajuste le budget TPM)."""
+        self.actual_tokens = tokens
+
+
+class AdaptiveConcurrencyLimiter(LoggerMixin):
+    """
+    Limiteur adaptatif pour un provider.
+
+    Attributes:
+        name: Nom du provider (clé de configuration).
+        limits: Budgets appliqués.
+    """
+
+    def __init__(self, name: str, limits: ProviderLimits | None = None) -> None:
+        self.name = name
+        self.limits = limits or ProviderLimits()
+
+        self._lock = threading.Lock()
+        self._limit = float(self.limits.initial_concurrency)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+
+        self._rpm = (
+            _TokenBucket(self.limits.requests_per_minute)
+            if self.limits.requests_per_minute > 0 else None
+        )
+        self._tpm = (
+            _TokenBucket(self.limits.tokens_per_minute)
+            if self.limits.tokens_per_minute > 0 else None
+        )
+
+    # ===== État =====
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Limite de concurrence courante."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Nombre d'appels en cours."""
+        return self._in_flight
+
+    def stats(self) -> dict[str, float]:
+        """Instantané de l'état du limiter (monitoring)."""
+        with self._lock:
+            return {
+                "concurrency_limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "rpm_available": self._rpm.tokens if self._rpm else -1,
+                "tpm_available": self._tpm.tokens if self._tpm else -1,
+            }
+
+    # ===== Acquisition =====
+
+    def _try_acquire(self, estimated_tokens: int) -> float:
+        """
+        Tente de réserver un slot et les budgets.
+
+        Returns:
+            0 si acquis, sinon le délai suggéré avant nouvel essai.
+        """
+        with self._lock:
+            if self._in_flight >= int(self._limit):
+                return _POLL_INTERVAL_S
+
+            now = time.monotonic()
+            wait = 0.0
+            if self._rpm:
+                wait = max(wait, self._rpm.wait_time(1, now))
+            if self._tpm and estimated_tokens > 0:
+                wait = max(wait, self._tpm.wait_time(estimated_tokens, now))
+            if wait > 0:
+                return wait
+
+            if self._rpm:
+                self._rpm.consume(1)
+            if self._tpm and estimated_tokens > 0:
+                self._tpm.consume(estimated_tokens)
+            self._in_flight += 1
+            return 0.0
+
+    def _deadline(self, timeout: float | None) -> float:
+        return time.monotonic() + (
+            timeout if timeout is not None else self.limits.queue_timeout_s
+        )
+
+    def _timeout(self, started: float) -> ProviderQueueTimeout:
+        waited = time.monotonic() - started
+        self.logger.warning(
+            "Provider queue timeout",
+            provider=self.name,
+            waited_s=round(waited, 2),
+            concurrency_limit=int(self._limit),
+        )
+        return ProviderQueueTimeout(self.name, waited)
+
+    async def acquire(
+        self,
+        estimated_tokens: int = 0,
+        timeout: float | None = None,
+    ) -> Permit:
+        """
+        Attend un slot (async) jusqu'à la deadline.
+
+        Raises:
+            ProviderQueueTimeout: Si la deadline est dépassée.
+        """
+        started = time.monotonic()
+        deadline = self._deadline(timeout)
+
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait == 0.0:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._timeout(started)
+            await asyncio.sleep(min(wait, _POLL_INTERVAL_S, remaining))
+
+        return Permit(
+            limiter=self,
+            estimated_tokens=estimated_tokens,
+            queued_ms=int((time.monotonic() - started) * 1000),
+        )
+
+    def acquire_sync(
+        self,
+        estimated_tokens: int = 0,
+        timeout: float | None = None,
+    ) -> Permit:
+        """Variante bloquante de `acquire` (code exécuté dans un thread)."""
+        started = time.monotonic()
+        deadline = self._deadline(timeout)
+
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait == 0.0:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._timeout(started)
+            time.sleep(min(wait, _POLL_INTERVAL_S, remaining))
+
+        return Permit(
+            limiter=self,
+            estimated_tokens=estimated_tokens,
+            queued_ms=int((time.monotonic() - started) * 1000),
+        )
+
+    def release(self, permit: Permit, error: BaseException | None = None) -> None:
+        """
+        Libère un slot et ajuste la limite (AIMD).
+
+        Args:
+            permit: Permis obtenu via acquire.
+            error: Exception levée par l'appel, le cas échéant.
+        """
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+            # Rembourser la réservation TPM non consommée
+            if self._tpm and permit.actual_tokens is not None:
+                unused = permit.estimated_tokens - permit.actual_tokens
+                if unused > 0:
+                    self._tpm.refund(unused)
+                elif unused < 0:
+                    self._tpm.consume(-unused)
+
+            if error is None:
+                # Additive increase : ~+1 par fenêtre complète de succès
+                self._limit = min(
+                    float(self.limits.max_concurrency),
+                    self._limit + 1.0 / max(self._limit, 1.0),
+                )
+                return
+
+            if not is_overload_error(error):
+                return
+
+            now = time.monotonic()
+            if now - self._last_decrease < self.limits.decrease_cooldown_s:
+                return
+            self._last_decrease = now
+            previous = self._limit
+            self._limit = max(
+                float(self.limits.min_concurrency),
+                self._limit * self.limits.decrease_factor,
+            )
+
+        self.logger.warning(
+            "Provider overloaded, reducing concurrency",
+            provider=self.name,
+            previous_limit=int(previous),
+            new_limit=int(self._limit),
+            error=type(error).__name__,
+        )
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        estimated_tokens: int = 0,
+        timeout: float | None = None,
+    ) -> AsyncIterator[Permit]:
+        """Context manager async : acquire + release avec classification d'erreur."""
+        permit = await self.acquire(estimated_tokens, timeout)
+        try:
+            yield permit
+        except BaseException as e:
+            self.release(permit, e)
+            raise
+        else:
+            self.release(permit)
+
+    @contextmanager
+    def slot_sync(
+        self,
+        estimated_tokens: int = 0,
+        timeout: float | None = None,
+    ) -> Iterator[Permit]:
+        """Context manager bloquant (code sync)."""
+        permit = self.acquire_sync(estimated_tokens, timeout)
+        try:
+            yield permit
+        except BaseException as e:
+            self.release(permit, e)
+            raise
+        else:
+            self.release(permit)
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    Indique si une erreur signale une surcharge du provider.
+
+    429 / 503, timeouts et messages de rate limit déclenchent
+    la réduction de concurrence ; les autres erreurs non.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if status in (429, 503):
+        return True
+
+    if "timeout" in type(error).__name__.lower():
+        return True
+
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message
+
+
+# ===== Registre des limiters =====
+
+_limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits_from_settings(name: str) -> ProviderLimits:
+    """Construit les budgets d'un provider depuis les settings."""
+    settings = get_settings()
+    limits = ProviderLimits(
+        max_concurrency=settings.provider_max_concurrency,
+        queue_timeout_s=settings.provider_queue_timeout,
+    )
+    limits.initial_concurrency = min(
+        limits.initial_concurrency, limits.max_concurrency
+    )
+
+    overrides = settings.provider_limits.get(name, {})
+    known = {f.name for f in fields(ProviderLimits)}
+    for key, value in overrides.items():
+        if key in known:
+            setattr(limits, key, type(getattr(limits, key))(value))
+
+    return limits
+
+
+def get_provider_limiter(name: str) -> AdaptiveConcurrencyLimiter:
+    """
+    Retourne le limiter partagé d'un provider.
+
+    Args:
+        name: Nom du provider ("mistral", "openai", "mistral-embed"...).
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = AdaptiveConcurrencyLimiter(name, _limits_from_settings(name))
+                _limiters[name] = limiter
+    return limiter
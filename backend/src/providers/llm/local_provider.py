@@ -0,0 +1,257 @@
+"""
+Local Simulated Provider
+=========================
+
+Provider LLM et client d'embeddings simulés, sans appel réseau.
+
+Destinés aux tests de charge : latence réaliste (time-to-first-token,
+débit en tokens/seconde), taux d'erreur configurable et sorties
+déterministes (même prompt → même réponse, même texte → même vecteur).
+
+Activation :
+    DEFAULT_LLM_PROVIDER=local
+    EMBEDDING_BACKEND=local
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+from src.config.settings import get_settings
+from .base_llm import (
+    BaseLLMProvider,
+    LLMConfig,
+    LLMProvider,
+    LLMResponse,
+    StreamChunk,
+)
+
+
+# Vocabulaire de la réponse simulée
+_VOCABULARY = (
+    "le la les un une des projet données réponse contexte document "
+    "analyse modèle recherche utilisateur système résultat question "
+    "performance latence API service requête source information "
+    "est sont a peut permet utilise dans pour avec sur selon afin "
+    "rapide simple fiable précis important principal récent"
+).split()
+
+
+class LocalProviderError(Exception):
+    """Erreur simulée (429) pour tester la résilience."""
+    
+    status_code = 429
+
+
+class LocalSimulatedProvider(BaseLLMProvider):
+    """
+    Provider LLM local simulé.
+    
+    Paramètres (settings) :
+    - local_llm_ttft_ms : délai avant le premier token
+    - local_llm_tokens_per_second : débit de génération
+    - local_llm_response_tokens : longueur des réponses
+    - local_llm_error_rate : probabilité d'erreur 429 par appel
+    """
+    
+    MODELS = ["local-simulated"]
+    
+    def __init__(self, config: LLMConfig | None = None) -> None:
+        """
+        Initialise le provider simulé.
+        
+        Args:
+            config: Configuration optionnelle.
+        """
+        settings = get_settings()
+        
+        default_config = LLMConfig(
+            model="local-simulated",
+            temperature=settings.llm_temperature,
+            max_tokens=settings.llm_max_tokens,
+        )
+        
+        super().__init__(config or default_config)
+        
+        self._ttft_s = settings.local_llm_ttft_ms / 1000
+        self._tokens_per_second = settings.local_llm_tokens_per_second
+        self._response_tokens = settings.local_llm_response_tokens
+        self._error_rate = settings.local_llm_error_rate
+        self._rng = random.Random(settings.local_llm_seed)
+    
+    @property
+    def provider_name(self) -> LLMProvider:
+        return LLMProvider.LOCAL
+    
+    @property
+    def available_models(self) -> list[str]:
+        return self.MODELS
+    
+    def _validate_config(self) -> None:
+        """Accepte n'importe quel nom de modèle (simulation)."""
+        pass
+    
+    def _final_messages(
+        self,
+        messages: list[dict[str, str]],
+        system_prompt: str | None,
+    ) -> list[dict[str, str]]:
+        final_messages = []
+        if system_prompt:
+            final_messages.append({"role": "system", "content": system_prompt})
+        final_messages.extend(messages)
+        return final_messages
+    
+    def _maybe_fail(self) -> None:
+        """Lève une erreur simulée selon le taux configuré."""
+        if self._error_rate > 0 and self._rng.random() < self._error_rate:
+            raise LocalProviderError("Simulated 429: rate limit exceeded")
+    
+    def _response_words(self, messages: list[dict[str, str]]) -> list[str]:
+        """
+        Réponse déterministe dérivée du prompt.
+        
+        Un prompt de classification (routeur) reçoit un JSON valide
+        pour que l'orchestrateur suive son chemin normal.
+        """
+        prompt = messages[-1]["content"] if messages else ""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        
+        if "JSON" in prompt:
+            decision = {
+                "intent": "documents" if digest[0] % 2 else "general",
+                "use_rag": bool(digest[0] % 2),
+                "use_web": False,
+                "use_reflection": False,
+                "confidence": 0.9,
+                "reasoning": "local simulation",
+            }
+            return [json.dumps(decision)]
+        
+        length = min(self._response_tokens, self.config.max_tokens)
+        seeded = random.Random(digest)
+        words = [seeded.choice(_VOCABULARY) for _ in range(length)]
+        if words:
+            words[0] = words[0].capitalize()
+            words[-1] += "."
+        return words
+    
+    async def generate(
+        self,
+        messages: list[dict[str, str]],
+        system_prompt: str | None = None,
+    ) -> LLMResponse:
+        """
+        Simule une génération complète (TTFT + durée de génération).
+        
+        Args:
+            messages: Liste des messages.
+            system_prompt: Prompt système optionnel.
+        
+        Returns:
+            LLMResponse simulée.
+        """
+        start_time = time.time()
+        final_messages = self._final_messages(messages, system_prompt)
+        
+        await asyncio.sleep(self._ttft_s)
+        self._maybe_fail()
+        
+        words = self._response_words(final_messages)
+        await asyncio.sleep(len(words) / self._tokens_per_second)
+        
+        return LLMResponse(
+            content=" ".join(words),
+            tokens_input=self._get_token_counter().count_messages(final_messages),
+            tokens_output=len(words),
+            model_used=self.config.model,
+            latency_ms=int((time.time() - start_time) * 1000),
+        )
+    
+    async def generate_stream(
+        self,
+        messages: list[dict[str, str]],
+        system_prompt: str | None = None,
+    ) -> AsyncIterator[StreamChunk]:
+        """
+        Simule une génération en streaming, un mot par token.
+        
+        Args:
+            messages: Liste des messages.
+            system_prompt: Prompt système optionnel.
+        
+        Yields:
+            StreamChunk progressifs, puis le chunk final avec l'usage.
+        """
+        final_messages = self._final_messages(messages, system_prompt)
+        
+        await asyncio.sleep(self._ttft_s)
+        self._maybe_fail()
+        
+        words = self._response_words(final_messages)
+        completion = self._get_token_counter().stream()
+        interval = 1 / self._tokens_per_second
+        
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(interval)
+            content = word if index == 0 else f" {word}"
+            completion.add(content)
+            yield StreamChunk(content=content, tokens_so_far=index + 1)
+        
+        yield self._final_stream_chunk(
+            final_messages,
+            completion,
+            reported_input=self._get_token_counter().count_messages(final_messages),
+            reported_output=len(words),
+        )
+
+
+class LocalEmbeddingClient:
+    """
+    Client d'embeddings local, compatible avec `Mistral.embeddings`.
+    
+    Vecteurs déterministes par hachage des mots (feature hashing) :
+    deux textes partageant du vocabulaire ont une similarité cosinus
+    positive, ce qui donne des résultats de recherche plausibles.
+    """
+    
+    def __init__(self, dimension: int, latency_ms: int = 0) -> None:
+        """
+        Args:
+            dimension: Dimension des vecteurs produits.
+            latency_ms: Latence simulée par appel.
+        """
+        self.dimension = dimension
+        self._latency_s = latency_ms / 1000
+        # Même interface que le client Mistral : client.embeddings.create(...)
+        self.embeddings = self
+    
+    def embed(self, text: str) -> list[float]:
+        """Vecteur normalisé déterministe pour un texte."""
+        vector = [0.0] * self.dimension
+        tokens = text.lower().split() or [text]
+        
+        for token in tokens:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[index] += sign
+        
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+    
+    def create(self, model: str, inputs: list[str]) -> SimpleNamespace:
+        """Imite `Mistral.embeddings.create` (latence + vecteurs)."""
+        if self._latency_s:
+            time.sleep(self._latency_s)
+        
+        return SimpleNamespace(
+            model=model,
+            data=[SimpleNamespace(embedding=self.embed(text)) for text in inputs],
+        )
@@ -157,13 +157,20 @@ class MistralLLMProvider(BaseLLMProvider):
                 top_p=self.config.top_p,
             )
             
-            tokens_count = 0
+            completion = self._get_token_counter().stream()
             in_thought_block = False
+            reported_input: int | None = None
+            reported_output: int | None = None
             
             for event in stream:
+                # L'usage réel est envoyé avec le dernier événement
+                if event.data.usage:
+                    reported_input = event.data.usage.prompt_tokens
+                    reported_output = event.data.usage.completion_tokens
+                
                 if event.data.choices and event.data.choices[0].delta.content:
                     chunk_content = event.data.choices[0].delta.content
-                    tokens_count += 1  # Approximation
+                    tokens_count = completion.add(chunk_content)
                     
                     # Détecter les blocs de pensée
                     if "<thought>" in chunk_content:
@@ -171,16 +178,18 @@ class MistralLLMProvider(BaseLLMProvider):
                     if "</thought>" in chunk_content:
                         in_thought_block = False
                     
-                    is_final = (
-                        event.data.choices[0].finish_reason is not None
-                    )
-                    
                     yield StreamChunk(
                         content=chunk_content,
                         is_thought=in_thought_block,
-                        is_final=is_final,
                         tokens_so_far=tokens_count,
                     )
+            
+            yield self._final_stream_chunk(
+                final_messages,
+                completion,
+                reported_input,
+                reported_output,
+            )
                     
         except Exception as e:
             self.logger.error("Mistral streaming failed", error=str(e))
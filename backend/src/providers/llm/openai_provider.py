@@ -186,15 +186,23 @@ class OpenAILLMProvider(BaseLLMProvider):
                 max_tokens=self.config.max_tokens,
                 top_p=self.config.top_p,
                 stream=True,
+                # Demande l'usage réel dans un dernier événement sans choices
+                stream_options={"include_usage": True},
             )
             
-            tokens_count = 0
+            completion = self._get_token_counter().stream()
             in_thought_block = False
+            reported_input: int | None = None
+            reported_output: int | None = None
             
             async for event in stream:
+                if getattr(event, "usage", None):
+                    reported_input = event.usage.prompt_tokens
+                    reported_output = event.usage.completion_tokens
+                
                 if event.choices and event.choices[0].delta.content:
                     chunk_content = event.choices[0].delta.content
-                    tokens_count += 1
+                    tokens_count = completion.add(chunk_content)
                     
                     # Détecter les blocs de pensée
                     if "<thought>" in chunk_content:
@@ -202,14 +210,18 @@ class OpenAILLMProvider(BaseLLMProvider):
                     if "</thought>" in chunk_content:
                         in_thought_block = False
                     
-                    is_final = event.choices[0].finish_reason is not None
-                    
                     yield StreamChunk(
                         content=chunk_content,
                         is_thought=in_thought_block,
-                        is_final=is_final,
                         tokens_so_far=tokens_count,
                     )
+            
+            yield self._final_stream_chunk(
+                final_messages,
+                completion,
+                reported_input,
+                reported_output,
+            )
                     
         except Exception as e:
             self.logger.error("OpenAI streaming failed", error=str(e))
@@ -0,0 +1,217 @@
+"""
+Token Counting
+===============
+
+Comptage des tokens pour les providers LLM.
+
+Utilise tiktoken quand l'encodage est disponible, sinon un estimateur
+par modèle (ratio caractères/token). Le compteur de flux est incrémental :
+seul le texte depuis la dernière frontière de mot est re-tokenisé.
+
+Les usages rapportés par les providers restent prioritaires ;
+ce module sert de repli quand le flux n'en fournit pas.
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from src.config.logging_config import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# Ratio moyen caractères/token par famille de modèles (texte FR/EN mixte)
+CHARS_PER_TOKEN: dict[str, float] = {
+    "mistral": 3.5,
+    "mixtral": 3.5,
+    "gpt": 4.0,
+    "o1": 4.0,
+    "gemini": 4.0,
+    "deepseek": 3.8,
+    "claude": 3.5,
+}
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Surcoût de formatage des messages chat (convention OpenAI)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@dataclass
+class TokenUsage:
+    """Consommation de tokens d'une génération."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # "provider" si rapporté par l'API, "estimated" sinon
+    source: str = "estimated"
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+@lru_cache(maxsize=8)
+def _load_encoding(model: str) -> Any | None:
+    """
+    Charge l'encodage tiktoken d'un modèle (mis en cache, y compris l'échec).
+
+    Les modèles non OpenAI utilisent cl100k_base, plus proche de leur
+    tokenizer qu'un simple ratio de caractères.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encodage non téléchargeable (réseau coupé, cache absent)
+        logger.warning(
+            "tiktoken encoding unavailable, using estimator",
+            model=model,
+            error=str(e),
+        )
+        return None
+
+
+def _chars_per_token(model: str) -> float:
+    """Ratio caractères/token pour un modèle."""
+    lowered = model.lower()
+    for prefix, ratio in CHARS_PER_TOKEN.items():
+        if lowered.startswith(prefix) or f"-{prefix}" in lowered:
+            return ratio
+    return DEFAULT_CHARS_PER_TOKEN
+
+
+class TokenCounter:
+    """
+    Compteur de tokens pour un modèle donné.
+
+    Example:
+        >>> counter = TokenCounter("mistral-large-latest")
+        >>> tokens = counter.count("Bonjour tout le monde")
+        >>> stream = counter.stream()
+        >>> stream.add("Bonjour ")
+    """
+
+    def __init__(self, model: str, use_tiktoken: bool = True) -> None:
+        """
+        Initialise le compteur.
+
+        Args:
+            model: Nom du modèle.
+            use_tiktoken: Désactiver pour forcer l'estimateur.
+        """
+        self.model = model
+        self._encoding = _load_encoding(model) if use_tiktoken else None
+        self._chars_per_token = _chars_per_token(model)
+
+    @property
+    def is_exact(self) -> bool:
+        """True si un vrai tokenizer est utilisé."""
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        """Compte les tokens d'un texte."""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / self._chars_per_token)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Tronque un texte à `max_tokens` tokens au plus.
+
+        Args:
+            text: Texte à tronquer.
+            max_tokens: Nombre maximum de tokens conservés.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self._encoding.decode(tokens[:max_tokens])
+        return text[:int(max_tokens * self._chars_per_token)]
+
+    def count_messages(self, messages: list[dict[str, str]]) -> int:
+        """
+        Compte les tokens d'un prompt chat (contenu + surcoût par message).
+
+        Args:
+            messages: Messages au format {"role", "content"}.
+        """
+        total = TOKENS_PER_REPLY
+        for message in messages:
+            total += TOKENS_PER_MESSAGE
+            total += self.count(message.get("content") or "")
+        return total
+
+    def stream(self) -> "StreamTokenCounter":
+        """Crée un compteur incrémental pour une complétion en flux."""
+        return StreamTokenCounter(self)
+
+
+class StreamTokenCounter:
+    """
+    Compteur incrémental de tokens pour une réponse en streaming.
+
+    Les fragments sont tokenisés jusqu'au dernier espace : la fin
+    (mot potentiellement incomplet) est gardée en attente jusqu'au
+    fragment suivant. Chaque caractère n'est ainsi tokenisé qu'une fois,
+    sans re-tokeniser tout le texte accumulé.
+    """
+
+    def __init__(self, counter: TokenCounter) -> None:
+        self._counter = counter
+        self._pending = ""
+        self._counted = 0
+        self._chars = 0
+
+    def add(self, text: str) -> int:
+        """
+        Ajoute un fragment et retourne le total courant (estimé).
+
+        Args:
+            text: Fragment de réponse.
+        """
+        if not text:
+            return self.total
+
+        self._chars += len(text)
+
+        if not self._counter.is_exact:
+            return self.total
+
+        self._pending += text
+        # Les pré-tokens tiktoken portent l'espace en tête : on coupe
+        # juste avant le dernier blanc pour ne pas scinder un token.
+        cut = max(self._pending.rfind(" "), self._pending.rfind("\n"))
+        if cut > 0:
+            self._counted += self._counter.count(self._pending[:cut])
+            self._pending = self._pending[cut:]
+
+        return self.total
+
+    @property
+    def total(self) -> int:
+        """Nombre de tokens comptés jusqu'ici (fragment en attente inclus)."""
+        if not self._counter.is_exact:
+            return math.ceil(self._chars / self._counter._chars_per_token)
+        return self._counted + self._counter.count(self._pending)
+
+
+@lru_cache(maxsize=32)
+def get_token_counter(model: str) -> TokenCounter:
+    """Retourne un compteur de tokens mis en cache pour un modèle."""
+    return TokenCounter(model)
@@ -4,10 +4,24 @@ from src.repositories.base import BaseRepository
 from src.repositories.document_repository import DocumentRepository
 from src.repositories.conversation_repository import ConversationRepository
 from src.repositories.api_key_repository import ApiKeyRepository
+from src.repositories.async_base import AsyncRepository
+from src.repositories.async_repositories import (
+    AsyncApiKeyRepository,
+    AsyncConversationRepository,
+    AsyncDocumentRepository,
+    AsyncSubscriptionRepository,
+    AsyncUserRepository,
+)
 
 __all__ = [
     "BaseRepository",
     "DocumentRepository",
     "ConversationRepository",
     "ApiKeyRepository",
+    "AsyncRepository",
+    "AsyncDocumentRepository",
+    "AsyncConversationRepository",
+    "AsyncApiKeyRepository",
+    "AsyncUserRepository",
+    "AsyncSubscriptionRepository",
 ]
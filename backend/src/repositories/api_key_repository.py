@@ -95,7 +95,7 @@ class ApiKeyRepository(BaseRepository[ApiKeyInfo]):
         full_key = f"{self.KEY_PREFIX}{random_part}"
         
         # Calculer le hash et le préfixe
-        key_hash = self._hash_key(full_key)
+        key_hash = self.hash_key(full_key)
         key_prefix = full_key[:12]  # rag_ + 8 chars
         
         # Calculer la date d'expiration
@@ -148,6 +148,7 @@ class ApiKeyRepository(BaseRepository[ApiKeyInfo]):
         try:
             self.table.delete().eq("id", id).execute()
             self.logger.info("API key deleted", id=id)
+            self._invalidate_cached_validation(id)
             return True
         except Exception as e:
             self.logger.error("Error deleting API key", error=str(e))
@@ -168,6 +169,7 @@ class ApiKeyRepository(BaseRepository[ApiKeyInfo]):
         try:
             self.table.update({"is_active": False}).eq("id", id).execute()
             self.logger.info("API key revoked", id=id)
+            self._invalidate_cached_validation(id)
             return True
         except Exception as e:
             self.logger.error("Error revoking API key", error=str(e))
@@ -196,33 +198,48 @@ class ApiKeyRepository(BaseRepository[ApiKeyInfo]):
             >>> if validation and validation.is_valid:
             ...     print(f"Scopes: {validation.scopes}")
         """
-        key_hash = self._hash_key(key)
-        
         try:
-            response = self.client.rpc(
-                "validate_api_key",
-                {
-                    "p_key_hash": key_hash,
-                    "p_client_ip": client_ip,
-                }
-            ).execute()
-            
-            if response.data:
-                data = response.data[0]
-                return ApiKeyValidation(
-                    id=data["id"] or UUID("00000000-0000-0000-0000-000000000000"),
-                    name=data["name"] or "",
-                    scopes=data["scopes"] or [],
-                    rate_limit_per_minute=data["rate_limit_per_minute"] or 0,
-                    is_valid=data["is_valid"],
-                    rejection_reason=data["rejection_reason"],
-                )
-            return None
-            
+            return self.validate_hash(self.hash_key(key), client_ip)
         except Exception as e:
             self.logger.error("Error validating API key", error=str(e))
             return None
     
+    def validate_hash(
+        self,
+        key_hash: str,
+        client_ip: str | None = None,
+        count_usage: bool = True,
+    ) -> ApiKeyValidation | None:
+        """
+        Valide une clé API à partir de son hash.
+        
+        Contrairement à `validate`, les erreurs Supabase sont propagées :
+        le cache de validation ne doit pas mémoriser un rejet dû
+        à une panne.
+        
+        Args:
+            key_hash: Hash SHA-256 de la clé.
+            client_ip: Adresse IP du client pour logging.
+            count_usage: Compter la requête dans usage_records
+                (False quand le compteur Redis fait foi).
+            
+        Returns:
+            ApiKeyValidation, ou None si la clé est inconnue.
+        """
+        params: dict[str, Any] = {
+            "p_key_hash": key_hash,
+            "p_client_ip": client_ip,
+        }
+        if not count_usage:
+            params["p_count_usage"] = False
+        
+        response = self.client.rpc("validate_api_key", params).execute()
+        
+        if not response.data:
+            return None
+        
+        return self._validation_from_row(response.data[0])
+    
     def list_keys(
         self,
         user_id: str | None = None,
@@ -342,8 +359,80 @@ class ApiKeyRepository(BaseRepository[ApiKeyInfo]):
             self.logger.error("Error logging API usage", error=str(e))
             return False
     
+    def log_usage_batch(self, rows: list[dict[str, Any]]) -> bool:
+        """
+        Enregistre un lot d'utilisations en un seul insert multi-lignes.
+        
+        Args:
+            rows: Lignes `api_key_usage_logs` (api_key_id, endpoint, method,
+                status_code, response_time_ms, client_ip, user_agent).
+            
+        Returns:
+            True si le lot a été inséré.
+        """
+        if not rows:
+            return True
+        
+        try:
+            self.client.table("api_key_usage_logs").insert(rows).execute()
+            return True
+        except Exception as e:
+            self.logger.error(
+                "Error logging API usage batch",
+                batch_size=len(rows),
+                error=str(e),
+            )
+            return False
+    
+    def record_usage_batch(self, usages: list[dict[str, Any]]) -> bool:
+        """
+        Écrit par lots l'usage des clés servies par le cache de validation.
+        
+        Args:
+            usages: Usages agrégés par clé (key_id, user_id, requests,
+                last_used_at, last_used_ip).
+            
+        Returns:
+            True si le lot a été écrit.
+        """
+        if not usages:
+            return True
+        
+        try:
+            self.client.rpc(
+                "record_api_key_usage_batch",
+                {"p_usage": usages},
+            ).execute()
+            return True
+        except Exception as e:
+            self.logger.error(
+                "Error writing API key usage batch",
+                batch_size=len(usages),
+                error=str(e),
+            )
+            return False
+    
+    @staticmethod
+    def _invalidate_cached_validation(key_id: str) -> None:
+        """Retire la clé du cache de validation (toutes instances)."""
+        # Import local : le cache dépend de ce repository
+        from src.services.api_key_cache import get_api_key_cache
+        get_api_key_cache().invalidate_soon(key_id)
+    
+    @staticmethod
+    def _validation_from_row(data: dict) -> ApiKeyValidation:
+        """Convertit une ligne de `validate_api_key`."""
+        return ApiKeyValidation(
+            id=data["id"] or UUID("00000000-0000-0000-0000-000000000000"),
+            user_id=data.get("user_id"),
+            scopes=data["scopes"] or [],
+            rate_limit=data["rate_limit_per_minute"] or 0,
+            is_valid=data["is_valid"],
+            rejection_reason=data["rejection_reason"],
+        )
+    
     @staticmethod
-    def _hash_key(key: str) -> str:
+    def hash_key(key: str) -> str:
         """Calcule le hash SHA-256 d'une clé."""
         return hashlib.sha256(key.encode()).hexdigest()
     
@@ -0,0 +1,98 @@
+"""
+Async Base Repository
+======================
+
+Classe de base des repositories asynchrones.
+
+Chaque repository asynchrone expose la même interface que son
+équivalent synchrone (`DocumentRepository`, `ApiKeyRepository`...),
+avec des méthodes `async` :
+- les méthodes réécrites en SQL passent par le pool asyncpg
+  (`connection()`), sans bloquer la boucle asyncio ni passer par PostgREST
+- sans pool (pas de `DATABASE_URL`, asyncpg absent, pool saturé ou
+  indisponible), elles se replient sur le repository Supabase synchrone,
+  exécuté dans un thread
+- toute autre méthode publique du repository synchrone reste appelable
+  (`await repo.methode(...)`), également exécutée dans un thread
+"""
+
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Generic, TypeVar
+
+from src.config.database import get_db_pool
+from src.config.logging_config import LoggerMixin
+from src.config.settings import get_settings
+from src.repositories.base import BaseRepository
+
+R = TypeVar("R", bound=BaseRepository)
+
+
+class AsyncRepository(LoggerMixin, Generic[R]):
+    """
+    Repository asynchrone : Postgres direct, repli sur le client Supabase.
+    
+    Attributes:
+        sync_class: Repository synchrone utilisé en repli.
+    """
+    
+    sync_class: type[R]
+    
+    def __init__(self, sync_repo: R | None = None) -> None:
+        """
+        Initialise le repository.
+        
+        Args:
+            sync_repo: Repository synchrone de repli (créé à la demande).
+        """
+        self._sync = sync_repo
+    
+    @property
+    def sync(self) -> R:
+        """Repository Supabase synchrone (repli)."""
+        if self._sync is None:
+            self._sync = self.sync_class()
+        return self._sync
+    
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        """
+        Connexion du pool, ou None si le repli Supabase doit être utilisé.
+        
+        Seule l'acquisition se replie (erreur, ou pool saturé au-delà de
+        `db_pool_acquire_timeout`) : une erreur pendant la requête est
+        propagée (une écriture peut avoir été appliquée).
+        """
+        pool = await get_db_pool()
+        conn = None
+        if pool is not None:
+            try:
+                conn = await pool.acquire(timeout=get_settings().db_pool_acquire_timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning("Postgres pool exhausted, using Supabase client")
+            except Exception as e:
+                self.logger.warning("Postgres pool unavailable, using Supabase client", error=str(e))
+        try:
+            yield conn
+        finally:
+            if conn is not None:
+                await pool.release(conn)
+    
+    async def fallback(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Exécute une méthode du repository synchrone dans un thread."""
+        return await asyncio.to_thread(getattr(self.sync, method), *args, **kwargs)
+    
+    def __getattr__(self, name: str) -> Any:
+        # Méthodes non réécrites en SQL : repository synchrone dans un thread
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = inspect.getattr_static(self.sync_class, name)
+        if isinstance(attr, staticmethod) or not callable(attr):
+            return getattr(self.sync, name)
+        
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self.fallback(name, *args, **kwargs)
+        
+        call.__name__ = name
+        return call
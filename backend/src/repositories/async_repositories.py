@@ -0,0 +1,697 @@
+"""
+Async Repositories
+===================
+
+Repositories asynchrones des chemins chauds, en SQL direct sur le pool
+asyncpg (`src.config.database`).
+
+- `AsyncDocumentRepository` : recherche vectorielle (`match_documents`,
+  ou en deux temps `match_document_ids` puis `get_contents`, statements
+  préparés), lecture des documents
+- `AsyncConversationRepository` : journalisation des conversations
+  (unitaire ou par lots)
+- `AsyncApiKeyRepository` : validation (`validate_api_key`, statement
+  préparé), listing, écritures d'usage par lots
+- `AsyncUserRepository` : identité de session en une seule requête
+- `AsyncSubscriptionRepository` : usage du mois, réconciliation
+
+Les méthodes non réécrites (création de documents, révocation de clés,
+abonnements...) et l'absence de pool passent par le repository Supabase
+synchrone, exécuté dans un thread (voir `AsyncRepository`).
+
+Example:
+    >>> repo = AsyncDocumentRepository()
+    >>> matches = await repo.search_similar(embedding, threshold=0.7, limit=5)
+"""
+
+import json
+from typing import Any
+
+from src.config.database import fetch_prepared
+from src.models.api_key import ApiKeyInfo, ApiKeyValidation
+from src.models.conversation import Conversation, ConversationCreate
+from src.models.document import (
+    Document,
+    DocumentFilter,
+    DocumentHit,
+    DocumentMatch,
+    SearchEffort,
+    SourceType,
+)
+from src.models.subscription import PlanInfo, SubscriptionWithPlan, UsageStats
+from src.models.user import UserInfo, UserWithSubscription
+from src.repositories.api_key_repository import ApiKeyRepository
+from src.repositories.async_base import AsyncRepository
+from src.repositories.conversation_repository import ConversationRepository
+from src.repositories.document_repository import DocumentRepository
+from src.repositories.subscription_repository import SubscriptionRepository
+from src.repositories.user_repository import UserRepository
+
+
+# ===== Requêtes chaudes (préparées par connexion) =====
+
+MATCH_DOCUMENTS_SQL = "SELECT * FROM match_documents($1::text::vector, $2, $3, $4, $5, $6::jsonb, $7, $8::text::halfvec, $9)"
+
+MATCH_DOCUMENT_IDS_SQL = "SELECT * FROM match_document_ids($1::text::vector, $2, $3, $4, $5, $6::jsonb, $7, $8::text::halfvec, $9)"
+
+DOCUMENT_CONTENTS_SQL = "SELECT id, content FROM documents WHERE id = ANY($1::uuid[])"
+
+DOCUMENT_EMBEDDINGS_SQL = "SELECT id, embedding::text AS embedding FROM documents WHERE id = ANY($1::uuid[])"
+
+VALIDATE_API_KEY_SQL = "SELECT * FROM validate_api_key($1, $2, $3)"
+
+# Colonnes `documents` : l'embedding est lu au format texte pgvector
+DOCUMENT_COLUMNS = (
+    "id, content, embedding::text AS embedding, metadata, source_type, "
+    "source_id, content_hash, created_at, updated_at, user_id"
+)
+
+
+def _vector_literal(embedding: list[float]) -> str:
+    """Vecteur au format texte pgvector (`[0.1,0.2,...]`)."""
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def _document(row: Any) -> Document:
+    """Convertit une ligne `documents` (embedding texte) en Document."""
+    data = dict(row)
+    if data.get("embedding") is not None:
+        data["embedding"] = json.loads(data["embedding"])
+    return Document(**data)
+
+
+class AsyncDocumentRepository(AsyncRepository[DocumentRepository]):
+    """Documents vectorisés (lecture et recherche)."""
+    
+    sync_class = DocumentRepository
+    
+    async def get_by_id(self, id: str) -> Document | None:
+        """Récupère un document par son ID."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_by_id", id)
+            try:
+                row = await conn.fetchrow(
+                    f"SELECT {DOCUMENT_COLUMNS} FROM documents WHERE id = $1",
+                    id,
+                )
+                return _document(row) if row else None
+            except Exception as e:
+                self.logger.error("Error fetching document", id=id, error=str(e))
+                return None
+    
+    async def search_similar(
+        self,
+        query_embedding: list[float],
+        threshold: float = 0.7,
+        limit: int = 10,
+        source_type: SourceType | None = None,
+        user_id: str | None = None,
+        filters: DocumentFilter | None = None,
+        search_effort: SearchEffort | None = None,
+    ) -> list[DocumentMatch]:
+        """
+        Recherche par similarité cosinus (`match_documents`, préparée).
+        
+        Args:
+            query_embedding: Vecteur de la requête.
+            threshold: Seuil de similarité minimum.
+            limit: Nombre maximum de résultats.
+            source_type: Filtrer par type de source.
+            user_id: Filtrer par utilisateur (multi-tenant).
+            filters: Filtre sur les métadonnées (évalué en SQL).
+            search_effort: Compromis rappel / latence (hnsw.ef_search).
+        
+        Returns:
+            Liste des documents correspondants avec score.
+        """
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback(
+                    "search_similar",
+                    query_embedding,
+                    threshold=threshold,
+                    limit=limit,
+                    source_type=source_type,
+                    user_id=user_id,
+                    filters=filters,
+                    search_effort=search_effort,
+                )
+            query_compact, rescore_count = DocumentRepository.compact_query(query_embedding, limit)
+            try:
+                rows = await fetch_prepared(
+                    conn,
+                    MATCH_DOCUMENTS_SQL,
+                    _vector_literal(query_embedding),
+                    float(threshold),
+                    limit,
+                    source_type.value if source_type else None,
+                    user_id or None,
+                    filters.to_params() if filters else None,
+                    DocumentRepository.ef_search(search_effort, rescore_count or limit),
+                    _vector_literal(query_compact) if query_compact else None,
+                    rescore_count,
+                )
+                return [DocumentMatch(**dict(row)) for row in rows]
+            except Exception as e:
+                self.logger.error("Search error", error=str(e))
+                return []
+    
+    async def search_ids(
+        self,
+        query_embedding: list[float],
+        threshold: float = 0.7,
+        limit: int = 10,
+        source_type: SourceType | None = None,
+        user_id: str | None = None,
+        filters: DocumentFilter | None = None,
+        search_effort: SearchEffort | None = None,
+    ) -> list[DocumentHit]:
+        """
+        Recherche par similarité sans le contenu (`match_document_ids`, préparée).
+        
+        Returns:
+            Identifiants, scores, métadonnées et vecteurs compacts.
+        """
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback(
+                    "search_ids",
+                    query_embedding,
+                    threshold=threshold,
+                    limit=limit,
+                    source_type=source_type,
+                    user_id=user_id,
+                    filters=filters,
+                    search_effort=search_effort,
+                )
+            query_compact, rescore_count = DocumentRepository.compact_query(query_embedding, limit)
+            try:
+                rows = await fetch_prepared(
+                    conn,
+                    MATCH_DOCUMENT_IDS_SQL,
+                    _vector_literal(query_embedding),
+                    float(threshold),
+                    limit,
+                    source_type.value if source_type else None,
+                    user_id or None,
+                    filters.to_params() if filters else None,
+                    DocumentRepository.ef_search(search_effort, rescore_count or limit),
+                    _vector_literal(query_compact) if query_compact else None,
+                    rescore_count,
+                )
+                return [DocumentHit(**dict(row)) for row in rows]
+            except Exception as e:
+                self.logger.error("Search error", error=str(e))
+                return []
+    
+    async def get_contents(self, ids: list[str]) -> dict[str, str]:
+        """Lit le contenu de plusieurs documents en une requête (préparée)."""
+        if not ids:
+            return {}
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_contents", ids)
+            rows = await fetch_prepared(conn, DOCUMENT_CONTENTS_SQL, ids)
+            return {str(row["id"]): row["content"] for row in rows}
+    
+    async def get_embeddings(self, ids: list[str]) -> dict[str, list[float]]:
+        """Lit l'embedding de plusieurs documents en une requête (préparée)."""
+        if not ids:
+            return {}
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_embeddings", ids)
+            rows = await fetch_prepared(conn, DOCUMENT_EMBEDDINGS_SQL, ids)
+            return {str(row["id"]): json.loads(row["embedding"]) for row in rows}
+    
+    async def get_by_source(
+        self,
+        source_type: SourceType,
+        source_id: str | None = None,
+    ) -> list[Document]:
+        """Récupère les documents par source."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_by_source", source_type, source_id)
+            rows = await conn.fetch(
+                f"SELECT {DOCUMENT_COLUMNS} FROM documents"
+                " WHERE source_type = $1 AND ($2::text IS NULL OR source_id = $2)",
+                source_type.value,
+                source_id,
+            )
+            return [_document(row) for row in rows]
+    
+    async def exists_by_hash(self, content: str) -> bool:
+        """Vérifie si un document existe déjà."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("exists_by_hash", content)
+            return await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM documents WHERE content_hash = $1)",
+                DocumentRepository._compute_hash(content),
+            )
+    
+    async def delete(self, id: str) -> bool:
+        """Supprime un document."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("delete", id)
+            try:
+                await conn.execute("DELETE FROM documents WHERE id = $1", id)
+                self.logger.info("Document deleted", id=id)
+                self.sync_class._invalidate_body(id)
+                return True
+            except Exception as e:
+                self.logger.error("Error deleting document", id=id, error=str(e))
+                return False
+
+
+class AsyncConversationRepository(AsyncRepository[ConversationRepository]):
+    """Conversations et feedback."""
+    
+    sync_class = ConversationRepository
+    
+    async def log_conversation(self, conv: ConversationCreate) -> Conversation:
+        """
+        Enregistre une nouvelle conversation.
+        
+        Args:
+            conv: Données de la conversation.
+        
+        Returns:
+            Conversation créée.
+        """
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("log_conversation", conv)
+            data = ConversationRepository._conversation_row(conv)
+            columns = ", ".join(data)
+            placeholders = ", ".join(f"${i}" for i in range(1, len(data) + 1))
+            row = await conn.fetchrow(
+                f"INSERT INTO conversations ({columns}) VALUES ({placeholders}) RETURNING *",
+                *data.values(),
+            )
+            self.logger.info("Conversation logged", id=str(row["id"]))
+            return Conversation(**dict(row))
+    
+    async def log_conversations_batch(self, rows: list[dict[str, Any]]) -> bool:
+        """
+        Enregistre un lot de conversations en un seul insert.
+        
+        Args:
+            rows: Lignes construites par `ConversationRepository.log_row`.
+        
+        Returns:
+            True si le lot a été écrit.
+        """
+        if not rows:
+            return True
+        
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("log_conversations_batch", rows)
+            columns = ", ".join(rows[0])
+            try:
+                await conn.execute(
+                    f"INSERT INTO conversations ({columns})"
+                    f" SELECT {columns}"
+                    " FROM jsonb_populate_recordset(NULL::conversations, $1::jsonb)"
+                    " ON CONFLICT (id) DO NOTHING",
+                    rows,
+                )
+                return True
+            except Exception as e:
+                self.logger.error(
+                    "Error logging conversation batch",
+                    batch_size=len(rows),
+                    error=str(e),
+                )
+                return False
+    
+    async def get_by_session(self, session_id: str) -> list[Conversation]:
+        """Récupère toutes les conversations d'une session."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_by_session", session_id)
+            rows = await conn.fetch(
+                "SELECT * FROM conversations WHERE session_id = $1 ORDER BY created_at",
+                session_id,
+            )
+            return [Conversation(**dict(row)) for row in rows]
+    
+    async def add_feedback(
+        self,
+        conversation_id: Any,
+        score: int,
+        comment: str | None = None,
+    ) -> bool:
+        """Ajoute un feedback à une conversation (False si elle n'existe pas)."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("add_feedback", conversation_id, score, comment)
+            try:
+                status = await conn.execute(
+                    "UPDATE conversations SET feedback_score = $2, feedback_comment = $3"
+                    " WHERE id = $1",
+                    str(conversation_id),
+                    score,
+                    comment,
+                )
+                # Statut asyncpg : "UPDATE <lignes>"
+                return status != "UPDATE 0"
+            except Exception as e:
+                self.logger.error("Error adding feedback", error=str(e))
+                return False
+
+
+class AsyncApiKeyRepository(AsyncRepository[ApiKeyRepository]):
+    """Clés API (validation, listing, usage)."""
+    
+    sync_class = ApiKeyRepository
+    
+    async def get_by_id(self, id: str) -> ApiKeyInfo | None:
+        """Récupère une clé API par son ID."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_by_id", id)
+            try:
+                row = await conn.fetchrow("SELECT * FROM api_keys WHERE id = $1", id)
+                if row:
+                    return ApiKeyInfo(**ApiKeyRepository._format_key_data(dict(row)))
+                return None
+            except Exception as e:
+                self.logger.error("Error fetching API key", id=id, error=str(e))
+                return None
+    
+    async def validate(
+        self,
+        key: str,
+        client_ip: str | None = None,
+    ) -> ApiKeyValidation | None:
+        """Valide une clé API (None si invalide ou en cas d'erreur)."""
+        try:
+            return await self.validate_hash(ApiKeyRepository.hash_key(key), client_ip)
+        except Exception as e:
+            self.logger.error("Error validating API key", error=str(e))
+            return None
+    
+    async def validate_hash(
+        self,
+        key_hash: str,
+        client_ip: str | None = None,
+        count_usage: bool = True,
+    ) -> ApiKeyValidation | None:
+        """
+        Valide une clé API à partir de son hash (`validate_api_key`, préparée).
+        
+        Les erreurs sont propagées, comme `ApiKeyRepository.validate_hash`.
+        
+        Args:
+            key_hash: Hash SHA-256 de la clé.
+            client_ip: Adresse IP du client pour logging.
+            count_usage: Compter la requête dans usage_records.
+        
+        Returns:
+            ApiKeyValidation, ou None si la clé est inconnue.
+        """
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback(
+                    "validate_hash",
+                    key_hash,
+                    client_ip,
+                    count_usage=count_usage,
+                )
+            rows = await fetch_prepared(
+                conn,
+                VALIDATE_API_KEY_SQL,
+                key_hash,
+                client_ip,
+                count_usage,
+            )
+            if not rows:
+                return None
+            return ApiKeyRepository._validation_from_row(dict(rows[0]))
+    
+    async def list_keys(
+        self,
+        user_id: str | None = None,
+        page: int = 1,
+        per_page: int = 20,
+        include_inactive: bool = False,
+    ) -> tuple[list[ApiKeyInfo], int]:
+        """Liste les clés API avec pagination. Retourne (clés, total)."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback(
+                    "list_keys",
+                    user_id=user_id,
+                    page=page,
+                    per_page=per_page,
+                    include_inactive=include_inactive,
+                )
+            conditions = ["TRUE"]
+            args: list[Any] = []
+            if user_id:
+                args.append(user_id)
+                conditions.append(f"user_id = ${len(args)}")
+            if not include_inactive:
+                conditions.append("is_active")
+            args += [per_page, (page - 1) * per_page]
+            
+            rows = await conn.fetch(
+                "SELECT *, count(*) OVER () AS total_count FROM api_keys"
+                f" WHERE {' AND '.join(conditions)}"
+                f" ORDER BY created_at DESC LIMIT ${len(args) - 1} OFFSET ${len(args)}",
+                *args,
+            )
+            keys = [ApiKeyInfo(**ApiKeyRepository._format_key_data(dict(r))) for r in rows]
+            total = rows[0]["total_count"] if rows else 0
+            return keys, total
+    
+    async def log_usage_batch(self, rows: list[dict[str, Any]]) -> bool:
+        """
+        Enregistre un lot d'utilisations en un seul insert (`unnest`).
+        
+        Args:
+            rows: Lignes `api_key_usage_logs`.
+        
+        Returns:
+            True si le lot a été inséré.
+        """
+        if not rows:
+            return True
+        
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("log_usage_batch", rows)
+            try:
+                await conn.execute(
+                    "INSERT INTO api_key_usage_logs"
+                    " (api_key_id, endpoint, method, status_code, response_time_ms,"
+                    " client_ip, user_agent)"
+                    " SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[],"
+                    " $4::int[], $5::int[], $6::text[], $7::text[])",
+                    [str(r["api_key_id"]) for r in rows],
+                    [r["endpoint"] for r in rows],
+                    [r["method"] for r in rows],
+                    [r["status_code"] for r in rows],
+                    [r["response_time_ms"] for r in rows],
+                    [r.get("client_ip") for r in rows],
+                    [r.get("user_agent") for r in rows],
+                )
+                return True
+            except Exception as e:
+                self.logger.error(
+                    "Error logging API usage batch",
+                    batch_size=len(rows),
+                    error=str(e),
+                )
+                return False
+    
+    async def record_usage_batch(self, usages: list[dict[str, Any]]) -> bool:
+        """
+        Écrit par lots l'usage des clés servies par le cache de validation.
+        
+        Args:
+            usages: Usages agrégés par clé.
+        
+        Returns:
+            True si le lot a été écrit.
+        """
+        if not usages:
+            return True
+        
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("record_usage_batch", usages)
+            try:
+                await conn.execute("SELECT record_api_key_usage_batch($1::jsonb)", usages)
+                return True
+            except Exception as e:
+                self.logger.error(
+                    "Error writing API key usage batch",
+                    batch_size=len(usages),
+                    error=str(e),
+                )
+                return False
+
+
+class AsyncUserRepository(AsyncRepository[UserRepository]):
+    """Utilisateurs et identité de session."""
+    
+    sync_class = UserRepository
+    
+    async def get_by_id(self, id: str) -> UserInfo | None:
+        """Récupère un utilisateur par son ID."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_by_id", id)
+            try:
+                row = await conn.fetchrow("SELECT * FROM users WHERE id = $1", id)
+                return UserInfo(**dict(row)) if row else None
+            except Exception as e:
+                self.logger.error("Error fetching user", id=id, error=str(e))
+                return None
+    
+    async def get_by_email(self, email: str) -> UserInfo | None:
+        """Récupère un utilisateur par email."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_by_email", email)
+            row = await conn.fetchrow("SELECT * FROM users WHERE email = $1", email.lower())
+            if row is None:
+                self.logger.debug("User not found by email", email=email)
+                return None
+            return UserInfo(**dict(row))
+    
+    async def get_user_with_subscription(self, user_id: str) -> UserWithSubscription | None:
+        """
+        Récupère un utilisateur avec son abonnement actif et l'usage du mois.
+        
+        Une seule requête (utilisateur, abonnement + plan, `get_user_usage`)
+        au lieu de trois appels PostgREST.
+        
+        Args:
+            user_id: UUID de l'utilisateur.
+        
+        Returns:
+            UserWithSubscription ou None si non trouvé.
+        """
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_user_with_subscription", user_id)
+            try:
+                row = await conn.fetchrow(
+                    """
+                    SELECT u.*,
+                           to_jsonb(s) AS _subscription,
+                           to_jsonb(p) AS _plan,
+                           to_jsonb(us) AS _usage
+                    FROM users u
+                    LEFT JOIN LATERAL (
+                        SELECT * FROM subscriptions
+                        WHERE user_id = u.id AND status = 'active'
+                        ORDER BY created_at DESC
+                        LIMIT 1
+                    ) s ON TRUE
+                    LEFT JOIN plans p ON p.id = s.plan_id
+                    LEFT JOIN LATERAL get_user_usage(u.id) us ON TRUE
+                    WHERE u.id = $1
+                    """,
+                    user_id,
+                )
+                if row is None:
+                    return None
+                
+                data = dict(row)
+                sub_data = data.pop("_subscription") or {}
+                plan_data = data.pop("_plan") or {}
+                usage_data = {
+                    k: v for k, v in (data.pop("_usage") or {}).items()
+                    if v is not None
+                }
+                return UserRepository._compose_with_subscription(
+                    UserInfo(**data), sub_data, plan_data, usage_data,
+                )
+            except Exception as e:
+                self.logger.error("Error getting user with subscription", error=str(e))
+                return None
+
+
+class AsyncSubscriptionRepository(AsyncRepository[SubscriptionRepository]):
+    """Abonnements et usage."""
+    
+    sync_class = SubscriptionRepository
+    
+    async def get_user_subscription(self, user_id: str) -> SubscriptionWithPlan | None:
+        """Récupère l'abonnement actif d'un utilisateur."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_user_subscription", user_id)
+            try:
+                rows = await conn.fetch(
+                    "SELECT to_jsonb(s) AS subscription, to_jsonb(p) AS plan"
+                    " FROM subscriptions s LEFT JOIN plans p ON p.id = s.plan_id"
+                    " WHERE s.user_id = $1 AND s.status = 'active'",
+                    user_id,
+                )
+                # Comme `.single()` : aucun ou plusieurs abonnements actifs
+                if len(rows) != 1:
+                    self.logger.debug("No active subscription found", user_id=user_id)
+                    return None
+                plan_data = rows[0]["plan"]
+                return SubscriptionWithPlan(
+                    **rows[0]["subscription"],
+                    plan=PlanInfo(**plan_data) if plan_data else None,
+                )
+            except Exception:
+                self.logger.debug("No active subscription found", user_id=user_id)
+                return None
+    
+    async def get_user_usage(self, user_id: str) -> UsageStats | None:
+        """Récupère l'usage du mois en cours pour un utilisateur."""
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("get_user_usage", user_id)
+            try:
+                row = await conn.fetchrow("SELECT * FROM get_user_usage($1)", user_id)
+                if row is None:
+                    return None
+                return SubscriptionRepository._usage_stats(dict(row))
+            except Exception as e:
+                self.logger.error("Error getting user usage", error=str(e))
+                return None
+    
+    async def apply_usage_deltas(
+        self,
+        batch_id: str,
+        deltas: list[dict[str, Any]],
+    ) -> bool:
+        """
+        Applique un lot de deltas d'usage (réconciliation, idempotent).
+        
+        Returns:
+            True si le lot est appliqué (maintenant ou précédemment).
+        """
+        async with self.connection() as conn:
+            if conn is None:
+                return await self.fallback("apply_usage_deltas", batch_id, deltas)
+            try:
+                applied = await conn.fetchval(
+                    "SELECT apply_usage_deltas($1, $2::jsonb)",
+                    batch_id,
+                    deltas,
+                )
+                if not applied:
+                    self.logger.info("Usage batch already applied", batch_id=batch_id)
+                return True
+            except Exception as e:
+                self.logger.error(
+                    "Error applying usage deltas",
+                    batch_id=batch_id,
+                    entries=len(deltas),
+                    error=str(e),
+                )
+                return False
@@ -5,6 +5,7 @@ Conversation Repository
 Repository pour la gestion des conversations et du feedback loop.
 """
 
+from datetime import datetime, timezone
 from typing import Any
 from uuid import UUID
 
@@ -57,10 +58,56 @@ class ConversationRepository(BaseRepository[Conversation]):
         
         Args:
             conv: Données de la conversation.
-            
+        
         Returns:
             Conversation créée.
         """
+        return self.create(self._conversation_row(conv))
+    
+    def log_conversations_batch(self, rows: list[dict[str, Any]]) -> bool:
+        """
+        Enregistre un lot de conversations (écriture différée).
+        
+        Les IDs étant générés côté client, un lot rejoué après un échec
+        ambigu n'insère pas de doublons.
+        
+        Args:
+            rows: Lignes construites par `log_row`.
+        
+        Returns:
+            True si le lot a été écrit.
+        """
+        if not rows:
+            return True
+        
+        try:
+            self.table.upsert(rows, on_conflict="id", ignore_duplicates=True).execute()
+            return True
+        except Exception as e:
+            self.logger.error(
+                "Error logging conversation batch",
+                batch_size=len(rows),
+                error=str(e),
+            )
+            return False
+    
+    @staticmethod
+    def log_row(conv: ConversationCreate, conversation_id: UUID) -> dict[str, Any]:
+        """
+        Ligne complète d'une conversation journalisée en différé.
+        
+        L'ID et la date sont fixés à la requête : l'ID est renvoyé au
+        client avant l'écriture.
+        """
+        return {
+            "id": str(conversation_id),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **ConversationRepository._conversation_row(conv),
+        }
+    
+    @staticmethod
+    def _conversation_row(conv: ConversationCreate) -> dict[str, Any]:
+        """Ligne `conversations` à insérer (partagée avec le repository asynchrone)."""
         # Extraire les données de réflexion et routage depuis metadata
         metadata_dict = conv.metadata.model_dump(mode="json")
         thought_process = None
@@ -78,7 +125,7 @@ class ConversationRepository(BaseRepository[Conversation]):
         if conv.metadata.llm_provider:
             llm_provider = conv.metadata.llm_provider
         
-        data = {
+        return {
             "session_id": conv.session_id,
             "user_query": conv.user_query,
             "ai_response": conv.ai_response,
@@ -92,7 +139,6 @@ class ConversationRepository(BaseRepository[Conversation]):
             "reflection_enabled": reflection_enabled,
             "llm_provider": llm_provider,
         }
-        return self.create(data)
     
     def add_feedback(
         self,
@@ -100,13 +146,13 @@ class ConversationRepository(BaseRepository[Conversation]):
         score: int,
         comment: str | None = None,
     ) -> bool:
-        """Ajoute un feedback à une conversation."""
+        """Ajoute un feedback à une conversation (False si elle n'existe pas)."""
         try:
-            self.table.update({
+            response = self.table.update({
                 "feedback_score": score,
                 "feedback_comment": comment,
             }).eq("id", str(conversation_id)).execute()
-            return True
+            return bool(response.data)
         except Exception as e:
             self.logger.error("Error adding feedback", error=str(e))
             return False
@@ -6,13 +6,27 @@ Repository pour la gestion des documents vectorisés dans Supabase.
 """
 
 import hashlib
+import json
 from typing import Any
 from uuid import UUID
 
-from src.models.document import Document, DocumentCreate, DocumentMatch, SourceType
+from src.config.settings import get_settings
+from src.models.document import (
+    Document,
+    DocumentCreate,
+    DocumentFilter,
+    DocumentHit,
+    DocumentMatch,
+    SearchEffort,
+    SourceType,
+)
 from src.repositories.base import BaseRepository
 
 
+# Maximum de hnsw.ef_search accepté par pgvector
+MAX_EF_SEARCH = 1000
+
+
 class DocumentRepository(BaseRepository[Document]):
     """
     Repository pour les opérations CRUD sur les documents.
@@ -57,6 +71,13 @@ class DocumentRepository(BaseRepository[Document]):
         if "content" in data and "content_hash" not in data:
             data["content_hash"] = self._compute_hash(data["content"])
         
+        # Mode compact : double écriture de l'embedding réduit (migration 015)
+        from src.services.compact_embeddings import get_compact_projection
+        
+        projection = get_compact_projection()
+        if projection is not None and data.get("embedding") and "embedding_compact" not in data:
+            data["embedding_compact"] = projection.project(data["embedding"])
+        
         response = self.table.insert(data).execute()
         self.logger.info("Document created", id=response.data[0]["id"])
         return Document(**response.data[0])
@@ -74,6 +95,7 @@ class DocumentRepository(BaseRepository[Document]):
         try:
             self.table.delete().eq("id", id).execute()
             self.logger.info("Document deleted", id=id)
+            self._invalidate_body(id)
             return True
         except Exception as e:
             self.logger.error("Error deleting document", id=id, error=str(e))
@@ -117,6 +139,8 @@ class DocumentRepository(BaseRepository[Document]):
         limit: int = 10,
         source_type: SourceType | None = None,
         user_id: str | None = None,
+        filters: DocumentFilter | None = None,
+        search_effort: SearchEffort | None = None,
     ) -> list[DocumentMatch]:
         """
         Recherche par similarité cosinus.
@@ -127,6 +151,10 @@ class DocumentRepository(BaseRepository[Document]):
             limit: Nombre maximum de résultats.
             source_type: Filtrer par type de source.
             user_id: Filtrer par utilisateur (multi-tenant).
+            filters: Filtre sur les métadonnées, évalué en SQL pendant
+                le parcours de l'index (tags, langue, dates...).
+            search_effort: Compromis rappel / latence (hnsw.ef_search),
+                None : réglage du serveur.
             
         Returns:
             Liste des documents correspondants avec score.
@@ -143,6 +171,17 @@ class DocumentRepository(BaseRepository[Document]):
             if user_id:
                 params["filter_user_id"] = user_id
             
+            if filters:
+                params["filters"] = filters.to_params()
+            
+            query_compact, rescore_count = self.compact_query(query_embedding, limit)
+            if query_compact:
+                params["query_compact"] = query_compact
+                params["rescore_count"] = rescore_count
+            
+            if search_effort:
+                params["search_ef"] = self.ef_search(search_effort, rescore_count or limit)
+            
             response = self.client.rpc("match_documents", params).execute()
             
             return [DocumentMatch(**doc) for doc in response.data]
@@ -150,6 +189,147 @@ class DocumentRepository(BaseRepository[Document]):
             self.logger.error("Search error", error=str(e))
             return []
     
+    def search_ids(
+        self,
+        query_embedding: list[float],
+        threshold: float = 0.7,
+        limit: int = 10,
+        source_type: SourceType | None = None,
+        user_id: str | None = None,
+        filters: DocumentFilter | None = None,
+        search_effort: SearchEffort | None = None,
+    ) -> list[DocumentHit]:
+        """
+        Recherche par similarité, sans le contenu (phase 1).
+        
+        Mêmes filtres que `search_similar` ; le contenu des résultats
+        retenus est lu ensuite avec `get_contents`.
+        
+        Returns:
+            Identifiants, scores, métadonnées et vecteurs compacts.
+        """
+        try:
+            params = {
+                "query_embedding": query_embedding,
+                "match_threshold": threshold,
+                "match_count": limit,
+            }
+            if source_type:
+                params["filter_source_type"] = source_type.value
+            
+            if user_id:
+                params["filter_user_id"] = user_id
+            
+            if filters:
+                params["filters"] = filters.to_params()
+            
+            query_compact, rescore_count = self.compact_query(query_embedding, limit)
+            if query_compact:
+                params["query_compact"] = query_compact
+                params["rescore_count"] = rescore_count
+            
+            if search_effort:
+                params["search_ef"] = self.ef_search(search_effort, rescore_count or limit)
+            
+            response = self.client.rpc("match_document_ids", params).execute()
+            
+            return [DocumentHit(**doc) for doc in response.data]
+        except Exception as e:
+            self.logger.error("Search error", error=str(e))
+            return []
+    
+    @staticmethod
+    def ef_search(effort: SearchEffort | None, limit: int) -> int | None:
+        """
+        Valeur de `hnsw.ef_search` d'un niveau d'effort.
+        
+        Jamais inférieure à `limit` : l'index ne renvoie pas plus de
+        résultats que sa liste de candidats.
+        
+        Args:
+            effort: Niveau d'effort (None : réglage du serveur).
+            limit: Nombre de résultats demandés.
+        
+        Returns:
+            ef_search, ou None si l'effort n'est pas configuré.
+        """
+        if effort is None:
+            return None
+        ef = get_settings().search_effort_ef_search.get(effort.value)
+        if ef is None:
+            return None
+        return min(max(ef, limit), MAX_EF_SEARCH)
+    
+    @staticmethod
+    def compact_query(
+        query_embedding: list[float],
+        limit: int,
+    ) -> tuple[list[float] | None, int | None]:
+        """
+        Requête du premier passage compact (`compact_search_enabled`).
+        
+        Args:
+            query_embedding: Vecteur de la requête.
+            limit: Nombre de résultats demandés.
+        
+        Returns:
+            Vecteur compact et nombre de candidats re-scorés en pleine
+            précision, ou (None, None) : recherche sur l'index complet.
+        """
+        from src.services.compact_embeddings import get_compact_projection
+        
+        settings = get_settings()
+        projection = get_compact_projection()
+        if not settings.compact_search_enabled or projection is None:
+            return None, None
+        return (
+            projection.project(query_embedding),
+            limit * settings.compact_rescore_multiplier,
+        )
+    
+    def get_contents(self, ids: list[str]) -> dict[str, str]:
+        """
+        Lit le contenu de plusieurs documents en une requête (phase 2).
+        
+        Args:
+            ids: UUID des documents.
+        
+        Returns:
+            Dictionnaire id -> contenu (documents supprimés absents).
+        """
+        if not ids:
+            return {}
+        response = self.table.select("id, content").in_("id", ids).execute()
+        return {str(row["id"]): row["content"] for row in response.data}
+    
+    def get_embeddings(self, ids: list[str]) -> dict[str, list[float]]:
+        """
+        Lit l'embedding de plusieurs documents en une requête.
+        
+        Args:
+            ids: UUID des documents.
+        
+        Returns:
+            Dictionnaire id -> embedding (documents supprimés absents).
+        """
+        if not ids:
+            return {}
+        response = self.table.select("id, embedding").in_("id", ids).execute()
+        return {
+            str(row["id"]): (
+                json.loads(row["embedding"]) if isinstance(row["embedding"], str)
+                else row["embedding"]
+            )
+            for row in response.data
+        }
+    
+    @staticmethod
+    def _invalidate_body(id: str) -> None:
+        """Retire un document supprimé des caches de fragments (contenu, embedding)."""
+        from src.services.chunk_cache import get_chunk_body_cache, get_chunk_embedding_cache
+        get_chunk_body_cache().invalidate(id)
+        get_chunk_embedding_cache().invalidate(id)
+    
     def get_by_source(
         self,
         source_type: SourceType,
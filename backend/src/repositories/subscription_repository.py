@@ -18,7 +18,7 @@ Example:
 
 from datetime import datetime, timedelta
 from typing import Any
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from src.models.subscription import (
     PlanInfo,
@@ -208,6 +208,7 @@ class SubscriptionRepository(BaseRepository[SubscriptionInfo]):
         }
         
         subscription = self.create(sub_data)
+        self._invalidate_cached_identity(user_id)
         
         self.logger.info(
             "Subscription created",
@@ -243,7 +244,11 @@ class SubscriptionRepository(BaseRepository[SubscriptionInfo]):
             else:
                 update_data["cancel_at_period_end"] = True
             
-            self.table.update(update_data).eq("id", subscription_id).execute()
+            response = self.table.update(update_data).eq("id", subscription_id).execute()
+            
+            for row in response.data or []:
+                if row.get("user_id"):
+                    self._invalidate_cached_identity(str(row["user_id"]))
             
             self.logger.info(
                 "Subscription canceled",
@@ -295,11 +300,34 @@ class SubscriptionRepository(BaseRepository[SubscriptionInfo]):
                 new_plan=new_plan_slug,
             )
             
+            self._invalidate_cached_identity(user_id)
             return self.get_user_subscription(user_id)
         except Exception as e:
             self.logger.error("Error upgrading subscription", error=str(e))
             return None
     
+    @staticmethod
+    def _usage_stats(data: dict[str, Any]) -> UsageStats:
+        """Convertit une ligne de `get_user_usage` (période courante)."""
+        return UsageStats(
+            period=datetime.utcnow().strftime("%Y-%m"),
+            requests_count=data.get("requests_count", 0),
+            documents_count=data.get("documents_count", 0),
+            api_keys_count=data.get("api_keys_count", 0),
+            requests_limit=data.get("requests_limit", 100),
+            documents_limit=data.get("documents_limit", 10),
+            api_keys_limit=data.get("api_keys_limit", 1),
+            overage_requests=data.get("overage_requests", 0),
+            plan_slug=data.get("plan_slug"),
+        )
+    
+    @staticmethod
+    def _invalidate_cached_identity(user_id: str) -> None:
+        """Retire les sessions de l'utilisateur du cache d'identité (toutes instances)."""
+        # Import local : évite de charger le cache dans les scripts
+        from src.services.session_cache import get_session_cache
+        get_session_cache().invalidate_soon(user_id)
+    
     # ===== Usage Tracking =====
     
     def get_user_usage(self, user_id: str) -> UsageStats | None:
@@ -320,19 +348,7 @@ class SubscriptionRepository(BaseRepository[SubscriptionInfo]):
             if not response.data:
                 return None
             
-            data = response.data[0]
-            current_period = datetime.utcnow().strftime("%Y-%m")
-            
-            return UsageStats(
-                period=current_period,
-                requests_count=data.get("requests_count", 0),
-                documents_count=data.get("documents_count", 0),
-                api_keys_count=data.get("api_keys_count", 0),
-                requests_limit=data.get("requests_limit", 100),
-                documents_limit=data.get("documents_limit", 10),
-                api_keys_limit=data.get("api_keys_limit", 1),
-                overage_requests=data.get("overage_requests", 0),
-            )
+            return self._usage_stats(response.data[0])
         except Exception as e:
             self.logger.error("Error getting user usage", error=str(e))
             return None
@@ -375,6 +391,10 @@ class SubscriptionRepository(BaseRepository[SubscriptionInfo]):
         """
         Incrémente un compteur d'usage.
         
+        L'incrément est appliqué côté base (`usage_records.x += amount`),
+        sans lecture préalable. Sur le chemin des requêtes, préférer
+        le compteur Redis (`UsageMeter`) réconcilié par lots.
+        
         Args:
             user_id: UUID de l'utilisateur.
             usage_type: Type d'usage (requests, documents, api_keys).
@@ -384,23 +404,61 @@ class SubscriptionRepository(BaseRepository[SubscriptionInfo]):
             True si incrémenté avec succès.
         """
         try:
-            if usage_type == "requests":
+            if usage_type == "requests" and amount == 1:
                 self.client.rpc("increment_user_requests", {
                     "p_user_id": user_id,
                 }).execute()
             else:
-                # Pour documents et api_keys, mise à jour directe
-                current_period = datetime.utcnow().strftime("%Y-%m")
-                column = f"{usage_type}_count"
-                
-                # Upsert le record d'usage
-                self.client.table("usage_records").upsert({
+                self._apply_usage_deltas(uuid4().hex, [{
                     "user_id": user_id,
-                    "period": current_period,
-                    column: amount,
-                }, on_conflict="user_id,period").execute()
+                    "period": datetime.utcnow().strftime("%Y-%m"),
+                    "type": usage_type,
+                    "amount": amount,
+                }])
             
             return True
         except Exception as e:
             self.logger.error("Error incrementing usage", error=str(e))
             return False
+    
+    def apply_usage_deltas(
+        self,
+        batch_id: str,
+        deltas: list[dict[str, Any]],
+    ) -> bool:
+        """
+        Applique un lot de deltas d'usage (réconciliation).
+        
+        Idempotent : un `batch_id` déjà appliqué est ignoré par la base.
+        
+        Args:
+            batch_id: Identifiant unique du lot.
+            deltas: Deltas (user_id, period, type, amount).
+            
+        Returns:
+            True si le lot est appliqué (maintenant ou précédemment).
+        """
+        try:
+            applied = self._apply_usage_deltas(batch_id, deltas)
+            if not applied:
+                self.logger.info("Usage batch already applied", batch_id=batch_id)
+            return True
+        except Exception as e:
+            self.logger.error(
+                "Error applying usage deltas",
+                batch_id=batch_id,
+                entries=len(deltas),
+                error=str(e),
+            )
+            return False
+    
+    def _apply_usage_deltas(
+        self,
+        batch_id: str,
+        deltas: list[dict[str, Any]],
+    ) -> bool:
+        response = self.client.rpc("apply_usage_deltas", {
+            "p_batch_id": batch_id,
+            "p_deltas": deltas,
+        }).execute()
+        return bool(response.data)
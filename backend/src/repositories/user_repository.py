@@ -287,6 +287,7 @@ class UserRepository(BaseRepository[UserInfo]):
                 .eq("id", user_id)
                 .execute()
             )
+            self._invalidate_cached_identity(user_id)
             if response.data:
                 return UserInfo(**response.data[0])
             return None
@@ -329,20 +330,37 @@ class UserRepository(BaseRepository[UserInfo]):
             sub_data = sub_response.data if sub_response.data else {}
             plan_data = sub_data.get("plans", {}) if sub_data else {}
             
-            return UserWithSubscription(
-                **user.model_dump(),
-                plan_slug=plan_data.get("slug", "free"),
-                plan_name=plan_data.get("name", "Free"),
-                subscription_status=sub_data.get("status", "active"),
-                billing_period=sub_data.get("billing_period", "monthly"),
-                current_period_end=sub_data.get("current_period_end"),
-                requests_used=usage_data.get("requests_count", 0),
-                requests_limit=usage_data.get("requests_limit", 100),
-                documents_used=usage_data.get("documents_count", 0),
-                documents_limit=usage_data.get("documents_limit", 10),
-                api_keys_used=usage_data.get("api_keys_count", 0),
-                api_keys_limit=usage_data.get("api_keys_limit", 1),
-            )
+            return self._compose_with_subscription(user, sub_data, plan_data, usage_data)
         except Exception as e:
             self.logger.error("Error getting user with subscription", error=str(e))
             return None
+    
+    @staticmethod
+    def _compose_with_subscription(
+        user: UserInfo,
+        sub_data: dict[str, Any],
+        plan_data: dict[str, Any],
+        usage_data: dict[str, Any],
+    ) -> UserWithSubscription:
+        """Compose l'utilisateur, son abonnement actif et l'usage du mois."""
+        return UserWithSubscription(
+            **user.model_dump(),
+            plan_slug=plan_data.get("slug", "free"),
+            plan_name=plan_data.get("name", "Free"),
+            subscription_status=sub_data.get("status", "active"),
+            billing_period=sub_data.get("billing_period", "monthly"),
+            current_period_end=sub_data.get("current_period_end"),
+            requests_used=usage_data.get("requests_count", 0),
+            requests_limit=usage_data.get("requests_limit", 100),
+            documents_used=usage_data.get("documents_count", 0),
+            documents_limit=usage_data.get("documents_limit", 10),
+            api_keys_used=usage_data.get("api_keys_count", 0),
+            api_keys_limit=usage_data.get("api_keys_limit", 1),
+        )
+    
+    @staticmethod
+    def _invalidate_cached_identity(user_id: str) -> None:
+        """Retire les sessions de l'utilisateur du cache d'identité (toutes instances)."""
+        # Import local : évite de charger le cache dans les scripts
+        from src.services.session_cache import get_session_cache
+        get_session_cache().invalidate_soon(user_id)
@@ -11,6 +11,7 @@ from src.services.orchestrator import (
     OrchestratorConfig,
     get_orchestrator,
 )
+from src.services.query_context import QueryContext, QueryDeadlineExceeded
 from src.services.rate_limiter import RateLimiter, get_rate_limiter
 
 __all__ = [
@@ -20,6 +21,8 @@ __all__ = [
     "RAGEngine",
     "RAGConfig",
     "RAGResponse",
+    "QueryContext",
+    "QueryDeadlineExceeded",
     "FeedbackService",
     # Orchestration
     "QueryOrchestrator",
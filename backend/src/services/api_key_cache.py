@@ -0,0 +1,509 @@
+"""
+API Key Validation Cache
+=========================
+
+Cache de validation des clés API, pour éviter un RPC Supabase par requête.
+
+Deux niveaux :
+- mémoire (LRU + TTL), par processus
+- Redis (`apikey:v1:{hash}`), partagé entre instances
+
+Les clés inconnues ou rejetées sont mises en cache négatif avec un TTL
+plus court. Les requêtes concurrentes sur une même clé absente du cache
+ne déclenchent qu'un seul appel Supabase (single-flight).
+
+La révocation (`ApiKeyRepository.revoke` / `delete`) invalide
+immédiatement les entrées : suppression locale, suppression Redis et
+diffusion sur le canal `apikey:invalidate` pour les autres instances.
+
+L'usage (`last_used_at`, compteurs) des requêtes servies par le cache
+est agrégé en mémoire et écrit par lots (`record_api_key_usage_batch`).
+Les quotas mensuels sont donc vérifiés avec au plus un TTL de retard.
+
+Usage:
+    >>> cache = get_api_key_cache()
+    >>> validation = await cache.validate(key, client_ip)
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from src.config.logging_config import LoggerMixin
+from src.config.redis import get_redis_client
+from src.config.settings import get_settings
+from src.models.api_key import ApiKeyValidation
+from src.repositories.api_key_repository import ApiKeyRepository
+from src.repositories.async_repositories import AsyncApiKeyRepository
+from src.services.usage_meter import get_usage_meter
+
+
+# Préfixes Redis
+ENTRY_PREFIX = "apikey:v1:"
+INDEX_PREFIX = "apikey:id:"
+INVALIDATION_CHANNEL = "apikey:invalidate"
+
+# Valeur Redis d'une clé inconnue
+_UNKNOWN = "null"
+
+
+@dataclass
+class _CacheEntry:
+    """Entrée du cache mémoire."""
+    
+    validation: ApiKeyValidation | None
+    expires_at: float
+
+
+@dataclass
+class _PendingUsage:
+    """Usage agrégé d'une clé en attente d'écriture."""
+    
+    user_id: str | None
+    requests: int
+    last_used_at: datetime
+    last_used_ip: str | None
+    
+    def to_payload(self, key_id: str) -> dict[str, Any]:
+        return {
+            "key_id": key_id,
+            "user_id": self.user_id,
+            "requests": self.requests,
+            "last_used_at": self.last_used_at.isoformat(),
+            "last_used_ip": self.last_used_ip,
+        }
+
+
+class ApiKeyValidationCache(LoggerMixin):
+    """
+    Cache de validation des clés API.
+    
+    Attributes:
+        ttl: Durée de vie d'une validation positive (secondes).
+        negative_ttl: Durée de vie d'un rejet (secondes).
+        max_entries: Taille maximale du cache mémoire.
+        flush_interval: Période d'écriture de l'usage (secondes).
+    """
+    
+    def __init__(
+        self,
+        repo: ApiKeyRepository | None = None,
+        ttl: float = 60.0,
+        negative_ttl: float = 10.0,
+        max_entries: int = 10_000,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self._repo = repo
+        self._async_repo: AsyncApiKeyRepository | None = None
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        # key_id -> hashes (une clé peut être connue sous plusieurs hash en théorie)
+        self._hashes_by_id: dict[str, set[str]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._pending: dict[str, _PendingUsage] = {}
+        
+        self._tasks: set[asyncio.Task] = set()
+        self._flusher: asyncio.Task | None = None
+        self._listener: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+    
+    @property
+    def repo(self) -> ApiKeyRepository:
+        if self._repo is None:
+            self._repo = ApiKeyRepository()
+        return self._repo
+    
+    @property
+    def async_repo(self) -> AsyncApiKeyRepository:
+        """Accès asynchrone (Postgres direct, repli sur `repo`)."""
+        if self._async_repo is None:
+            self._async_repo = AsyncApiKeyRepository(self.repo)
+        return self._async_repo
+    
+    # ===== Validation =====
+    
+    async def validate(
+        self,
+        key: str,
+        client_ip: str | None = None,
+    ) -> ApiKeyValidation | None:
+        """
+        Valide une clé API (cache, puis Redis, puis Supabase).
+        
+        Args:
+            key: Clé API complète.
+            client_ip: Adresse IP du client.
+        
+        Returns:
+            ApiKeyValidation, ou None si la clé est inconnue
+            ou si Supabase est indisponible.
+        """
+        key_hash = ApiKeyRepository.hash_key(key)
+        
+        entry = self._get_local(key_hash)
+        if entry is not None:
+            self._record_hit(entry.validation, client_ip)
+            return entry.validation
+        
+        inflight = self._inflight.get(key_hash)
+        if inflight is not None:
+            validation = await asyncio.shield(inflight)
+            self._record_hit(validation, client_ip)
+            return validation
+        
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key_hash] = future
+        validation: ApiKeyValidation | None = None
+        try:
+            validation, from_db = await self._load(key_hash, client_ip)
+        except Exception as e:
+            # Panne Supabase : rien n'est mis en cache
+            self.logger.error("Error validating API key", error=str(e))
+            return None
+        finally:
+            self._inflight.pop(key_hash, None)
+            future.set_result(validation)
+        
+        # Le RPC de validation a déjà compté cette requête
+        if not from_db:
+            self._record_hit(validation, client_ip)
+        return validation
+    
+    async def _load(
+        self,
+        key_hash: str,
+        client_ip: str | None,
+    ) -> tuple[ApiKeyValidation | None, bool]:
+        """
+        Charge une validation depuis Redis ou Supabase.
+        
+        Returns:
+            (validation, lue_depuis_supabase)
+        """
+        redis = await get_redis_client()
+        
+        if redis is not None:
+            try:
+                raw = await redis.get(ENTRY_PREFIX + key_hash)
+            except Exception as e:
+                self.logger.warning("API key cache read failed", error=str(e))
+                raw = None
+            if raw is not None:
+                validation = (
+                    None if raw == _UNKNOWN
+                    else ApiKeyValidation.model_validate_json(raw)
+                )
+                ttl = await self._remaining_ttl(redis, key_hash)
+                self._set_local(key_hash, validation, ttl)
+                return validation, False
+        
+        # Compteur Redis actif : la requête est comptée à l'admission
+        validation = await self.async_repo.validate_hash(
+            key_hash,
+            client_ip,
+            count_usage=not get_usage_meter().enabled,
+        )
+        ttl = self._ttl_for(validation)
+        self._set_local(key_hash, validation, ttl)
+        
+        if redis is not None:
+            await self._store_redis(redis, key_hash, validation, ttl)
+        
+        return validation, True
+    
+    def _ttl_for(self, validation: ApiKeyValidation | None) -> float:
+        if validation is not None and validation.is_valid:
+            return self.ttl
+        return self.negative_ttl
+    
+    async def _remaining_ttl(self, redis: Any, key_hash: str) -> float:
+        """TTL Redis restant, pour ne pas prolonger une entrée partagée."""
+        try:
+            ttl_ms = await redis.pttl(ENTRY_PREFIX + key_hash)
+        except Exception:
+            return self.negative_ttl
+        if ttl_ms is None or ttl_ms <= 0:
+            return self.negative_ttl
+        return ttl_ms / 1000
+    
+    async def _store_redis(
+        self,
+        redis: Any,
+        key_hash: str,
+        validation: ApiKeyValidation | None,
+        ttl: float,
+    ) -> None:
+        payload = _UNKNOWN if validation is None else validation.model_dump_json()
+        ttl_ms = max(int(ttl * 1000), 1)
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.set(ENTRY_PREFIX + key_hash, payload, px=ttl_ms)
+            if validation is not None and validation.id is not None:
+                index_key = INDEX_PREFIX + str(validation.id)
+                pipe.sadd(index_key, key_hash)
+                pipe.pexpire(index_key, max(int(self.ttl * 1000), ttl_ms))
+            await pipe.execute()
+        except Exception as e:
+            self.logger.warning("API key cache write failed", error=str(e))
+    
+    # ===== Cache mémoire =====
+    
+    def _get_local(self, key_hash: str) -> _CacheEntry | None:
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop_hash(key_hash)
+            return None
+        self._entries.move_to_end(key_hash)
+        return entry
+    
+    def _set_local(
+        self,
+        key_hash: str,
+        validation: ApiKeyValidation | None,
+        ttl: float,
+    ) -> None:
+        self._entries[key_hash] = _CacheEntry(
+            validation=validation,
+            expires_at=time.monotonic() + ttl,
+        )
+        self._entries.move_to_end(key_hash)
+        if validation is not None and validation.id is not None:
+            self._hashes_by_id.setdefault(str(validation.id), set()).add(key_hash)
+        
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._drop_hash(oldest)
+    
+    def _drop_hash(self, key_hash: str) -> None:
+        entry = self._entries.pop(key_hash, None)
+        if entry is None or entry.validation is None or entry.validation.id is None:
+            return
+        key_id = str(entry.validation.id)
+        hashes = self._hashes_by_id.get(key_id)
+        if hashes is not None:
+            hashes.discard(key_hash)
+            if not hashes:
+                del self._hashes_by_id[key_id]
+    
+    def _drop_key_id(self, key_id: str) -> int:
+        """Supprime les entrées locales d'une clé. Retourne le nombre d'entrées retirées."""
+        hashes = self._hashes_by_id.pop(key_id, set())
+        for key_hash in hashes:
+            self._entries.pop(key_hash, None)
+        return len(hashes)
+    
+    # ===== Invalidation =====
+    
+    async def invalidate(self, key_id: str) -> None:
+        """
+        Invalide une clé sur toutes les instances.
+        
+        Args:
+            key_id: ID de la clé révoquée ou supprimée.
+        """
+        self._drop_key_id(key_id)
+        
+        redis = await get_redis_client()
+        if redis is None:
+            return
+        
+        try:
+            index_key = INDEX_PREFIX + key_id
+            hashes = await redis.smembers(index_key)
+            pipe = redis.pipeline(transaction=False)
+            for key_hash in hashes:
+                pipe.delete(ENTRY_PREFIX + key_hash)
+            pipe.delete(index_key)
+            pipe.publish(INVALIDATION_CHANNEL, key_id)
+            await pipe.execute()
+            self.logger.info("API key cache invalidated", key_id=key_id)
+        except Exception as e:
+            self.logger.error(
+                "API key cache invalidation failed",
+                key_id=key_id,
+                error=str(e),
+            )
+    
+    def invalidate_soon(self, key_id: str) -> None:
+        """
+        Invalidation depuis du code synchrone.
+        
+        Depuis la boucle de l'API, le cache local est purgé immédiatement
+        et la propagation Redis est planifiée. Depuis un thread, tout est
+        délégué à la boucle de l'API. Hors API (scripts), les instances
+        conservent l'entrée au plus `ttl` secondes.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None and self._loop.is_running():
+                asyncio.run_coroutine_threadsafe(self.invalidate(key_id), self._loop)
+            else:
+                self._drop_key_id(key_id)
+            return
+        
+        self._drop_key_id(key_id)
+        self._spawn(self.invalidate(key_id))
+    
+    async def _listen(self) -> None:
+        """Applique les invalidations publiées par les autres instances."""
+        backoff = 1.0
+        while True:
+            redis = await get_redis_client()
+            if redis is None:
+                return
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                backoff = 1.0
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True,
+                        timeout=1.0,
+                    )
+                    if message and message.get("type") == "message":
+                        self._drop_key_id(str(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(
+                    "API key invalidation listener error",
+                    error=str(e),
+                    retry_in_s=backoff,
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+    
+    # ===== Usage =====
+    
+    def _record_hit(
+        self,
+        validation: ApiKeyValidation | None,
+        client_ip: str | None,
+    ) -> None:
+        """Agrège l'usage d'une requête servie sans passer par Supabase."""
+        if validation is None or not validation.is_valid or validation.id is None:
+            return
+        
+        key_id = str(validation.id)
+        now = datetime.now(timezone.utc)
+        # Avec le compteur Redis, usage_records est alimenté par la réconciliation
+        count_user = validation.user_id is not None and not get_usage_meter().enabled
+        pending = self._pending.get(key_id)
+        if pending is None:
+            self._pending[key_id] = _PendingUsage(
+                user_id=str(validation.user_id) if count_user else None,
+                requests=1,
+                last_used_at=now,
+                last_used_ip=client_ip,
+            )
+        else:
+            pending.requests += 1
+            pending.last_used_at = now
+            pending.last_used_ip = client_ip or pending.last_used_ip
+    
+    async def flush(self) -> int:
+        """
+        Écrit l'usage agrégé dans Supabase.
+        
+        En cas d'échec, l'usage est réintégré pour le prochain flush.
+        
+        Returns:
+            Nombre de clés écrites.
+        """
+        if not self._pending:
+            return 0
+        
+        batch, self._pending = self._pending, {}
+        payload = [usage.to_payload(key_id) for key_id, usage in batch.items()]
+        
+        written = await self.async_repo.record_usage_batch(payload)
+        if written:
+            return len(payload)
+        
+        for key_id, usage in batch.items():
+            current = self._pending.get(key_id)
+            if current is None:
+                self._pending[key_id] = usage
+            else:
+                current.requests += usage.requests
+                if usage.last_used_at > current.last_used_at:
+                    current.last_used_at = usage.last_used_at
+        return 0
+    
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error("API key usage flush failed", error=str(e))
+    
+    # ===== Cycle de vie =====
+    
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def start(self) -> None:
+        """Démarre le flush périodique et l'écoute des invalidations."""
+        self._loop = asyncio.get_running_loop()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if self._listener is None and await get_redis_client() is not None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        """Arrête les tâches de fond et écrit l'usage restant."""
+        for task in (self._flusher, self._listener):
+            if task is not None:
+                task.cancel()
+        for task in (self._flusher, self._listener, *self._tasks):
+            if task is not None:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._flusher = None
+        self._listener = None
+        self._loop = None
+        
+        await self.flush()
+    
+    def clear(self) -> None:
+        """Vide le cache mémoire (tests)."""
+        self._entries.clear()
+        self._hashes_by_id.clear()
+
+
+# ===== Singleton =====
+
+_cache: ApiKeyValidationCache | None = None
+
+
+def get_api_key_cache() -> ApiKeyValidationCache:
+    """Retourne l'instance du cache de validation."""
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = ApiKeyValidationCache(
+            ttl=settings.api_key_cache_ttl,
+            negative_ttl=settings.api_key_negative_cache_ttl,
+            flush_interval=settings.api_key_usage_flush_interval,
+        )
+    return _cache
@@ -34,6 +34,7 @@ from src.models.api_key import (
 )
 from src.repositories.api_key_repository import ApiKeyRepository
 from src.repositories.subscription_repository import SubscriptionRepository
+from src.services.usage_meter import UsageMeter, get_usage_meter
 
 
 logger = get_logger(__name__)
@@ -74,6 +75,7 @@ class ApiKeyService:
         self,
         key_repo: ApiKeyRepository | None = None,
         sub_repo: SubscriptionRepository | None = None,
+        meter: UsageMeter | None = None,
     ) -> None:
         """
         Initialise le service.
@@ -81,9 +83,11 @@ class ApiKeyService:
         Args:
             key_repo: Repository API Keys (injection dépendance).
             sub_repo: Repository Subscriptions (injection dépendance).
+            meter: Compteurs d'usage (injection dépendance).
         """
         self._key_repo = key_repo or ApiKeyRepository()
         self._sub_repo = sub_repo or SubscriptionRepository()
+        self._meter = meter or get_usage_meter()
     
     async def create_user_key(
         self,
@@ -102,6 +106,7 @@ class ApiKeyService:
         1. Vérifie que l'utilisateur n'a pas atteint sa limite de clés
         2. Filtre les scopes interdits (admin)
         3. Génère la clé via le repository
+        4. Compte la clé dans `usage_records` (api_keys_count)
         
         Args:
             user_id: UUID de l'utilisateur propriétaire.
@@ -168,7 +173,10 @@ class ApiKeyService:
             scopes=safe_scopes,
         )
         
-        # 4. Construire la réponse
+        # 4. Compter la clé (limite vérifiée par check_user_limits)
+        await self._meter.increment(user_id, "api_keys")
+        
+        # 5. Construire la réponse
         key_info = ApiKeyInfo(
             id=result["id"],
             name=result["name"],
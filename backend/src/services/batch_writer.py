@@ -0,0 +1,438 @@
+"""
+Async Batch Writer
+===================
+
+Écriture différée et groupée d'événements (logs d'usage des clés API,
+journal des conversations).
+
+Le chemin critique d'une requête se limite à un `append` en mémoire.
+Une tâche de fond écrit les événements par lots (insert multi-lignes) :
+- dès que `max_batch` événements sont en attente
+- ou au plus tard toutes les `flush_interval` secondes
+
+Sous pression (base lente ou indisponible), le buffer est borné à
+`max_pending` événements. Au-delà, les événements sont déversés dans un
+fichier JSONL local (`spill_dir`) puis réinjectés quand l'écriture
+repart, ou abandonnés (et comptés) si aucun répertoire n'est configuré.
+
+Un lot refusé `max_attempts` fois de suite est réécrit par moitiés pour
+isoler les lignes invalides : elles sont écartées dans `{name}.rejected.jsonl`
+(jamais réinjecté) et le reste du lot est écrit. Si aucune moitié ne passe
+(base indisponible), le lot part dans le fichier de débordement.
+
+Au shutdown, `stop()` écrit tout ce qui reste en attente.
+
+Usage:
+    >>> writer = get_usage_log_writer()
+    >>> writer.append({"api_key_id": key_id, "endpoint": "/query", ...})
+"""
+
+import asyncio
+import inspect
+import json
+import os
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from src.config.logging_config import LoggerMixin
+from src.config.settings import get_settings
+from src.repositories.api_key_repository import ApiKeyRepository
+from src.repositories.async_repositories import AsyncConversationRepository
+
+
+# Fonction d'écriture d'un lot : synchrone (exécutée dans un thread)
+# ou coroutine (repositories asynchrones)
+FlushFn = Callable[[list[dict[str, Any]]], bool | Awaitable[bool]]
+
+
+class AsyncBatchWriter(LoggerMixin):
+    """
+    Buffer borné d'événements écrits par lots.
+    
+    Attributes:
+        name: Nom du flux (logs, fichier de débordement).
+        max_batch: Taille maximale d'un lot.
+        flush_interval: Délai maximal avant écriture (secondes).
+        max_pending: Nombre maximal d'événements en mémoire.
+        spill_dir: Répertoire de débordement (None : abandon).
+        max_attempts: Échecs consécutifs d'un lot avant isolement des lignes invalides.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        flush_fn: FlushFn,
+        max_batch: int = 500,
+        flush_interval: float = 2.0,
+        max_pending: int = 10_000,
+        spill_dir: str | Path | None = None,
+        max_attempts: int = 3,
+    ) -> None:
+        self.name = name
+        self._flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_attempts = max_attempts
+        
+        self._buffer: list[dict[str, Any]] = []
+        # Lot retiré du buffer, en cours d'écriture
+        self._writing: list[dict[str, Any]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._spill_tasks: set[asyncio.Task] = set()
+        # Échecs consécutifs du lot en tête du buffer
+        self._failures = 0
+        
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.rejected = 0
+    
+    @property
+    def spill_path(self) -> Path | None:
+        return self.spill_dir / f"{self.name}.jsonl" if self.spill_dir else None
+    
+    @property
+    def rejected_path(self) -> Path | None:
+        """Lignes refusées par la base (non réinjectées)."""
+        return self.spill_dir / f"{self.name}.rejected.jsonl" if self.spill_dir else None
+    
+    @property
+    def pending(self) -> int:
+        """Nombre d'événements en mémoire."""
+        return len(self._buffer)
+    
+    def holds(self, key: str, value: Any) -> bool:
+        """
+        Indique si un événement est encore détenu par ce writer.
+        
+        Args:
+            key: Champ de l'événement.
+            value: Valeur recherchée.
+        
+        Returns:
+            True si l'événement est en attente ou en cours d'écriture.
+        """
+        return any(
+            event.get(key) == value
+            for event in (*self._writing, *self._buffer)
+        )
+    
+    @property
+    def running(self) -> bool:
+        """La tâche d'écriture de fond est-elle démarrée."""
+        return self._task is not None
+    
+    # ===== Chemin critique =====
+    
+    def append(self, event: dict[str, Any]) -> None:
+        """
+        Ajoute un événement (non bloquant).
+        
+        Args:
+            event: Ligne à insérer.
+        """
+        if len(self._buffer) >= self.max_pending:
+            self._overflow()
+        
+        self._buffer.append(event)
+        
+        if len(self._buffer) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+    
+    def _overflow(self) -> None:
+        """Libère le buffer plein : débordement disque ou abandon."""
+        if self.spill_path is None:
+            # Abandonner les plus anciens : les événements récents restent exploitables
+            overflow = len(self._buffer) - self.max_pending + 1
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            if self.dropped == overflow or self.dropped // 1000 != (self.dropped - overflow) // 1000:
+                self.logger.warning(
+                    "Usage buffer full, dropping events",
+                    writer=self.name,
+                    dropped_total=self.dropped,
+                )
+            return
+        
+        batch, self._buffer = self._buffer, []
+        self.spilled += len(batch)
+        self._failures = 0
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._spill(batch)
+            return
+        task = loop.create_task(asyncio.to_thread(self._spill, batch))
+        self._spill_tasks.add(task)
+        task.add_done_callback(self._spill_tasks.discard)
+    
+    # ===== Débordement disque =====
+    
+    def _spill(self, batch: list[dict[str, Any]], path: Path | None = None) -> None:
+        path = path or self.spill_path
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                for event in batch:
+                    f.write(json.dumps(event, default=str) + "\n")
+            self.logger.warning(
+                "Usage buffer spilled to disk",
+                writer=self.name,
+                events=len(batch),
+                path=str(path),
+            )
+        except OSError as e:
+            self.dropped += len(batch)
+            self.logger.error("Usage spill failed", writer=self.name, error=str(e))
+    
+    def _take_spill(self) -> list[dict[str, Any]]:
+        """Lit et retire le fichier de débordement."""
+        path = self.spill_path
+        if path is None or not path.exists():
+            return []
+        
+        replay = path.with_suffix(".replay")
+        try:
+            os.replace(path, replay)
+            with replay.open(encoding="utf-8") as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            replay.unlink()
+        except (OSError, ValueError) as e:
+            self.logger.error("Usage spill replay failed", writer=self.name, error=str(e))
+            return []
+        return events
+    
+    # ===== Écriture =====
+    
+    async def _write(self, batch: list[dict[str, Any]]) -> bool:
+        """Écrit un lot ; False en cas d'échec."""
+        try:
+            if inspect.iscoroutinefunction(self._flush_fn):
+                return bool(await self._flush_fn(batch))
+            return bool(await asyncio.to_thread(self._flush_fn, batch))
+        except Exception as e:
+            self.logger.error("Usage batch write failed", writer=self.name, error=str(e))
+            return False
+    
+    async def _bisect(self, batch: list[dict[str, Any]]) -> tuple[int, list[dict[str, Any]]]:
+        """
+        Réécrit un lot en échec par moitiés pour isoler les lignes invalides.
+        
+        Les deux moitiés d'une partie sont écrites avant de descendre dans
+        celles qui échouent : sans aucune écriture réussie, la descente
+        s'arrête à la première ligne seule (base indisponible).
+        
+        Returns:
+            Nombre d'événements écrits et lignes refusées ; (0, lot) si
+            aucune écriture n'a abouti.
+        """
+        written = 0
+        rejected: list[dict[str, Any]] = []
+        parts = [batch]
+        
+        while parts:
+            part = parts.pop()
+            if len(part) == 1:
+                if not written:
+                    return 0, batch
+                rejected.extend(part)
+                continue
+            
+            middle = len(part) // 2
+            for half in (part[:middle], part[middle:]):
+                if await self._write(half):
+                    written += len(half)
+                else:
+                    parts.append(half)
+        
+        return written, rejected
+    
+    async def _give_up(self, batch: list[dict[str, Any]]) -> int:
+        """
+        Traite un lot refusé `max_attempts` fois.
+        
+        Returns:
+            Nombre d'événements écrits (0 : base indisponible).
+        """
+        written, rejected = await self._bisect(batch)
+        
+        if not written:
+            if self.spill_path is None:
+                # Conservé en tête : le buffer borné fait le reste
+                self._buffer[:0] = batch
+            else:
+                self.spilled += len(batch)
+                await asyncio.to_thread(self._spill, batch)
+            return 0
+        
+        if rejected:
+            self.rejected += len(rejected)
+            self.logger.error(
+                "Usage rows rejected by the database",
+                writer=self.name,
+                rows=len(rejected),
+                path=str(self.rejected_path) if self.rejected_path else None,
+            )
+            if self.rejected_path is None:
+                self.dropped += len(rejected)
+            else:
+                await asyncio.to_thread(self._spill, rejected, self.rejected_path)
+        return written
+    
+    async def flush(self) -> int:
+        """
+        Écrit les événements en attente par lots.
+        
+        Returns:
+            Nombre d'événements écrits.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        
+        written = 0
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.max_batch]
+                del self._buffer[:len(batch)]
+                self._writing = batch
+                
+                if await self._write(batch):
+                    self._failures = 0
+                    written += len(batch)
+                    continue
+                
+                self._failures += 1
+                if self._failures < self.max_attempts:
+                    # Remettre en tête ; le surplus déborde
+                    self._buffer[:0] = batch
+                    if len(self._buffer) > self.max_pending:
+                        self._overflow()
+                    break
+                
+                # Nombre d'essais épuisé : isoler les lignes invalides
+                self._failures = 0
+                recovered = await self._give_up(batch)
+                if not recovered:
+                    break
+                written += recovered
+            
+            self._writing = []
+            
+            # L'écriture fonctionne : réinjecter le débordement disque
+            if written and not self._buffer and self.spill_path is not None:
+                replay = await asyncio.to_thread(self._take_spill)
+                self._buffer[:0] = replay
+        
+        self.written += written
+        return written
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error("Usage flush loop error", writer=self.name, error=str(e))
+    
+    # ===== Cycle de vie =====
+    
+    async def start(self) -> None:
+        """Démarre la tâche d'écriture et réinjecte un éventuel débordement."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        replay = await asyncio.to_thread(self._take_spill)
+        if replay:
+            self._buffer[:0] = replay
+            self.logger.info("Usage spill replayed", writer=self.name, events=len(replay))
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Arrête la tâche de fond et écrit le reste du buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        if self._spill_tasks:
+            await asyncio.gather(*self._spill_tasks, return_exceptions=True)
+        
+        await self.flush()
+        if self._buffer and self.spill_path is not None:
+            # Base indisponible au shutdown : conserver sur disque
+            batch, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._spill, batch)
+        
+        self.logger.info(
+            "Usage writer stopped",
+            writer=self.name,
+            written=self.written,
+            dropped=self.dropped,
+            pending=len(self._buffer),
+        )
+    
+    def stats(self) -> dict[str, int]:
+        """Compteurs du writer (monitoring)."""
+        return {
+            "pending": len(self._buffer),
+            "written": self.written,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+# ===== Singleton =====
+
+_usage_log_writer: AsyncBatchWriter | None = None
+
+
+def get_usage_log_writer() -> AsyncBatchWriter:
+    """Retourne le writer des logs d'usage des clés API (`api_key_usage_logs`)."""
+    global _usage_log_writer
+    if _usage_log_writer is None:
+        settings = get_settings()
+        repo = ApiKeyRepository()
+        _usage_log_writer = AsyncBatchWriter(
+            name="api_key_usage_logs",
+            flush_fn=repo.log_usage_batch,
+            max_batch=settings.usage_log_batch_size,
+            flush_interval=settings.usage_log_flush_interval,
+            max_pending=settings.usage_log_max_pending,
+            spill_dir=settings.usage_log_spill_dir or None,
+            max_attempts=settings.usage_log_max_attempts,
+        )
+    return _usage_log_writer
+
+
+_conversation_log_writer: AsyncBatchWriter | None = None
+
+
+def get_conversation_log_writer() -> AsyncBatchWriter:
+    """Retourne le writer du journal des conversations (`conversations`)."""
+    global _conversation_log_writer
+    if _conversation_log_writer is None:
+        settings = get_settings()
+        repo = AsyncConversationRepository()
+        _conversation_log_writer = AsyncBatchWriter(
+            name="conversations",
+            flush_fn=repo.log_conversations_batch,
+            max_batch=settings.conversation_log_batch_size,
+            flush_interval=settings.conversation_log_flush_interval,
+            max_pending=settings.usage_log_max_pending,
+            spill_dir=settings.usage_log_spill_dir or None,
+            max_attempts=settings.usage_log_max_attempts,
+        )
+    return _conversation_log_writer
@@ -0,0 +1,173 @@
+"""
+Chunk Cache
+============
+
+Caches mémoire des fragments lus pendant la recherche vectorielle :
+- `ChunkBodyCache` : contenu (`documents.content`), lu en phase 2
+- `ChunkEmbeddingCache` : embeddings des candidats (diversification MMR)
+
+Le contenu et l'embedding d'un document sont immuables (une réindexation
+crée de nouveaux documents) : les fragments fréquemment retenus (CV,
+README...) ne sont lus en base qu'une fois par worker. Les entrées sont
+bornées en octets (LRU) et expirent après `ttl` ; la suppression d'un
+document invalide ses entrées.
+
+Usage:
+    >>> cache = get_chunk_body_cache()
+    >>> bodies = await cache.fetch(ids, documents.get_contents)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from src.config.logging_config import LoggerMixin
+from src.config.settings import get_settings
+
+
+# Lecture en lot des valeurs absentes du cache : ids -> {id: valeur}
+BodyLoader = Callable[[list[str]], Awaitable[dict[str, Any]]]
+
+
+class ChunkBodyCache(LoggerMixin):
+    """
+    Cache LRU des contenus de fragments (thread-safe).
+    
+    Attributes:
+        max_bytes: Taille maximale du cache (octets UTF-8).
+        ttl: Durée de vie d'une entrée (secondes).
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600.0) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        
+        # id -> (valeur, taille, expiration)
+        self._entries: OrderedDict[str, tuple[Any, int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    async def fetch(self, ids: list[str], load: BodyLoader) -> dict[str, Any]:
+        """
+        Contenus des fragments, lus en base pour les seuls absents du cache.
+        
+        Args:
+            ids: UUID des documents.
+            load: Lecture en lot des contenus manquants.
+        
+        Returns:
+            Dictionnaire id -> contenu (documents supprimés absents).
+        """
+        bodies = self.get_many(ids)
+        missing = [id for id in ids if id not in bodies]
+        if missing:
+            loaded = await load(missing)
+            self.put_many(loaded)
+            bodies.update(loaded)
+        return bodies
+    
+    def get_many(self, ids: list[str]) -> dict[str, Any]:
+        """Valeurs présentes (et non expirées) dans le cache."""
+        now = time.monotonic()
+        found: dict[str, Any] = {}
+        with self._lock:
+            for id in ids:
+                entry = self._entries.get(id)
+                if entry is None or entry[2] <= now:
+                    if entry is not None:
+                        self._pop(id)
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(id)
+                found[id] = entry[0]
+                self.hits += 1
+        return found
+    
+    def put_many(self, bodies: dict[str, Any]) -> None:
+        """Ajoute des valeurs au cache (éviction LRU au-delà de `max_bytes`)."""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for id, content in bodies.items():
+                size = self._size(content)
+                if size > self.max_bytes:
+                    continue
+                self._pop(id)
+                self._entries[id] = (content, size, expires_at)
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, size, _) = self._entries.popitem(last=False)
+                self._bytes -= size
+    
+    def invalidate(self, id: str) -> None:
+        """Retire un document du cache (suppression)."""
+        with self._lock:
+            self._pop(str(id))
+    
+    def clear(self) -> None:
+        """Vide le cache (tests)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> dict[str, Any]:
+        """Statistiques du cache (monitoring)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+    
+    @staticmethod
+    def _size(value: Any) -> int:
+        return len(value.encode("utf-8"))
+    
+    def _pop(self, id: str) -> None:
+        entry = self._entries.pop(id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+class ChunkEmbeddingCache(ChunkBodyCache):
+    """Cache LRU des embeddings de fragments (tableaux float32)."""
+    
+    @staticmethod
+    def _size(value: Any) -> int:
+        return int(value.nbytes)
+
+
+# ===== Singleton =====
+
+_cache: ChunkBodyCache | None = None
+_embedding_cache: ChunkEmbeddingCache | None = None
+
+
+def get_chunk_body_cache() -> ChunkBodyCache:
+    """Retourne l'instance du cache des fragments."""
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = ChunkBodyCache(
+            max_bytes=int(settings.chunk_cache_max_mb * 1024 * 1024),
+            ttl=settings.chunk_cache_ttl,
+        )
+    return _cache
+
+
+def get_chunk_embedding_cache() -> ChunkEmbeddingCache:
+    """Retourne l'instance du cache des embeddings de fragments."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        settings = get_settings()
+        _embedding_cache = ChunkEmbeddingCache(
+            max_bytes=int(settings.chunk_embedding_cache_max_mb * 1024 * 1024),
+            ttl=settings.chunk_cache_ttl,
+        )
+    return _embedding_cache
@@ -0,0 +1,135 @@
+"""
+Compact Embeddings
+===================
+
+Embeddings compacts pour le premier passage de la recherche vectorielle.
+
+Chaque fragment stocke un vecteur float de `embedding_dimension` (1024)
+dimensions. En mode compact, un second vecteur réduit (256 dimensions
+par défaut) est écrit dans `documents.embedding_compact` (halfvec,
+float16, migration 015) :
+- le premier passage ANN parcourt l'index HNSW compact (≈ 8x plus petit)
+- les meilleurs candidats sont re-scorés sur l'embedding complet
+
+Réduction :
+- troncature (défaut) : premières dimensions, renormalisées
+- projection PCA : ajustée sur un échantillon du corpus
+  (`scripts/compact_embeddings.py fit`), chargée depuis
+  `compact_embedding_projection`
+
+La même projection est appliquée aux documents (écriture) et aux
+requêtes (recherche) ; les vecteurs compacts sont normalisés (produit
+scalaire = cosinus, comme les embeddings complets).
+
+Usage:
+    >>> projection = get_compact_projection()
+    >>> if projection is not None:
+    ...     compact = projection.project(embedding)
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.services import similarity
+
+
+@dataclass
+class CompactProjection:
+    """
+    Réduction de dimension des embeddings (troncature ou PCA).
+    
+    Attributes:
+        dimension: Dimension des vecteurs compacts.
+        components: Axes de la PCA (dimension × d), None = troncature.
+        mean: Moyenne du corpus retirée avant projection (PCA).
+    """
+    
+    dimension: int
+    components: np.ndarray | None = None
+    mean: np.ndarray | None = None
+    
+    @classmethod
+    def truncation(cls, dimension: int) -> "CompactProjection":
+        """Projection par troncature (premières dimensions)."""
+        return cls(dimension=dimension)
+    
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dimension: int) -> "CompactProjection":
+        """
+        Ajuste une PCA sur un échantillon d'embeddings.
+        
+        Args:
+            embeddings: Échantillon (n × d), n ≥ dimension.
+            dimension: Dimension des vecteurs compacts.
+        
+        Returns:
+            Projection sur les `dimension` premiers axes principaux.
+        """
+        matrix = similarity.as_matrix(embeddings)
+        if matrix.shape[0] < dimension:
+            raise ValueError(
+                f"PCA needs at least {dimension} embeddings, got {matrix.shape[0]}"
+            )
+        mean = matrix.mean(axis=0)
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls(
+            dimension=dimension,
+            components=np.ascontiguousarray(vt[:dimension], dtype=np.float32),
+            mean=mean.astype(np.float32),
+        )
+    
+    @classmethod
+    def load(cls, path: str | Path) -> "CompactProjection":
+        """Charge une projection PCA (`save`)."""
+        with np.load(path) as data:
+            components = data["components"]
+            return cls(
+                dimension=components.shape[0],
+                components=components,
+                mean=data["mean"],
+            )
+    
+    def save(self, path: str | Path) -> None:
+        """Enregistre la projection PCA (fichier .npz)."""
+        if self.components is None:
+            raise ValueError("Truncation projections have nothing to save")
+        np.savez(path, components=self.components, mean=self.mean)
+    
+    def project_many(self, embeddings: similarity.MatrixLike) -> np.ndarray:
+        """Vecteurs compacts normalisés (n × dimension)."""
+        matrix = similarity.as_matrix(embeddings)
+        if self.components is None:
+            reduced = matrix[:, :self.dimension].copy()
+        else:
+            reduced = (matrix - self.mean) @ self.components.T
+        return similarity.normalize(reduced)
+    
+    def project(self, embedding: similarity.VectorLike) -> list[float]:
+        """Vecteur compact normalisé d'un embedding."""
+        return self.project_many(embedding)[0].tolist()
+
+
+# ===== Singleton =====
+
+_projection: CompactProjection | None = None
+
+
+def get_compact_projection() -> CompactProjection | None:
+    """
+    Retourne la projection du mode compact, None si désactivé.
+    
+    PCA si `compact_embedding_projection` est renseigné, troncature sinon.
+    """
+    global _projection
+    settings = get_settings()
+    if not settings.compact_embedding_enabled:
+        return None
+    if _projection is None:
+        if settings.compact_embedding_projection:
+            _projection = CompactProjection.load(settings.compact_embedding_projection)
+        else:
+            _projection = CompactProjection.truncation(settings.compact_embedding_dimension)
+    return _projection
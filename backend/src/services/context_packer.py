@@ -0,0 +1,306 @@
+"""
+Context Packer
+===============
+
+Assemblage du contexte envoyé au LLM sous budget de tokens.
+
+Les candidats (documents du Vector Store, paragraphes de la réponse web)
+sont :
+1. comptés en tokens (tokenizer du modèle cible)
+2. dédupliqués : un fragment quasi identique ou contenu dans un fragment
+   mieux classé est écarté (recouvrement des trigrammes de mots)
+3. placés par score décroissant jusqu'au budget du modèle (un rang
+   imposé, ex. diversification, est conservé au sein de sa source) : les
+   mieux classés sont conservés entiers, la troncature porte sur le premier
+   fragment qui dépasse (coupé en fin de phrase), les suivants sont écartés
+
+Les tokens placés et écartés sont remontés dans les métadonnées de la
+réponse (`context_tokens`, `context_dropped_tokens`).
+
+Usage:
+    >>> packer = ContextPacker(ContextPackerConfig(default_budget=4000))
+    >>> packed = packer.pack(chunks, model="mistral-large-latest")
+    >>> packed.text, packed.to_metadata()
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.providers.llm import get_token_counter
+
+
+VECTOR_SOURCE = "vector_store"
+WEB_SOURCE = "perplexity"
+
+SECTION_HEADERS = {
+    VECTOR_SOURCE: "=== CONTEXTE PERSONNEL ===",
+    WEB_SOURCE: "=== INFORMATIONS WEB RÉCENTES ===",
+}
+CHUNK_SEPARATORS = {
+    VECTOR_SOURCE: "\n\n---\n\n",
+    WEB_SOURCE: "\n\n",
+}
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"[.!?…](?=\s)|\n")
+
+
+@dataclass
+class ContextPackerConfig:
+    """Configuration du packing de contexte."""
+    
+    enabled: bool = True
+    
+    # Budget de tokens du contexte, par défaut et par modèle (préfixe)
+    default_budget: int = 6000
+    model_budgets: dict[str, int] = field(default_factory=dict)
+    
+    # Recouvrement de trigrammes au-delà duquel un fragment est un doublon
+    dedup_threshold: float = 0.85
+    
+    # En deçà, un fragment tronqué n'est pas conservé
+    min_chunk_tokens: int = 48
+    
+    # Score des paragraphes web (comparable aux similarités vectorielles)
+    web_score: float = 0.8
+    
+    # Présélection avant lecture des contenus (recherche en deux temps) :
+    # octets par token (estimation basse) et marge sur le budget
+    preselect_bytes_per_token: float = 4.5
+    preselect_slack: float = 1.25
+
+
+@dataclass
+class ContextChunk:
+    """Fragment candidat au contexte."""
+    
+    text: str
+    score: float
+    source: str = VECTOR_SOURCE
+    tokens: int = 0
+    truncated: bool = False
+    # Rang imposé au sein de la source (None : ordre des scores)
+    rank: int | None = None
+
+
+@dataclass
+class PackedContext:
+    """Contexte assemblé et bilan du packing."""
+    
+    text: str = ""
+    chunks: list[ContextChunk] = field(default_factory=list)
+    budget: int = 0
+    packed_tokens: int = 0
+    dropped_tokens: int = 0
+    dropped_chunks: int = 0
+    deduplicated_chunks: int = 0
+    truncated_chunks: int = 0
+    
+    def to_metadata(self) -> dict[str, Any]:
+        return {
+            "context_tokens": self.packed_tokens,
+            "context_dropped_tokens": self.dropped_tokens,
+            "context_budget": self.budget,
+            "context_chunks": len(self.chunks),
+            "context_dropped_chunks": self.dropped_chunks,
+            "context_deduplicated_chunks": self.deduplicated_chunks,
+        }
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    """Trigrammes de mots (minuscules) d'un texte."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < 3:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _overlap(a: set, b: set) -> float:
+    """Coefficient de recouvrement |A ∩ B| / min(|A|, |B|)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def web_chunks(text: str, score: float) -> list[ContextChunk]:
+    """
+    Découpe la réponse web en paragraphes.
+    
+    Le score décroît légèrement avec la position : sous budget serré,
+    le début de la synthèse est conservé en priorité.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    return [
+        ContextChunk(text=p, score=score - i * 1e-3, source=WEB_SOURCE)
+        for i, p in enumerate(paragraphs)
+    ]
+
+
+class ContextPacker:
+    """
+    Assemble le contexte dans le budget de tokens du modèle.
+    
+    Attributes:
+        config: Configuration du packing.
+    """
+    
+    def __init__(self, config: ContextPackerConfig | None = None) -> None:
+        self.config = config or ContextPackerConfig()
+    
+    def budget_for(self, model: str) -> int:
+        """Budget de tokens du contexte pour un modèle."""
+        budgets = self.config.model_budgets
+        if model in budgets:
+            return budgets[model]
+        # Préfixe le plus long (ex: "mistral-small" pour "mistral-small-latest")
+        for prefix in sorted(budgets, key=len, reverse=True):
+            if model.startswith(prefix):
+                return budgets[prefix]
+        return self.config.default_budget
+    
+    def preselect(self, sizes: list[int], model: str) -> int:
+        """
+        Nombre de fragments dont le contenu mérite d'être lu.
+        
+        Recherche en deux temps : seule la taille des résultats est connue
+        (octets, par score décroissant). Les tokens sont sous-estimés et le
+        budget majoré (`preselect_slack`), pour ne pas écarter un fragment
+        que `pack` aurait retenu ; le premier fragment hors budget est
+        inclus (troncature possible).
+        
+        Args:
+            sizes: Taille du contenu des résultats, par score décroissant.
+            model: Modèle cible (budget).
+        
+        Returns:
+            Nombre de résultats à lire, en tête de liste.
+        """
+        if not self.config.enabled:
+            return len(sizes)
+        
+        budget = self.budget_for(model) * self.config.preselect_slack
+        estimated = 0.0
+        for i, size in enumerate(sizes):
+            estimated += size / self.config.preselect_bytes_per_token
+            if estimated >= budget:
+                return i + 1
+        return len(sizes)
+    
+    def pack(self, chunks: list[ContextChunk], model: str) -> PackedContext:
+        """
+        Sélectionne et assemble les fragments dans le budget.
+        
+        Args:
+            chunks: Candidats (vectoriels et web).
+            model: Modèle cible (tokenizer et budget).
+        
+        Returns:
+            PackedContext.
+        """
+        counter = get_token_counter(model)
+        budget = self.budget_for(model)
+        result = PackedContext(budget=budget)
+        
+        candidates = [c for c in chunks if c.text.strip()]
+        for chunk in candidates:
+            chunk.tokens = counter.count(chunk.text)
+        
+        if not self.config.enabled:
+            result.chunks = candidates
+            return self._assemble(result, counter)
+        
+        ranked = self._order(candidates)
+        
+        # Coût fixe des en-têtes de section (réservé d'emblée)
+        remaining = budget - sum(
+            counter.count(header) + 2
+            for source, header in SECTION_HEADERS.items()
+            if any(c.source == source for c in ranked)
+        )
+        
+        kept_shingles: list[set] = []
+        for chunk in ranked:
+            shingles = _shingles(chunk.text)
+            if any(_overlap(shingles, other) >= self.config.dedup_threshold for other in kept_shingles):
+                result.deduplicated_chunks += 1
+                result.dropped_tokens += chunk.tokens
+                continue
+            
+            cost = chunk.tokens + counter.count(CHUNK_SEPARATORS[chunk.source])
+            if cost <= remaining:
+                result.chunks.append(chunk)
+                kept_shingles.append(shingles)
+                remaining -= cost
+                continue
+            
+            # Premier fragment hors budget : tronqué s'il en reste assez
+            room = remaining - (cost - chunk.tokens)
+            if room >= self.config.min_chunk_tokens:
+                text = self._cut(counter.truncate(chunk.text, room))
+                kept = counter.count(text)
+                result.chunks.append(ContextChunk(
+                    text=text,
+                    score=chunk.score,
+                    source=chunk.source,
+                    tokens=kept,
+                    truncated=True,
+                    rank=chunk.rank,
+                ))
+                kept_shingles.append(shingles)
+                result.truncated_chunks += 1
+                result.dropped_tokens += chunk.tokens - kept
+                remaining = 0
+                continue
+            
+            result.dropped_chunks += 1
+            result.dropped_tokens += chunk.tokens
+        
+        return self._assemble(result, counter)
+    
+    @staticmethod
+    def _order(chunks: list[ContextChunk]) -> list[ContextChunk]:
+        """
+        Ordre de placement, par score décroissant.
+        
+        Les fragments à rang imposé gardent cet ordre au sein de leur
+        source : le i-ème prend la i-ème meilleure similarité de la
+        source pour l'interclassement avec les autres sources (leur
+        score n'est pas modifié).
+        """
+        priorities = [chunk.score for chunk in chunks]
+        groups: dict[str, list[int]] = {}
+        for i, chunk in enumerate(chunks):
+            if chunk.rank is not None:
+                groups.setdefault(chunk.source, []).append(i)
+        
+        for indices in groups.values():
+            scores = sorted((chunks[i].score for i in indices), reverse=True)
+            for i, score in zip(sorted(indices, key=lambda i: chunks[i].rank), scores):
+                priorities[i] = score
+        
+        # Tri stable : à priorité égale, l'ordre de la recherche est conservé
+        order = sorted(range(len(chunks)), key=lambda i: priorities[i], reverse=True)
+        return [chunks[i] for i in order]
+    
+    @staticmethod
+    def _cut(text: str) -> str:
+        """Coupe un texte tronqué en fin de phrase (sinon en fin de mot)."""
+        ends = [m.end() for m in _SENTENCE_END_RE.finditer(text)]
+        if ends and ends[-1] >= len(text) // 2:
+            return text[:ends[-1]].rstrip()
+        space = text.rfind(" ")
+        return text[:space].rstrip() if space > 0 else text
+    
+    @staticmethod
+    def _assemble(result: PackedContext, counter: Any) -> PackedContext:
+        """Assemble les sections (personnel puis web) et compte le total."""
+        sections = []
+        for source, header in SECTION_HEADERS.items():
+            texts = [c.text for c in result.chunks if c.source == source]
+            if texts:
+                sections.append(f"{header}\n{CHUNK_SEPARATORS[source].join(texts)}")
+        
+        result.text = "\n\n".join(sections)
+        result.packed_tokens = counter.count(result.text)
+        return result
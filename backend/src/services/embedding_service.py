@@ -9,10 +9,18 @@ import hashlib
 from typing import Any
 
 from mistralai import Mistral
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 
 from src.config.settings import get_settings
 from src.config.logging_config import LoggerMixin
+from src.providers.llm.limiter import ProviderQueueTimeout, get_provider_limiter
+from src.providers.llm.local_provider import LocalEmbeddingClient
+from src.services import similarity
 
 
 class EmbeddingService(LoggerMixin):
@@ -30,13 +38,23 @@ class EmbeddingService(LoggerMixin):
     def __init__(self) -> None:
         """Initialise le service d'embedding."""
         settings = get_settings()
-        self._client = Mistral(api_key=settings.mistral_api_key)
+        if settings.embedding_backend == "local":
+            self._client = LocalEmbeddingClient(
+                dimension=settings.embedding_dimension,
+                latency_ms=settings.local_embedding_latency_ms,
+            )
+        else:
+            self._client = Mistral(api_key=settings.mistral_api_key)
         self.model = settings.embedding_model
         self.dimension = settings.embedding_dimension
+        # Budget distinct des appels chat (limites Mistral séparées)
+        self._limiter = get_provider_limiter(self.model)
     
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
+        # L'attente d'un slot a déjà consommé son budget : pas de rejeu
+        retry=retry_if_not_exception_type(ProviderQueueTimeout),
     )
     def embed_text(self, text: str) -> list[float]:
         """
@@ -50,6 +68,7 @@ class EmbeddingService(LoggerMixin):
             
         Raises:
             ValueError: Si le texte est vide.
+            ProviderQueueTimeout: Si aucun slot n'est obtenu à temps.
             MistralException: En cas d'erreur API.
         """
         if not text.strip():
@@ -58,10 +77,11 @@ class EmbeddingService(LoggerMixin):
         # Tronquer si nécessaire (limite de tokens)
         truncated = self._truncate_text(text, max_tokens=8000)
         
-        response = self._client.embeddings.create(
-            model=self.model,
-            inputs=[truncated],
-        )
+        with self._limiter.slot_sync(self._estimate_tokens([truncated])):
+            response = self._client.embeddings.create(
+                model=self.model,
+                inputs=[truncated],
+            )
         
         embedding = response.data[0].embedding
         self.logger.debug(
@@ -75,6 +95,8 @@ class EmbeddingService(LoggerMixin):
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
+        # L'attente d'un slot a déjà consommé son budget : pas de rejeu
+        retry=retry_if_not_exception_type(ProviderQueueTimeout),
     )
     def embed_batch(
         self,
@@ -90,6 +112,9 @@ class EmbeddingService(LoggerMixin):
             
         Returns:
             Liste de vecteurs d'embeddings.
+        
+        Raises:
+            ProviderQueueTimeout: Si aucun slot n'est obtenu à temps.
         """
         if not texts:
             return []
@@ -103,10 +128,11 @@ class EmbeddingService(LoggerMixin):
             # Tronquer chaque texte
             truncated = [self._truncate_text(t, 8000) for t in batch]
             
-            response = self._client.embeddings.create(
-                model=self.model,
-                inputs=truncated,
-            )
+            with self._limiter.slot_sync(self._estimate_tokens(truncated)):
+                response = self._client.embeddings.create(
+                    model=self.model,
+                    inputs=truncated,
+                )
             
             batch_embeddings = [d.embedding for d in response.data]
             all_embeddings.extend(batch_embeddings)
@@ -133,6 +159,11 @@ class EmbeddingService(LoggerMixin):
         """
         return self.embed_text(query)
     
+    @staticmethod
+    def _estimate_tokens(texts: list[str]) -> int:
+        """Estimation des tokens d'un appel (1 token ≈ 4 caractères)."""
+        return sum(len(t) for t in texts) // 4 + 1
+    
     def _truncate_text(self, text: str, max_tokens: int) -> str:
         """
         Tronque le texte si nécessaire.
@@ -162,15 +193,9 @@ class EmbeddingService(LoggerMixin):
             embedding2: Deuxième vecteur.
             
         Returns:
-            Score de similarité entre 0 et 1.
-        """
-        import math
-        
-        dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
-        norm1 = math.sqrt(sum(a * a for a in embedding1))
-        norm2 = math.sqrt(sum(b * b for b in embedding2))
+            Score de similarité entre 0 et 1 (0 si un vecteur est nul).
         
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
+        Pour comparer une requête à plusieurs embeddings, utiliser
+        `src.services.similarity` (matrices pré-normalisées, top-k).
+        """
+        return similarity.cosine(embedding1, embedding2)
@@ -0,0 +1,544 @@
+"""
+Gateway Admission
+==================
+
+Décision d'admission unique pour les requêtes authentifiées.
+
+Une requête `/query` avec réflexion déclenchait jusqu'à quatre appels
+distincts (validation Supabase, rate limit par clé, limite de réflexion,
+quotas). L'admission les regroupe :
+
+1. la clé est lue depuis le cache de validation (mémoire, sans I/O
+   dans le cas courant)
+2. toutes les fenêtres de rate limit applicables et le compteur de
+   requêtes du mois (`UsageMeter`) sont évalués par un seul script Lua,
+   de façon atomique : rien n'est consommé si l'une des vérifications
+   échoue ; la requête admise est comptée et son delta mis en attente
+   de réconciliation vers `usage_records`
+
+Sans Redis, les fenêtres sont évaluées en mémoire (par processus) et le
+quota reste vérifié par `validate_api_key` lors du remplissage du cache.
+
+La latence d'admission est mesurée et exposée pour le monitoring.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Any
+
+from src.config.logging_config import LoggerMixin
+from src.config.redis import get_redis_client
+from src.config.settings import get_settings
+from src.models.api_key import ApiKeyValidation
+from src.repositories.async_repositories import AsyncSubscriptionRepository
+from src.repositories.subscription_repository import SubscriptionRepository
+from src.services.rate_limiter import RateLimitResult, gcra
+from src.services.usage_meter import (
+    COUNTER_TTL_MS,
+    DELTAS_KEY,
+    UsageMeter,
+    counter_key,
+    delta_field,
+    get_usage_meter,
+)
+
+
+# Nombre maximal de clés suivies par le fallback mémoire
+LOCAL_MAX_KEYS = 10_000
+
+# Nombre maximal d'utilisateurs dans le cache des quotas
+QUOTA_MAX_USERS = 10_000
+
+# Durée de cache d'un quota introuvable (lecture en échec ou usage absent)
+NEGATIVE_QUOTA_TTL = 5.0
+
+# Admission atomique
+# KEYS[1..n]  : fenêtres GCRA
+# KEYS[n+1]   : total de requêtes du mois (optionnel, UsageMeter)
+# KEYS[n+2]   : hash des deltas à réconcilier (optionnel, UsageMeter)
+# ARGV[1]     : n
+# ARGV[2i..]  : intervalle d'émission et fenêtre (ms) de la fenêtre i
+# ARGV[2n+2..]: limite stricte (-1 = aucune), valeur initiale ("" = 0),
+#               TTL (ms) du total, champ delta
+# Retour : {allowed, denied_by, retry_after_ms, now_ms, quota_used,
+#           remaining_1, reset_after_ms_1, ..., remaining_n, reset_after_ms_n}
+# denied_by : 0 = admis, i = fenêtre i, -1 = quota
+ADMISSION_SCRIPT = """
+local n = tonumber(ARGV[1])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local denied = 0
+local retry = 0
+local new_tats = {}
+local windows = {}
+
+for i = 1, n do
+    local emission = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    local tat = tonumber(redis.call('GET', KEYS[i]))
+    if not tat or tat < now then
+        tat = now
+    end
+    local new_tat = tat + emission
+    local allow_at = new_tat - window
+    if now < allow_at then
+        if denied == 0 then
+            denied = i
+            retry = allow_at - now
+        end
+        windows[2 * i - 1] = 0
+        windows[2 * i] = tat - now
+    else
+        new_tats[i] = new_tat
+        windows[2 * i - 1] = math.floor((window - (new_tat - now)) / emission)
+        windows[2 * i] = new_tat - now
+    end
+end
+
+local quota_used = -1
+if denied == 0 and #KEYS > n then
+    local base = 2 * n + 2
+    local limit = tonumber(ARGV[base])
+    if ARGV[base + 1] ~= '' then
+        redis.call('SET', KEYS[n + 1], ARGV[base + 1], 'NX', 'PX', ARGV[base + 2])
+    end
+    local used = tonumber(redis.call('GET', KEYS[n + 1])) or 0
+    if limit >= 0 and used >= limit then
+        denied = -1
+        quota_used = used
+    else
+        quota_used = redis.call('INCR', KEYS[n + 1])
+        redis.call('PEXPIRE', KEYS[n + 1], ARGV[base + 2])
+        if #KEYS > n + 1 then
+            redis.call('HINCRBY', KEYS[n + 2], ARGV[base + 3], 1)
+        end
+    end
+end
+
+if denied == 0 then
+    for i = 1, n do
+        local ttl = math.max(math.ceil(new_tats[i] - now), 1)
+        redis.call('SET', KEYS[i], new_tats[i], 'PX', ttl)
+    end
+end
+
+local reply = {denied == 0 and 1 or 0, denied, retry, now, quota_used}
+for i = 1, 2 * n do
+    reply[5 + i] = windows[i]
+end
+return reply
+"""
+
+
+@dataclass
+class AdmissionWindow:
+    """Fenêtre de rate limit évaluée à l'admission."""
+    
+    key: str
+    limit: int
+    window: int = 60
+    reason: str = "rate_limit_exceeded"
+
+
+@dataclass
+class QuotaInfo:
+    """Quota mensuel d'un utilisateur (mis en cache)."""
+    
+    hard_limit: int
+    # Usage en base au moment de la lecture (None : inconnu)
+    used: int | None
+    expires_at: float
+    plan_slug: str | None = None
+    # False : usage introuvable, comptage seul
+    known: bool = True
+
+
+@dataclass
+class AdmissionDecision:
+    """
+    Décision d'admission.
+    
+    Attributes:
+        allowed: Requête admise.
+        reason: Code d'erreur si refusée (rate_limit_exceeded,
+            REFLECTION_LIMIT_EXCEEDED, quota_exceeded).
+        retry_after: Secondes avant nouvel essai.
+        rate_limit: Fenêtre principale (headers X-RateLimit-*).
+        quota_used: Requêtes du mois après admission (-1 si non suivi).
+        latency_ms: Durée de l'admission.
+        plan_slug: Plan de l'utilisateur (None si inconnu).
+    """
+    
+    allowed: bool
+    rate_limit: RateLimitResult
+    reason: str | None = None
+    retry_after: int = 0
+    quota_used: int = -1
+    latency_ms: float = 0.0
+    plan_slug: str | None = None
+
+
+class AdmissionStats:
+    """Latence d'admission (fenêtre glissante d'échantillons, thread-safe)."""
+    
+    def __init__(self, max_samples: int = 2048) -> None:
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=max_samples)
+        self.admitted = 0
+        self.rejected: dict[str, int] = {}
+        self.fallbacks = 0
+    
+    def record(self, decision: AdmissionDecision, fallback: bool) -> None:
+        with self._lock:
+            self._samples.append(decision.latency_ms)
+            if decision.allowed:
+                self.admitted += 1
+            else:
+                reason = decision.reason or "unknown"
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+            if fallback:
+                self.fallbacks += 1
+    
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._samples)
+            admitted = self.admitted
+            rejected = dict(self.rejected)
+            fallbacks = self.fallbacks
+        
+        def pct(p: float) -> float | None:
+            if not ordered:
+                return None
+            index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+            return round(ordered[index], 3)
+        
+        return {
+            "admitted": admitted,
+            "rejected": rejected,
+            "local_fallbacks": fallbacks,
+            "latency_ms": {
+                "p50": pct(50),
+                "p95": pct(95),
+                "p99": pct(99),
+                "max": round(ordered[-1], 3) if ordered else None,
+            },
+        }
+
+
+def _seconds_until_next_month(now: datetime) -> int:
+    if now.month == 12:
+        reset = now.replace(year=now.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        reset = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return max(1, math.ceil((reset - now).total_seconds()))
+
+
+class GatewayAdmission(LoggerMixin):
+    """
+    Admission des requêtes : rate limits + quota en un appel Redis.
+    
+    Example:
+        >>> gateway = get_gateway()
+        >>> decision = await gateway.admit(validation, client_ip, reflection=True)
+        >>> if not decision.allowed:
+        ...     raise HTTPException(429, ...)
+    """
+    
+    def __init__(
+        self,
+        sub_repo: SubscriptionRepository | None = None,
+        quota_cache_ttl: float = 60.0,
+        meter: UsageMeter | None = None,
+    ) -> None:
+        self.settings = get_settings()
+        self._sub_repo = sub_repo
+        self._async_sub_repo: AsyncSubscriptionRepository | None = None
+        self.meter = meter or get_usage_meter()
+        self.quota_cache_ttl = quota_cache_ttl
+        self.stats = AdmissionStats()
+        
+        self._script: Any = None
+        self._script_client: Any = None
+        # Cache des quotas : utilisateur -> quota, LRU borné + TTL
+        self._quotas: OrderedDict[str, QuotaInfo] = OrderedDict()
+        # Fallback mémoire : clé -> TAT (ms), LRU borné
+        self._local: OrderedDict[str, float] = OrderedDict()
+    
+    @property
+    def sub_repo(self) -> SubscriptionRepository:
+        if self._sub_repo is None:
+            self._sub_repo = SubscriptionRepository()
+        return self._sub_repo
+    
+    @property
+    def async_sub_repo(self) -> AsyncSubscriptionRepository:
+        """Accès asynchrone (Postgres direct, repli sur `sub_repo`)."""
+        if self._async_sub_repo is None:
+            self._async_sub_repo = AsyncSubscriptionRepository(self.sub_repo)
+        return self._async_sub_repo
+    
+    # ===== Admission =====
+    
+    def windows_for(
+        self,
+        validation: ApiKeyValidation | None,
+        client_ip: str,
+        reflection: bool = False,
+    ) -> list[AdmissionWindow]:
+        """Fenêtres de rate limit applicables à une requête."""
+        if not self.settings.rate_limit_enabled:
+            return []
+        
+        if validation is not None:
+            windows = [AdmissionWindow(f"rl:key:{validation.id}", validation.rate_limit)]
+        else:
+            windows = [AdmissionWindow(f"rl:ip:{client_ip}", self.settings.rate_limit_requests)]
+        
+        if reflection:
+            owner = (validation.user_id or validation.id) if validation else client_ip
+            windows.append(AdmissionWindow(
+                key=f"rl:reflection:{owner}",
+                limit=getattr(self.settings, "rate_limit_reflection", 5),
+                reason="REFLECTION_LIMIT_EXCEEDED",
+            ))
+        
+        # Limite <= 0 : illimité
+        return [w for w in windows if w.limit > 0]
+    
+    async def admit(
+        self,
+        validation: ApiKeyValidation | None,
+        client_ip: str,
+        reflection: bool = False,
+    ) -> AdmissionDecision:
+        """
+        Évalue toutes les limites d'une requête en une seule décision.
+        
+        Args:
+            validation: Clé validée (None si accès public).
+            client_ip: IP du client (limite publique).
+            reflection: La requête demande le mode réflexion.
+        """
+        started = time.perf_counter()
+        windows = self.windows_for(validation, client_ip, reflection)
+        quota = await self._quota_for(validation)
+        
+        fallback = False
+        values = None
+        if windows or quota is not None:
+            values = await self._run_script(windows, quota, validation)
+            if values is None:
+                fallback = True
+                values = self._run_local(windows)
+                if values[0] and quota is not None and self.meter.enabled:
+                    self.meter.record_local(str(validation.user_id))
+        
+        decision = self._decide(windows, values, validation)
+        decision.latency_ms = (time.perf_counter() - started) * 1000
+        decision.plan_slug = quota.plan_slug if quota is not None else None
+        self.stats.record(decision, fallback)
+        
+        if not decision.allowed:
+            self.logger.warning(
+                "Admission rejected",
+                reason=decision.reason,
+                key_id=str(validation.id) if validation else None,
+                retry_after=decision.retry_after,
+            )
+        return decision
+    
+    def _decide(
+        self,
+        windows: list[AdmissionWindow],
+        values: tuple | None,
+        validation: ApiKeyValidation | None,
+    ) -> AdmissionDecision:
+        if values is None:
+            limit = validation.rate_limit if validation else self.settings.rate_limit_requests
+            return AdmissionDecision(
+                allowed=True,
+                rate_limit=RateLimitResult(allowed=True, limit=max(limit, 0), remaining=max(limit, 0)),
+            )
+        
+        allowed, denied_by, retry_ms, now_ms, quota_used = values[:5]
+        per_window = values[5:]
+        
+        if windows:
+            remaining, reset_ms = per_window[0], per_window[1]
+            primary = RateLimitResult(
+                allowed=bool(allowed),
+                limit=windows[0].limit,
+                remaining=int(remaining),
+                retry_after=math.ceil(retry_ms / 1000) if denied_by == 1 else 0,
+                reset_at=math.ceil((now_ms + reset_ms) / 1000),
+            )
+        else:
+            primary = RateLimitResult(allowed=bool(allowed), limit=0, remaining=0)
+        
+        decision = AdmissionDecision(
+            allowed=bool(allowed),
+            rate_limit=primary,
+            quota_used=int(quota_used),
+        )
+        if denied_by > 0:
+            decision.reason = windows[int(denied_by) - 1].reason
+            decision.retry_after = math.ceil(retry_ms / 1000)
+        elif denied_by < 0:
+            decision.reason = "quota_exceeded"
+            decision.retry_after = _seconds_until_next_month(datetime.now(timezone.utc))
+        return decision
+    
+    # ===== Redis =====
+    
+    async def _run_script(
+        self,
+        windows: list[AdmissionWindow],
+        quota: QuotaInfo | None,
+        validation: ApiKeyValidation | None,
+    ) -> tuple | None:
+        """Exécute le script d'admission. Retourne None si Redis est indisponible."""
+        redis = await get_redis_client()
+        if not redis:
+            return None
+        
+        keys = [w.key for w in windows]
+        args: list[Any] = [len(windows)]
+        for w in windows:
+            window_ms = w.window * 1000
+            args.extend([window_ms / w.limit, window_ms])
+        
+        if quota is not None and validation is not None:
+            user_id = str(validation.user_id)
+            keys.append(counter_key(user_id, "requests"))
+            args.extend([
+                quota.hard_limit,
+                "" if quota.used is None else quota.used,
+                COUNTER_TTL_MS,
+                delta_field(user_id, "requests"),
+            ])
+            if self.meter.enabled:
+                keys.append(DELTAS_KEY)
+        
+        try:
+            # register_script : EVALSHA, avec rechargement sur NOSCRIPT
+            if self._script is None or self._script_client is not redis:
+                self._script = redis.register_script(ADMISSION_SCRIPT)
+                self._script_client = redis
+            values = await self._script(keys=keys, args=args)
+            return tuple(float(v) for v in values)
+        except Exception as e:
+            self.logger.error("Admission script failed, using local fallback", error=str(e))
+            return None
+    
+    # ===== Fallback mémoire =====
+    
+    def _run_local(self, windows: list[AdmissionWindow]) -> tuple:
+        """Même évaluation que le script, en mémoire (sans quota)."""
+        now_ms = time.time() * 1000
+        denied, retry_ms = 0, 0.0
+        new_tats: list[float] = []
+        per_window: list[float] = []
+        
+        for index, w in enumerate(windows, start=1):
+            window_ms = w.window * 1000
+            allowed, remaining, retry, reset_ms, tat = gcra(
+                self._local.get(w.key), now_ms, window_ms / w.limit, window_ms
+            )
+            if not allowed and denied == 0:
+                denied, retry_ms = index, retry
+            new_tats.append(tat)
+            per_window.extend([remaining, reset_ms])
+        
+        if denied == 0:
+            for w, tat in zip(windows, new_tats):
+                self._local[w.key] = tat
+                self._local.move_to_end(w.key)
+            while len(self._local) > LOCAL_MAX_KEYS:
+                self._local.popitem(last=False)
+        
+        return (1.0 if denied == 0 else 0.0, float(denied), retry_ms, now_ms, -1.0, *per_window)
+    
+    # ===== Quota =====
+    
+    async def _quota_for(self, validation: ApiKeyValidation | None) -> QuotaInfo | None:
+        """
+        Quota mensuel de l'utilisateur de la clé (cache TTL).
+        
+        Seul le plan gratuit a une limite stricte ; les plans payants
+        sont comptés (overage) sans blocage.
+        """
+        if validation is None or validation.user_id is None:
+            return None
+        
+        user_id = str(validation.user_id)
+        now = time.monotonic()
+        stale = self._quotas.get(user_id)
+        if stale is not None:
+            if stale.expires_at > now:
+                self._quotas.move_to_end(user_id)
+                return self._counted(stale)
+            del self._quotas[user_id]
+        
+        try:
+            usage = await self.async_sub_repo.get_user_usage(user_id)
+        except Exception as e:
+            self.logger.warning("Quota lookup failed", user_id=user_id, error=str(e))
+            usage = None
+        
+        if usage is None:
+            # Mis en cache brièvement : au plus une lecture par délai,
+            # même pendant une panne. Le dernier quota connu est gardé
+            # (limite du plan gratuit), sinon comptage sans limite.
+            if stale is not None and stale.known:
+                quota = replace(stale, expires_at=now + NEGATIVE_QUOTA_TTL)
+            else:
+                quota = QuotaInfo(
+                    hard_limit=-1,
+                    used=None,
+                    expires_at=now + NEGATIVE_QUOTA_TTL,
+                    known=False,
+                )
+        else:
+            hard_limit = (
+                usage.requests_limit
+                if usage.plan_slug == "free" and usage.requests_limit >= 0
+                else -1
+            )
+            quota = QuotaInfo(
+                hard_limit=hard_limit,
+                used=usage.requests_count,
+                expires_at=now + self.quota_cache_ttl,
+                plan_slug=usage.plan_slug,
+            )
+        
+        self._quotas[user_id] = quota
+        while len(self._quotas) > QUOTA_MAX_USERS:
+            self._quotas.popitem(last=False)
+        return self._counted(quota)
+    
+    def _counted(self, quota: QuotaInfo) -> QuotaInfo | None:
+        """Quota à appliquer (None : usage introuvable et compteurs désactivés)."""
+        if not quota.known and not self.meter.enabled:
+            return None
+        return quota
+
+
+# ===== Singleton =====
+
+_gateway: GatewayAdmission | None = None
+
+
+def get_gateway() -> GatewayAdmission:
+    """Retourne l'instance de l'admission gateway."""
+    global _gateway
+    if _gateway is None:
+        _gateway = GatewayAdmission(
+            quota_cache_ttl=get_settings().api_key_cache_ttl,
+        )
+    return _gateway
@@ -0,0 +1,262 @@
+"""
+Model Cascade
+==============
+
+Cascade de modèles : un modèle rapide et économique répond d'abord
+aux intentions simples, le grand modèle n'intervient qu'en escalade.
+
+Escalade vers le grand modèle quand :
+- le routeur est peu confiant (confidence < seuil)
+- le mode réflexion est demandé
+- l'auto-vérification de la réponse du petit modèle échoue
+  (réponse vide/tronquée, aveu d'ignorance alors que du contexte existe)
+- l'appel au petit modèle échoue (429, timeout...)
+
+Les statistiques (taux d'escalade, latence économisée) sont agrégées
+en mémoire et exposées pour le monitoring.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.config.logging_config import LoggerMixin
+from src.providers.llm import LLMResponse
+from src.services.orchestrator import QueryIntent, RoutingDecision
+
+
+# Marqueurs d'une réponse qui n'exploite pas le contexte fourni
+UNCERTAINTY_MARKERS = (
+    "je ne sais pas",
+    "je n'ai pas cette info",
+    "je n'ai pas d'information",
+    "je ne peux pas répondre",
+    "je ne dispose pas",
+    "i don't know",
+    "i do not have",
+    "i'm not sure",
+)
+
+# Petit modèle de chaque provider (intentions simples, tâches annexes)
+SMALL_MODELS = {
+    "mistral": "mistral-small-latest",
+    "openai": "gpt-4o-mini",
+    "gemini": "gemini-1.5-flash",
+}
+
+# Intentions servies par le petit modèle par défaut
+SMALL_MODEL_INTENTS = (QueryIntent.GREETING, QueryIntent.GENERAL)
+
+
+def small_model_for(provider: str) -> str | None:
+    """Petit modèle d'un provider, None s'il n'en a pas."""
+    return SMALL_MODELS.get(provider)
+
+
+def default_intent_models(provider: str) -> dict[str, str]:
+    """Modèle par intention par défaut : le petit modèle du provider."""
+    small_model = small_model_for(provider)
+    if small_model is None:
+        return {}
+    return {intent.value: small_model for intent in SMALL_MODEL_INTENTS}
+
+
+@dataclass
+class CascadeConfig:
+    """Configuration de la cascade de modèles."""
+    
+    enabled: bool = False
+    
+    # Modèle par intention ; les intentions absentes utilisent le grand
+    # modèle (vide : petit modèle du provider, `default_intent_models`)
+    intent_models: dict[str, str] = field(default_factory=dict)
+    
+    # Escalade si le routeur est moins confiant que ce seuil
+    min_confidence: float = 0.7
+    
+    # Auto-vérification (heuristique, sans appel LLM supplémentaire)
+    self_check: bool = True
+    min_answer_chars: int = 20
+
+
+@dataclass
+class CascadeDecision:
+    """Choix du modèle pour une requête."""
+    
+    model: str
+    escalated: bool = False
+    reason: str | None = None
+    
+    def to_metadata(self) -> dict[str, Any]:
+        return {
+            "cascade_model": self.model,
+            "cascade_escalated": self.escalated,
+            "cascade_reason": self.reason,
+        }
+
+
+class CascadeStats:
+    """
+    Statistiques agrégées de la cascade (thread-safe).
+    
+    La latence économisée est estimée en comparant chaque réponse
+    du petit modèle à la latence moyenne observée du grand modèle.
+    """
+    
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        # Requêtes dont l'intention relève du petit modèle
+        self.eligible = 0
+        self.small_first = 0
+        self.escalations: dict[str, int] = {}
+        self._small_latency_ms = 0
+        self._small_answers = 0
+        self._large_latency_ms = 0
+        self._large_calls = 0
+    
+    def record(
+        self,
+        decision: CascadeDecision,
+        small_latency_ms: int | None,
+        large_latency_ms: int | None,
+    ) -> None:
+        """Enregistre le déroulé d'une requête."""
+        with self._lock:
+            self.requests += 1
+            if small_latency_ms is not None or decision.escalated:
+                self.eligible += 1
+            if small_latency_ms is not None:
+                self.small_first += 1
+            if decision.escalated and decision.reason:
+                self.escalations[decision.reason] = (
+                    self.escalations.get(decision.reason, 0) + 1
+                )
+            if small_latency_ms is not None and not decision.escalated:
+                self._small_latency_ms += small_latency_ms
+                self._small_answers += 1
+            if large_latency_ms is not None:
+                self._large_latency_ms += large_latency_ms
+                self._large_calls += 1
+    
+    def snapshot(self) -> dict[str, Any]:
+        """Instantané des statistiques."""
+        with self._lock:
+            escalated = sum(self.escalations.values())
+            avg_large = (
+                self._large_latency_ms / self._large_calls
+                if self._large_calls else None
+            )
+            avg_small = (
+                self._small_latency_ms / self._small_answers
+                if self._small_answers else None
+            )
+            saved_ms = (
+                int((avg_large - avg_small) * self._small_answers)
+                if avg_large is not None and avg_small is not None else 0
+            )
+            return {
+                "requests": self.requests,
+                "eligible": self.eligible,
+                "small_model_first": self.small_first,
+                "answered_by_small_model": self._small_answers,
+                "escalations": dict(self.escalations),
+                "escalation_rate": (
+                    round(escalated / self.eligible, 3)
+                    if self.eligible else 0.0
+                ),
+                "avg_small_latency_ms": int(avg_small) if avg_small is not None else None,
+                "avg_large_latency_ms": int(avg_large) if avg_large is not None else None,
+                "estimated_latency_saved_ms": max(saved_ms, 0),
+            }
+
+
+class ModelCascade(LoggerMixin):
+    """
+    Sélection du modèle et décisions d'escalade.
+    
+    Example:
+        >>> cascade = ModelCascade(CascadeConfig(enabled=True), "mistral-large-latest", "mistral")
+        >>> decision = cascade.select(routing)
+        >>> if decision.model != cascade.large_model:
+        ...     response = await small.generate(messages)
+        ...     reason = cascade.check_answer(response, routing, has_context=True)
+    """
+    
+    def __init__(
+        self,
+        config: CascadeConfig,
+        large_model: str,
+        provider: str = "mistral",
+    ) -> None:
+        """
+        Args:
+            config: Configuration de la cascade.
+            large_model: Modèle d'escalade (celui du RAGConfig).
+            provider: Provider LLM, source des petits modèles par défaut.
+        """
+        self.config = config
+        self.large_model = large_model
+        self.intent_models = config.intent_models or default_intent_models(provider)
+        self.stats = CascadeStats()
+    
+    def select(self, routing: RoutingDecision) -> CascadeDecision:
+        """
+        Choisit le modèle initial selon l'intention et le routage.
+        
+        Args:
+            routing: Décision du routeur.
+        """
+        small_model = self.intent_models.get(routing.intent.value)
+        
+        if not self.config.enabled or not small_model or small_model == self.large_model:
+            return CascadeDecision(model=self.large_model)
+        
+        if routing.use_reflection:
+            return CascadeDecision(
+                model=self.large_model,
+                escalated=True,
+                reason="reflection",
+            )
+        
+        if routing.confidence < self.config.min_confidence:
+            return CascadeDecision(
+                model=self.large_model,
+                escalated=True,
+                reason="low_confidence",
+            )
+        
+        return CascadeDecision(model=small_model)
+    
+    def check_answer(
+        self,
+        response: LLMResponse,
+        routing: RoutingDecision,
+        has_context: bool,
+    ) -> str | None:
+        """
+        Auto-vérification de la réponse du petit modèle.
+        
+        Returns:
+            Raison de l'escalade, ou None si la réponse est acceptée.
+        """
+        if not self.config.self_check:
+            return None
+        
+        answer = (response.content or "").strip()
+        
+        if response.finish_reason == "length":
+            return "truncated"
+        
+        if (
+            routing.intent != QueryIntent.GREETING
+            and len(answer) < self.config.min_answer_chars
+        ):
+            return "too_short"
+        
+        if has_context:
+            lowered = answer.lower()
+            if any(marker in lowered for marker in UNCERTAINTY_MARKERS):
+                return "ignored_context"
+        
+        return None
@@ -63,6 +63,7 @@ class OrchestratorConfig:
     
     # Routage
     enable_smart_routing: bool = True
+    router_provider: str = "mistral"
     router_model: str = "mistral-tiny"
     router_timeout_ms: int = 2000
     
@@ -264,7 +265,7 @@ Question : """
         
         try:
             provider = self._factory.get_provider(
-                LLMProvider.MISTRAL,
+                self.config.router_provider,
                 router_config,
             )
         except Exception:
@@ -377,5 +378,9 @@ def get_orchestrator() -> QueryOrchestrator:
     """Récupère le singleton de l'orchestrateur."""
     global _orchestrator
     if _orchestrator is None:
-        _orchestrator = QueryOrchestrator()
+        config = OrchestratorConfig()
+        # En simulation locale, le routeur ne doit pas appeler Mistral
+        if get_settings().default_llm_provider == LLMProvider.LOCAL.value:
+            config.router_provider = LLMProvider.LOCAL.value
+        _orchestrator = QueryOrchestrator(config)
     return _orchestrator
@@ -0,0 +1,120 @@
+"""
+Query Context
+==============
+
+Contexte d'une requête RAG : session, utilisateur, échéance et traçage.
+
+Le `RAGEngine` est partagé par toutes les requêtes du worker (providers,
+repositories, cascade) et ne porte aucun état de requête. Tout ce qui
+est propre à une requête voyage dans un `QueryContext` immuable, créé
+par la route et passé explicitement au moteur : des requêtes
+concurrentes ne peuvent plus s'écraser leur session.
+
+Usage:
+    >>> context = QueryContext.create(session_id=request.session_id, user_id=user_id, timeout=120)
+    >>> response = await rag.query_async(question, context=context)
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import uuid4
+
+from src.models.document import DocumentFilter, SearchEffort
+
+
+class QueryDeadlineExceeded(TimeoutError):
+    """L'échéance de la requête est dépassée."""
+
+
+def new_session_id() -> str:
+    """Génère un identifiant de session de conversation."""
+    return str(uuid4())
+
+
+@dataclass(frozen=True)
+class QueryContext:
+    """
+    État propre à une requête RAG.
+    
+    Attributes:
+        session_id: Session de conversation (journalisation).
+        user_id: Utilisateur (isolation multi-tenant), None si anonyme.
+        request_id: Identifiant de traçage (logs).
+        deadline: Échéance (horloge `time.monotonic`), None si illimitée.
+        started_at: Début de la requête (horloge `time.monotonic`).
+        filters: Filtre de la recherche vectorielle (métadonnées).
+        search_effort: Compromis rappel / latence de la recherche vectorielle.
+    """
+    
+    session_id: str = field(default_factory=new_session_id)
+    user_id: str | None = None
+    request_id: str = field(default_factory=lambda: uuid4().hex)
+    deadline: float | None = None
+    started_at: float = field(default_factory=time.monotonic)
+    filters: DocumentFilter | None = None
+    search_effort: SearchEffort | None = None
+    
+    @classmethod
+    def create(
+        cls,
+        session_id: str | None = None,
+        user_id: str | None = None,
+        request_id: str | None = None,
+        timeout: float | None = None,
+        filters: DocumentFilter | None = None,
+        search_effort: SearchEffort | None = None,
+    ) -> "QueryContext":
+        """
+        Crée le contexte d'une requête.
+        
+        Args:
+            session_id: Session existante, sinon nouvelle session.
+            user_id: ID utilisateur.
+            request_id: ID de traçage transmis par le client (X-Request-ID).
+            timeout: Budget de la requête en secondes (None ou 0 = illimité).
+            filters: Filtre de la recherche vectorielle (métadonnées).
+            search_effort: Effort de la recherche vectorielle (None : serveur).
+        
+        Returns:
+            QueryContext.
+        """
+        now = time.monotonic()
+        return cls(
+            session_id=session_id or new_session_id(),
+            user_id=user_id,
+            request_id=request_id or uuid4().hex,
+            deadline=now + timeout if timeout else None,
+            started_at=now,
+            filters=filters,
+            search_effort=search_effort,
+        )
+    
+    def remaining(self) -> float | None:
+        """Temps restant avant l'échéance (secondes), None si illimité."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        """L'échéance est-elle dépassée."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+    
+    def check_deadline(self) -> None:
+        """Lève `QueryDeadlineExceeded` si l'échéance est dépassée."""
+        if self.expired:
+            raise QueryDeadlineExceeded(
+                f"Query deadline exceeded after {self.elapsed_ms()} ms"
+            )
+    
+    def elapsed_ms(self) -> int:
+        """Durée écoulée depuis le début de la requête (ms)."""
+        return int((time.monotonic() - self.started_at) * 1000)
+    
+    def log_fields(self) -> dict[str, Any]:
+        """Champs de traçage liés aux logs de la requête."""
+        return {
+            "request_id": self.request_id,
+            "session_id": self.session_id,
+        }
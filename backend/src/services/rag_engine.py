@@ -8,11 +8,14 @@ Version 2 avec orchestration intelligente, multi-providers et streaming.
 
 import asyncio
 import time
+from contextlib import aclosing
 from dataclasses import dataclass, field
 from typing import Any, AsyncIterator
 from uuid import uuid4
 
-from src.agents.perplexity_agent import PerplexityAgent, WebSearchResult
+import structlog
+
+from src.agents.perplexity_agent import PerplexityAgent, WebSearchChunk, WebSearchResult
 from src.config.logging_config import LoggerMixin
 from src.config.settings import get_settings
 from src.models.conversation import (
@@ -20,23 +23,45 @@ from src.models.conversation import (
     ConversationCreate,
     ConversationMetadata,
 )
-from src.models.document import DocumentMatch
+from src.models.document import DocumentFilter, DocumentMatch, SearchEffort
 from src.providers.llm import (
     LLMProviderFactory,
     LLMConfig,
     LLMResponse,
+    ProviderQueueTimeout,
     StreamChunk,
     BaseLLMProvider,
+    TokenUsage,
+    get_token_counter,
 )
+from src.repositories.async_repositories import AsyncDocumentRepository
 from src.repositories.conversation_repository import ConversationRepository
 from src.repositories.document_repository import DocumentRepository
+from src.services.batch_writer import get_conversation_log_writer
+from src.services.chunk_cache import get_chunk_body_cache
+from src.services.context_packer import (
+    ContextChunk,
+    ContextPacker,
+    ContextPackerConfig,
+    PackedContext,
+    web_chunks,
+)
 from src.services.embedding_service import EmbeddingService
+from src.services.model_cascade import CascadeConfig, CascadeDecision, ModelCascade
 from src.services.orchestrator import (
     QueryOrchestrator,
     RoutingDecision,
     QueryIntent,
     get_orchestrator,
 )
+from src.services.query_context import QueryContext, QueryDeadlineExceeded, new_session_id
+from src.services.reranking import (
+    Reranker,
+    RerankConfig,
+    ResultReranker,
+    RetrievalTimings,
+)
+from src.services.session_memory import get_session_memory
 
 
 @dataclass
@@ -67,10 +92,17 @@ class RAGConfig:
     # Recherche vectorielle
     vector_threshold: float = 0.7
     vector_max_results: int = 5
+    # Diversification MMR et re-ranking des candidats
+    rerank: RerankConfig = field(default_factory=RerankConfig)
     
     # Recherche web
     use_web_search: bool = True
     web_max_tokens: int = 1024
+    web_streaming: bool = True
+    # Démarre la génération dès que le flux web a fourni assez de contexte
+    # (coupure en fin de phrase) ; la suite du flux complète sources et
+    # usage. 0 = attendre la réponse web complète.
+    web_early_start_chars: int = 1500
     
     # Génération
     llm_model: str = "mistral-large-latest"
@@ -81,6 +113,12 @@ class RAGConfig:
     # Orchestration
     use_smart_routing: bool = True
     
+    # Cascade de modèles (petit modèle d'abord, escalade vers llm_model)
+    cascade: CascadeConfig = field(default_factory=CascadeConfig)
+    
+    # Packing du contexte sous budget de tokens
+    context: ContextPackerConfig = field(default_factory=ContextPackerConfig)
+    
     # Mode réflexion
     enable_reflection: bool = False
     reflection_depth: int = 1
@@ -92,6 +130,27 @@ class RAGConfig:
     log_conversations: bool = True
 
 
+@dataclass
+class WebStreamState:
+    """
+    Réponse web consommée en tâche de fond (`query_stream`).
+    
+    Le flux est lu jusqu'au bout même après le démarrage anticipé
+    de la génération : les fragments tardifs complètent les sources
+    et l'usage de la réponse.
+    
+    Attributes:
+        content: Texte reçu, fragments tardifs compris.
+        sources: URLs sources connues.
+        tokens_used: Tokens consommés (fragment final).
+        chunks: Fragments à diffuser, None en fin de flux.
+    """
+    content: str = ""
+    sources: list[str] = field(default_factory=list)
+    tokens_used: int = 0
+    chunks: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
 class RAGEngine(LoggerMixin):
     """
     Moteur RAG principal V2.
@@ -104,6 +163,10 @@ class RAGEngine(LoggerMixin):
     5. Génération de la réponse (multi-provider)
     6. Logging de la conversation
     
+    Le moteur est partagé entre les requêtes concurrentes : l'état d'une
+    requête (session, utilisateur, échéance, traçage) est porté par un
+    `QueryContext` passé à `query_async` / `query_stream`.
+    
     Optimisations:
     - Routage intelligent pour éviter les appels inutiles
     - Support multi-providers (Mistral, OpenAI, Gemini)
@@ -139,22 +202,40 @@ Tu as accès à des informations personnelles (CV, projets GitHub, profils) et d
 
 ## Langue
 Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie sinon."""
-    
-    def __init__(self, config: RAGConfig | None = None) -> None:
+
+    def __init__(
+        self,
+        config: RAGConfig | None = None,
+        reranker: Reranker | None = None,
+    ) -> None:
         """
         Initialise le RAG Engine.
         
         Args:
             config: Configuration personnalisée.
+            reranker: Re-ranker des fragments (optionnel, après MMR).
         """
         settings = get_settings()
         self.config = config or RAGConfig(
             vector_threshold=settings.similarity_threshold,
             vector_max_results=settings.max_results,
             llm_model=settings.llm_model,
+            llm_provider=settings.default_llm_provider,
             llm_temperature=settings.llm_temperature,
             llm_max_tokens=settings.llm_max_tokens,
         )
+        if config is None:
+            self.config.cascade.enabled = settings.cascade_enabled
+            self.config.cascade.min_confidence = settings.cascade_min_confidence
+            if settings.cascade_intent_models:
+                self.config.cascade.intent_models = dict(settings.cascade_intent_models)
+            self.config.context.default_budget = settings.context_token_budget
+            self.config.context.model_budgets = dict(settings.context_model_budgets)
+            self.config.context.dedup_threshold = settings.context_dedup_threshold
+            self.config.rerank.enabled = settings.rerank_enabled
+            self.config.rerank.fetch_multiplier = settings.rerank_fetch_multiplier
+            self.config.rerank.mmr_lambda = settings.rerank_mmr_lambda
+            self.config.rerank.time_budget_ms = settings.rerank_time_budget_ms
         
         # Services
         self._llm_factory = LLMProviderFactory()
@@ -162,26 +243,47 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
         self._embedding_service = EmbeddingService()
         self._document_repo = DocumentRepository()
         self._conversation_repo = ConversationRepository()
+        self._documents = AsyncDocumentRepository(self._document_repo)
+        self._chunk_bodies = get_chunk_body_cache()
+        self._reranking = ResultReranker(self.config.rerank, reranker)
+        self._conversation_log = get_conversation_log_writer()
+        self._memory = get_session_memory()
         self._perplexity = PerplexityAgent()
         
         # Provider LLM principal
         self._llm_provider: BaseLLMProvider | None = None
-        
-        # Session courante
-        self._session_id = str(uuid4())
+        self._cascade = ModelCascade(
+            self.config.cascade, self.config.llm_model, self.config.llm_provider,
+        )
+        self._packer = ContextPacker(self.config.context)
     
-    @property
-    def session_id(self) -> str:
-        """ID de la session courante."""
-        return self._session_id
+    @staticmethod
+    def new_session() -> str:
+        """Crée un identifiant de session (l'état de session vit dans `QueryContext`)."""
+        return new_session_id()
     
-    def new_session(self) -> str:
-        """Crée une nouvelle session."""
-        self._session_id = str(uuid4())
-        return self._session_id
+    def cascade_stats(self) -> dict[str, Any]:
+        """Statistiques de la cascade de modèles."""
+        return self._cascade.stats.snapshot()
     
-    def _get_llm_provider(self) -> BaseLLMProvider:
-        """Récupère ou crée le provider LLM."""
+    def _get_llm_provider(self, model: str | None = None) -> BaseLLMProvider:
+        """
+        Récupère ou crée le provider LLM.
+        
+        Args:
+            model: Modèle alternatif (cascade), llm_model par défaut.
+        """
+        if model is not None and model != self.config.llm_model:
+            return self._llm_factory.get_provider(
+                self.config.llm_provider,
+                LLMConfig(
+                    model=model,
+                    temperature=self.config.llm_temperature,
+                    max_tokens=self.config.llm_max_tokens,
+                    stream=self.config.enable_streaming,
+                ),
+            )
+        
         if self._llm_provider is None:
             llm_config = LLMConfig(
                 model=self.config.llm_model,
@@ -204,6 +306,7 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
         use_rag: bool | None = None,
         enable_reflection: bool | None = None,
         user_id: str | None = None,
+        context: QueryContext | None = None,
     ) -> RAGResponse:
         """
         Traite une requête de manière asynchrone avec routage intelligent.
@@ -214,11 +317,51 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
             use_web: Forcer/désactiver la recherche web.
             use_rag: Forcer/désactiver le RAG.
             enable_reflection: Activer le mode réflexion.
-            user_id: ID utilisateur pour l'isolation contextuelle.
-            
+            user_id: ID utilisateur (si `context` n'est pas fourni).
+            context: Contexte de la requête (session, utilisateur, échéance).
+        
         Returns:
             RAGResponse avec la réponse et les sources.
+        
+        Raises:
+            QueryDeadlineExceeded: Échéance du contexte dépassée.
         """
+        ctx = context or QueryContext.create(user_id=user_id)
+        
+        with structlog.contextvars.bound_contextvars(**ctx.log_fields()):
+            remaining = ctx.remaining()
+            if remaining is None:
+                return await self._query(
+                    question, system_prompt, use_web, use_rag, enable_reflection, ctx,
+                )
+            try:
+                return await asyncio.wait_for(
+                    self._query(
+                        question, system_prompt, use_web, use_rag, enable_reflection, ctx,
+                    ),
+                    timeout=remaining,
+                )
+            except asyncio.TimeoutError as e:
+                # TimeoutError levée par le pipeline lui-même (ex: file
+                # d'attente d'un provider) : propagée telle quelle
+                if not ctx.expired:
+                    raise
+                self.logger.warning("Query deadline exceeded", elapsed_ms=ctx.elapsed_ms())
+                raise QueryDeadlineExceeded(
+                    f"Query deadline exceeded after {ctx.elapsed_ms()} ms"
+                ) from e
+    
+    async def _query(
+        self,
+        question: str,
+        system_prompt: str | None,
+        use_web: bool | None,
+        use_rag: bool | None,
+        enable_reflection: bool | None,
+        ctx: QueryContext,
+    ) -> RAGResponse:
+        """Pipeline de `query_async` pour un contexte donné."""
+        user_id = ctx.user_id
         start_time = time.time()
         sources: list[ContextSource] = []
         
@@ -242,10 +385,11 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
         )
         
         # 2. Recherche vectorielle (si nécessaire)
-        vector_context = ""
+        vector_chunks: list[ContextChunk] = []
+        retrieval = RetrievalTimings()
         if routing.should_use_rag:
-            vector_context, vector_sources = await self._search_vector_store(
-                question, user_id
+            vector_chunks, vector_sources, retrieval = await self._search_vector_store(
+                question, user_id, ctx.filters, ctx.search_effort
             )
             sources.extend(vector_sources)
         
@@ -262,28 +406,31 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
                 ))
         
         # 4. Construire le contexte fusionné
-        full_context = self._build_context(vector_context, web_context)
+        packed = self._build_context(vector_chunks, web_context, self.config.llm_model)
+        full_context = packed.text
         
-        # 5. Générer la réponse
+        # 5. Générer la réponse (cascade de modèles si activée)
+        history = await self._memory.history(ctx.session_id, user_id, self.config.llm_model)
         provider = self._get_llm_provider()
         messages = provider.build_messages(
             question,
             context=full_context if full_context else None,
+            history=history,
             system_prompt=system_prompt or self.DEFAULT_SYSTEM_PROMPT,
         )
         
-        # Mode réflexion ou standard
-        if routing.use_reflection:
-            llm_response = await provider.generate_with_reflection(messages)
-        else:
-            llm_response = await provider.generate(
-                messages,
-                system_prompt=system_prompt or self.DEFAULT_SYSTEM_PROMPT,
-            )
+        llm_response, cascade_decision = await self._generate_answer(
+            routing,
+            messages,
+            system_prompt or self.DEFAULT_SYSTEM_PROMPT,
+            has_context=bool(full_context),
+        )
         
         answer = llm_response.content
         thought_process = llm_response.thought_process
         
+        await self._memory.remember(ctx.session_id, user_id, question, answer)
+        
         # 6. Calculer les métriques
         elapsed_ms = int((time.time() - start_time) * 1000)
         
@@ -299,9 +446,11 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
                     "output": llm_response.tokens_output,
                 },
                 elapsed_ms,
+                ctx.session_id,
                 user_id,
                 thought_process=thought_process,
                 routing_decision=routing,
+                model_used=cascade_decision.model,
             )
         
         self.logger.info(
@@ -327,6 +476,9 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
                 "routing_intent": routing.intent.value,
                 "routing_confidence": routing.confidence,
                 "routing_latency_ms": routing.latency_ms,
+                **cascade_decision.to_metadata(),
+                **packed.to_metadata(),
+                **retrieval.to_metadata(),
             },
             thought_process=thought_process,
             routing=routing,
@@ -340,6 +492,7 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
         use_rag: bool | None = None,
         enable_reflection: bool | None = None,
         user_id: str | None = None,
+        context: QueryContext | None = None,
     ) -> AsyncIterator[dict[str, Any]]:
         """
         Traite une requête en mode streaming.
@@ -348,6 +501,7 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
         - routing: Décision de routage
         - search_start: Début d'une recherche
         - search_complete: Fin d'une recherche
+        - web_chunk: Fragment de la réponse web (Perplexity en streaming)
         - chunk: Morceau de réponse
         - thought: Pensée interne (mode réflexion)
         - complete: Réponse terminée
@@ -358,11 +512,35 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
             use_web: Forcer la recherche web.
             use_rag: Forcer le RAG.
             enable_reflection: Mode réflexion.
-            user_id: ID utilisateur.
-            
+            user_id: ID utilisateur (si `context` n'est pas fourni).
+            context: Contexte de la requête (session, utilisateur, échéance).
+        
         Yields:
             Dictionnaires d'événements SSE.
+        
+        Raises:
+            QueryDeadlineExceeded: Échéance dépassée (vérifiée entre les
+                étapes et les fragments).
         """
+        ctx = context or QueryContext.create(user_id=user_id)
+        with structlog.contextvars.bound_contextvars(**ctx.log_fields()):
+            async with aclosing(self._query_stream(
+                question, system_prompt, use_web, use_rag, enable_reflection, ctx,
+            )) as events:
+                async for event in events:
+                    yield event
+    
+    async def _query_stream(
+        self,
+        question: str,
+        system_prompt: str | None,
+        use_web: bool | None,
+        use_rag: bool | None,
+        enable_reflection: bool | None,
+        ctx: QueryContext,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Pipeline de `query_stream` pour un contexte donné."""
+        user_id = ctx.user_id
         start_time = time.time()
         sources: list[ContextSource] = []
         
@@ -387,129 +565,180 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
             },
         }
         
-        # 2. Recherches parallèles si nécessaire
-        vector_context = ""
+        # 2. Recherches : le RAG tourne en tâche de fond pendant le flux web
+        vector_chunks: list[ContextChunk] = []
+        retrieval = RetrievalTimings()
         web_context = ""
+        vector_task: asyncio.Task | None = None
+        web: WebStreamState | None = None
+        web_task: asyncio.Task | None = None
         
-        async def search_rag():
-            nonlocal vector_context, sources
-            if routing.should_use_rag:
-                yield {"event": "search_start", "data": {"type": "rag"}}
-                context, src = await self._search_vector_store(question, user_id)
-                vector_context = context
-                sources.extend(src)
-                yield {
-                    "event": "search_complete",
-                    "data": {"type": "rag", "results": len(src)},
-                }
-        
-        async def search_web():
-            nonlocal web_context, sources
-            if routing.should_use_web:
-                yield {"event": "search_start", "data": {"type": "web"}}
-                result = await self._search_web(question)
-                if result:
-                    web_context = result.content
-                    sources.append(ContextSource(
-                        source_type="perplexity",
-                        content_preview=web_context[:500],
-                        url=result.sources[0] if result.sources else None,
-                    ))
-                yield {
-                    "event": "search_complete",
-                    "data": {"type": "web", "found": bool(result)},
-                }
-        
-        # Exécuter les recherches
         if routing.should_use_rag:
             yield {"event": "search_start", "data": {"type": "rag"}}
-            vector_context, vector_sources = await self._search_vector_store(
-                question, user_id
+            vector_task = asyncio.create_task(
+                self._search_vector_store(question, user_id, ctx.filters, ctx.search_effort)
             )
-            sources.extend(vector_sources)
-            yield {
-                "event": "search_complete",
-                "data": {"type": "rag", "results": len(vector_sources)},
-            }
         
-        if routing.should_use_web:
-            yield {"event": "search_start", "data": {"type": "web"}}
-            web_result = await self._search_web(question)
-            if web_result:
-                web_context = web_result.content
-                sources.append(ContextSource(
-                    source_type="perplexity",
-                    content_preview=web_context[:500],
-                    url=web_result.sources[0] if web_result.sources else None,
-                ))
-            yield {
-                "event": "search_complete",
-                "data": {"type": "web", "found": bool(web_result)},
-            }
-        
-        # 3. Génération en streaming
-        yield {"event": "generation_start", "data": {}}
-        
-        full_context = self._build_context(vector_context, web_context)
-        provider = self._get_llm_provider()
-        messages = provider.build_messages(
-            question,
-            context=full_context if full_context else None,
-            system_prompt=system_prompt or self.DEFAULT_SYSTEM_PROMPT,
-        )
-        
-        full_response = ""
-        thought_content = ""
-        
-        async for chunk in provider.generate_stream(messages):
-            if chunk.is_thought:
-                thought_content += chunk.content
+        try:
+            if routing.should_use_web:
+                yield {"event": "search_start", "data": {"type": "web"}}
+                web = WebStreamState()
+                web_task = asyncio.create_task(self._consume_web_stream(question, web))
+                early_start = False
+                
+                while True:
+                    content = await web.chunks.get()
+                    if content is None:
+                        break
+                    
+                    ctx.check_deadline()
+                    web_context += content
+                    yield {
+                        "event": "web_chunk",
+                        "data": {"content": content},
+                    }
+                    
+                    # Le flux continue en tâche de fond (sources, usage)
+                    if self._has_enough_web_context(web_context):
+                        early_start = True
+                        break
+                
                 yield {
-                    "event": "thought",
-                    "data": {"content": chunk.content},
+                    "event": "search_complete",
+                    "data": {
+                        "type": "web",
+                        "found": bool(web_context),
+                        "partial": early_start,
+                    },
                 }
-            else:
-                full_response += chunk.content
+            
+            if vector_task is not None:
+                vector_chunks, vector_sources, retrieval = await vector_task
+                # Conserver l'ordre historique : sources personnelles d'abord
+                sources[:0] = vector_sources
                 yield {
-                    "event": "chunk",
-                    "data": {"content": chunk.content},
+                    "event": "search_complete",
+                    "data": {"type": "rag", "results": len(vector_sources)},
                 }
         
-        # 4. Finalisation
-        elapsed_ms = int((time.time() - start_time) * 1000)
+            # 3. Génération en streaming
+            ctx.check_deadline()
+            yield {"event": "generation_start", "data": {}}
         
-        # Logger la conversation
-        conversation_id = None
-        if self.config.log_conversations:
-            conversation_id = await self._log_conversation(
+            # En streaming, la réponse est déjà envoyée : seule la sélection
+            # initiale de la cascade s'applique (pas d'auto-vérification)
+            cascade_decision = self._cascade.select(routing)
+            packed = self._build_context(vector_chunks, web_context, cascade_decision.model)
+            full_context = packed.text
+            history = await self._memory.history(ctx.session_id, user_id, cascade_decision.model)
+            provider = self._get_llm_provider(cascade_decision.model)
+            generation_start = time.time()
+            messages = provider.build_messages(
                 question,
-                full_response,
-                sources,
-                {"input": 0, "output": 0},  # Tokens non disponibles en streaming
-                elapsed_ms,
-                user_id,
-                thought_process=thought_content if thought_content else None,
+                context=full_context if full_context else None,
+                history=history,
+                system_prompt=system_prompt or self.DEFAULT_SYSTEM_PROMPT,
             )
         
-        yield {
-            "event": "complete",
-            "data": {
-                "conversation_id": conversation_id,
-                "sources": [
-                    {
-                        "source_type": s.source_type,
-                        "content_preview": s.content_preview,
-                        "similarity_score": s.similarity_score,
-                        "url": s.url,
+            full_response = ""
+            thought_content = ""
+            usage: TokenUsage | None = None
+        
+            async for chunk in provider.generate_stream(messages):
+                ctx.check_deadline()
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.content:
+                    continue
+                if chunk.is_thought:
+                    thought_content += chunk.content
+                    yield {
+                        "event": "thought",
+                        "data": {"content": chunk.content},
                     }
-                    for s in sources
-                ],
-                "metadata": {
-                    "elapsed_ms": elapsed_ms,
-                    "routing_intent": routing.intent.value,
+                else:
+                    full_response += chunk.content
+                    yield {
+                        "event": "chunk",
+                        "data": {"content": chunk.content},
+                    }
+        
+            # 4. Finalisation
+            if web_task is not None:
+                # Réponse web complète : fragments reçus après le démarrage anticipé
+                await self._finish_web_stream(web_task, ctx)
+                if web.content:
+                    sources.append(ContextSource(
+                        source_type="perplexity",
+                        content_preview=web.content[:500],
+                        url=web.sources[0] if web.sources else None,
+                    ))
+            
+            await self._memory.remember(ctx.session_id, user_id, question, full_response)
+            elapsed_ms = int((time.time() - start_time) * 1000)
+            
+            if self._cascade.config.enabled:
+                generation_ms = int((time.time() - generation_start) * 1000)
+                is_large = cascade_decision.model == self.config.llm_model
+                self._cascade.stats.record(
+                    cascade_decision,
+                    small_latency_ms=None if is_large else generation_ms,
+                    large_latency_ms=generation_ms if is_large else None,
+                )
+            
+            if usage is None:
+                # Provider sans chunk final : estimation locale
+                counter = get_token_counter(provider.config.model)
+                usage = TokenUsage(
+                    input_tokens=counter.count_messages(messages),
+                    output_tokens=counter.count(thought_content + full_response),
+                )
+            
+            # Logger la conversation
+            conversation_id = None
+            if self.config.log_conversations:
+                conversation_id = await self._log_conversation(
+                    question,
+                    full_response,
+                    sources,
+                    {"input": usage.input_tokens, "output": usage.output_tokens},
+                    elapsed_ms,
+                    ctx.session_id,
+                    user_id,
+                    thought_process=thought_content if thought_content else None,
+                    model_used=cascade_decision.model,
+                )
+            
+            yield {
+                "event": "complete",
+                "data": {
+                    "conversation_id": conversation_id,
+                    "sources": [
+                        {
+                            "source_type": s.source_type,
+                            "content_preview": s.content_preview,
+                            "similarity_score": s.similarity_score,
+                            "url": s.url,
+                        }
+                        for s in sources
+                    ],
+                    "metadata": {
+                        "elapsed_ms": elapsed_ms,
+                        "routing_intent": routing.intent.value,
+                        "tokens_input": usage.input_tokens,
+                        "tokens_output": usage.output_tokens,
+                        "tokens_source": usage.source,
+                        "web_tokens": web.tokens_used if web is not None else 0,
+                        **cascade_decision.to_metadata(),
+                        **packed.to_metadata(),
+                        **retrieval.to_metadata(),
+                    },
                 },
-            },
-        }
+            }
+        finally:
+            for task in (vector_task, web_task):
+                if task is not None and not task.done():
+                    task.cancel()
     
     def query(
         self,
@@ -524,7 +753,7 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
             question: Question de l'utilisateur.
             system_prompt: Prompt système personnalisé.
             use_web: Forcer/désactiver la recherche web.
-            
+        
         Returns:
             RAGResponse avec la réponse et les sources.
         """
@@ -540,45 +769,187 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
             self.query_async(question, system_prompt, use_web)
         )
     
+    async def _generate_answer(
+        self,
+        routing: RoutingDecision,
+        messages: list[dict[str, str]],
+        system_prompt: str,
+        has_context: bool,
+    ) -> tuple[LLMResponse, CascadeDecision]:
+        """
+        Génère la réponse, via le petit modèle d'abord si la cascade le permet.
+        
+        En cas d'escalade après auto-vérification, les tokens des deux
+        appels sont cumulés dans la réponse retournée. Une erreur du petit
+        modèle escalade aussi (raison "error").
+        
+        Returns:
+            Tuple (réponse, décision de cascade).
+        """
+        decision = self._cascade.select(routing)
+        small_response: LLMResponse | None = None
+        small_latency_ms: int | None = None
+        
+        if decision.model != self.config.llm_model:
+            started = time.time()
+            try:
+                small_response = await self._get_llm_provider(decision.model).generate(
+                    messages,
+                    system_prompt=system_prompt,
+                )
+            except Exception as e:
+                # 429, timeout... : le grand modèle prend le relais
+                self.logger.warning("Small model failed", model=decision.model, error=str(e))
+                reason = "error"
+            else:
+                reason = self._cascade.check_answer(small_response, routing, has_context)
+            small_latency_ms = int((time.time() - started) * 1000)
+            
+            if reason is None:
+                self._cascade.stats.record(decision, small_latency_ms, None)
+                return small_response, decision
+            
+            self.logger.info(
+                "Cascade escalation",
+                reason=reason,
+                small_model=decision.model,
+                large_model=self.config.llm_model,
+            )
+            decision = CascadeDecision(
+                model=self.config.llm_model,
+                escalated=True,
+                reason=reason,
+            )
+        
+        provider = self._get_llm_provider()
+        started = time.time()
+        if routing.use_reflection:
+            llm_response = await provider.generate_with_reflection(messages)
+        else:
+            llm_response = await provider.generate(
+                messages,
+                system_prompt=system_prompt,
+            )
+        large_latency_ms = int((time.time() - started) * 1000)
+        
+        if small_response is not None:
+            llm_response.tokens_input += small_response.tokens_input
+            llm_response.tokens_output += small_response.tokens_output
+        
+        if self._cascade.config.enabled:
+            self._cascade.stats.record(decision, small_latency_ms, large_latency_ms)
+        
+        return llm_response, decision
+    
     async def _search_vector_store(
         self,
         query: str,
         user_id: str | None = None,
-    ) -> tuple[str, list[ContextSource]]:
-        """Recherche dans le Vector Store."""
+        filters: DocumentFilter | None = None,
+        search_effort: SearchEffort | None = None,
+    ) -> tuple[list[ContextChunk], list[ContextSource], RetrievalTimings]:
+        """
+        Recherche dans le Vector Store (fragments candidats et sources).
+        
+        Recherche en deux temps : identifiants et scores d'abord (candidats
+        sur-échantillonnés, diversifiés par MMR), puis lecture groupée
+        (cache des fragments) du seul contenu des résultats qui peuvent
+        entrer dans le budget de contexte, re-rankés si un re-ranker est
+        configuré. Les filtres de métadonnées sont évalués en SQL, pendant
+        le parcours de l'index : les candidats les satisfont tous.
+        
+        Returns:
+            Tuple (fragments, sources, durées des étapes).
+        
+        Raises:
+            ProviderQueueTimeout: Si le provider d'embedding est saturé.
+        """
+        timings = RetrievalTimings()
         try:
             # Générer l'embedding de la requête
-            query_embedding = self._embedding_service.embed_query(query)
+            # (appels bloquants déportés dans un thread pour ne pas
+            # geler la boucle pendant le flux web)
+            with timings.stage("embed"):
+                query_embedding = await asyncio.to_thread(
+                    self._embedding_service.embed_query, query
+                )
             
-            # Rechercher les documents similaires
-            matches = self._document_repo.search_similar(
-                query_embedding,
-                threshold=self.config.vector_threshold,
-                limit=self.config.vector_max_results,
-                user_id=user_id,
-            )
+            # Phase 1 : identifiants, scores et tailles des candidats
+            k = self.config.vector_max_results
+            with timings.stage("search"):
+                hits = await self._documents.search_ids(
+                    query_embedding,
+                    threshold=self.config.vector_threshold,
+                    limit=self._reranking.candidate_count(k),
+                    user_id=user_id,
+                    filters=filters,
+                    search_effort=search_effort,
+                )
+            
+            if not hits:
+                return [], [], timings
+            
+            # Diversification (budget de temps partagé avec le re-ranking)
+            deadline = self._reranking.deadline()
+            with timings.stage("mmr"):
+                hits = await self._reranking.diversify(
+                    hits, k, self._documents.get_embeddings, deadline,
+                )
             
-            if not matches:
-                return "", []
+            # Phase 2 : contenu des seuls résultats qui peuvent être placés
+            # (budget du grand modèle, le plus large de la cascade)
+            selected = hits[:self._packer.preselect(
+                [hit.content_bytes for hit in hits],
+                self.config.llm_model,
+            )]
+            with timings.stage("fetch"):
+                bodies = await self._chunk_bodies.fetch(
+                    [str(hit.id) for hit in selected],
+                    self._documents.get_contents,
+                )
+            # Supprimés entre les deux phases
+            selected = [hit for hit in selected if str(hit.id) in bodies]
             
-            # Construire le contexte
-            context_parts = []
+            with timings.stage("rerank"):
+                order = await self._reranking.rerank(
+                    query,
+                    [bodies[str(hit.id)] for hit in selected],
+                    deadline,
+                )
+            
+            # Fragments candidats (le packing se fait dans _build_context) :
+            # le rang transmet au packer l'ordre de la diversification et
+            # du re-ranking
+            chunks = []
             sources = []
             
-            for match in matches:
-                context_parts.append(match.content)
+            for rank, i in enumerate(order):
+                hit = selected[i]
+                content = bodies[str(hit.id)]
+                chunks.append(ContextChunk(text=content, score=hit.similarity, rank=rank))
                 sources.append(ContextSource(
                     source_type="vector_store",
-                    document_id=match.id,
-                    content_preview=match.content[:300],
-                    similarity_score=match.similarity,
+                    document_id=hit.id,
+                    content_preview=content[:300],
+                    similarity_score=hit.similarity,
                 ))
             
-            return "\n\n---\n\n".join(context_parts), sources
-            
+            self.logger.debug(
+                "Vector search",
+                candidates=len(hits),
+                fetched=len(selected),
+                payload_bytes=sum(hit.content_bytes for hit in selected),
+                **timings.stages,
+            )
+            return chunks, sources, timings
+        
+        except ProviderQueueTimeout:
+            # Saturation : la route répond PROVIDER_BUSY plutôt que
+            # de générer une réponse sans contexte
+            raise
         except Exception as e:
             self.logger.error("Vector search failed", error=str(e))
-            return "", []
+            return [], [], timings
     
     async def _search_web(self, query: str) -> WebSearchResult | None:
         """Recherche web via Perplexity."""
@@ -594,23 +965,110 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
             self.logger.error("Web search failed", error=str(e))
             return None
     
+    async def _search_web_stream(self, query: str) -> AsyncIterator[WebSearchChunk]:
+        """
+        Recherche web via Perplexity, fragment par fragment.
+        
+        Si le streaming web est désactivé, la réponse complète
+        est émise en un seul fragment.
+        """
+        if not self._perplexity.is_enabled:
+            return
+        
+        if not self.config.web_streaming:
+            result = await self._search_web(query)
+            if result:
+                yield WebSearchChunk(
+                    content=result.content,
+                    sources=result.sources,
+                    is_final=True,
+                    tokens_used=result.tokens_used,
+                )
+            return
+        
+        async for chunk in self._perplexity.search_stream(
+            query,
+            max_tokens=self.config.web_max_tokens,
+        ):
+            yield chunk
+    
+    async def _consume_web_stream(self, query: str, state: WebStreamState) -> None:
+        """
+        Lit le flux web jusqu'au bout (tâche de fond de `query_stream`).
+        
+        Les fragments sont publiés dans `state.chunks` pour la diffusion ;
+        None marque la fin du flux, y compris en cas d'erreur.
+        """
+        try:
+            async with aclosing(self._search_web_stream(query)) as web_stream:
+                async for chunk in web_stream:
+                    if chunk.sources:
+                        state.sources = chunk.sources
+                    if chunk.tokens_used:
+                        state.tokens_used = chunk.tokens_used
+                    if chunk.content:
+                        state.content += chunk.content
+                        state.chunks.put_nowait(chunk.content)
+        except Exception as e:
+            self.logger.error("Web search stream failed", error=str(e))
+        finally:
+            state.chunks.put_nowait(None)
+    
+    async def _finish_web_stream(self, task: asyncio.Task, ctx: QueryContext) -> None:
+        """
+        Attend la fin du flux web après la génération.
+        
+        L'attente est bornée par l'échéance de la requête ; au-delà,
+        le contexte reçu jusque-là est conservé et la tâche annulée.
+        """
+        if task.done():
+            return
+        await asyncio.wait({task}, timeout=ctx.remaining())
+        if not task.done():
+            self.logger.warning("Web search stream still running at completion")
+            task.cancel()
+    
+    def _has_enough_web_context(self, web_context: str) -> bool:
+        """
+        Indique si le contexte web reçu suffit pour lancer la génération.
+        
+        On coupe uniquement en fin de phrase pour ne pas injecter
+        une information tronquée dans le prompt.
+        """
+        threshold = self.config.web_early_start_chars
+        if threshold <= 0 or len(web_context) < threshold:
+            return False
+        return web_context.rstrip().endswith((".", "!", "?", "\n"))
+    
     def _build_context(
         self,
-        vector_context: str,
+        vector_chunks: list[ContextChunk],
         web_context: str,
-    ) -> str:
-        """Fusionne les contextes."""
-        parts = []
-        
-        if vector_context:
-            parts.append(f"""=== CONTEXTE PERSONNEL ===
-{vector_context}""")
+        model: str,
+    ) -> PackedContext:
+        """
+        Fusionne les contextes dans le budget de tokens du modèle.
         
+        Args:
+            vector_chunks: Documents du Vector Store (score = similarité).
+            web_context: Réponse web (découpée en paragraphes).
+            model: Modèle de génération (tokenizer et budget).
+        """
+        chunks = list(vector_chunks)
         if web_context:
-            parts.append(f"""=== INFORMATIONS WEB RÉCENTES ===
-{web_context}""")
+            chunks += web_chunks(web_context, self.config.context.web_score)
         
-        return "\n\n".join(parts) if parts else ""
+        packed = self._packer.pack(chunks, model)
+        if packed.dropped_tokens:
+            self.logger.info(
+                "Context packed",
+                model=model,
+                budget=packed.budget,
+                packed_tokens=packed.packed_tokens,
+                dropped_tokens=packed.dropped_tokens,
+                deduplicated=packed.deduplicated_chunks,
+            )
+        return packed
     
     async def _log_conversation(
         self,
@@ -619,11 +1077,19 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
         sources: list[ContextSource],
         tokens: dict[str, int],
         elapsed_ms: int,
+        session_id: str,
         user_id: str | None = None,
         thought_process: str | None = None,
         routing_decision: Any | None = None,
+        model_used: str | None = None,
     ) -> str | None:
-        """Enregistre la conversation avec les données de réflexion et routage."""
+        """
+        Journalise la conversation avec les données de réflexion et routage.
+        
+        L'ID est généré ici et renvoyé immédiatement : l'insert est
+        différé et groupé par le writer des conversations (réessayé en
+        cas d'échec, hors du chemin critique).
+        """
         try:
             # Préparer les données de routage
             routing_info = None
@@ -639,13 +1105,13 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
                 }
             
             conv = ConversationCreate(
-                session_id=self._session_id,
+                session_id=session_id,
                 user_query=question,
                 ai_response=answer,
                 context_sources=sources,
                 user_id=user_id,
                 metadata=ConversationMetadata(
-                    model_used=self.config.llm_model,
+                    model_used=model_used or self.config.llm_model,
                     tokens_input=tokens.get("input", 0),
                     tokens_output=tokens.get("output", 0),
                     response_time_ms=elapsed_ms,
@@ -666,9 +1132,15 @@ Réponds dans la langue de la question. Tutoie si l'utilisateur tutoie, vouvoie
                 ),
             )
             
-            created = self._conversation_repo.log_conversation(conv)
-            return str(created.id)
-            
+            conversation_id = uuid4()
+            self._conversation_log.append(
+                ConversationRepository.log_row(conv, conversation_id)
+            )
+            if not self._conversation_log.running:
+                # Hors API (scripts, CLI) : pas de tâche de fond
+                await self._conversation_log.flush()
+            return str(conversation_id)
+        
         except Exception as e:
             self.logger.error("Failed to log conversation", error=str(e))
             return None
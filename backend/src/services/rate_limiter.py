@@ -2,29 +2,182 @@
 Rate Limiter Service
 ====================
 
-Gestion du rate limiting utilisant Redis pour le stockage des compteurs.
+Gestion du rate limiting par GCRA (Generic Cell Rate Algorithm).
 Prend en charge les limites par clé API et par IP.
+
+Le GCRA est équivalent à un sliding window sans effet de bord :
+une limite de N requêtes par fenêtre W autorise au plus N requêtes
+sur n'importe quelle fenêtre glissante de W secondes (pas de rafale
+2x à la frontière de deux fenêtres fixes).
+
+- Redis : un script Lua atomique, un seul aller-retour, horloge Redis
+  (`TIME`) partagée par toutes les instances
+- Redis indisponible : GCRA en mémoire, par processus (dégradé mais
+  jamais ouvert)
 """
 
+import math
 import time
-from typing import Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
 from src.config.redis import get_redis_client
 from src.config.settings import get_settings
 from src.config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Nombre maximal de clés suivies par le fallback mémoire
+LOCAL_MAX_KEYS = 10_000
+
+# GCRA atomique
+# KEYS[1] : clé de la limite
+# ARGV[1] : intervalle d'émission T = W / N (ms)
+# ARGV[2] : fenêtre W (ms)
+# Retour : {allowed, remaining, retry_after_ms, reset_after_ms, now_ms}
+GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission
+local allow_at = new_tat - window
+
+if now < allow_at then
+    return {0, 0, allow_at - now, tat - now, now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(math.ceil(new_tat - now), 1))
+local remaining = math.floor((window - (new_tat - now)) / emission)
+return {1, remaining, 0, new_tat - now, now}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """
+    Résultat d'une vérification de rate limit.
+    
+    Attributes:
+        allowed: Requête autorisée.
+        limit: Limite appliquée (requêtes par fenêtre).
+        remaining: Requêtes encore disponibles immédiatement.
+        retry_after: Secondes avant qu'une requête soit de nouveau acceptée.
+        reset_at: Timestamp Unix (secondes) du quota entièrement reconstitué.
+    """
+    
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int = 0
+    reset_at: int = 0
+    
+    @property
+    def count(self) -> int:
+        """Requêtes consommées dans la fenêtre courante."""
+        return max(0, self.limit - self.remaining)
+
+
+def gcra(
+    tat: float | None,
+    now_ms: float,
+    emission_ms: float,
+    window_ms: float,
+) -> tuple[bool, int, float, float, float]:
+    """
+    GCRA en mémoire (même calcul que le script Lua).
+    
+    Returns:
+        (allowed, remaining, retry_after_ms, reset_after_ms, nouveau_tat)
+    """
+    if tat is None or tat < now_ms:
+        tat = now_ms
+    
+    new_tat = tat + emission_ms
+    allow_at = new_tat - window_ms
+    
+    if now_ms < allow_at:
+        return False, 0, allow_at - now_ms, tat - now_ms, tat
+    
+    remaining = int((window_ms - (new_tat - now_ms)) // emission_ms)
+    return True, remaining, 0.0, new_tat - now_ms, new_tat
+
+
 class RateLimiter:
     """
-    Service de rate limiting basé sur Redis (Fixed Window).
+    Service de rate limiting GCRA (Redis + fallback mémoire).
     """
     
     def __init__(self):
         self.settings = get_settings()
+        self._script: Any = None
+        self._script_client: Any = None
+        # Fallback mémoire : clé -> TAT (ms), LRU borné
+        self._local: OrderedDict[str, float] = OrderedDict()
+    
+    async def check(
+        self,
+        key: str,
+        limit: Optional[int] = None,
+        window: int = 60,
+    ) -> RateLimitResult:
+        """
+        Vérifie et consomme une requête pour une clé donnée.
         
+        Args:
+            key: Identifiant unique (ex: prefixe_cle ou IP).
+            limit: Nombre max de requêtes dans la fenêtre (défaut depuis settings).
+            window: Taille de la fenêtre en secondes (défaut 60s).
+        
+        Returns:
+            RateLimitResult (limite <= 0 : illimité).
+        """
+        max_requests = limit if limit is not None else self.settings.rate_limit_requests
+        
+        if not self.settings.rate_limit_enabled or max_requests <= 0:
+            return RateLimitResult(
+                allowed=True,
+                limit=max(max_requests, 0),
+                remaining=max(max_requests, 0),
+            )
+        
+        window_ms = window * 1000
+        emission_ms = window_ms / max_requests
+        
+        result = await self._check_redis(key, emission_ms, window_ms)
+        if result is None:
+            result = self._check_local(key, emission_ms, window_ms)
+        
+        allowed, remaining, retry_after_ms, reset_after_ms, now_ms = result
+        rate_limit = RateLimitResult(
+            allowed=bool(allowed),
+            limit=max_requests,
+            remaining=int(remaining),
+            retry_after=math.ceil(retry_after_ms / 1000),
+            reset_at=math.ceil((now_ms + reset_after_ms) / 1000),
+        )
+        
+        if not rate_limit.allowed:
+            logger.warning(
+                "Rate limit exceeded",
+                key=key,
+                limit=max_requests,
+                retry_after=rate_limit.retry_after,
+            )
+        
+        return rate_limit
+    
     async def is_allowed(
-        self, 
-        key: str, 
+        self,
+        key: str,
         limit: Optional[int] = None,
         window: int = 60
     ) -> Tuple[bool, int, int]:
@@ -35,59 +188,61 @@ class RateLimiter:
             key: Identifiant unique (ex: prefixe_cle ou IP).
             limit: Nombre max de requêtes dans la fenêtre (défaut depuis settings).
             window: Taille de la fenêtre en secondes (défaut 60s).
-            
+        
         Returns:
             (allowed, current_count, retry_after)
         """
-        if not self.settings.rate_limit_enabled:
-            return True, 0, 0
-            
+        result = await self.check(key, limit=limit, window=window)
+        return result.allowed, result.count, result.retry_after
+    
+    async def _check_redis(
+        self,
+        key: str,
+        emission_ms: float,
+        window_ms: float,
+    ) -> tuple | None:
+        """Exécute le script GCRA. Retourne None si Redis est indisponible."""
         redis = await get_redis_client()
         if not redis:
-            # Fallback si Redis est indisponible
-            logger.warning("Redis unavailable for rate limiting, allowing request")
-            return True, 0, 0
-            
-        # Résolution de la limite
-        max_requests = limit if limit is not None else self.settings.rate_limit_requests
-        if max_requests <= 0:
-            return True, 0, 0
-            
-        # Clé Redis : rl:{key}:{timestamp_fenetre}
-        current_time = int(time.time())
-        window_id = current_time // window
-        redis_key = f"rl:{key}:{window_id}"
+            return None
         
         try:
-            # Incrémenter et récupérer le compteur
-            # On utilise pipeline pour s'assurer de l'expiration
-            pipe = redis.pipeline()
-            pipe.incr(redis_key)
-            pipe.expire(redis_key, window + 5) # Un peu plus que la fenêtre
-            results = await pipe.execute()
-            
-            count = results[0]
-            allowed = count <= max_requests
-            
-            # Temps restant avant la fin de la fenêtre
-            retry_after = window - (current_time % window) if not allowed else 0
-            
-            if not allowed:
-                logger.warning(
-                    "Rate limit exceeded", 
-                    key=key, 
-                    count=count, 
-                    limit=max_requests
-                )
-                
-            return allowed, count, retry_after
+            # register_script : EVALSHA, avec rechargement sur NOSCRIPT
+            if self._script is None or self._script_client is not redis:
+                self._script = redis.register_script(GCRA_SCRIPT)
+                self._script_client = redis
             
+            values = await self._script(
+                keys=[f"rl:{key}"],
+                args=[emission_ms, window_ms],
+            )
+            return tuple(float(v) for v in values)
+        
         except Exception as e:
-            logger.error("Rate limiter error", error=str(e))
-            return True, 0, 0
-
+            logger.error("Rate limiter error, using local fallback", error=str(e))
+            return None
+    
+    def _check_local(
+        self,
+        key: str,
+        emission_ms: float,
+        window_ms: float,
+    ) -> tuple:
+        """GCRA en mémoire (limite appliquée par processus)."""
+        now_ms = time.time() * 1000
+        allowed, remaining, retry_after_ms, reset_after_ms, tat = gcra(
+            self._local.get(key), now_ms, emission_ms, window_ms
+        )
+        
+        self._local[key] = tat
+        self._local.move_to_end(key)
+        while len(self._local) > LOCAL_MAX_KEYS:
+            self._local.popitem(last=False)
+        
+        return allowed, remaining, retry_after_ms, reset_after_ms, now_ms
+    
     async def check_reflection_limit(
-        self, 
+        self,
         user_id: str,
     ) -> Tuple[bool, int, int]:
         """
@@ -98,8 +253,8 @@ class RateLimiter:
         window = 60 # 1 minute
         
         return await self.is_allowed(
-            f"reflection:{user_id}", 
-            limit=limit, 
+            f"reflection:{user_id}",
+            limit=limit,
             window=window
         )
 
@@ -0,0 +1,261 @@
+"""
+Reranking
+==========
+
+Ré-ordonnancement des résultats de la recherche vectorielle.
+
+Le top-k brut contient souvent des fragments quasi identiques (même
+fichier, paragraphes voisins) qui consomment le budget de contexte.
+Étapes, sur un ensemble de candidats sur-échantillonné (`fetch_multiplier`
+× k) :
+1. diversification MMR (Maximal Marginal Relevance), vectorisée NumPy
+   sur les vecteurs compacts renvoyés par la phase 1 (migration 016) ;
+   à défaut, sur les embeddings complets (cache des embeddings)
+2. re-ranking optionnel (`Reranker` : cross-encoder, API de rerank...)
+   sur le contenu des fragments retenus
+
+Les deux étapes partagent un budget de temps strict : au-delà, l'ordre
+courant est conservé (MMR ignorée, re-ranking abandonné). Les durées
+de chaque étape de la recherche sont remontées dans les métadonnées.
+
+Usage:
+    >>> selected = await reranking.diversify(hits, k, documents.get_embeddings, deadline)
+    >>> order = await reranking.rerank(question, texts, deadline)
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterator, Protocol
+
+import numpy as np
+
+from src.config.logging_config import LoggerMixin
+from src.models.document import DocumentHit
+from src.services import similarity
+from src.services.chunk_cache import ChunkEmbeddingCache, get_chunk_embedding_cache
+
+
+# Lecture en lot des embeddings : ids -> {id: embedding}
+EmbeddingLoader = Callable[[list[str]], Awaitable[dict[str, list[float]]]]
+
+
+class Reranker(Protocol):
+    """Re-ranker de fragments (score de pertinence par texte)."""
+    
+    name: str
+    
+    async def score(self, query: str, texts: list[str]) -> list[float]:
+        """Scores de pertinence (plus haut = plus pertinent), un par texte."""
+        ...
+
+
+@dataclass
+class RerankConfig:
+    """Configuration du ré-ordonnancement."""
+    
+    enabled: bool = True
+    
+    # Candidats lus en phase 1 : fetch_multiplier × k
+    fetch_multiplier: int = 4
+    
+    # Compromis pertinence / diversité (1.0 = pertinence seule)
+    mmr_lambda: float = 0.7
+    
+    # Budget de temps de la diversification et du re-ranking (ms)
+    time_budget_ms: float = 150.0
+
+
+@dataclass
+class RetrievalTimings:
+    """Durée de chaque étape de la recherche vectorielle (ms)."""
+    
+    stages: dict[str, float] = field(default_factory=dict)
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mesure une étape (cumulée si répétée)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed, 2)
+    
+    def to_metadata(self) -> dict[str, Any]:
+        return {"retrieval_timings_ms": dict(self.stages)}
+
+
+def mmr_select(
+    embeddings: np.ndarray,
+    relevance: np.ndarray,
+    k: int,
+    lambda_: float = 0.7,
+) -> list[int]:
+    """
+    Sélection MMR : pertinence moins redondance avec les déjà retenus.
+    
+    score(i) = λ·pertinence(i) − (1 − λ)·max_j∈S cos(i, j)
+    
+    La matrice de similarité est calculée une fois (n × n) ; chaque
+    itération met à jour la redondance maximale en O(n).
+    
+    Args:
+        embeddings: Embeddings des candidats (n × d).
+        relevance: Pertinence des candidats (similarité à la requête).
+        k: Nombre de candidats à retenir.
+        lambda_: Compromis pertinence / diversité.
+    
+    Returns:
+        Indices retenus, dans l'ordre de sélection.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    
+    pairwise = similarity.many_to_many(similarity.as_matrix(embeddings))
+    
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    
+    while len(selected) < k:
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    
+    return selected
+
+
+class ResultReranker(LoggerMixin):
+    """
+    Diversification MMR et re-ranking optionnel, sous budget de temps.
+    
+    Attributes:
+        config: Configuration.
+        reranker: Re-ranker optionnel (None = MMR seule).
+    """
+    
+    def __init__(
+        self,
+        config: RerankConfig | None = None,
+        reranker: Reranker | None = None,
+        embedding_cache: ChunkEmbeddingCache | None = None,
+    ) -> None:
+        self.config = config or RerankConfig()
+        self.reranker = reranker
+        self._embeddings = embedding_cache or get_chunk_embedding_cache()
+    
+    def candidate_count(self, k: int) -> int:
+        """Nombre de candidats à lire en phase 1 pour en retenir k."""
+        if not self.config.enabled:
+            return k
+        return k * max(1, self.config.fetch_multiplier)
+    
+    def deadline(self) -> float:
+        """Échéance du ré-ordonnancement (horloge `time.monotonic`)."""
+        return time.monotonic() + self.config.time_budget_ms / 1000
+    
+    async def diversify(
+        self,
+        hits: list[DocumentHit],
+        k: int,
+        load_embeddings: EmbeddingLoader,
+        deadline: float,
+    ) -> list[DocumentHit]:
+        """
+        Retient k candidats par MMR.
+        
+        Les vecteurs compacts des candidats (phase 1) sont utilisés s'ils
+        sont tous présents ; sinon les embeddings complets sont lus.
+        Budget dépassé (lecture des embeddings) : les k plus similaires
+        sont retenus.
+        
+        Args:
+            hits: Candidats, par similarité décroissante.
+            k: Nombre de candidats à retenir.
+            load_embeddings: Lecture en lot des embeddings absents du cache.
+            deadline: Échéance (horloge `time.monotonic`).
+        
+        Returns:
+            Candidats retenus, dans l'ordre MMR.
+        """
+        if not self.config.enabled or len(hits) <= k:
+            return hits[:k]
+        
+        ids = [str(hit.id) for hit in hits]
+        if all(hit.embedding_compact for hit in hits):
+            vectors = {
+                str(hit.id): np.asarray(hit.embedding_compact, dtype=np.float32)
+                for hit in hits
+            }
+        else:
+            try:
+                vectors = await asyncio.wait_for(
+                    self._embeddings.fetch(ids, self._load_arrays(load_embeddings)),
+                    timeout=max(0.0, deadline - time.monotonic()),
+                )
+            except asyncio.TimeoutError:
+                self.logger.warning("MMR skipped: time budget exceeded", candidates=len(hits))
+                return hits[:k]
+        
+        if len(vectors) < len(ids):
+            # Candidats supprimés entre-temps : on ne diversifie que le reste
+            hits = [hit for hit in hits if str(hit.id) in vectors]
+            ids = [str(hit.id) for hit in hits]
+            if len(hits) <= k:
+                return hits
+        
+        order = mmr_select(
+            np.stack([vectors[id] for id in ids]),
+            np.array([hit.similarity for hit in hits], dtype=np.float32),
+            k,
+            self.config.mmr_lambda,
+        )
+        return [hits[i] for i in order]
+    
+    async def rerank(self, query: str, texts: list[str], deadline: float) -> list[int]:
+        """
+        Ordre des textes selon le re-ranker.
+        
+        Sans re-ranker, budget dépassé ou erreur : ordre inchangé.
+        
+        Args:
+            query: Question de l'utilisateur.
+            texts: Contenu des fragments, dans l'ordre courant.
+            deadline: Échéance (horloge `time.monotonic`).
+        
+        Returns:
+            Indices des textes, du plus au moins pertinent.
+        """
+        identity = list(range(len(texts)))
+        if self.reranker is None or not self.config.enabled or len(texts) < 2:
+            return identity
+        
+        try:
+            scores = await asyncio.wait_for(
+                self.reranker.score(query, texts),
+                timeout=max(0.0, deadline - time.monotonic()),
+            )
+        except asyncio.TimeoutError:
+            self.logger.warning("Rerank skipped: time budget exceeded", reranker=self.reranker.name)
+            return identity
+        except Exception as e:
+            self.logger.warning("Rerank failed", reranker=self.reranker.name, error=str(e))
+            return identity
+        
+        # Tri stable : à score égal, l'ordre MMR est conservé
+        return sorted(identity, key=lambda i: scores[i], reverse=True)
+    
+    @staticmethod
+    def _load_arrays(load: EmbeddingLoader) -> Callable[[list[str]], Awaitable[dict[str, np.ndarray]]]:
+        async def load_arrays(ids: list[str]) -> dict[str, np.ndarray]:
+            embeddings = await load(ids)
+            return {id: np.asarray(vector, dtype=np.float32) for id, vector in embeddings.items()}
+        return load_arrays
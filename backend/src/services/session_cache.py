@@ -0,0 +1,280 @@
+"""
+Session Identity Cache
+=======================
+
+Cache de l'identité de session (`UserWithSubscription`) résolue par
+`get_current_user`.
+
+Sans cache, chaque requête de la console enchaîne `get_by_email`, le RPC
+`get_user_usage`, `get_by_id` et la jointure `subscriptions` (quatre
+appels Supabase synchrones, une requête avec le pool Postgres).
+L'identité composée est conservée en mémoire :
+- clé : `sub` + email du token (ou `X-User-ID`)
+- expiration : la plus proche de `exp` (token) et de `ttl`
+
+Les requêtes concurrentes d'une même session ne déclenchent qu'un seul
+chargement (single-flight).
+
+Un changement d'abonnement (`SubscriptionRepository.upgrade_subscription`
+/ `cancel_subscription`) ou de profil invalide les entrées de
+l'utilisateur, localement et sur les autres instances via le canal Redis
+`session:invalidate`. Les compteurs d'usage affichés ont au plus `ttl`
+secondes de retard.
+
+Usage:
+    >>> cache = get_session_cache()
+    >>> user = await cache.resolve(f"jwt:{sub}:{email}", load, expires_at=exp)
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from src.config.logging_config import LoggerMixin
+from src.config.redis import get_redis_client
+from src.config.settings import get_settings
+from src.models.user import UserWithSubscription
+
+
+INVALIDATION_CHANNEL = "session:invalidate"
+
+# Chargement asynchrone de l'identité (repositories asynchrones)
+IdentityLoader = Callable[[], Awaitable[UserWithSubscription | None]]
+
+
+@dataclass
+class _SessionEntry:
+    """Entrée du cache mémoire."""
+    
+    user: UserWithSubscription
+    expires_at: float
+
+
+class SessionIdentityCache(LoggerMixin):
+    """
+    Cache des identités de session.
+    
+    Attributes:
+        ttl: Durée de vie maximale d'une identité (secondes).
+        max_entries: Taille maximale du cache mémoire.
+    """
+    
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        
+        self._entries: OrderedDict[str, _SessionEntry] = OrderedDict()
+        # user_id -> clés de session
+        self._keys_by_user: dict[str, set[str]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        
+        self._tasks: set[asyncio.Task] = set()
+        self._listener: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+    
+    # ===== Résolution =====
+    
+    async def resolve(
+        self,
+        session_key: str,
+        load: IdentityLoader,
+        expires_at: float | None = None,
+    ) -> UserWithSubscription | None:
+        """
+        Retourne l'identité d'une session (cache, sinon `load`).
+        
+        Args:
+            session_key: Clé de session (`jwt:{sub}:{email}` ou `id:{user_id}`).
+            load: Chargement depuis la base si absente du cache.
+            expires_at: Expiration du token (timestamp Unix), si connue.
+        
+        Returns:
+            UserWithSubscription, ou None si l'utilisateur est introuvable.
+        """
+        entry = self._get_local(session_key)
+        if entry is not None:
+            return entry.user
+        
+        inflight = self._inflight.get(session_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[session_key] = future
+        user: UserWithSubscription | None = None
+        try:
+            user = await load()
+        finally:
+            self._inflight.pop(session_key, None)
+            future.set_result(user)
+        
+        # Introuvable : pas de cache négatif (compte en cours de création)
+        if user is not None:
+            ttl = self.ttl
+            if expires_at is not None:
+                ttl = min(ttl, expires_at - time.time())
+            if ttl > 0:
+                self._set_local(session_key, user, ttl)
+        return user
+    
+    # ===== Cache mémoire =====
+    
+    def _get_local(self, session_key: str) -> _SessionEntry | None:
+        entry = self._entries.get(session_key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop_key(session_key)
+            return None
+        self._entries.move_to_end(session_key)
+        return entry
+    
+    def _set_local(self, session_key: str, user: UserWithSubscription, ttl: float) -> None:
+        self._entries[session_key] = _SessionEntry(
+            user=user,
+            expires_at=time.monotonic() + ttl,
+        )
+        self._entries.move_to_end(session_key)
+        self._keys_by_user.setdefault(str(user.id), set()).add(session_key)
+        
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._drop_key(oldest)
+    
+    def _drop_key(self, session_key: str) -> None:
+        entry = self._entries.pop(session_key, None)
+        if entry is None:
+            return
+        user_id = str(entry.user.id)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(session_key)
+            if not keys:
+                del self._keys_by_user[user_id]
+    
+    def _drop_user(self, user_id: str) -> int:
+        """Supprime les sessions locales d'un utilisateur. Retourne le nombre d'entrées retirées."""
+        keys = self._keys_by_user.pop(user_id, set())
+        for session_key in keys:
+            self._entries.pop(session_key, None)
+        return len(keys)
+    
+    # ===== Invalidation =====
+    
+    async def invalidate(self, user_id: str) -> None:
+        """
+        Invalide les sessions d'un utilisateur sur toutes les instances.
+        
+        Args:
+            user_id: UUID de l'utilisateur.
+        """
+        self._drop_user(user_id)
+        
+        redis = await get_redis_client()
+        if redis is None:
+            return
+        
+        try:
+            await redis.publish(INVALIDATION_CHANNEL, user_id)
+        except Exception as e:
+            self.logger.error(
+                "Session cache invalidation failed",
+                user_id=user_id,
+                error=str(e),
+            )
+    
+    def invalidate_soon(self, user_id: str) -> None:
+        """
+        Invalidation depuis du code synchrone (repositories).
+        
+        Même stratégie que `ApiKeyValidationCache.invalidate_soon` :
+        purge locale immédiate et diffusion planifiée sur la boucle de l'API.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None and self._loop.is_running():
+                asyncio.run_coroutine_threadsafe(self.invalidate(user_id), self._loop)
+            else:
+                self._drop_user(user_id)
+            return
+        
+        self._drop_user(user_id)
+        task = asyncio.create_task(self.invalidate(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _listen(self) -> None:
+        """Applique les invalidations publiées par les autres instances."""
+        backoff = 1.0
+        while True:
+            redis = await get_redis_client()
+            if redis is None:
+                return
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                backoff = 1.0
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True,
+                        timeout=1.0,
+                    )
+                    if message and message.get("type") == "message":
+                        self._drop_user(str(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(
+                    "Session invalidation listener error",
+                    error=str(e),
+                    retry_in_s=backoff,
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+    
+    # ===== Cycle de vie =====
+    
+    async def start(self) -> None:
+        """Démarre l'écoute des invalidations."""
+        self._loop = asyncio.get_running_loop()
+        if self._listener is None and await get_redis_client() is not None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        """Arrête les tâches de fond."""
+        if self._listener is not None:
+            self._listener.cancel()
+        for task in (self._listener, *self._tasks):
+            if task is not None:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._listener = None
+        self._loop = None
+    
+    def clear(self) -> None:
+        """Vide le cache mémoire (tests)."""
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+
+# ===== Singleton =====
+
+_cache: SessionIdentityCache | None = None
+
+
+def get_session_cache() -> SessionIdentityCache:
+    """Retourne l'instance du cache de sessions."""
+    global _cache
+    if _cache is None:
+        _cache = SessionIdentityCache(ttl=get_settings().session_cache_ttl)
+    return _cache
@@ -0,0 +1,497 @@
+"""
+Session Memory
+===============
+
+Mémoire de conversation injectée dans `build_messages(history=...)`.
+
+Par session (clé `utilisateur + session_id`) :
+- les derniers échanges (question, réponse) sont conservés tels quels
+- les échanges plus anciens sont condensés dans un résumé glissant,
+  produit par un modèle économique en tâche de fond (hors chemin
+  critique : la requête suivante utilise le résumé disponible)
+
+Stockage Redis (liste des échanges + résumé, expiration `ttl`), repli
+en mémoire du worker sans Redis. Entre workers, un verrou Redis
+(`{clé}:compacting`, SET NX PX) garantit un seul résumé par session ;
+le résumé n'est enregistré que si le verrou est toujours détenu. Le
+coût est constant par tour : jamais de relecture de l'historique
+complet via `ConversationRepository`.
+
+À la construction des messages, seul un historique sous budget de
+tokens est injecté : le résumé, puis les échanges les plus récents.
+
+Usage:
+    >>> memory = get_session_memory()
+    >>> history = await memory.history(session_id, user_id, model=model)
+    >>> messages = provider.build_messages(question, history=history, ...)
+    >>> await memory.remember(session_id, user_id, question, answer)
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from src.config.logging_config import LoggerMixin
+from src.config.redis import get_redis_client
+from src.config.settings import get_settings
+from src.providers.llm import LLMConfig, get_token_counter
+from src.providers.llm.factory import get_provider_factory
+from src.services.model_cascade import small_model_for
+
+
+KEY_PREFIX = "memory:v1:"
+
+SUMMARY_PROMPT = (
+    "Tu résumes une conversation entre un utilisateur et un assistant. "
+    "Intègre les nouveaux échanges au résumé existant en conservant les faits, "
+    "préférences, décisions et questions en suspens utiles pour la suite. "
+    "Réponds uniquement par le résumé, en {words} mots au plus, dans la langue "
+    "de la conversation."
+)
+SUMMARY_INTRO = "Résumé de notre conversation jusqu'ici :\n\n{summary}"
+SUMMARY_ACK = "Compris, je tiens compte de ces échanges."
+
+# KEYS[1] : verrou, KEYS[2] : résumé, KEYS[3] : échanges
+# ARGV[1] : jeton, ARGV[2] : résumé, ARGV[3] : échanges consommés,
+# ARGV[4] : TTL du résumé (ms), ARGV[5] : bail du verrou (ms)
+REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[4])
+redis.call('LTRIM', KEYS[3], ARGV[3], -1)
+redis.call('PEXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+# KEYS[1] : verrou, ARGV[1] : jeton
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Résumé glissant : (résumé actuel, échanges à intégrer) -> nouveau résumé
+Summarizer = Callable[[str, list[dict[str, str]]], Awaitable[str]]
+
+
+@dataclass
+class SessionMemoryConfig:
+    """Configuration de la mémoire de session."""
+    
+    enabled: bool = True
+    
+    # Échanges conservés tels quels, au-delà : résumé glissant
+    max_turns: int = 6
+    
+    # Budget de tokens de l'historique injecté (résumé + échanges)
+    token_budget: int = 1500
+    
+    # Modèle économique du résumé (vide = petit modèle du provider,
+    # sinon `fallback_model`) et longueur visée
+    summary_provider: str = "mistral"
+    summary_model: str = ""
+    fallback_model: str = "mistral-large-latest"
+    summary_max_tokens: int = 400
+    
+    # Bail du verrou de résumé entre workers (secondes)
+    compaction_lock_ttl: float = 60.0
+    
+    # Expiration d'une session inactive (secondes)
+    ttl: float = 86400.0
+    
+    # Repli mémoire (sans Redis)
+    max_local_sessions: int = 10_000
+
+
+@dataclass
+class _LocalSession:
+    """Session du repli mémoire."""
+    
+    summary: str = ""
+    turns: list[dict[str, str]] = field(default_factory=list)
+    expires_at: float = 0.0
+
+
+class SessionMemory(LoggerMixin):
+    """
+    Mémoire de conversation par session.
+    
+    Attributes:
+        config: Configuration de la mémoire.
+    """
+    
+    def __init__(
+        self,
+        config: SessionMemoryConfig | None = None,
+        summarizer: Summarizer | None = None,
+    ) -> None:
+        """
+        Initialise la mémoire.
+        
+        Args:
+            config: Configuration.
+            summarizer: Résumé glissant (défaut : `summary_model` via la factory LLM).
+        """
+        self.config = config or SessionMemoryConfig()
+        self._summarizer = summarizer or self._summarize_with_llm
+        
+        self._local: OrderedDict[str, _LocalSession] = OrderedDict()
+        # Sessions en cours de résumé sur ce worker
+        self._summarizing: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        
+        self._replace_script: Any = None
+        self._release_script: Any = None
+        self._script_client: Any = None
+    
+    @property
+    def summary_model(self) -> str:
+        """Modèle du résumé, cohérent avec `summary_provider`."""
+        return (
+            self.config.summary_model
+            or small_model_for(self.config.summary_provider)
+            or self.config.fallback_model
+        )
+    
+    @staticmethod
+    def _key(session_id: str, user_id: str | None) -> str:
+        # L'utilisateur fait partie de la clé : un session_id fourni par un
+        # client ne donne pas accès à l'historique d'un autre utilisateur
+        return f"{KEY_PREFIX}{user_id or 'anonymous'}:{session_id}"
+    
+    # ===== Lecture =====
+    
+    async def history(
+        self,
+        session_id: str,
+        user_id: str | None,
+        model: str,
+    ) -> list[dict[str, str]]:
+        """
+        Historique à injecter dans `build_messages`, sous budget de tokens.
+        
+        Le résumé est placé en tête (borné au tiers du budget), puis les
+        échanges les plus récents tant que le budget le permet.
+        
+        Args:
+            session_id: Session de conversation.
+            user_id: Utilisateur (None si anonyme).
+            model: Modèle de génération (tokenizer).
+        
+        Returns:
+            Messages `{"role", "content"}` chronologiques (vide si aucun).
+        """
+        if not self.config.enabled:
+            return []
+        
+        summary, turns = await self._load(self._key(session_id, user_id))
+        if not summary and not turns:
+            return []
+        
+        counter = get_token_counter(model)
+        remaining = self.config.token_budget
+        
+        head: list[dict[str, str]] = []
+        if summary:
+            summary = counter.truncate(summary, self.config.token_budget // 3)
+            head = [
+                {"role": "user", "content": SUMMARY_INTRO.format(summary=summary)},
+                {"role": "assistant", "content": SUMMARY_ACK},
+            ]
+            remaining -= counter.count_messages(head)
+        
+        recent: list[dict[str, str]] = []
+        for turn in reversed(turns):
+            pair = [
+                {"role": "user", "content": turn["question"]},
+                {"role": "assistant", "content": turn["answer"]},
+            ]
+            cost = counter.count_messages(pair)
+            if cost > remaining:
+                # Dernier échange trop long : réponse tronquée plutôt que rien
+                if not recent and remaining > counter.count_messages(pair[:1]):
+                    room = remaining - counter.count_messages(pair[:1])
+                    pair[1]["content"] = counter.truncate(turn["answer"], room)
+                    recent[:0] = pair
+                break
+            recent[:0] = pair
+            remaining -= cost
+        
+        return head + recent
+    
+    # ===== Écriture =====
+    
+    async def remember(
+        self,
+        session_id: str,
+        user_id: str | None,
+        question: str,
+        answer: str,
+    ) -> None:
+        """
+        Ajoute un échange à la session.
+        
+        Au-delà de `max_turns` échanges, le résumé glissant est planifié en
+        tâche de fond : cet appel ne fait qu'une écriture Redis.
+        
+        Args:
+            session_id: Session de conversation.
+            user_id: Utilisateur (None si anonyme).
+            question: Question de l'utilisateur.
+            answer: Réponse générée.
+        """
+        if not self.config.enabled or not answer:
+            return
+        
+        key = self._key(session_id, user_id)
+        turn = {"question": question, "answer": answer}
+        try:
+            count = await self._append(key, turn)
+        except Exception as e:
+            self.logger.warning("Session memory write failed", error=str(e))
+            return
+        
+        if count > self.config.max_turns and key not in self._summarizing:
+            self._summarizing.add(key)
+            task = asyncio.create_task(self._compact(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def clear(self, session_id: str, user_id: str | None) -> None:
+        """Oublie une session."""
+        key = self._key(session_id, user_id)
+        self._local.pop(key, None)
+        redis = await get_redis_client()
+        if redis is not None:
+            try:
+                await redis.delete(f"{key}:turns", f"{key}:summary")
+            except Exception as e:
+                self.logger.warning("Session memory clear failed", error=str(e))
+    
+    # ===== Résumé glissant =====
+    
+    async def _compact(self, key: str) -> None:
+        """Condense les échanges au-delà de `max_turns` dans le résumé."""
+        token: str | None = None
+        try:
+            # Un seul résumé par session, tous workers confondus
+            token = await self._acquire(key)
+            if token is None:
+                return
+            
+            # Les échanges ajoutés pendant un résumé sont intégrés au suivant
+            while True:
+                summary, turns = await self._load(key)
+                overflow = turns[:len(turns) - self.config.max_turns]
+                if not overflow:
+                    return
+                
+                started = time.monotonic()
+                new_summary = (await self._summarizer(summary, overflow)).strip()
+                if not new_summary:
+                    return
+                
+                # Nouveaux échanges en fin de liste : seuls les
+                # `len(overflow)` premiers sont retirés
+                if not await self._replace(key, new_summary, len(overflow), token):
+                    self.logger.warning("Session memory lock lost, summary discarded")
+                    return
+                self.logger.info(
+                    "Session memory compacted",
+                    turns_summarized=len(overflow),
+                    summary_length=len(new_summary),
+                    elapsed_ms=int((time.monotonic() - started) * 1000),
+                )
+        except Exception as e:
+            # Échanges conservés : nouvelle tentative au prochain tour
+            self.logger.warning("Session memory summarization failed", error=str(e))
+        finally:
+            if token is not None:
+                await self._release(key, token)
+            self._summarizing.discard(key)
+    
+    async def _summarize_with_llm(self, summary: str, turns: list[dict[str, str]]) -> str:
+        """Résumé glissant via le modèle économique."""
+        provider = get_provider_factory().get_provider(
+            self.config.summary_provider,
+            LLMConfig(
+                model=self.summary_model,
+                temperature=0.2,
+                max_tokens=self.config.summary_max_tokens,
+            ),
+        )
+        exchanges = "\n\n".join(
+            f"Utilisateur : {turn['question']}\nAssistant : {turn['answer']}"
+            for turn in turns
+        )
+        prompt = SUMMARY_PROMPT.format(words=int(self.config.summary_max_tokens * 0.7))
+        response = await provider.generate([
+            {"role": "system", "content": prompt},
+            {
+                "role": "user",
+                "content": f"Résumé actuel :\n{summary or '(aucun)'}\n\nNouveaux échanges :\n{exchanges}",
+            },
+        ])
+        return response.content
+    
+    # ===== Verrou de résumé =====
+    
+    def _scripts(self, redis: Any) -> None:
+        if self._script_client is not redis:
+            self._replace_script = redis.register_script(REPLACE_SCRIPT)
+            self._release_script = redis.register_script(RELEASE_SCRIPT)
+            self._script_client = redis
+    
+    async def _acquire(self, key: str) -> str | None:
+        """
+        Verrou de résumé d'une session (SET NX PX).
+        
+        Returns:
+            Jeton du verrou, None s'il est détenu par un autre worker.
+            Sans Redis, `_summarizing` suffit (un seul worker).
+        """
+        token = uuid.uuid4().hex
+        redis = await get_redis_client()
+        if redis is None:
+            return token
+        
+        acquired = await redis.set(
+            f"{key}:compacting",
+            token,
+            nx=True,
+            px=int(self.config.compaction_lock_ttl * 1000),
+        )
+        return token if acquired else None
+    
+    async def _release(self, key: str, token: str) -> None:
+        """Libère le verrou s'il est toujours détenu par ce jeton."""
+        redis = await get_redis_client()
+        if redis is None:
+            return
+        try:
+            self._scripts(redis)
+            await self._release_script(keys=[f"{key}:compacting"], args=[token])
+        except Exception as e:
+            # Le bail expirera de lui-même
+            self.logger.warning("Session memory lock release failed", error=str(e))
+    
+    # ===== Stockage =====
+    
+    async def _load(self, key: str) -> tuple[str, list[dict[str, str]]]:
+        """Résumé et échanges conservés d'une session."""
+        redis = await get_redis_client()
+        if redis is not None:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                pipe.get(f"{key}:summary")
+                pipe.lrange(f"{key}:turns", 0, -1)
+                summary, raw_turns = await pipe.execute()
+                return summary or "", [json.loads(raw) for raw in raw_turns]
+            except Exception as e:
+                self.logger.warning("Session memory read failed", error=str(e))
+                return "", []
+        
+        session = self._get_local(key)
+        if session is None:
+            return "", []
+        return session.summary, list(session.turns)
+    
+    async def _append(self, key: str, turn: dict[str, str]) -> int:
+        """Ajoute un échange. Retourne le nombre d'échanges conservés."""
+        # Borne dure si le résumé échoue durablement
+        cap = self.config.max_turns * 4
+        redis = await get_redis_client()
+        if redis is not None:
+            ttl_ms = int(self.config.ttl * 1000)
+            pipe = redis.pipeline(transaction=False)
+            pipe.rpush(f"{key}:turns", json.dumps(turn, ensure_ascii=False))
+            pipe.ltrim(f"{key}:turns", -cap, -1)
+            pipe.pexpire(f"{key}:turns", ttl_ms)
+            pipe.pexpire(f"{key}:summary", ttl_ms)
+            count, *_ = await pipe.execute()
+            return min(count, cap)
+        
+        session = self._get_local(key) or self._set_local(key, _LocalSession())
+        session.turns = (session.turns + [turn])[-cap:]
+        session.expires_at = time.monotonic() + self.config.ttl
+        return len(session.turns)
+    
+    async def _replace(self, key: str, summary: str, consumed: int, token: str) -> bool:
+        """
+        Enregistre le résumé et retire les `consumed` plus anciens échanges.
+        
+        Returns:
+            False si le verrou de résumé n'est plus détenu (rien n'est écrit).
+        """
+        redis = await get_redis_client()
+        if redis is not None:
+            self._scripts(redis)
+            replaced = await self._replace_script(
+                keys=[f"{key}:compacting", f"{key}:summary", f"{key}:turns"],
+                args=[
+                    token,
+                    summary,
+                    consumed,
+                    int(self.config.ttl * 1000),
+                    int(self.config.compaction_lock_ttl * 1000),
+                ],
+            )
+            return bool(replaced)
+        
+        session = self._get_local(key)
+        if session is not None:
+            session.summary = summary
+            session.turns = session.turns[consumed:]
+        return True
+    
+    def _get_local(self, key: str) -> _LocalSession | None:
+        session = self._local.get(key)
+        if session is None:
+            return None
+        if session.expires_at <= time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return session
+    
+    def _set_local(self, key: str, session: _LocalSession) -> _LocalSession:
+        session.expires_at = time.monotonic() + self.config.ttl
+        self._local[key] = session
+        while len(self._local) > self.config.max_local_sessions:
+            self._local.popitem(last=False)
+        return session
+    
+    # ===== Cycle de vie =====
+    
+    async def stop(self) -> None:
+        """Attend les résumés en cours."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# ===== Singleton =====
+
+_memory: SessionMemory | None = None
+
+
+def get_session_memory() -> SessionMemory:
+    """Retourne l'instance de la mémoire de session."""
+    global _memory
+    if _memory is None:
+        settings = get_settings()
+        _memory = SessionMemory(SessionMemoryConfig(
+            enabled=settings.session_memory_enabled,
+            max_turns=settings.session_memory_turns,
+            token_budget=settings.session_memory_token_budget,
+            summary_provider=settings.default_llm_provider,
+            summary_model=settings.session_memory_summary_model,
+            fallback_model=settings.llm_model,
+            ttl=settings.session_memory_ttl,
+        ))
+    return _memory
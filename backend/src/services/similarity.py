@@ -0,0 +1,177 @@
+"""
+Similarity
+===========
+
+Noyaux de similarité vectorisés (NumPy) pour les calculs côté client :
+déduplication, diversification MMR, caches sémantiques, évaluation.
+
+- matrices float32 contiguës, pré-normalisées une fois (`as_matrix`) :
+  la similarité cosinus devient un simple produit scalaire
+- produits un-contre-plusieurs et plusieurs-contre-plusieurs (BLAS)
+- top-k en O(n) avec `argpartition` (seuls les k retenus sont triés)
+- chemin int8 optionnel (`QuantizedMatrix`) : mémoire divisée par 4,
+  échelle par ligne, calcul par blocs
+
+Usage:
+    >>> docs = as_matrix(embeddings)                 # normalisée, float32
+    >>> scores = one_to_many(query, docs)            # cosinus
+    >>> indices, top = top_k(scores, k=5)
+    >>> index = QuantizedMatrix.from_matrix(docs)    # int8
+    >>> indices, top = top_k(index.one_to_many(query), k=5)
+"""
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+
+VectorLike = Sequence[float] | np.ndarray
+MatrixLike = Sequence[Sequence[float]] | np.ndarray
+
+# Lignes traitées par bloc sur le chemin int8 (bornage de la mémoire temporaire)
+INT8_BLOCK_ROWS = 4096
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normalise les lignes (norme L2 = 1), en place si possible.
+    
+    Les lignes nulles restent nulles (similarité 0 avec tout vecteur).
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def as_matrix(vectors: MatrixLike, normalized: bool = True) -> np.ndarray:
+    """
+    Matrice float32 contiguë (n × d).
+    
+    Args:
+        vectors: Vecteurs (listes ou tableau).
+        normalized: Normaliser les lignes (cosinus = produit scalaire).
+    
+    Returns:
+        Tableau float32 (n × d), copie indépendante de l'entrée.
+    """
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2, order="C")
+    return normalize(matrix) if normalized else matrix
+
+
+def as_vector(vector: VectorLike, normalized: bool = True) -> np.ndarray:
+    """Vecteur float32 (d,), normalisé par défaut."""
+    return as_matrix(vector, normalized=normalized)[0]
+
+
+def cosine(a: VectorLike, b: VectorLike) -> float:
+    """Similarité cosinus entre deux vecteurs (0 si l'un est nul)."""
+    return float(as_vector(a) @ as_vector(b))
+
+
+def one_to_many(
+    query: VectorLike,
+    matrix: np.ndarray,
+    normalized: bool = True,
+) -> np.ndarray:
+    """
+    Scores d'une requête contre chaque ligne d'une matrice.
+    
+    Args:
+        query: Vecteur de la requête.
+        matrix: Matrice issue de `as_matrix`.
+        normalized: True : cosinus (matrice pré-normalisée, requête
+            normalisée ici) ; False : produit scalaire brut.
+    
+    Returns:
+        Scores (n,) float32.
+    """
+    return matrix @ as_vector(query, normalized=normalized)
+
+
+def many_to_many(a: np.ndarray, b: np.ndarray | None = None) -> np.ndarray:
+    """
+    Matrice des produits scalaires (n × m) entre deux matrices.
+    
+    Avec des matrices issues de `as_matrix` (normalisées), c'est la
+    matrice des similarités cosinus. Sans `b`, similarités de `a` avec
+    elle-même.
+    """
+    return a @ (a if b is None else b).T
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    k meilleurs scores, par ordre décroissant.
+    
+    `argpartition` isole les k meilleurs en O(n) ; seuls ceux-ci sont
+    triés (O(k log k)) au lieu de trier les n scores.
+    
+    Returns:
+        Tuple (indices, scores), de longueur min(k, n).
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=scores.dtype)
+    if k < n:
+        candidates = np.argpartition(scores, n - k)[n - k:]
+    else:
+        candidates = np.arange(n)
+    order = candidates[np.argsort(scores[candidates])[::-1]]
+    return order, scores[order]
+
+
+@dataclass
+class QuantizedMatrix:
+    """
+    Matrice quantifiée en int8 (quantification symétrique par ligne).
+    
+    ligne ≈ codes × scale, avec scale = max|ligne| / 127. Les scores sont
+    approchés (erreur relative de l'ordre de 1 %) : à utiliser pour la
+    présélection, avec rescoring float32 des meilleurs candidats si
+    l'ordre exact importe.
+    
+    Attributes:
+        codes: Codes int8 (n × d).
+        scales: Échelle float32 par ligne (n,).
+    """
+    
+    codes: np.ndarray
+    scales: np.ndarray
+    
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> "QuantizedMatrix":
+        """Quantifie une matrice float (normalisée ou non)."""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+        return cls(codes=codes, scales=scales.astype(np.float32))
+    
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+    
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scales.nbytes)
+    
+    def one_to_many(self, query: VectorLike, normalized: bool = True) -> np.ndarray:
+        """
+        Scores approchés d'une requête (float32) contre chaque ligne.
+        
+        Calcul par blocs de `INT8_BLOCK_ROWS` lignes : la conversion
+        temporaire en float32 reste bornée quelle que soit la taille.
+        """
+        q = as_vector(query, normalized=normalized)
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), INT8_BLOCK_ROWS):
+            block = self.codes[start:start + INT8_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ q
+        scores *= self.scales
+        return scores
+    
+    def dequantize(self) -> np.ndarray:
+        """Matrice float32 reconstruite (approchée)."""
+        return self.codes.astype(np.float32) * self.scales[:, None]
@@ -0,0 +1,332 @@
+"""
+Usage Meter
+============
+
+Compteurs d'usage (requêtes, documents, clés) dans Redis, reportés
+périodiquement dans `usage_records`.
+
+Structure Redis :
+- `usage:{user}:{YYYY-MM}:{type}` : total de la période, lu en O(1)
+  par l'admission pour les quotas
+- `usage:deltas` : hash des incréments pas encore reportés
+  (champ `{user}|{période}|{type}`)
+
+Réconciliation (idempotente entre workers) :
+1. le hash `usage:deltas` est renommé atomiquement en
+   `usage:claim:{batch_id}` : un seul worker obtient chaque delta
+2. le lot est appliqué par `apply_usage_deltas(batch_id, ...)`, qui
+   ignore un `batch_id` déjà appliqué
+3. le lot est supprimé ; un lot dont le worker a disparu est repris
+   après expiration du bail, sans risque de double comptage
+
+Sans Redis, les incréments sont agrégés en mémoire et reportés de la
+même façon (un `batch_id` par lot, conservé jusqu'à acquittement).
+
+Usage:
+    >>> meter = get_usage_meter()
+    >>> await meter.increment(user_id, "documents", 3)
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+from src.config.logging_config import LoggerMixin
+from src.config.redis import get_redis_client
+from src.config.settings import get_settings
+from src.repositories.async_repositories import AsyncSubscriptionRepository
+from src.repositories.subscription_repository import SubscriptionRepository
+
+
+COUNTER_PREFIX = "usage:"
+DELTAS_KEY = "usage:deltas"
+CLAIMS_KEY = "usage:claims"
+CLAIM_PREFIX = "usage:claim:"
+
+# Durée de vie d'un total de période (un peu plus d'un mois)
+COUNTER_TTL_MS = 35 * 24 * 3600 * 1000
+
+USAGE_TYPES = ("requests", "documents", "api_keys")
+
+# KEYS[1] : total, KEYS[2] : hash des deltas
+# ARGV[1] : champ delta, ARGV[2] : montant, ARGV[3] : valeur initiale ("" = 0), ARGV[4] : TTL ms
+INCREMENT_SCRIPT = """
+if ARGV[3] ~= '' then
+    redis.call('SET', KEYS[1], ARGV[3], 'NX', 'PX', ARGV[4])
+end
+local total = redis.call('INCRBY', KEYS[1], ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+redis.call('HINCRBY', KEYS[2], ARGV[1], ARGV[2])
+return total
+"""
+
+# KEYS[1] : hash des deltas, KEYS[2] : lot réclamé, KEYS[3] : index des lots
+# ARGV[1] : batch_id, ARGV[2] : horodatage (ms)
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+return 1
+"""
+
+
+def current_period() -> str:
+    """Période courante (YYYY-MM, UTC)."""
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+def counter_key(user_id: str, usage_type: str, period: str | None = None) -> str:
+    """Clé Redis du total d'une période."""
+    return f"{COUNTER_PREFIX}{user_id}:{period or current_period()}:{usage_type}"
+
+
+def delta_field(user_id: str, usage_type: str, period: str | None = None) -> str:
+    """Champ du hash des deltas."""
+    return f"{user_id}|{period or current_period()}|{usage_type}"
+
+
+def _parse_deltas(raw: dict[str, Any]) -> list[dict[str, Any]]:
+    deltas = []
+    for field, amount in raw.items():
+        user_id, period, usage_type = field.split("|")
+        if int(amount):
+            deltas.append({
+                "user_id": user_id,
+                "period": period,
+                "type": usage_type,
+                "amount": int(amount),
+            })
+    return deltas
+
+
+class UsageMeter(LoggerMixin):
+    """
+    Compteurs d'usage Redis et réconciliation vers `usage_records`.
+    
+    Attributes:
+        interval: Période de réconciliation (secondes).
+        claim_lease: Délai avant reprise d'un lot non acquitté (secondes).
+    """
+    
+    def __init__(
+        self,
+        repo: SubscriptionRepository | None = None,
+        interval: float = 10.0,
+        claim_lease: float = 60.0,
+        enabled: bool = True,
+    ) -> None:
+        self._repo = repo
+        self._async_repo: AsyncSubscriptionRepository | None = None
+        self.interval = interval
+        self.claim_lease = claim_lease
+        self.enabled = enabled
+        
+        self._increment_script: Any = None
+        self._claim_script: Any = None
+        self._script_client: Any = None
+        
+        # Fallback mémoire : champ -> montant, et lot en attente d'acquittement
+        self._local: dict[str, int] = {}
+        self._local_batch: tuple[str, list[dict[str, Any]]] | None = None
+        
+        self._task: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None
+    
+    @property
+    def repo(self) -> SubscriptionRepository:
+        if self._repo is None:
+            self._repo = SubscriptionRepository()
+        return self._repo
+    
+    @property
+    def async_repo(self) -> AsyncSubscriptionRepository:
+        """Accès asynchrone (Postgres direct, repli sur `repo`)."""
+        if self._async_repo is None:
+            self._async_repo = AsyncSubscriptionRepository(self.repo)
+        return self._async_repo
+    
+    def _scripts(self, redis: Any) -> None:
+        if self._script_client is not redis:
+            self._increment_script = redis.register_script(INCREMENT_SCRIPT)
+            self._claim_script = redis.register_script(CLAIM_SCRIPT)
+            self._script_client = redis
+    
+    # ===== Comptage =====
+    
+    async def increment(
+        self,
+        user_id: str,
+        usage_type: str = "requests",
+        amount: int = 1,
+        seed: int | None = None,
+    ) -> int | None:
+        """
+        Incrémente un compteur d'usage.
+        
+        Args:
+            user_id: UUID de l'utilisateur.
+            usage_type: requests, documents ou api_keys.
+            amount: Montant.
+            seed: Valeur initiale du total si absent (usage déjà en base).
+        
+        Returns:
+            Total de la période, ou None si compté en mémoire (Redis indisponible).
+        """
+        if usage_type not in USAGE_TYPES:
+            raise ValueError(f"Type d'usage inconnu: {usage_type}")
+        
+        redis = await get_redis_client()
+        if redis is not None:
+            try:
+                self._scripts(redis)
+                total = await self._increment_script(
+                    keys=[counter_key(user_id, usage_type), DELTAS_KEY],
+                    args=[
+                        delta_field(user_id, usage_type),
+                        amount,
+                        "" if seed is None else seed,
+                        COUNTER_TTL_MS,
+                    ],
+                )
+                return int(total)
+            except Exception as e:
+                self.logger.warning("Usage counter unavailable, buffering locally", error=str(e))
+        
+        self.record_local(user_id, usage_type, amount)
+        return None
+    
+    def record_local(self, user_id: str, usage_type: str = "requests", amount: int = 1) -> None:
+        """Agrège un incrément en mémoire (Redis indisponible)."""
+        field = delta_field(user_id, usage_type)
+        self._local[field] = self._local.get(field, 0) + amount
+    
+    # ===== Réconciliation =====
+    
+    async def reconcile(self) -> int:
+        """
+        Reporte les deltas en attente dans `usage_records`.
+        
+        Returns:
+            Nombre de deltas appliqués.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            applied = 0
+            try:
+                applied += await self._reconcile_local()
+            except Exception as e:
+                self.logger.error("Local usage reconciliation failed", error=str(e))
+            
+            try:
+                redis = await get_redis_client()
+                if redis is None:
+                    return applied
+                
+                self._scripts(redis)
+                applied += await self._recover_stale(redis)
+                
+                batch_id = uuid.uuid4().hex
+                claimed = await self._claim_script(
+                    keys=[DELTAS_KEY, CLAIM_PREFIX + batch_id, CLAIMS_KEY],
+                    args=[batch_id, int(time.time() * 1000)],
+                )
+                if claimed:
+                    applied += await self._apply_claim(redis, batch_id)
+            except Exception as e:
+                self.logger.error("Usage reconciliation failed", error=str(e))
+            
+            return applied
+    
+    async def _recover_stale(self, redis: Any) -> int:
+        """Rejoue les lots réclamés dont le bail a expiré."""
+        deadline = int((time.time() - self.claim_lease) * 1000)
+        stale = await redis.zrangebyscore(CLAIMS_KEY, 0, deadline)
+        applied = 0
+        for batch_id in stale:
+            self.logger.warning("Recovering stale usage batch", batch_id=batch_id)
+            applied += await self._apply_claim(redis, batch_id)
+        return applied
+    
+    async def _apply_claim(self, redis: Any, batch_id: str) -> int:
+        """Applique un lot réclamé puis l'acquitte."""
+        raw = await redis.hgetall(CLAIM_PREFIX + batch_id)
+        deltas = _parse_deltas(raw)
+        
+        if deltas:
+            ok = await self.async_repo.apply_usage_deltas(batch_id, deltas)
+            if not ok:
+                # Conservé : repris après expiration du bail
+                return 0
+        
+        pipe = redis.pipeline(transaction=False)
+        pipe.delete(CLAIM_PREFIX + batch_id)
+        pipe.zrem(CLAIMS_KEY, batch_id)
+        await pipe.execute()
+        return len(deltas)
+    
+    async def _reconcile_local(self) -> int:
+        """Reporte les incréments mémoire (lot conservé jusqu'à acquittement)."""
+        if self._local_batch is None:
+            if not self._local:
+                return 0
+            raw, self._local = self._local, {}
+            self._local_batch = (uuid.uuid4().hex, _parse_deltas(raw))
+        
+        batch_id, deltas = self._local_batch
+        ok = await self.async_repo.apply_usage_deltas(batch_id, deltas)
+        if not ok:
+            return 0
+        self._local_batch = None
+        return len(deltas)
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            # Une itération en échec ne doit pas arrêter la tâche
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self.logger.error("Usage reconciliation iteration failed", error=str(e))
+    
+    # ===== Cycle de vie =====
+    
+    async def start(self) -> None:
+        """Démarre la réconciliation périodique."""
+        if self._task is None:
+            self._lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Arrête la tâche et reporte les deltas restants."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.reconcile()
+
+
+# ===== Singleton =====
+
+_usage_meter: UsageMeter | None = None
+
+
+def get_usage_meter() -> UsageMeter:
+    """Retourne le compteur d'usage partagé."""
+    global _usage_meter
+    if _usage_meter is None:
+        settings = get_settings()
+        _usage_meter = UsageMeter(
+            interval=settings.usage_reconcile_interval,
+            claim_lease=settings.usage_claim_lease,
+            enabled=settings.usage_meter_enabled and bool(settings.redis_url),
+        )
+    return _usage_meter
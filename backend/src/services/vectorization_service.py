@@ -13,6 +13,7 @@ from src.config.logging_config import LoggerMixin
 from src.models.document import DocumentCreate, Document
 from src.providers.base import BaseProvider
 from src.repositories.document_repository import DocumentRepository
+from src.services import similarity
 from src.services.embedding_service import EmbeddingService
 
 
@@ -31,6 +32,11 @@ class VectorizationService(LoggerMixin):
     
     Orchestre l'extraction, l'embedding et le stockage
     des documents dans le Vector Store.
+    
+    Les embeddings sont stockés normalisés (norme 1) : la recherche
+    utilise le produit scalaire (index `vector_ip_ops`), égal à la
+    similarité cosinus sans calcul de norme (migration 014). En mode
+    compact, le repository écrit aussi l'embedding réduit (migration 015).
     """
     
     def __init__(self) -> None:
@@ -38,6 +44,10 @@ class VectorizationService(LoggerMixin):
         self._embedding_service = EmbeddingService()
         self._document_repo = DocumentRepository()
     
+    def _embed(self, content: str) -> list[float]:
+        """Embedding normalisé (norme 1) d'un contenu."""
+        return similarity.as_vector(self._embedding_service.embed_text(content)).tolist()
+    
     def ingest_from_provider(
         self,
         provider: BaseProvider,
@@ -75,7 +85,7 @@ class VectorizationService(LoggerMixin):
                     continue
                 
                 # Générer l'embedding
-                embedding = self._embedding_service.embed_text(doc.content)
+                embedding = self._embed(doc.content)
                 
                 # Stocker dans Supabase
                 self._document_repo.create_from_model(doc, embedding, user_id=user_id)
@@ -122,7 +132,7 @@ class VectorizationService(LoggerMixin):
                     stats.total_skipped += 1
                     continue
                 
-                embedding = self._embedding_service.embed_text(doc.content)
+                embedding = self._embed(doc.content)
                 self._document_repo.create_from_model(doc, embedding, user_id=user_id)
                 stats.total_created += 1
                 
@@ -159,7 +169,7 @@ class VectorizationService(LoggerMixin):
                 return None
             
             # Générer l'embedding
-            embedding = self._embedding_service.embed_text(content)
+            embedding = self._embed(content)
             
             # Créer le document
             data = {
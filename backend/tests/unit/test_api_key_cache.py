@@ -0,0 +1,162 @@
+"""
+Tests unitaires pour le cache de validation des clés API.
+"""
+
+import asyncio
+import time
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+import pytest
+
+from src.models.api_key import ApiKeyValidation
+from src.services.api_key_cache import ApiKeyValidationCache
+
+
+@pytest.fixture(autouse=True)
+def no_redis():
+    """Cache mémoire seul (pas de Redis)."""
+    async def _none():
+        return None
+    
+    with patch("src.services.api_key_cache.get_redis_client", _none):
+        yield
+
+
+def _validation(is_valid: bool = True) -> ApiKeyValidation:
+    return ApiKeyValidation(
+        id=uuid4(),
+        user_id=uuid4(),
+        scopes=["query"],
+        rate_limit=100,
+        is_valid=is_valid,
+        rejection_reason=None if is_valid else "revoked",
+    )
+
+
+def _cache(repo: Mock, **kwargs) -> ApiKeyValidationCache:
+    return ApiKeyValidationCache(repo=repo, **kwargs)
+
+
+class TestValidation:
+    """Tests pour la validation via le cache."""
+    
+    @pytest.mark.asyncio
+    async def test_hit_skips_supabase(self):
+        """Le deuxième appel est servi par le cache."""
+        repo = Mock()
+        repo.validate_hash.return_value = _validation()
+        cache = _cache(repo)
+        
+        first = await cache.validate("sk-proj-abc", "1.2.3.4")
+        second = await cache.validate("sk-proj-abc", "1.2.3.4")
+        
+        assert first == second
+        assert repo.validate_hash.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_unknown_key_is_negatively_cached(self):
+        """Une clé inconnue n'est pas revalidée pendant le TTL négatif."""
+        repo = Mock()
+        repo.validate_hash.return_value = None
+        cache = _cache(repo, negative_ttl=30.0)
+        
+        assert await cache.validate("sk-proj-unknown") is None
+        assert await cache.validate("sk-proj-unknown") is None
+        assert repo.validate_hash.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_rejection_uses_negative_ttl(self):
+        """Une clé rejetée expire selon le TTL négatif."""
+        repo = Mock()
+        repo.validate_hash.return_value = _validation(is_valid=False)
+        cache = _cache(repo, ttl=60.0, negative_ttl=0.0)
+        
+        await cache.validate("sk-proj-revoked")
+        await cache.validate("sk-proj-revoked")
+        
+        assert repo.validate_hash.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_supabase_error_not_cached(self):
+        """Une panne Supabase n'est pas mémorisée comme un rejet."""
+        repo = Mock()
+        repo.validate_hash.side_effect = [RuntimeError("down"), _validation()]
+        cache = _cache(repo)
+        
+        assert await cache.validate("sk-proj-abc") is None
+        assert (await cache.validate("sk-proj-abc")).is_valid
+    
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        """Les validations concurrentes d'une même clé partagent un appel."""
+        repo = Mock()
+        
+        def slow_validate(key_hash, client_ip):
+            time.sleep(0.05)
+            return _validation()
+        
+        repo.validate_hash.side_effect = slow_validate
+        cache = _cache(repo)
+        
+        results = await asyncio.gather(
+            *(cache.validate("sk-proj-abc") for _ in range(5))
+        )
+        
+        assert repo.validate_hash.call_count == 1
+        assert all(r == results[0] for r in results)
+
+
+class TestInvalidation:
+    """Tests pour l'invalidation des clés révoquées."""
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_entry(self):
+        """Après invalidation, la clé est revalidée auprès de Supabase."""
+        validation = _validation()
+        repo = Mock()
+        repo.validate_hash.return_value = validation
+        cache = _cache(repo)
+        
+        await cache.validate("sk-proj-abc")
+        await cache.invalidate(str(validation.id))
+        await cache.validate("sk-proj-abc")
+        
+        assert repo.validate_hash.call_count == 2
+
+
+class TestUsageWriteBack:
+    """Tests pour l'écriture par lots de l'usage."""
+    
+    @pytest.mark.asyncio
+    async def test_hits_are_aggregated(self):
+        """Seuls les hits sont comptés : le RPC compte déjà le miss."""
+        validation = _validation()
+        repo = Mock()
+        repo.validate_hash.return_value = validation
+        repo.record_usage_batch.return_value = True
+        cache = _cache(repo)
+        
+        for _ in range(4):
+            await cache.validate("sk-proj-abc", "1.2.3.4")
+        
+        assert await cache.flush() == 1
+        payload = repo.record_usage_batch.call_args[0][0]
+        assert payload[0]["key_id"] == str(validation.id)
+        assert payload[0]["requests"] == 3
+        assert payload[0]["last_used_ip"] == "1.2.3.4"
+    
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried(self):
+        """Un lot non écrit est réintégré pour le flush suivant."""
+        repo = Mock()
+        repo.validate_hash.return_value = _validation()
+        repo.record_usage_batch.side_effect = [False, True]
+        cache = _cache(repo)
+        
+        await cache.validate("sk-proj-abc")
+        await cache.validate("sk-proj-abc")
+        
+        assert await cache.flush() == 0
+        assert await cache.flush() == 1
+        assert repo.record_usage_batch.call_args[0][0][0]["requests"] == 1
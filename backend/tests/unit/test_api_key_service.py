@@ -3,7 +3,7 @@ Tests unitaires pour ApiKeyService.
 """
 
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from uuid import uuid4, UUID
 from datetime import datetime
 
@@ -49,11 +49,19 @@ class TestApiKeyServiceCreation:
         return repo
     
     @pytest.fixture
-    def service(self, mock_key_repo, mock_sub_repo):
+    def mock_meter(self):
+        """Mock des compteurs d'usage."""
+        meter = Mock()
+        meter.increment = AsyncMock()
+        return meter
+    
+    @pytest.fixture
+    def service(self, mock_key_repo, mock_sub_repo, mock_meter):
         """Service avec mocks injectés."""
         return ApiKeyService(
             key_repo=mock_key_repo,
             sub_repo=mock_sub_repo,
+            meter=mock_meter,
         )
     
     @pytest.mark.asyncio
@@ -94,6 +102,25 @@ class TestApiKeyServiceCreation:
         assert "limite" in exc_info.value.message.lower()
         assert exc_info.value.limits["reason"] == "api_keys_limit_reached"
     
+    @pytest.mark.asyncio
+    async def test_create_key_is_metered(self, service, mock_meter):
+        """La clé créée est comptée dans api_keys_count."""
+        user_id = str(uuid4())
+        
+        await service.create_user_key(user_id=user_id, name="Test", scopes=["query"])
+        
+        mock_meter.increment.assert_awaited_once_with(user_id, "api_keys")
+    
+    @pytest.mark.asyncio
+    async def test_blocked_key_is_not_metered(self, service, mock_sub_repo, mock_meter):
+        """Une création refusée par quota n'est pas comptée."""
+        mock_sub_repo.check_user_limits.return_value = {"allowed": False, "reason": "limit"}
+        
+        with pytest.raises(QuotaExceededError):
+            await service.create_user_key(user_id=str(uuid4()), name="Test", scopes=["query"])
+        
+        mock_meter.increment.assert_not_called()
+    
     @pytest.mark.asyncio
     async def test_create_key_filters_admin_scope(self, service, mock_key_repo):
         """Test que le scope admin est filtré."""
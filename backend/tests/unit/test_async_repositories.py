@@ -0,0 +1,218 @@
+"""
+Tests unitaires pour les repositories asynchrones (asyncpg + repli Supabase).
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+
+import pytest
+
+from src.config.database import fetch_prepared
+from src.models.document import DocumentFilter, SearchEffort
+from src.repositories.async_repositories import (
+    MATCH_DOCUMENT_IDS_SQL,
+    VALIDATE_API_KEY_SQL,
+    AsyncApiKeyRepository,
+    AsyncConversationRepository,
+    AsyncDocumentRepository,
+)
+from src.repositories.conversation_repository import ConversationRepository
+
+
+def _pool(conn: Mock) -> Mock:
+    pool = Mock()
+    pool.acquire = AsyncMock(return_value=conn)
+    pool.release = AsyncMock()
+    return pool
+
+
+def _patch_pool(pool: Mock | None):
+    return patch(
+        "src.repositories.async_base.get_db_pool",
+        AsyncMock(return_value=pool),
+    )
+
+
+class TestFallback:
+    """Tests du repli sur le repository Supabase."""
+    
+    @pytest.mark.asyncio
+    async def test_no_pool_uses_sync_repo(self):
+        """Sans pool, la méthode synchrone est appelée dans un thread."""
+        sync = Mock()
+        sync.search_similar.return_value = ["match"]
+        repo = AsyncDocumentRepository(sync)
+        
+        with _patch_pool(None):
+            result = await repo.search_similar([0.1, 0.2], threshold=0.5, limit=3)
+        
+        assert result == ["match"]
+        sync.search_similar.assert_called_once_with(
+            [0.1, 0.2], threshold=0.5, limit=3, source_type=None, user_id=None,
+            filters=None, search_effort=None,
+        )
+    
+    @pytest.mark.asyncio
+    async def test_acquire_failure_falls_back(self):
+        """Un pool saturé ou indisponible bascule sur Supabase."""
+        pool = Mock()
+        pool.acquire = AsyncMock(side_effect=OSError("connection refused"))
+        pool.release = AsyncMock()
+        sync = Mock()
+        sync.validate_hash.return_value = None
+        repo = AsyncApiKeyRepository(sync)
+        
+        with _patch_pool(pool):
+            assert await repo.validate_hash("abc", "1.2.3.4") is None
+        
+        sync.validate_hash.assert_called_once_with("abc", "1.2.3.4", count_usage=True)
+        pool.release.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_exhausted_pool_falls_back(self):
+        """Un pool saturé au-delà du délai d'acquisition bascule sur Supabase."""
+        pool = Mock()
+        pool.acquire = AsyncMock(side_effect=asyncio.TimeoutError())
+        pool.release = AsyncMock()
+        sync = Mock()
+        sync.validate_hash.return_value = None
+        repo = AsyncApiKeyRepository(sync)
+        
+        with _patch_pool(pool):
+            assert await repo.validate_hash("abc", "1.2.3.4") is None
+        
+        assert pool.acquire.await_args.kwargs["timeout"] > 0
+        sync.validate_hash.assert_called_once_with("abc", "1.2.3.4", count_usage=True)
+        pool.release.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_query_error_does_not_fall_back(self):
+        """Une erreur pendant une écriture n'est pas rejouée via Supabase."""
+        conn = Mock()
+        conn.fetchrow = AsyncMock(side_effect=RuntimeError("timeout"))
+        pool = _pool(conn)
+        sync = Mock()
+        repo = AsyncConversationRepository(sync)
+        conv = Mock()
+        
+        with _patch_pool(pool), patch.object(
+            ConversationRepository,
+            "_conversation_row",
+            return_value={"session_id": "s", "user_query": "q"},
+        ):
+            with pytest.raises(RuntimeError):
+                await repo.log_conversation(conv)
+        
+        sync.log_conversation.assert_not_called()
+        pool.release.assert_awaited_once_with(conn)
+    
+    @pytest.mark.asyncio
+    async def test_unported_methods_are_delegated(self):
+        """Les méthodes non réécrites restent appelables en async."""
+        sync = Mock()
+        sync.revoke.return_value = True
+        repo = AsyncApiKeyRepository(sync)
+        
+        assert await repo.revoke("key-1") is True
+        sync.revoke.assert_called_once_with("key-1")
+        assert repo.hash_key("x") == sync.hash_key("x")
+        with pytest.raises(AttributeError):
+            repo._format_key_data
+
+
+class TestFeedback:
+    """Tests du feedback sur une conversation."""
+    
+    @pytest.mark.asyncio
+    async def test_unknown_conversation_is_reported(self):
+        """Aucune ligne mise à jour : la conversation n'existe pas (encore)."""
+        conn = Mock()
+        conn.execute = AsyncMock(side_effect=["UPDATE 0", "UPDATE 1"])
+        repo = AsyncConversationRepository(Mock())
+        
+        with _patch_pool(_pool(conn)):
+            assert await repo.add_feedback(uuid4(), 5) is False
+            assert await repo.add_feedback(uuid4(), 5) is True
+
+
+class TestPreparedStatements:
+    """Tests des requêtes chaudes préparées."""
+    
+    @pytest.mark.asyncio
+    async def test_validate_hash_uses_prepared_statement(self):
+        """validate_api_key passe par le statement préparé de la connexion."""
+        key_id = uuid4()
+        statement = Mock()
+        statement.fetch = AsyncMock(return_value=[{
+            "id": key_id,
+            "user_id": None,
+            "scopes": ["query"],
+            "rate_limit_per_minute": 60,
+            "is_valid": True,
+            "rejection_reason": None,
+        }])
+        conn = Mock()
+        conn.prepare_hot = AsyncMock(return_value=statement)
+        sync = Mock()
+        repo = AsyncApiKeyRepository(sync)
+        
+        with _patch_pool(_pool(conn)):
+            validation = await repo.validate_hash("abc", None, count_usage=False)
+        
+        assert validation.id == key_id
+        assert validation.rate_limit == 60
+        conn.prepare_hot.assert_awaited_once_with(VALIDATE_API_KEY_SQL)
+        statement.fetch.assert_awaited_once_with("abc", None, False)
+        sync.validate_hash.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_search_ids_pushes_filters_down(self):
+        """Le filtre de métadonnées est passé à match_document_ids (JSONB)."""
+        statement = Mock()
+        statement.fetch = AsyncMock(return_value=[])
+        conn = Mock()
+        conn.prepare_hot = AsyncMock(return_value=statement)
+        repo = AsyncDocumentRepository(Mock())
+        filters = DocumentFilter(tags_any=["cv"], language="fr")
+        
+        with _patch_pool(_pool(conn)):
+            assert await repo.search_ids([0.5, 0.25], limit=8, filters=filters) == []
+        
+        conn.prepare_hot.assert_awaited_once_with(MATCH_DOCUMENT_IDS_SQL)
+        statement.fetch.assert_awaited_once_with(
+            "[0.5,0.25]", 0.7, 8, None, None,
+            {"tags_any": ["cv"], "contains": {"language": "fr"}},
+            None, None, None,
+        )
+    
+    @pytest.mark.asyncio
+    async def test_search_effort_sets_ef_search(self):
+        """L'effort de recherche devient hnsw.ef_search, jamais inférieur à la limite."""
+        statement = Mock()
+        statement.fetch = AsyncMock(return_value=[])
+        conn = Mock()
+        conn.prepare_hot = AsyncMock(return_value=statement)
+        repo = AsyncDocumentRepository(Mock())
+        
+        with _patch_pool(_pool(conn)):
+            await repo.search_ids([0.5], limit=8, search_effort=SearchEffort.THOROUGH)
+            await repo.search_ids([0.5], limit=60, search_effort=SearchEffort.FAST)
+        
+        assert statement.fetch.await_args_list[0].args[6] == 120
+        assert statement.fetch.await_args_list[1].args[6] == 60
+    
+    @pytest.mark.asyncio
+    async def test_invalidated_statement_is_prepared_again(self):
+        """Un statement invalidé (fonction recréée) est préparé à nouveau."""
+        import asyncpg
+        
+        stale, fresh = Mock(), Mock()
+        stale.fetch = AsyncMock(side_effect=asyncpg.InvalidCachedStatementError(""))
+        fresh.fetch = AsyncMock(return_value=["row"])
+        conn = Mock()
+        conn.prepare_hot = AsyncMock(side_effect=[stale, fresh])
+        
+        assert await fetch_prepared(conn, "SELECT 1", 42) == ["row"]
+        conn.forget_hot.assert_called_once_with("SELECT 1")
+        fresh.fetch.assert_awaited_once_with(42)
@@ -0,0 +1,293 @@
+"""
+Tests unitaires pour l'écriture par lots des logs d'usage.
+"""
+
+import asyncio
+from unittest.mock import Mock, patch
+from uuid import UUID, uuid4
+
+import pytest
+
+from src.api.routes import _add_feedback
+from src.api.schemas import FeedbackRequest
+from src.services.batch_writer import AsyncBatchWriter
+from src.services.rag_engine import RAGConfig, RAGEngine
+
+
+def _event(i: int) -> dict:
+    return {"api_key_id": "k", "endpoint": "/query", "status_code": 200, "n": i}
+
+
+class TestAsyncBatchWriter:
+    """Tests pour AsyncBatchWriter."""
+    
+    @pytest.mark.asyncio
+    async def test_flush_in_batches(self):
+        """Les événements sont écrits en lots de max_batch."""
+        flush_fn = Mock(return_value=True)
+        writer = AsyncBatchWriter("test", flush_fn, max_batch=3)
+        
+        for i in range(7):
+            writer.append(_event(i))
+        
+        assert await writer.flush() == 7
+        assert [len(c.args[0]) for c in flush_fn.call_args_list] == [3, 3, 1]
+    
+    @pytest.mark.asyncio
+    async def test_size_triggers_flush(self):
+        """Atteindre max_batch réveille la tâche sans attendre l'intervalle."""
+        flush_fn = Mock(return_value=True)
+        writer = AsyncBatchWriter("test", flush_fn, max_batch=2, flush_interval=60)
+        await writer.start()
+        
+        writer.append(_event(1))
+        writer.append(_event(2))
+        await asyncio.sleep(0.05)
+        
+        assert flush_fn.call_count == 1
+        await writer.stop()
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_kept(self):
+        """Un lot non écrit reste en tête du buffer."""
+        flush_fn = Mock(side_effect=[False, True])
+        writer = AsyncBatchWriter("test", flush_fn, max_batch=10)
+        
+        writer.append(_event(1))
+        assert await writer.flush() == 0
+        assert writer.pending == 1
+        
+        assert await writer.flush() == 1
+        assert writer.pending == 0
+    
+    def test_drops_oldest_without_spill_dir(self):
+        """Sans répertoire de débordement, les plus anciens sont abandonnés."""
+        writer = AsyncBatchWriter("test", Mock(), max_pending=3)
+        
+        for i in range(5):
+            writer.append(_event(i))
+        
+        assert writer.pending == 3
+        assert writer.dropped == 2
+        assert [e["n"] for e in writer._buffer] == [2, 3, 4]
+    
+    @pytest.mark.asyncio
+    async def test_spill_and_replay(self, tmp_path):
+        """Le débordement disque est réinjecté au flush suivant réussi."""
+        flush_fn = Mock(return_value=True)
+        writer = AsyncBatchWriter("test", flush_fn, max_pending=2, spill_dir=tmp_path)
+        
+        for i in range(3):
+            writer.append(_event(i))
+        await asyncio.gather(*writer._spill_tasks)
+        
+        assert writer.spill_path.exists()
+        assert writer.pending == 1
+        
+        await writer.flush()
+        await writer.flush()
+        
+        written = [e["n"] for c in flush_fn.call_args_list for e in c.args[0]]
+        assert sorted(written) == [0, 1, 2]
+        assert not writer.spill_path.exists()
+    
+    @pytest.mark.asyncio
+    async def test_stop_drains(self):
+        """Le shutdown écrit tout le buffer."""
+        flush_fn = Mock(return_value=True)
+        writer = AsyncBatchWriter("test", flush_fn, flush_interval=60)
+        await writer.start()
+        
+        writer.append(_event(1))
+        await writer.stop()
+        
+        assert writer.pending == 0
+        assert writer.written == 1
+    
+    @pytest.mark.asyncio
+    async def test_async_flush_fn(self):
+        """Une fonction d'écriture asynchrone est attendue sur la boucle."""
+        batches = []
+        
+        async def flush_fn(batch):
+            batches.append(batch)
+            return True
+        
+        writer = AsyncBatchWriter("test", flush_fn)
+        writer.append(_event(1))
+        
+        assert await writer.flush() == 1
+        assert batches == [[_event(1)]]
+
+    @pytest.mark.asyncio
+    async def test_invalid_row_is_isolated(self, tmp_path):
+        """Après max_attempts échecs, la ligne refusée est écartée et le reste écrit."""
+        written = []
+        
+        def flush_fn(batch):
+            if any(e["n"] == 2 for e in batch):
+                return False
+            written.extend(e["n"] for e in batch)
+            return True
+        
+        writer = AsyncBatchWriter("test", flush_fn, max_attempts=2, spill_dir=tmp_path)
+        for i in range(5):
+            writer.append(_event(i))
+        
+        assert await writer.flush() == 0
+        assert await writer.flush() == 4
+        
+        assert sorted(written) == [0, 1, 3, 4]
+        assert writer.pending == 0
+        assert writer.rejected == 1
+        assert writer.rejected_path.read_text().count("\n") == 1
+        assert not writer.spill_path.exists()
+    
+    @pytest.mark.asyncio
+    async def test_unavailable_database_spills_batch(self, tmp_path):
+        """Si aucune moitié ne passe, le lot déborde sur disque sans être rejeté."""
+        flush_fn = Mock(return_value=False)
+        writer = AsyncBatchWriter("test", flush_fn, max_attempts=1, spill_dir=tmp_path)
+        for i in range(64):
+            writer.append(_event(i))
+        
+        assert await writer.flush() == 0
+        
+        assert writer.pending == 0
+        assert writer.rejected == 0
+        assert writer.spill_path.read_text().count("\n") == 64
+        # Une descente jusqu'à une ligne seule, pas une réécriture ligne à ligne
+        assert flush_fn.call_count <= 1 + 2 * 6
+    
+    @pytest.mark.asyncio
+    async def test_unavailable_database_keeps_batch_without_spill_dir(self):
+        """Sans répertoire de débordement, le lot reste en tête du buffer."""
+        writer = AsyncBatchWriter("test", Mock(return_value=False), max_attempts=1)
+        for i in range(4):
+            writer.append(_event(i))
+        
+        assert await writer.flush() == 0
+        assert [e["n"] for e in writer._buffer] == [0, 1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_holds_pending_and_in_flight(self):
+        """Un événement est détenu jusqu'à la fin de son écriture."""
+        seen = []
+        
+        async def flush_fn(batch):
+            seen.append(writer.holds("id", "c1"))
+            return True
+        
+        writer = AsyncBatchWriter("conversations", flush_fn)
+        writer.append({"id": "c1"})
+        
+        assert writer.holds("id", "c1")
+        assert not writer.holds("id", "c2")
+        await writer.flush()
+        assert seen == [True]
+        assert not writer.holds("id", "c1")
+
+
+class TestConversationLog:
+    """Tests de la journalisation différée des conversations."""
+    
+    def _engine(self, writer: AsyncBatchWriter) -> RAGEngine:
+        engine = RAGEngine.__new__(RAGEngine)
+        engine.config = RAGConfig()
+        engine._conversation_log = writer
+        return engine
+    
+    @pytest.mark.asyncio
+    async def test_id_returned_before_write(self):
+        """L'ID est renvoyé sans attendre l'insert, puis écrit par lot."""
+        flush_fn = Mock(return_value=True)
+        writer = AsyncBatchWriter("conversations", flush_fn, flush_interval=60)
+        await writer.start()
+        engine = self._engine(writer)
+        
+        conversation_id = await engine._log_conversation(
+            "question", "réponse", [], {"input": 1, "output": 2}, 10, "session-1",
+        )
+        
+        assert flush_fn.call_count == 0
+        assert writer.pending == 1
+        
+        await writer.stop()
+        row = flush_fn.call_args.args[0][0]
+        assert row["id"] == conversation_id
+        assert row["session_id"] == "session-1"
+        UUID(conversation_id)
+    
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried(self):
+        """Un lot en échec est conservé et réécrit au flush suivant."""
+        flush_fn = Mock(side_effect=[False, True])
+        writer = AsyncBatchWriter("conversations", flush_fn)
+        writer.append({"id": "c1"})
+        
+        assert await writer.flush() == 0
+        assert await writer.flush() == 1
+        assert flush_fn.call_args.args[0] == [{"id": "c1"}]
+
+
+class TestFeedbackOrdering:
+    """Tests du feedback sur une conversation pas encore écrite."""
+    
+    def _request(self) -> FeedbackRequest:
+        return FeedbackRequest(conversation_id=uuid4(), score=5)
+    
+    def _patch(self, writer: AsyncBatchWriter, flush_interval: float = 1.0):
+        return (
+            patch("src.api.routes.get_conversation_log_writer", return_value=writer),
+            patch("src.api.routes.get_settings", return_value=Mock(
+                conversation_log_flush_interval=flush_interval,
+            )),
+            patch("src.api.routes.FEEDBACK_RETRY_DELAY", 0.01),
+        )
+    
+    @pytest.mark.asyncio
+    async def test_local_conversation_is_flushed_first(self):
+        """La conversation de ce worker est écrite avant le feedback."""
+        request = self._request()
+        flush_fn = Mock(return_value=True)
+        writer = AsyncBatchWriter("conversations", flush_fn)
+        writer.append({"id": str(request.conversation_id)})
+        feedback = Mock()
+        feedback.add_feedback.side_effect = lambda *args: flush_fn.called
+        
+        writer_patch, settings_patch, delay_patch = self._patch(writer)
+        with writer_patch, settings_patch, delay_patch:
+            assert await _add_feedback(feedback, request) is True
+        
+        assert feedback.add_feedback.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_retries_while_local_write_fails(self):
+        """Une écriture locale en échec est retentée avant le feedback."""
+        request = self._request()
+        flush_fn = Mock(side_effect=[False, True])
+        writer = AsyncBatchWriter("conversations", flush_fn)
+        writer.append({"id": str(request.conversation_id)})
+        feedback = Mock()
+        feedback.add_feedback.side_effect = lambda *args: flush_fn.call_count == 2
+        
+        writer_patch, settings_patch, delay_patch = self._patch(writer)
+        with writer_patch, settings_patch, delay_patch:
+            assert await _add_feedback(feedback, request) is True
+        
+        assert feedback.add_feedback.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_unknown_conversation_single_attempt(self):
+        """Une conversation absente de ce worker n'est pas attendue."""
+        writer = AsyncBatchWriter("conversations", Mock(return_value=True))
+        writer.append({"id": str(uuid4())})
+        feedback = Mock()
+        feedback.add_feedback.return_value = False
+        
+        writer_patch, settings_patch, delay_patch = self._patch(writer)
+        with writer_patch, settings_patch, delay_patch:
+            assert await _add_feedback(feedback, self._request()) is False
+        
+        assert feedback.add_feedback.call_count == 1
+        assert writer.pending == 1
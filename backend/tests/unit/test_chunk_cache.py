@@ -0,0 +1,93 @@
+"""
+Tests unitaires pour la recherche en deux temps et le cache des fragments.
+"""
+
+from unittest.mock import AsyncMock, Mock
+from uuid import uuid4
+
+import pytest
+
+from src.models.document import DocumentHit, SourceType
+from src.services.chunk_cache import ChunkBodyCache
+from src.services.context_packer import ContextPacker, ContextPackerConfig
+from src.services.rag_engine import RAGConfig, RAGEngine
+from src.services.reranking import ResultReranker
+
+
+class TestChunkBodyCache:
+    """Tests du cache des contenus."""
+    
+    @pytest.mark.asyncio
+    async def test_only_missing_bodies_are_loaded(self):
+        """Seuls les contenus absents du cache sont lus en base."""
+        cache = ChunkBodyCache()
+        cache.put_many({"a": "contenu A"})
+        load = AsyncMock(return_value={"b": "contenu B"})
+        
+        bodies = await cache.fetch(["a", "b", "c"], load)
+        
+        assert bodies == {"a": "contenu A", "b": "contenu B"}
+        load.assert_awaited_once_with(["b", "c"])
+        assert await cache.fetch(["b"], load) == {"b": "contenu B"}
+        assert load.await_count == 1
+    
+    def test_eviction_is_bounded_in_bytes(self):
+        """Au-delà de max_bytes, les entrées les moins récentes sont évincées."""
+        cache = ChunkBodyCache(max_bytes=10)
+        cache.put_many({"a": "aaaa", "b": "bbbb"})
+        cache.get_many(["a"])
+        cache.put_many({"c": "cccc"})
+        
+        assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+        assert cache.stats()["bytes"] == 8
+    
+    def test_expired_and_invalidated_entries(self):
+        """Les entrées expirées ou invalidées ne sont plus servies."""
+        cache = ChunkBodyCache(ttl=0.0)
+        cache.put_many({"a": "contenu"})
+        assert cache.get_many(["a"]) == {}
+        
+        cache = ChunkBodyCache()
+        cache.put_many({"a": "contenu"})
+        cache.invalidate("a")
+        assert cache.get_many(["a"]) == {}
+        assert cache.stats()["bytes"] == 0
+
+
+def _hit(similarity: float, content_bytes: int) -> DocumentHit:
+    return DocumentHit(
+        id=uuid4(),
+        similarity=similarity,
+        source_type=SourceType.PDF,
+        content_bytes=content_bytes,
+    )
+
+
+class TestTwoPhaseSearch:
+    """Tests de la recherche vectorielle en deux temps du RAG Engine."""
+    
+    @pytest.mark.asyncio
+    async def test_bodies_fetched_only_for_preselected_hits(self):
+        """Le contenu n'est lu que pour les résultats qui peuvent entrer dans le budget."""
+        hits = [_hit(0.9, 4000), _hit(0.8, 4000), _hit(0.7, 4000), _hit(0.6, 4000)]
+        ids = [str(hit.id) for hit in hits]
+        
+        engine = RAGEngine.__new__(RAGEngine)
+        engine.config = RAGConfig(llm_model="mistral-large-latest")
+        engine._packer = ContextPacker(ContextPackerConfig(default_budget=1000))
+        engine._embedding_service = Mock(embed_query=Mock(return_value=[0.1, 0.2]))
+        engine._documents = Mock(
+            search_ids=AsyncMock(return_value=hits),
+            get_contents=AsyncMock(side_effect=lambda ids: {id: f"contenu {id}" for id in ids}),
+        )
+        engine._chunk_bodies = ChunkBodyCache()
+        engine._reranking = ResultReranker(engine.config.rerank)
+        
+        chunks, sources, timings = await engine._search_vector_store("question", "user-1")
+        
+        # 1000 tokens * 1.25 ≈ 5625 octets : deux résultats lus
+        engine._documents.get_contents.assert_awaited_once_with(ids[:2])
+        assert [c.score for c in chunks] == [0.9, 0.8]
+        assert [str(s.document_id) for s in sources] == ids[:2]
+        assert sources[0].content_preview == f"contenu {ids[0]}"
+        assert set(timings.stages) == {"embed", "search", "mmr", "fetch", "rerank"}
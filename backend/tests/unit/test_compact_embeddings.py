@@ -0,0 +1,140 @@
+"""
+Tests unitaires pour les embeddings compacts (mode compact, migration 015).
+"""
+
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from src.repositories.document_repository import DocumentRepository
+from src.services.compact_embeddings import CompactProjection, get_compact_projection
+
+
+@pytest.fixture
+def compact_settings():
+    """Mode compact activé (troncature à 2 dimensions)."""
+    settings = Mock(
+        compact_embedding_enabled=True,
+        compact_embedding_dimension=2,
+        compact_embedding_projection="",
+        compact_search_enabled=True,
+        compact_rescore_multiplier=4,
+    )
+    with patch("src.services.compact_embeddings.get_settings", return_value=settings), \
+         patch("src.repositories.document_repository.get_settings", return_value=settings), \
+         patch("src.services.compact_embeddings._projection", None):
+        yield settings
+
+
+@pytest.fixture
+def repo():
+    """Repository documents avec un client Supabase mocké."""
+    repo = DocumentRepository()
+    repo._client = Mock()
+    return repo
+
+
+class TestCompactProjection:
+    """Tests de la réduction de dimension."""
+    
+    def test_truncation_keeps_first_dimensions_normalized(self):
+        """La troncature garde les premières dimensions, renormalisées."""
+        projection = CompactProjection.truncation(2)
+        
+        compact = projection.project([3.0, 4.0, 12.0])
+        
+        assert compact == pytest.approx([0.6, 0.8])
+    
+    def test_pca_keeps_the_main_axes(self):
+        """La PCA projette sur les axes de plus grande variance."""
+        rng = np.random.default_rng(0)
+        # Variance concentrée sur les deux premières dimensions
+        embeddings = rng.normal(size=(200, 6)) * [10.0, 5.0, 0.1, 0.1, 0.1, 0.1]
+        
+        projection = CompactProjection.fit(embeddings, 2)
+        compact = projection.project_many(embeddings)
+        
+        assert compact.shape == (200, 2)
+        assert np.linalg.norm(compact, axis=1) == pytest.approx(np.ones(200), abs=1e-5)
+        # Les produits scalaires compacts suivent ceux des vecteurs complets
+        full = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        correlation = np.corrcoef((full @ full.T).ravel(), (compact @ compact.T).ravel())[0, 1]
+        assert correlation > 0.95
+    
+    def test_pca_needs_enough_samples(self):
+        """Un échantillon plus petit que la dimension est refusé."""
+        with pytest.raises(ValueError):
+            CompactProjection.fit(np.ones((3, 8)), 4)
+    
+    def test_save_and_load(self, tmp_path):
+        """La projection PCA enregistrée est rechargée à l'identique."""
+        rng = np.random.default_rng(1)
+        embeddings = rng.normal(size=(50, 8))
+        projection = CompactProjection.fit(embeddings, 3)
+        path = tmp_path / "pca.npz"
+        
+        projection.save(path)
+        loaded = CompactProjection.load(path)
+        
+        assert loaded.dimension == 3
+        assert loaded.project(embeddings[0]) == pytest.approx(projection.project(embeddings[0]))
+    
+    def test_disabled_by_default(self):
+        """Sans compact_embedding_enabled, pas de projection."""
+        settings = Mock(compact_embedding_enabled=False)
+        with patch("src.services.compact_embeddings.get_settings", return_value=settings):
+            assert get_compact_projection() is None
+
+
+class TestCompactRepository:
+    """Tests de la double écriture et du premier passage compact."""
+    
+    def test_create_writes_compact_embedding(self, compact_settings, repo):
+        """L'ingestion écrit aussi l'embedding compact (double écriture)."""
+        table = repo.client.table.return_value
+        table.insert.return_value.execute.return_value = Mock(data=[{
+            "id": str(uuid4()),
+            "content": "Bonjour",
+            "source_type": "manual",
+            "created_at": "2026-01-01T00:00:00Z",
+        }])
+        
+        repo.create({"content": "Bonjour", "embedding": [0.36, 0.48, 0.8], "source_type": "manual"})
+        
+        data = table.insert.call_args.args[0]
+        assert data["embedding_compact"] == pytest.approx([0.6, 0.8])
+    
+    def test_create_without_compact_mode(self, repo):
+        """Mode compact désactivé : seul l'embedding complet est écrit."""
+        table = repo.client.table.return_value
+        table.insert.return_value.execute.return_value = Mock(data=[{
+            "id": str(uuid4()),
+            "content": "Bonjour",
+            "source_type": "manual",
+            "created_at": "2026-01-01T00:00:00Z",
+        }])
+        settings = Mock(compact_embedding_enabled=False)
+        
+        with patch("src.services.compact_embeddings.get_settings", return_value=settings):
+            repo.create({"content": "Bonjour", "embedding": [0.6, 0.8], "source_type": "manual"})
+        
+        assert "embedding_compact" not in table.insert.call_args.args[0]
+    
+    def test_search_sends_compact_query(self, compact_settings, repo):
+        """La recherche transmet la requête compacte et les candidats à re-scorer."""
+        repo.client.rpc.return_value.execute.return_value = Mock(data=[])
+        
+        repo.search_ids([0.0, 3.0, 4.0], limit=5)
+        
+        name, params = repo.client.rpc.call_args.args
+        assert name == "match_document_ids"
+        assert params["query_compact"] == pytest.approx([0.0, 1.0])
+        assert params["rescore_count"] == 20
+    
+    def test_compact_search_disabled(self, compact_settings):
+        """compact_search_enabled à False : recherche sur l'index complet."""
+        compact_settings.compact_search_enabled = False
+        
+        assert DocumentRepository.compact_query([0.6, 0.8], 5) == (None, None)
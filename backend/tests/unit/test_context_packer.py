@@ -0,0 +1,160 @@
+"""
+Tests unitaires pour le packing du contexte sous budget de tokens.
+"""
+
+from src.providers.llm.tokenizer import get_token_counter
+from src.services.context_packer import (
+    SECTION_HEADERS,
+    VECTOR_SOURCE,
+    WEB_SOURCE,
+    ContextChunk,
+    ContextPacker,
+    ContextPackerConfig,
+    web_chunks,
+)
+
+MODEL = "mistral-large-latest"
+
+
+def _text(topic: str, sentences: int) -> str:
+    """Texte de test : phrases distinctes sur un sujet."""
+    return " ".join(
+        f"Le paragraphe {topic} numéro {i} décrit un aspect différent du sujet {topic}."
+        for i in range(sentences)
+    )
+
+
+def _tokens(text: str) -> int:
+    return get_token_counter(MODEL).count(text)
+
+
+class TestContextPacker:
+    """Tests de sélection, troncature et déduplication."""
+    
+    def test_everything_fits(self):
+        """Sous budget, tous les fragments sont conservés dans l'ordre des sections."""
+        packer = ContextPacker(ContextPackerConfig(default_budget=4000))
+        packed = packer.pack([
+            ContextChunk(text=_text("alpha", 3), score=0.9),
+            ContextChunk(text=_text("beta", 3), score=0.5, source=WEB_SOURCE),
+        ], MODEL)
+        
+        assert packed.text.startswith(SECTION_HEADERS[VECTOR_SOURCE])
+        assert SECTION_HEADERS[WEB_SOURCE] in packed.text
+        assert packed.dropped_tokens == 0
+        assert packed.packed_tokens == _tokens(packed.text)
+    
+    def test_budget_keeps_best_chunks_whole(self):
+        """Les mieux classés sont entiers, le suivant est tronqué, le reste écarté."""
+        best, second, last = _text("alpha", 6), _text("beta", 20), _text("gamma", 20)
+        budget = _tokens(best) + 120
+        packer = ContextPacker(ContextPackerConfig(default_budget=budget, min_chunk_tokens=20))
+        
+        packed = packer.pack([
+            ContextChunk(text=last, score=0.2),
+            ContextChunk(text=best, score=0.9),
+            ContextChunk(text=second, score=0.6),
+        ], MODEL)
+        
+        assert [c.text for c in packed.chunks][0] == best
+        assert packed.chunks[1].truncated
+        assert second.startswith(packed.chunks[1].text)
+        assert packed.chunks[1].text.endswith(".")
+        assert packed.truncated_chunks == 1
+        assert packed.dropped_chunks == 1
+        assert "gamma" not in packed.text
+        assert packed.packed_tokens <= budget
+        assert packed.dropped_tokens > 0
+    
+    def test_small_remainder_is_not_truncated(self):
+        """Un reste inférieur à min_chunk_tokens n'est pas rempli."""
+        best = _text("alpha", 6)
+        packer = ContextPacker(ContextPackerConfig(
+            default_budget=_tokens(best) + 30,
+            min_chunk_tokens=200,
+        ))
+        
+        packed = packer.pack([
+            ContextChunk(text=best, score=0.9),
+            ContextChunk(text=_text("beta", 10), score=0.5),
+        ], MODEL)
+        
+        assert len(packed.chunks) == 1
+        assert packed.truncated_chunks == 0
+        assert packed.dropped_chunks == 1
+    
+    def test_near_duplicates_are_dropped(self):
+        """Un fragment contenu dans un fragment mieux classé est écarté."""
+        full = _text("alpha", 8)
+        packer = ContextPacker(ContextPackerConfig(default_budget=4000))
+        
+        packed = packer.pack([
+            ContextChunk(text=full, score=0.9),
+            ContextChunk(text=full[: len(full) // 2], score=0.8),
+            ContextChunk(text=_text("beta", 2), score=0.7, source=WEB_SOURCE),
+        ], MODEL)
+        
+        assert packed.deduplicated_chunks == 1
+        assert len(packed.chunks) == 2
+    
+    def test_rank_order_is_kept_within_source(self):
+        """Un rang imposé est conservé sans modifier les similarités."""
+        packer = ContextPacker(ContextPackerConfig(default_budget=4000))
+        packed = packer.pack([
+            ContextChunk(text=_text("alpha", 3), score=0.7, rank=0),
+            ContextChunk(text=_text("beta", 3), score=0.9, rank=1),
+            ContextChunk(text=_text("gamma", 3), score=0.8, source=WEB_SOURCE),
+            ContextChunk(text=_text("delta", 3), score=0.6, rank=2),
+        ], MODEL)
+        
+        # Le rang 0 prend la meilleure similarité de sa source (0.9)
+        # pour l'interclassement avec le web, le rang 1 la suivante (0.7)
+        assert [c.text.split()[2] for c in packed.chunks] == ["alpha", "gamma", "beta", "delta"]
+        assert [c.score for c in packed.chunks] == [0.7, 0.8, 0.9, 0.6]
+    
+    def test_model_budget_prefix(self):
+        """Le budget par modèle est résolu par préfixe le plus long."""
+        packer = ContextPacker(ContextPackerConfig(
+            default_budget=6000,
+            model_budgets={"mistral": 4000, "mistral-small": 2000},
+        ))
+        
+        assert packer.budget_for("mistral-small-latest") == 2000
+        assert packer.budget_for("mistral-large-latest") == 4000
+        assert packer.budget_for("gpt-4o") == 6000
+    
+    def test_metadata(self):
+        """Les tokens placés et écartés sont remontés en métadonnées."""
+        packer = ContextPacker(ContextPackerConfig(default_budget=300, min_chunk_tokens=10_000))
+        packed = packer.pack([
+            ContextChunk(text=_text("alpha", 3), score=0.9),
+            ContextChunk(text=_text("beta", 30), score=0.5),
+        ], MODEL)
+        
+        metadata = packed.to_metadata()
+        assert metadata["context_tokens"] == packed.packed_tokens
+        assert metadata["context_dropped_tokens"] == _tokens(_text("beta", 30))
+        assert metadata["context_budget"] == 300
+        assert metadata["context_dropped_chunks"] == 1
+
+
+def test_web_chunks_keep_order():
+    """Les paragraphes web gardent leur ordre à score égal."""
+    chunks = web_chunks("Premier.\n\nDeuxième.\n\n\nTroisième.", score=0.8)
+    
+    assert [c.text for c in chunks] == ["Premier.", "Deuxième.", "Troisième."]
+    assert all(c.source == WEB_SOURCE for c in chunks)
+    assert chunks[0].score > chunks[1].score > chunks[2].score
+
+
+def test_preselect_reads_enough_bodies_for_budget():
+    """La présélection couvre le budget (majoré) et le fragment qui le dépasse."""
+    packer = ContextPacker(ContextPackerConfig(
+        default_budget=1000,
+        preselect_bytes_per_token=4.0,
+        preselect_slack=1.0,
+    ))
+    
+    assert packer.preselect([1600, 1600, 1600, 1600], MODEL) == 3
+    assert packer.preselect([100, 100], MODEL) == 2
+    assert packer.preselect([], MODEL) == 0
@@ -0,0 +1,229 @@
+"""
+Tests unitaires pour l'admission gateway.
+"""
+
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+
+import pytest
+
+from src.models.api_key import ApiKeyValidation
+from src.models.subscription import UsageStats
+from src.services.gateway import GatewayAdmission, QuotaInfo
+from src.services.usage_meter import DELTAS_KEY, UsageMeter
+
+
+def _validation(rate_limit: int = 100) -> ApiKeyValidation:
+    return ApiKeyValidation(
+        id=uuid4(),
+        user_id=uuid4(),
+        scopes=["query"],
+        rate_limit=rate_limit,
+        is_valid=True,
+    )
+
+
+@pytest.fixture
+def gateway():
+    """Gateway avec settings mockés et sans quota."""
+    with patch("src.services.gateway.get_settings") as mock_settings:
+        settings = Mock()
+        settings.rate_limit_enabled = True
+        settings.rate_limit_requests = 100
+        settings.rate_limit_reflection = 1
+        mock_settings.return_value = settings
+        
+        sub_repo = Mock()
+        sub_repo.get_user_usage.return_value = None
+        yield GatewayAdmission(sub_repo=sub_repo, meter=UsageMeter(enabled=True))
+
+
+class TestLocalAdmission:
+    """Tests pour l'admission sans Redis."""
+    
+    @pytest.fixture(autouse=True)
+    def no_redis(self):
+        with patch("src.services.gateway.get_redis_client", AsyncMock(return_value=None)):
+            yield
+    
+    @pytest.mark.asyncio
+    async def test_reflection_window_applies(self, gateway):
+        """La deuxième réflexion est refusée avec le code dédié."""
+        validation = _validation()
+        
+        first = await gateway.admit(validation, "1.2.3.4", reflection=True)
+        second = await gateway.admit(validation, "1.2.3.4", reflection=True)
+        
+        assert first.allowed is True
+        assert second.allowed is False
+        assert second.reason == "REFLECTION_LIMIT_EXCEEDED"
+        assert second.retry_after > 0
+    
+    @pytest.mark.asyncio
+    async def test_rejection_consumes_nothing(self, gateway):
+        """Un refus sur une fenêtre ne consomme pas les autres."""
+        validation = _validation(rate_limit=3)
+        
+        await gateway.admit(validation, "1.2.3.4", reflection=True)
+        await gateway.admit(validation, "1.2.3.4", reflection=True)
+        
+        # 1 requête consommée sur la fenêtre de la clé, pas 2
+        decision = await gateway.admit(validation, "1.2.3.4")
+        assert decision.allowed is True
+        assert decision.rate_limit.remaining == 1
+    
+    @pytest.mark.asyncio
+    async def test_latency_is_recorded(self, gateway):
+        """Chaque décision alimente les statistiques."""
+        await gateway.admit(_validation(), "1.2.3.4")
+        
+        snapshot = gateway.stats.snapshot()
+        assert snapshot["admitted"] == 1
+        assert snapshot["local_fallbacks"] == 1
+        assert snapshot["latency_ms"]["p50"] is not None
+
+
+class TestScriptAdmission:
+    """Tests pour l'admission par script Redis."""
+    
+    @pytest.mark.asyncio
+    async def test_single_script_call_with_quota(self, gateway):
+        """Fenêtres et quota sont évalués en un seul appel."""
+        validation = _validation()
+        gateway.sub_repo.get_user_usage.return_value = UsageStats(
+            period="2026-10",
+            requests_count=100,
+            requests_limit=100,
+            plan_slug="free",
+        )
+        
+        redis = Mock()
+        script = AsyncMock(return_value=[0, -1, 0, 1_700_000_000_000, 100, 99, 600, 0, 60_000])
+        redis.register_script.return_value = script
+        
+        with patch("src.services.gateway.get_redis_client", AsyncMock(return_value=redis)):
+            decision = await gateway.admit(validation, "1.2.3.4", reflection=True)
+        
+        assert script.await_count == 1
+        keys = script.call_args.kwargs["keys"]
+        assert keys[0] == f"rl:key:{validation.id}"
+        assert keys[1] == f"rl:reflection:{validation.user_id}"
+        assert keys[2].startswith(f"usage:{validation.user_id}:")
+        assert keys[2].endswith(":requests")
+        assert keys[3] == DELTAS_KEY
+        # n, (T, W) x 2, limite stricte, valeur initiale, TTL, champ delta
+        args = script.call_args.kwargs["args"]
+        assert args[0] == 2
+        assert args[5:7] == [100, 100]
+        
+        assert decision.allowed is False
+        assert decision.reason == "quota_exceeded"
+        assert decision.retry_after > 0
+    
+    @pytest.mark.asyncio
+    async def test_paid_plan_has_no_hard_limit(self, gateway):
+        """Les plans payants sont comptés sans limite stricte."""
+        gateway.sub_repo.get_user_usage.return_value = UsageStats(
+            period="2026-10",
+            requests_count=5000,
+            requests_limit=1000,
+            plan_slug="pro",
+        )
+        
+        quota = await gateway._quota_for(_validation())
+        
+        assert quota.hard_limit == -1
+        assert quota.used == 5000
+        assert quota.plan_slug == "pro"
+    
+    @pytest.mark.asyncio
+    async def test_counted_without_usage_lookup(self, gateway):
+        """Avec le compteur Redis, une requête est comptée même sans quota connu."""
+        quota = await gateway._quota_for(_validation())
+        
+        assert quota.hard_limit == -1
+        assert quota.used is None
+
+
+class TestQuotaCache:
+    """Tests du cache des quotas (LRU borné + TTL)."""
+    
+    def _usage(self) -> UsageStats:
+        return UsageStats(period="2026-10", requests_count=1, requests_limit=100, plan_slug="free")
+    
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded(self, gateway):
+        """Au-delà de la borne, les utilisateurs les moins récents sont évincés."""
+        gateway.sub_repo.get_user_usage.return_value = self._usage()
+        validations = [_validation() for _ in range(3)]
+        
+        with patch("src.services.gateway.QUOTA_MAX_USERS", 2):
+            for validation in validations:
+                await gateway._quota_for(validation)
+        
+        assert list(gateway._quotas) == [str(v.user_id) for v in validations[1:]]
+    
+    @pytest.mark.asyncio
+    async def test_hit_refreshes_recency(self, gateway):
+        """Un quota relu redevient le plus récent."""
+        gateway.sub_repo.get_user_usage.return_value = self._usage()
+        first, second, third = (_validation() for _ in range(3))
+        
+        with patch("src.services.gateway.QUOTA_MAX_USERS", 2):
+            await gateway._quota_for(first)
+            await gateway._quota_for(second)
+            await gateway._quota_for(first)
+            await gateway._quota_for(third)
+        
+        assert set(gateway._quotas) == {str(first.user_id), str(third.user_id)}
+    
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_evicted(self, gateway):
+        """Un quota expiré est retiré puis relu en base."""
+        validation = _validation()
+        gateway._quotas[str(validation.user_id)] = QuotaInfo(hard_limit=10, used=0, expires_at=0.0)
+        gateway.sub_repo.get_user_usage.return_value = self._usage()
+        
+        quota = await gateway._quota_for(validation)
+        
+        assert quota.hard_limit == 100
+        assert gateway._quotas[str(validation.user_id)] is quota
+
+    @pytest.mark.asyncio
+    async def test_missing_usage_is_cached(self, gateway):
+        """Un usage introuvable n'est relu qu'après le délai court."""
+        validation = _validation()
+        
+        first = await gateway._quota_for(validation)
+        second = await gateway._quota_for(validation)
+        
+        assert second is first
+        assert first.known is False
+        assert gateway.sub_repo.get_user_usage.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_lookup_failure_keeps_last_quota(self, gateway):
+        """Pendant une panne, la limite du plan gratuit reste appliquée."""
+        validation = _validation()
+        gateway._quotas[str(validation.user_id)] = QuotaInfo(
+            hard_limit=10, used=3, expires_at=0.0, plan_slug="free",
+        )
+        gateway.sub_repo.get_user_usage.side_effect = RuntimeError("db down")
+        
+        quota = await gateway._quota_for(validation)
+        await gateway._quota_for(validation)
+        
+        assert quota.hard_limit == 10
+        assert quota.plan_slug == "free"
+        assert quota.expires_at > 0
+        assert gateway.sub_repo.get_user_usage.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_missing_usage_without_meter(self, gateway):
+        """Sans compteurs, un usage introuvable n'est pas appliqué mais reste en cache."""
+        gateway.meter = UsageMeter(enabled=False)
+        validation = _validation()
+        
+        assert await gateway._quota_for(validation) is None
+        assert await gateway._quota_for(validation) is None
+        assert gateway.sub_repo.get_user_usage.call_count == 1
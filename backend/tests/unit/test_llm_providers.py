@@ -15,6 +15,12 @@ from src.providers.llm import (
     LLMProviderFactory,
     get_llm_provider,
     MistralLLMProvider,
+    TokenCounter,
+    AdaptiveConcurrencyLimiter,
+    ProviderLimits,
+    ProviderQueueTimeout,
+    LocalSimulatedProvider,
+    LocalEmbeddingClient,
 )
 
 
@@ -31,7 +37,7 @@ class TestLLMProvider:
     
     def test_all_providers_exist(self):
         """Vérifie que tous les providers attendus existent."""
-        expected = {"MISTRAL", "OPENAI", "GEMINI", "DEEPSEEK", "ANTHROPIC"}
+        expected = {"MISTRAL", "OPENAI", "GEMINI", "DEEPSEEK", "ANTHROPIC", "LOCAL"}
         actual = {p.name for p in LLMProvider}
         assert expected == actual
 
@@ -295,3 +301,181 @@ class TestProviderReflectionMode:
         
         assert response.content is not None
         assert len(response.content) > 0
+
+
+class TestTokenCounter:
+    """Tests pour le comptage de tokens (estimateur et flux incrémental)."""
+    
+    class _WordEncoding:
+        """Encodage factice : un token par mot (espace en tête inclus)."""
+        
+        def encode(self, text, disallowed_special=()):
+            import re
+            return re.findall(r" ?\S+|\s+", text)
+    
+    def test_estimator_uses_model_ratio(self):
+        """Sans tiktoken, le ratio caractères/token du modèle est utilisé."""
+        counter = TokenCounter("mistral-large-latest", use_tiktoken=False)
+        
+        assert counter.is_exact is False
+        assert counter.count("a" * 35) == 10
+        assert counter.count("") == 0
+    
+    def test_count_messages_includes_overhead(self):
+        """Le comptage d'un prompt inclut le surcoût par message."""
+        counter = TokenCounter("gpt-4o", use_tiktoken=False)
+        messages = [{"role": "user", "content": "a" * 40}]
+        
+        assert counter.count_messages(messages) == 10 + 4 + 3
+    
+    def test_stream_counter_matches_full_count(self):
+        """Le comptage incrémental égale le comptage du texte complet."""
+        counter = TokenCounter("gpt-4o", use_tiktoken=False)
+        counter._encoding = self._WordEncoding()
+        stream = counter.stream()
+        
+        for piece in ["Bon", "jour tout", " le mon", "de\nentier"]:
+            stream.add(piece)
+        
+        assert stream.total == counter.count("Bonjour tout le monde\nentier")
+    
+    def test_final_chunk_prefers_provider_usage(self):
+        """L'usage rapporté par le provider prime sur l'estimation."""
+        provider = Mock(spec=BaseLLMProvider)
+        provider.config = LLMConfig(model="mistral-small-latest")
+        provider._get_token_counter = lambda: TokenCounter(
+            "mistral-small-latest", use_tiktoken=False
+        )
+        completion = provider._get_token_counter().stream()
+        completion.add("réponse")
+        
+        reported = BaseLLMProvider._final_stream_chunk(
+            provider, [{"role": "user", "content": "q"}], completion, 12, 34
+        )
+        estimated = BaseLLMProvider._final_stream_chunk(
+            provider, [{"role": "user", "content": "q"}], completion
+        )
+        
+        assert reported.is_final is True
+        assert reported.usage.source == "provider"
+        assert reported.usage.total_tokens == 46
+        assert estimated.usage.source == "estimated"
+        assert estimated.usage.output_tokens == completion.total
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Tests pour le limiter adaptatif des providers."""
+    
+    class _RateLimited(Exception):
+        status_code = 429
+    
+    @pytest.mark.asyncio
+    async def test_queue_waits_then_times_out(self):
+        """Sans slot libre, la requête attend puis échoue à la deadline."""
+        limiter = AdaptiveConcurrencyLimiter(
+            "test", ProviderLimits(initial_concurrency=1, max_concurrency=1)
+        )
+        
+        async with limiter.slot():
+            with pytest.raises(ProviderQueueTimeout):
+                await limiter.acquire(timeout=0.1)
+        
+        assert limiter.in_flight == 0
+    
+    @pytest.mark.asyncio
+    async def test_multiplicative_decrease_on_429(self):
+        """Un 429 divise la limite, une seule fois par fenêtre."""
+        limiter = AdaptiveConcurrencyLimiter(
+            "test", ProviderLimits(initial_concurrency=8)
+        )
+        
+        for _ in range(3):
+            with pytest.raises(self._RateLimited):
+                async with limiter.slot():
+                    raise self._RateLimited()
+        
+        assert limiter.concurrency_limit == 4
+    
+    @pytest.mark.asyncio
+    async def test_additive_increase_on_success(self):
+        """Une fenêtre complète de succès augmente la limite de 1."""
+        limiter = AdaptiveConcurrencyLimiter(
+            "test", ProviderLimits(initial_concurrency=4, max_concurrency=5)
+        )
+        
+        for _ in range(20):
+            async with limiter.slot():
+                pass
+        
+        assert limiter.concurrency_limit == 5
+    
+    @pytest.mark.asyncio
+    async def test_tpm_budget_refunds_unused_tokens(self):
+        """La réservation TPM est ajustée à la consommation réelle."""
+        limiter = AdaptiveConcurrencyLimiter(
+            "test", ProviderLimits(tokens_per_minute=1000)
+        )
+        
+        async with limiter.slot(estimated_tokens=900) as permit:
+            permit.record_tokens(100)
+        
+        # 900 tokens remboursés : un nouvel appel de 800 passe sans attendre
+        permit = await limiter.acquire(estimated_tokens=800, timeout=0)
+        assert permit.queued_ms == 0
+
+
+class TestLocalSimulatedProvider:
+    """Tests pour le provider simulé (tests de charge)."""
+    
+    @pytest.fixture
+    def local_provider(self, mock_settings):
+        mock_settings.local_llm_ttft_ms = 0
+        mock_settings.local_llm_tokens_per_second = 10000.0
+        mock_settings.local_llm_response_tokens = 20
+        mock_settings.local_llm_error_rate = 0.0
+        mock_settings.local_llm_seed = 1
+        with patch(
+            "src.providers.llm.local_provider.get_settings",
+            return_value=mock_settings,
+        ):
+            return LocalSimulatedProvider(LLMConfig(model="local-simulated"))
+    
+    @pytest.mark.asyncio
+    async def test_generate_is_deterministic(self, local_provider):
+        """Même prompt, même réponse."""
+        messages = [{"role": "user", "content": "Bonjour"}]
+        
+        first = await local_provider.generate(messages)
+        second = await local_provider.generate(messages)
+        
+        assert first.content == second.content
+        assert first.tokens_output == 20
+    
+    @pytest.mark.asyncio
+    async def test_stream_reports_usage(self, local_provider):
+        """Le flux se termine par un chunk final avec l'usage."""
+        chunks = [
+            chunk async for chunk in local_provider.generate_stream(
+                [{"role": "user", "content": "Bonjour"}]
+            )
+        ]
+        
+        assert chunks[-1].is_final is True
+        assert chunks[-1].usage.output_tokens == 20
+        assert chunks[-1].usage.source == "provider"
+        assert len(chunks) == 21
+    
+    def test_local_embeddings_are_deterministic_and_normalized(self):
+        """Vecteurs déterministes, normalisés, proches si vocabulaire commun."""
+        client = LocalEmbeddingClient(dimension=64)
+        
+        response = client.embeddings.create(
+            model="mistral-embed",
+            inputs=["projets python data", "projets python data", "météo demain"],
+        )
+        a, b, c = (d.embedding for d in response.data)
+        
+        assert a == b
+        assert len(a) == 64
+        assert sum(v * v for v in a) == pytest.approx(1.0)
+        assert sum(x * y for x, y in zip(a, c)) < 1.0
@@ -0,0 +1,140 @@
+"""
+Tests unitaires pour les middlewares ASGI de la gateway.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+import pytest
+
+from src.api.middleware import RateLimitMiddleware, RequestLoggingMiddleware
+from src.services.rate_limiter import RateLimitResult
+
+
+def _scope(path: str = "/api/v1/query") -> dict:
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"user-agent", b"pytest")],
+        "client": ("1.2.3.4", 1234),
+    }
+
+
+async def _receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def _app(state: dict | None = None, release: asyncio.Event | None = None):
+    """Application ASGI qui renseigne l'état puis streame deux chunks."""
+    async def app(scope, receive, send):
+        scope["state"].update(state or {})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n", "more_body": True})
+        if release is not None:
+            await release.wait()
+        await send({"type": "http.response.body", "body": b"data: 2\n\n", "more_body": False})
+    return app
+
+
+class TestRateLimitMiddleware:
+    """Tests pour RateLimitMiddleware."""
+    
+    @pytest.mark.asyncio
+    async def test_headers_from_state(self):
+        """Les headers sont injectés dans http.response.start."""
+        rate_limit = RateLimitResult(True, limit=100, remaining=42, retry_after=0, reset_at=1_700_000_060)
+        messages = []
+        
+        async def send(message):
+            messages.append(message)
+        
+        middleware = RateLimitMiddleware(_app({"rate_limit": rate_limit}))
+        await middleware(_scope(), _receive, send)
+        
+        headers = dict(messages[0]["headers"])
+        assert headers[b"x-ratelimit-limit"] == b"100"
+        assert headers[b"x-ratelimit-remaining"] == b"42"
+        assert headers[b"x-ratelimit-reset"] == b"1700000060"
+    
+    @pytest.mark.asyncio
+    async def test_health_is_exempt(self):
+        """Le health check ne reçoit pas de headers."""
+        rate_limit = RateLimitResult(True, limit=100, remaining=42, retry_after=0, reset_at=0)
+        messages = []
+        
+        async def send(message):
+            messages.append(message)
+        
+        scope = _scope("/health")
+        scope["state"] = {}
+        await RateLimitMiddleware(_app({"rate_limit": rate_limit}))(scope, _receive, send)
+        
+        assert messages[0]["headers"] == []
+
+
+class TestRequestLoggingMiddleware:
+    """Tests pour RequestLoggingMiddleware."""
+    
+    @pytest.mark.asyncio
+    async def test_stream_is_not_buffered(self):
+        """Le premier chunk est transmis avant la fin du générateur."""
+        release = asyncio.Event()
+        received = []
+        first_chunk = asyncio.Event()
+        
+        async def send(message):
+            received.append(message)
+            if message["type"] == "http.response.body":
+                first_chunk.set()
+        
+        middleware = RateLimitMiddleware(RequestLoggingMiddleware(_app(release=release)))
+        task = asyncio.create_task(middleware(_scope(), _receive, send))
+        
+        await asyncio.wait_for(first_chunk.wait(), timeout=1)
+        assert not task.done()
+        assert b"x-response-time" in dict(received[0]["headers"])
+        
+        release.set()
+        await task
+        assert [m.get("body") for m in received[1:]] == [b"data: 1\n\n", b"data: 2\n\n"]
+    
+    @pytest.mark.asyncio
+    async def test_usage_logged_after_body(self):
+        """L'usage de la clé est enregistré avec le statut et l'IP."""
+        api_key = SimpleNamespace(id=uuid4())
+        writer = Mock()
+        
+        async def send(message):
+            pass
+        
+        with patch("src.api.middleware.get_usage_log_writer", return_value=writer), \
+             patch("src.api.middleware.get_settings") as mock_settings:
+            mock_settings.return_value.usage_log_enabled = True
+            await RequestLoggingMiddleware(_app({"api_key": api_key}))(_scope(), _receive, send)
+        
+        event = writer.append.call_args.args[0]
+        assert event["api_key_id"] == str(api_key.id)
+        assert event["status_code"] == 200
+        assert event["client_ip"] == "1.2.3.4"
+        assert event["user_agent"] == "pytest"
+    
+    @pytest.mark.asyncio
+    async def test_exception_logged_as_500(self):
+        """Une exception de l'application est journalisée puis propagée."""
+        api_key = SimpleNamespace(id=uuid4())
+        writer = Mock()
+        
+        async def app(scope, receive, send):
+            scope["state"]["api_key"] = api_key
+            raise RuntimeError("boom")
+        
+        with patch("src.api.middleware.get_usage_log_writer", return_value=writer), \
+             patch("src.api.middleware.get_settings") as mock_settings:
+            mock_settings.return_value.usage_log_enabled = True
+            with pytest.raises(RuntimeError):
+                await RequestLoggingMiddleware(app)(_scope(), _receive, Mock())
+        
+        assert writer.append.call_args.args[0]["status_code"] == 500
@@ -0,0 +1,143 @@
+"""
+Tests unitaires pour la cascade de modèles.
+"""
+
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from src.providers.llm import LLMResponse
+from src.services.model_cascade import (
+    CascadeConfig,
+    CascadeDecision,
+    CascadeStats,
+    ModelCascade,
+)
+from src.services.orchestrator import QueryIntent, RoutingDecision
+from src.services.rag_engine import RAGConfig, RAGEngine
+
+
+LARGE = "mistral-large-latest"
+SMALL = "mistral-small-latest"
+
+
+@pytest.fixture
+def cascade():
+    return ModelCascade(CascadeConfig(enabled=True), LARGE)
+
+
+def _routing(intent=QueryIntent.GENERAL, confidence=0.9, reflection=False):
+    return RoutingDecision(
+        intent=intent,
+        use_rag=False,
+        use_web=False,
+        use_reflection=reflection,
+        confidence=confidence,
+    )
+
+
+class TestCascadeSelection:
+    """Tests pour la sélection du modèle initial."""
+    
+    def test_simple_intent_uses_small_model(self, cascade):
+        """Les intentions simples partent sur le petit modèle."""
+        decision = cascade.select(_routing(QueryIntent.GREETING))
+        
+        assert decision.model == SMALL
+        assert decision.escalated is False
+    
+    def test_unmapped_intent_uses_large_model(self, cascade):
+        """Une intention sans palier configuré utilise le grand modèle."""
+        decision = cascade.select(_routing(QueryIntent.HYBRID))
+        
+        assert decision.model == LARGE
+        assert decision.escalated is False
+    
+    @pytest.mark.parametrize("routing, reason", [
+        (_routing(confidence=0.4), "low_confidence"),
+        (_routing(reflection=True), "reflection"),
+    ])
+    def test_escalates_before_generation(self, cascade, routing, reason):
+        """Confiance faible ou réflexion : grand modèle directement."""
+        decision = cascade.select(routing)
+        
+        assert decision.model == LARGE
+        assert decision.reason == reason
+    
+    def test_disabled_cascade_keeps_large_model(self):
+        """Cascade désactivée : comportement historique."""
+        cascade = ModelCascade(CascadeConfig(enabled=False), LARGE)
+        assert cascade.select(_routing(QueryIntent.GREETING)).model == LARGE
+
+    def test_small_model_follows_provider(self):
+        """Sans configuration, le petit modèle est celui du provider."""
+        cascade = ModelCascade(CascadeConfig(enabled=True), "gpt-4o", "openai")
+        assert cascade.select(_routing(QueryIntent.GREETING)).model == "gpt-4o-mini"
+    
+    def test_provider_without_small_model(self):
+        """Provider sans petit modèle connu : grand modèle."""
+        cascade = ModelCascade(CascadeConfig(enabled=True), "local-simulated", "local")
+        assert cascade.select(_routing(QueryIntent.GREETING)).model == "local-simulated"
+
+
+class TestCascadeSelfCheck:
+    """Tests pour l'auto-vérification des réponses du petit modèle."""
+    
+    def test_accepts_good_answer(self, cascade):
+        response = LLMResponse(content="Python est ton langage principal, surtout pour la data.")
+        assert cascade.check_answer(response, _routing(), has_context=True) is None
+    
+    def test_rejects_truncated_answer(self, cascade):
+        response = LLMResponse(content="Une réponse coupée", finish_reason="length")
+        assert cascade.check_answer(response, _routing(), has_context=False) == "truncated"
+    
+    def test_rejects_ignored_context(self, cascade):
+        response = LLMResponse(content="Je ne sais pas vraiment, désolé pour ça.")
+        assert cascade.check_answer(response, _routing(), has_context=True) == "ignored_context"
+    
+    def test_short_greeting_is_fine(self, cascade):
+        response = LLMResponse(content="Salut !")
+        assert cascade.check_answer(
+            response, _routing(QueryIntent.GREETING), has_context=False
+        ) is None
+
+
+class TestCascadeStats:
+    """Tests pour les statistiques de cascade."""
+    
+    def test_escalation_rate_and_savings(self):
+        stats = CascadeStats()
+        stats.record(CascadeDecision(model=SMALL), small_latency_ms=200, large_latency_ms=None)
+        stats.record(
+            CascadeDecision(model=LARGE, escalated=True, reason="too_short"),
+            small_latency_ms=150,
+            large_latency_ms=1000,
+        )
+        
+        snapshot = stats.snapshot()
+        
+        assert snapshot["escalation_rate"] == 0.5
+        assert snapshot["escalations"] == {"too_short": 1}
+        assert snapshot["estimated_latency_saved_ms"] == 800
+
+
+class TestCascadeGeneration:
+    """Tests de la génération en cascade dans le RAG Engine."""
+    
+    @pytest.mark.asyncio
+    async def test_small_model_error_escalates(self):
+        """Une erreur du petit modèle (429, timeout) escalade vers le grand."""
+        engine = RAGEngine.__new__(RAGEngine)
+        engine.config = RAGConfig(llm_model=LARGE)
+        engine._cascade = ModelCascade(CascadeConfig(enabled=True), LARGE)
+        small = Mock(generate=AsyncMock(side_effect=RuntimeError("429 Too Many Requests")))
+        large = Mock(generate=AsyncMock(return_value=LLMResponse(content="Réponse du grand modèle")))
+        engine._get_llm_provider = Mock(side_effect=lambda model=None: small if model else large)
+        
+        response, decision = await engine._generate_answer(
+            _routing(QueryIntent.GENERAL), [], "system", has_context=False,
+        )
+        
+        assert response.content == "Réponse du grand modèle"
+        assert decision == CascadeDecision(model=LARGE, escalated=True, reason="error")
+        assert engine._cascade.stats.snapshot()["escalations"] == {"error": 1}
@@ -9,6 +9,7 @@ from datetime import datetime
 from src.models.document import (
     Document,
     DocumentCreate,
+    DocumentFilter,
     DocumentMetadata,
     SourceType,
     DocumentMatch,
@@ -80,6 +81,61 @@ class TestDocumentModels:
         assert 0 <= match.similarity <= 1
 
 
+class TestDocumentFilter:
+    """Tests du filtre de métadonnées (paramètre JSONB de match_documents)."""
+    
+    def test_empty_filter(self):
+        """Un filtre vide ne contraint pas la recherche."""
+        assert DocumentFilter().to_params() is None
+    
+    def test_containment_is_merged(self):
+        """Langue, repository, is_cv et metadata forment une seule contenance."""
+        params = DocumentFilter(
+            language="python",
+            repository="owner/app",
+            is_cv=True,
+            metadata={"author": "me", "extra": {"stars": 3}},
+        ).to_params()
+        
+        assert params == {
+            "contains": {
+                "author": "me",
+                "language": "python",
+                "extra": {"stars": 3, "repo": "owner/app", "is_cv": True},
+            },
+        }
+    
+    def test_tags_sources_and_dates(self):
+        """Tags, types de source et dates sont sérialisables en JSON."""
+        params = DocumentFilter(
+            tags_any=["cv", "resume"],
+            tags_all=["code"],
+            source_types=[SourceType.GITHUB],
+            created_after=datetime(2024, 1, 1),
+        ).to_params()
+        
+        assert params == {
+            "tags_any": ["cv", "resume"],
+            "tags_all": ["code"],
+            "source_types": ["github"],
+            "created_after": "2024-01-01T00:00:00",
+        }
+    
+    def test_not_cv_is_an_exclusion(self):
+        """is_cv=False exclut les CV sans exiger la clé is_cv."""
+        assert DocumentFilter(is_cv=False).to_params() == {
+            "excludes": {"extra": {"is_cv": True}},
+        }
+    
+    def test_empty_date_range_rejected(self):
+        """Un intervalle de dates vide est refusé."""
+        with pytest.raises(ValueError):
+            DocumentFilter(
+                created_after=datetime(2024, 2, 1),
+                created_before=datetime(2024, 1, 1),
+            )
+
+
 class TestConversationModels:
     """Tests pour les modèles Conversation."""
     
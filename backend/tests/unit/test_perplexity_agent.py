@@ -0,0 +1,252 @@
+"""
+Tests unitaires pour la recherche web Perplexity en streaming.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+import pytest
+
+from src.agents.perplexity_agent import PerplexityAgent, WebSearchChunk
+from src.models.conversation import ContextSource
+from src.providers.llm import StreamChunk
+from src.services.context_packer import ContextPacker
+from src.services.model_cascade import ModelCascade
+from src.services.orchestrator import QueryIntent, RoutingDecision
+from src.services.query_context import QueryContext
+from src.services.rag_engine import RAGConfig, RAGEngine
+from src.services.reranking import RetrievalTimings
+
+
+def _agent() -> PerplexityAgent:
+    agent = PerplexityAgent.__new__(PerplexityAgent)
+    agent.api_key = "key"
+    agent.model = "sonar"
+    agent.timeout = 5
+    agent._enabled = True
+    return agent
+
+
+def _patch_stream(lines: list[str]):
+    """Client httpx dont la réponse streamée renvoie `lines`."""
+    async def aiter_lines():
+        for line in lines:
+            yield line
+    
+    response = Mock(aiter_lines=aiter_lines)
+    stream = MagicMock()
+    stream.__aenter__ = AsyncMock(return_value=response)
+    stream.__aexit__ = AsyncMock(return_value=False)
+    client = Mock(stream=Mock(return_value=stream))
+    client_cm = MagicMock()
+    client_cm.__aenter__ = AsyncMock(return_value=client)
+    client_cm.__aexit__ = AsyncMock(return_value=False)
+    return patch("src.agents.perplexity_agent.httpx.AsyncClient", return_value=client_cm)
+
+
+def _sse(data: dict) -> str:
+    return "data: " + json.dumps(data)
+
+
+class TestParseStreamLine:
+    """Tests pour le parsing des lignes SSE Perplexity."""
+
+    def test_parse_data_line(self):
+        """Une ligne data: valide est décodée."""
+        line = 'data: {"choices": [{"delta": {"content": "Bonjour"}}]}'
+        payload = PerplexityAgent._parse_stream_line(line)
+
+        assert payload["choices"][0]["delta"]["content"] == "Bonjour"
+
+    @pytest.mark.parametrize("line", [
+        "",
+        ": keep-alive",
+        "data: [DONE]",
+        "data: {not json",
+        "event: message",
+    ])
+    def test_ignored_lines(self, line):
+        """Les lignes vides, commentaires et fin de flux sont ignorées."""
+        assert PerplexityAgent._parse_stream_line(line) is None
+
+
+class TestEarlyStart:
+    """Tests pour le démarrage anticipé de la génération."""
+
+    def _engine(self, threshold: int) -> RAGEngine:
+        engine = RAGEngine.__new__(RAGEngine)
+        engine.config = RAGConfig(web_early_start_chars=threshold)
+        return engine
+
+    def test_waits_for_threshold(self):
+        """Pas de démarrage tant que le seuil n'est pas atteint."""
+        engine = self._engine(threshold=50)
+        assert engine._has_enough_web_context("Phrase courte.") is False
+
+    def test_cuts_on_sentence_boundary(self):
+        """Démarrage uniquement en fin de phrase."""
+        engine = self._engine(threshold=20)
+
+        assert engine._has_enough_web_context("Une phrase assez longue.") is True
+        assert engine._has_enough_web_context("Une phrase assez longue et") is False
+
+    def test_disabled_when_zero(self):
+        """Un seuil à 0 attend la réponse web complète."""
+        engine = self._engine(threshold=0)
+        assert engine._has_enough_web_context("x" * 5000 + ".") is False
+
+
+class TestSearchStream:
+    """Tests pour PerplexityAgent.search_stream."""
+    
+    @pytest.mark.asyncio
+    async def test_chunks_then_final(self):
+        """Les deltas sont émis au fil de l'eau, puis un fragment final avec l'usage."""
+        lines = [
+            _sse({"choices": [{"delta": {"content": "Bonjour"}}]}),
+            "",
+            _sse({"choices": [{"delta": {"content": " monde."}}], "citations": ["https://a"]}),
+            _sse({"choices": [], "usage": {"total_tokens": 42}}),
+            "data: [DONE]",
+        ]
+        
+        with _patch_stream(lines):
+            chunks = [c async for c in _agent().search_stream("question")]
+        
+        assert [c.content for c in chunks] == ["Bonjour", " monde.", ""]
+        assert chunks[1].sources == ["https://a"]
+        assert chunks[-1].is_final
+        assert chunks[-1].tokens_used == 42
+        assert chunks[-1].sources == ["https://a"]
+    
+    @pytest.mark.asyncio
+    async def test_error_ends_stream(self):
+        """Une erreur réseau termine le flux sans exception."""
+        with patch(
+            "src.agents.perplexity_agent.httpx.AsyncClient",
+            side_effect=RuntimeError("network"),
+        ):
+            chunks = [c async for c in _agent().search_stream("question")]
+        
+        assert chunks == []
+
+
+class TestStreamingPipeline:
+    """Tests du flux web et du RAG concurrents dans `query_stream`."""
+    
+    def _engine(self, web_chunks: list[WebSearchChunk], threshold: int = 20) -> RAGEngine:
+        engine = RAGEngine.__new__(RAGEngine)
+        engine.config = RAGConfig(web_early_start_chars=threshold)
+        engine._packer = ContextPacker(engine.config.context)
+        engine._cascade = ModelCascade(engine.config.cascade, engine.config.llm_model)
+        engine._orchestrator = Mock(route=AsyncMock(return_value=RoutingDecision(
+            intent=QueryIntent.HYBRID, use_rag=True, use_web=True,
+        )))
+        engine._memory = Mock(history=AsyncMock(return_value=[]), remember=AsyncMock())
+        engine._log_conversation = AsyncMock(return_value="conv-id")
+        
+        # Le flux web n'avance qu'une fois la recherche vectorielle lancée
+        vector_started = asyncio.Event()
+        
+        async def search_vector_store(question, user_id, filters, search_effort):
+            vector_started.set()
+            return [], [ContextSource(source_type="vector_store", content_preview="doc")], RetrievalTimings()
+        
+        async def search_web_stream(question):
+            await vector_started.wait()
+            for chunk in web_chunks:
+                await asyncio.sleep(0)
+                yield chunk
+        
+        engine._search_vector_store = search_vector_store
+        engine._search_web_stream = search_web_stream
+        
+        prompts = []
+        
+        async def generate_stream(messages):
+            yield StreamChunk(content="Réponse")
+        
+        def build_messages(question, context=None, **kwargs):
+            prompts.append(context)
+            return []
+        
+        engine._get_llm_provider = Mock(return_value=Mock(
+            build_messages=build_messages,
+            generate_stream=generate_stream,
+            config=Mock(model="mistral-large-latest"),
+        ))
+        engine.prompts = prompts
+        return engine
+    
+    async def _events(self, engine: RAGEngine) -> list[dict]:
+        return [e async for e in engine.query_stream("question", context=QueryContext.create())]
+    
+    @pytest.mark.asyncio
+    async def test_late_chunks_fold_into_sources_and_usage(self):
+        """Après le démarrage anticipé, la fin du flux web complète sources et usage."""
+        engine = self._engine([
+            WebSearchChunk(content="Première phrase assez longue."),
+            WebSearchChunk(content=" Suite tardive du contexte web."),
+            WebSearchChunk(content="", sources=["https://source"], is_final=True, tokens_used=42),
+        ])
+        
+        events = await self._events(engine)
+        
+        web_chunks = [e["data"]["content"] for e in events if e["event"] == "web_chunk"]
+        assert web_chunks == ["Première phrase assez longue."]
+        web_complete = next(
+            e for e in events if e["event"] == "search_complete" and e["data"]["type"] == "web"
+        )
+        assert web_complete["data"]["partial"] is True
+        # Le prompt ne contient que le contexte reçu avant la génération
+        assert "Suite tardive" not in engine.prompts[0]
+        
+        complete = events[-1]["data"]
+        sources = complete["sources"]
+        assert [s["source_type"] for s in sources] == ["vector_store", "perplexity"]
+        assert sources[1]["url"] == "https://source"
+        assert "Suite tardive" in sources[1]["content_preview"]
+        assert complete["metadata"]["web_tokens"] == 42
+    
+    @pytest.mark.asyncio
+    async def test_full_stream_without_early_start(self):
+        """Sans démarrage anticipé, tout le flux web est diffusé puis utilisé."""
+        engine = self._engine([
+            WebSearchChunk(content="Court."),
+            WebSearchChunk(content="", sources=["https://source"], is_final=True, tokens_used=7),
+        ], threshold=0)
+        
+        events = await self._events(engine)
+        
+        assert [e["data"]["content"] for e in events if e["event"] == "web_chunk"] == ["Court."]
+        rag_complete = [
+            e for e in events if e["event"] == "search_complete" and e["data"]["type"] == "rag"
+        ]
+        assert rag_complete[0]["data"]["results"] == 1
+        assert "Court." in engine.prompts[0]
+        assert events[-1]["data"]["metadata"]["web_tokens"] == 7
+    
+    @pytest.mark.asyncio
+    async def test_closed_stream_cancels_web_task(self):
+        """Un client déconnecté pendant la génération annule la lecture du flux web."""
+        never_ends = asyncio.Event()
+        engine = self._engine([WebSearchChunk(content="Première phrase assez longue.")])
+        inner = engine._search_web_stream
+        
+        async def search_web_stream(question):
+            async for chunk in inner(question):
+                yield chunk
+            await never_ends.wait()
+        
+        engine._search_web_stream = search_web_stream
+        
+        stream = engine.query_stream("question", context=QueryContext.create())
+        async for event in stream:
+            if event["event"] == "chunk":
+                break
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        await stream.aclose()
+        await asyncio.sleep(0)
+        
+        assert tasks and all(t.done() for t in tasks)
@@ -0,0 +1,139 @@
+"""
+Tests unitaires pour le contexte de requête et le RAG Engine partagé.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from src.providers.llm import ProviderQueueTimeout
+from src.services.context_packer import ContextPacker
+from src.services.embedding_service import EmbeddingService
+from src.services.model_cascade import CascadeDecision
+from src.services.orchestrator import QueryIntent, RoutingDecision
+from src.services.query_context import QueryContext, QueryDeadlineExceeded
+from src.services.rag_engine import RAGConfig, RAGEngine
+
+
+def _engine(route_delay: float = 0.0) -> RAGEngine:
+    """RAG Engine sans recherche : routage et génération simulés."""
+    engine = RAGEngine.__new__(RAGEngine)
+    engine.config = RAGConfig()
+    engine._packer = ContextPacker(engine.config.context)
+    
+    async def route(question, **kwargs):
+        await asyncio.sleep(route_delay)
+        return RoutingDecision(intent=QueryIntent.GENERAL)
+    
+    engine._orchestrator = Mock(route=route)
+    engine._get_llm_provider = Mock(return_value=Mock(build_messages=Mock(return_value=[])))
+    engine._generate_answer = AsyncMock(return_value=(
+        Mock(content="ok", thought_process=None, tokens_input=1, tokens_output=1, model_used="m"),
+        CascadeDecision(model="m"),
+    ))
+    engine._log_conversation = AsyncMock(return_value="conv-id")
+    engine._memory = Mock(history=AsyncMock(return_value=[]), remember=AsyncMock())
+    return engine
+
+
+class TestQueryContext:
+    """Tests pour QueryContext."""
+    
+    def test_defaults(self):
+        """Sans session fournie, une nouvelle session est créée."""
+        first = QueryContext.create(user_id="u1")
+        second = QueryContext.create(user_id="u1")
+        
+        assert first.session_id != second.session_id
+        assert first.request_id != second.request_id
+        assert first.remaining() is None
+        assert not first.expired
+    
+    def test_deadline(self):
+        """L'échéance est dérivée du budget."""
+        context = QueryContext.create(session_id="s1", timeout=30)
+        
+        assert context.session_id == "s1"
+        assert 29 < context.remaining() <= 30
+    
+    def test_check_deadline(self):
+        """Une échéance dépassée lève QueryDeadlineExceeded."""
+        context = QueryContext(deadline=time.monotonic() - 1)
+        
+        assert context.expired
+        with pytest.raises(QueryDeadlineExceeded):
+            context.check_deadline()
+
+
+class TestSharedEngine:
+    """Tests de l'isolation des requêtes concurrentes."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_sessions_are_isolated(self):
+        """Chaque conversation est journalisée sous sa propre session."""
+        engine = _engine(route_delay=0.01)
+        contexts = [QueryContext.create(session_id=f"s{i}", user_id=f"u{i}") for i in range(20)]
+        
+        await asyncio.gather(*(
+            engine.query_async(f"question {i}", context=ctx)
+            for i, ctx in enumerate(contexts)
+        ))
+        
+        logged = {
+            call.args[0]: (call.args[5], call.args[6])
+            for call in engine._log_conversation.call_args_list
+        }
+        assert logged == {f"question {i}": (f"s{i}", f"u{i}") for i in range(20)}
+    
+    @pytest.mark.asyncio
+    async def test_deadline_exceeded(self):
+        """Une requête qui dépasse son échéance est interrompue."""
+        engine = _engine(route_delay=1.0)
+        context = QueryContext.create(timeout=0.05)
+        
+        with pytest.raises(QueryDeadlineExceeded):
+            await engine.query_async("question", context=context)
+        engine._log_conversation.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_provider_timeout_is_not_a_deadline(self):
+        """Une file d'attente provider saturée n'est pas une échéance dépassée."""
+        engine = _engine()
+        engine._generate_answer = AsyncMock(side_effect=ProviderQueueTimeout("mistral", 2.0))
+        context = QueryContext.create(timeout=30)
+        
+        with pytest.raises(ProviderQueueTimeout):
+            await engine.query_async("question", context=context)
+
+    def test_embedding_queue_timeout_is_not_retried(self):
+        """Un slot d'embedding non obtenu n'est pas redemandé."""
+        service = EmbeddingService.__new__(EmbeddingService)
+        service.model = "mistral-embed"
+        service._client = Mock()
+        service._limiter = Mock(
+            slot_sync=Mock(side_effect=ProviderQueueTimeout("mistral-embed", 30.0))
+        )
+        
+        with pytest.raises(ProviderQueueTimeout):
+            service.embed_text("question")
+        
+        service._limiter.slot_sync.assert_called_once()
+        service._client.embeddings.create.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_embedding_queue_timeout_reaches_caller(self):
+        """La saturation de l'embedding n'est pas masquée en contexte vide."""
+        engine = _engine()
+        engine._embedding_service = Mock(
+            embed_query=Mock(side_effect=ProviderQueueTimeout("mistral-embed", 30.0))
+        )
+        engine._orchestrator = Mock(route=AsyncMock(
+            return_value=RoutingDecision(intent=QueryIntent.DOCUMENTS, use_rag=True)
+        ))
+        context = QueryContext.create(timeout=30)
+        
+        with pytest.raises(ProviderQueueTimeout):
+            await engine.query_async("question", context=context)
+        engine._generate_answer.assert_not_called()
@@ -4,7 +4,7 @@ Tests unitaires pour le Rate Limiter.
 
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
-from src.services.rate_limiter import RateLimiter
+from src.services.rate_limiter import RateLimiter, gcra
 
 class TestRateLimiter:
     """Tests pour le service RateLimiter."""
@@ -27,31 +27,67 @@ class TestRateLimiter:
     async def test_reflection_limit_works(self, limiter):
         """Vérifie que la limite de réflexion est respectée."""
         with patch("src.services.rate_limiter.get_redis_client") as mock_redis_func:
-            mock_redis = AsyncMock()
+            mock_redis = Mock()
             mock_redis_func.return_value = mock_redis
             
-            # Simuler Redis pipeline
-            mock_pipe = AsyncMock()
-            mock_redis.pipeline.return_value = mock_pipe
+            # Simuler le script GCRA (allowed, remaining, retry_ms, reset_ms, now_ms)
+            mock_script = AsyncMock()
+            mock_redis.register_script.return_value = mock_script
+            now_ms = 1_700_000_000_000
             
             # Premier appel (autorisé)
-            mock_pipe.execute.return_value = [1, True]
+            mock_script.return_value = [1, 1, 0, 30_000, now_ms]
             allowed, count, _ = await limiter.check_reflection_limit("user1")
             assert allowed is True
             assert count == 1
             
             # Deuxième appel (autorisé)
-            mock_pipe.execute.return_value = [2, True]
+            mock_script.return_value = [1, 0, 0, 60_000, now_ms]
             allowed, count, _ = await limiter.check_reflection_limit("user1")
             assert allowed is True
             assert count == 2
             
             # Troisième appel (bloqué, limite à 2 définie dans fixture)
-            mock_pipe.execute.return_value = [3, True]
+            mock_script.return_value = [0, 0, 30_000, 60_000, now_ms]
             allowed, count, retry = await limiter.check_reflection_limit("user1")
             assert allowed is False
-            assert count == 3
-            assert retry > 0
+            assert count == 2
+            assert retry == 30
+            
+            # Script enregistré une seule fois (EVALSHA ensuite)
+            assert mock_redis.register_script.call_count == 1
+            call = mock_script.call_args
+            assert call.kwargs["keys"] == ["rl:reflection:user1"]
+            assert call.kwargs["args"] == [30_000, 60_000]
+
+    @pytest.mark.asyncio
+    async def test_reset_at_is_unix_timestamp(self, limiter):
+        """Le reset est un timestamp absolu calculé depuis l'horloge Redis."""
+        with patch("src.services.rate_limiter.get_redis_client") as mock_redis_func:
+            mock_redis = Mock()
+            mock_redis_func.return_value = mock_redis
+            mock_script = AsyncMock(return_value=[1, 99, 0, 600, 1_700_000_000_000])
+            mock_redis.register_script.return_value = mock_script
+            
+            result = await limiter.check("key:abc")
+            
+            assert result.allowed is True
+            assert result.remaining == 99
+            assert result.reset_at == 1_700_000_001
+
+    @pytest.mark.asyncio
+    async def test_redis_error_uses_local_fallback(self, limiter):
+        """Une erreur Redis bascule sur le GCRA mémoire (pas d'ouverture)."""
+        with patch("src.services.rate_limiter.get_redis_client") as mock_redis_func:
+            mock_redis = Mock()
+            mock_redis_func.return_value = mock_redis
+            mock_redis.register_script.return_value = AsyncMock(
+                side_effect=ConnectionError("down")
+            )
+            
+            results = [await limiter.check("key:abc", limit=3) for _ in range(4)]
+            
+            assert [r.allowed for r in results] == [True, True, True, False]
 
     @pytest.mark.asyncio
     async def test_rate_limit_disabled(self, limiter):
@@ -67,3 +103,31 @@ class TestRateLimiter:
         with patch("src.services.rate_limiter.get_redis_client", return_value=None):
             allowed, _, _ = await limiter.is_allowed("test")
             assert allowed is True
+
+
+class TestLocalGcra:
+    """Tests pour le GCRA en mémoire."""
+    
+    def test_allows_limit_then_blocks(self):
+        """N requêtes passent d'un coup, la suivante attend T = W / N."""
+        tat = None
+        for i in range(5):
+            allowed, remaining, _, _, tat = gcra(tat, 0.0, 12_000.0, 60_000.0)
+            assert allowed is True
+            assert remaining == 4 - i
+        
+        allowed, _, retry_ms, _, _ = gcra(tat, 0.0, 12_000.0, 60_000.0)
+        assert allowed is False
+        assert retry_ms == 12_000.0
+    
+    def test_no_burst_at_window_edge(self):
+        """Pas de rafale 2x : le quota se reconstitue progressivement."""
+        tat = None
+        for _ in range(5):
+            _, _, _, _, tat = gcra(tat, 59_000.0, 12_000.0, 60_000.0)
+        
+        # Une "nouvelle fenêtre" fixe commencerait à 60s : ici une seule cellule
+        allowed, _, _, _, tat = gcra(tat, 71_000.0, 12_000.0, 60_000.0)
+        assert allowed is True
+        allowed, _, _, _, _ = gcra(tat, 71_000.0, 12_000.0, 60_000.0)
+        assert allowed is False
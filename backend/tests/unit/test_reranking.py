@@ -0,0 +1,146 @@
+"""
+Tests unitaires pour la diversification MMR et le re-ranking.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from src.models.document import DocumentHit, SourceType
+from src.services.chunk_cache import ChunkEmbeddingCache
+from src.services.reranking import (
+    RerankConfig,
+    ResultReranker,
+    RetrievalTimings,
+    mmr_select,
+)
+
+
+def _hit(similarity: float) -> DocumentHit:
+    return DocumentHit(id=uuid4(), similarity=similarity, source_type=SourceType.GITHUB)
+
+
+def _reranking(reranker=None, **config) -> ResultReranker:
+    return ResultReranker(RerankConfig(**config), reranker, ChunkEmbeddingCache())
+
+
+class TestMMR:
+    """Tests de la sélection MMR."""
+    
+    def test_near_duplicates_are_demoted(self):
+        """Un quasi-doublon du meilleur candidat passe après un candidat différent."""
+        embeddings = np.array([
+            [1.0, 0.0, 0.0],
+            [0.99, 0.01, 0.0],
+            [0.0, 1.0, 0.0],
+        ])
+        relevance = np.array([0.9, 0.89, 0.8])
+        
+        assert mmr_select(embeddings, relevance, k=2, lambda_=0.5) == [0, 2]
+    
+    def test_lambda_one_is_relevance_order(self):
+        """λ = 1 : ordre de pertinence pur."""
+        rng = np.random.default_rng(0)
+        relevance = np.array([0.5, 0.9, 0.7, 0.8])
+        
+        assert mmr_select(rng.normal(size=(4, 8)), relevance, k=4, lambda_=1.0) == [1, 3, 2, 0]
+    
+    def test_k_larger_than_candidates(self):
+        assert mmr_select(np.eye(2), np.array([0.2, 0.4]), k=5) == [1, 0]
+        assert mmr_select(np.empty((0, 3)), np.array([]), k=3) == []
+
+
+class TestResultReranker:
+    """Tests des étapes sous budget de temps."""
+    
+    @pytest.mark.asyncio
+    async def test_diversify_fetches_embeddings_once(self):
+        """Les embeddings des candidats sont lus une fois puis servis par le cache."""
+        hits = [_hit(0.9), _hit(0.89), _hit(0.8)]
+        vectors = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+        load = AsyncMock(return_value={str(h.id): v for h, v in zip(hits, vectors)})
+        reranking = _reranking(mmr_lambda=0.5)
+        
+        selected = await reranking.diversify(hits, 2, load, reranking.deadline())
+        assert selected == [hits[0], hits[2]]
+        
+        await reranking.diversify(hits, 2, load, reranking.deadline())
+        load.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_diversify_uses_compact_vectors(self):
+        """Les vecteurs compacts de la phase 1 évitent la lecture des embeddings."""
+        hits = [_hit(0.9), _hit(0.89), _hit(0.8)]
+        for hit, vector in zip(hits, [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]):
+            hit.embedding_compact = vector
+        load = AsyncMock(return_value={})
+        reranking = _reranking(mmr_lambda=0.5)
+        
+        selected = await reranking.diversify(hits, 2, load, reranking.deadline())
+        
+        assert selected == [hits[0], hits[2]]
+        load.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_diversify_over_budget_keeps_top_k(self):
+        """Lecture des embeddings trop lente : top-k par similarité."""
+        async def slow_load(ids):
+            await asyncio.sleep(1.0)
+            return {}
+        
+        hits = [_hit(0.9), _hit(0.8), _hit(0.7)]
+        reranking = _reranking(time_budget_ms=10)
+        
+        selected = await reranking.diversify(hits, 2, slow_load, reranking.deadline())
+        assert selected == hits[:2]
+    
+    @pytest.mark.asyncio
+    async def test_rerank_orders_by_score(self):
+        """Le re-ranker réordonne ; à score égal, l'ordre courant est conservé."""
+        reranker = AsyncMock()
+        reranker.name = "test"
+        reranker.score = AsyncMock(return_value=[0.1, 0.9, 0.1])
+        reranking = _reranking(reranker)
+        
+        order = await reranking.rerank("q", ["a", "b", "c"], reranking.deadline())
+        
+        assert order == [1, 0, 2]
+        reranker.score.assert_awaited_once_with("q", ["a", "b", "c"])
+    
+    @pytest.mark.asyncio
+    async def test_rerank_timeout_or_error_keeps_order(self):
+        """Re-ranker hors budget ou en erreur : ordre inchangé."""
+        class SlowReranker:
+            name = "slow"
+            
+            async def score(self, query, texts):
+                await asyncio.sleep(1.0)
+                return [1.0] * len(texts)
+        
+        reranking = _reranking(SlowReranker())
+        assert await reranking.rerank("q", ["a", "b"], time.monotonic() + 0.01) == [0, 1]
+        
+        failing = AsyncMock()
+        failing.name = "failing"
+        failing.score = AsyncMock(side_effect=RuntimeError("down"))
+        reranking = _reranking(failing)
+        assert await reranking.rerank("q", ["a", "b"], reranking.deadline()) == [0, 1]
+    
+    def test_candidate_count(self):
+        assert _reranking(fetch_multiplier=4).candidate_count(5) == 20
+        assert _reranking(enabled=False).candidate_count(5) == 5
+
+
+def test_timings_are_cumulated():
+    """Les durées d'une étape répétée sont cumulées."""
+    timings = RetrievalTimings()
+    with timings.stage("fetch"):
+        pass
+    with timings.stage("fetch"):
+        pass
+    
+    assert set(timings.to_metadata()["retrieval_timings_ms"]) == {"fetch"}
@@ -0,0 +1,118 @@
+"""
+Tests unitaires pour le cache des identités de session.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+
+import pytest
+
+from src.models.user import UserWithSubscription
+from src.services.session_cache import SessionIdentityCache
+
+
+def _user() -> UserWithSubscription:
+    return UserWithSubscription(
+        id=uuid4(),
+        email="jane@example.com",
+        provider="google",
+        created_at=datetime.now(timezone.utc),
+        plan_slug="pro",
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_redis():
+    with patch("src.services.session_cache.get_redis_client", AsyncMock(return_value=None)):
+        yield
+
+
+class TestSessionIdentityCache:
+    """Tests pour SessionIdentityCache."""
+    
+    @pytest.mark.asyncio
+    async def test_hit_skips_loader(self):
+        """La deuxième résolution est servie par le cache."""
+        cache = SessionIdentityCache()
+        load = AsyncMock(return_value=_user())
+        
+        first = await cache.resolve("jwt:1:jane@example.com", load)
+        second = await cache.resolve("jwt:1:jane@example.com", load)
+        
+        assert first is second
+        assert load.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        """Les requêtes concurrentes d'une session partagent un chargement."""
+        cache = SessionIdentityCache()
+        user = _user()
+        
+        async def slow_load():
+            await asyncio.sleep(0.05)
+            return user
+        
+        load = AsyncMock(side_effect=slow_load)
+        results = await asyncio.gather(*(cache.resolve("jwt:1:jane", load) for _ in range(5)))
+        
+        assert all(r is user for r in results)
+        assert load.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_expiry_bound_to_token(self):
+        """Un token expiré n'est pas mis en cache."""
+        cache = SessionIdentityCache(ttl=60)
+        load = AsyncMock(return_value=_user())
+        
+        await cache.resolve("jwt:1:jane", load, expires_at=time.time() - 1)
+        await cache.resolve("jwt:1:jane", load, expires_at=time.time() - 1)
+        
+        assert load.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_unknown_user_not_cached(self):
+        """Un utilisateur introuvable est rechargé à la requête suivante."""
+        cache = SessionIdentityCache()
+        load = AsyncMock(return_value=None)
+        
+        assert await cache.resolve("id:x", load) is None
+        assert await cache.resolve("id:x", load) is None
+        assert load.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_all_user_sessions(self):
+        """Un changement d'abonnement purge toutes les sessions de l'utilisateur."""
+        cache = SessionIdentityCache()
+        user = _user()
+        load = AsyncMock(return_value=user)
+        
+        await cache.resolve("jwt:1:jane", load)
+        await cache.resolve(f"id:{user.id}", load)
+        
+        cache.invalidate_soon(str(user.id))
+        await cache.resolve("jwt:1:jane", load)
+        
+        assert load.call_count == 3
+        assert not cache._entries.get(f"id:{user.id}")
+
+
+class TestSubscriptionInvalidation:
+    """Tests de l'invalidation par SubscriptionRepository."""
+    
+    def test_upgrade_invalidates(self):
+        """upgrade_subscription invalide l'identité de l'utilisateur."""
+        from src.repositories.subscription_repository import SubscriptionRepository
+        
+        repo = SubscriptionRepository()
+        repo._client = Mock()
+        repo.get_user_subscription = Mock(return_value=Mock(id=uuid4(), plan=None))
+        repo.get_plan_by_slug = Mock(return_value=Mock(id=uuid4()))
+        
+        cache = Mock()
+        with patch("src.services.session_cache.get_session_cache", return_value=cache):
+            repo.upgrade_subscription("user-1", "pro")
+        
+        cache.invalidate_soon.assert_called_once_with("user-1")
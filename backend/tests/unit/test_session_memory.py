@@ -0,0 +1,237 @@
+"""
+Tests unitaires pour la mémoire de session (repli mémoire, sans Redis).
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from src.services.session_memory import SUMMARY_ACK, SessionMemory, SessionMemoryConfig
+
+MODEL = "mistral-large-latest"
+
+
+@pytest.fixture(autouse=True)
+def no_redis():
+    with patch(
+        "src.services.session_memory.get_redis_client",
+        AsyncMock(return_value=None),
+    ):
+        yield
+
+
+def _memory(summarizer=None, **config) -> SessionMemory:
+    return SessionMemory(
+        SessionMemoryConfig(**config),
+        summarizer=summarizer or AsyncMock(return_value="Résumé."),
+    )
+
+
+class TestHistory:
+    """Tests de l'historique injecté."""
+    
+    @pytest.mark.asyncio
+    async def test_turns_are_replayed_in_order(self):
+        """Les échanges sont rejoués en messages user/assistant chronologiques."""
+        memory = _memory()
+        await memory.remember("s1", "u1", "Question 1", "Réponse 1")
+        await memory.remember("s1", "u1", "Question 2", "Réponse 2")
+        
+        history = await memory.history("s1", "u1", MODEL)
+        
+        assert [m["content"] for m in history] == [
+            "Question 1", "Réponse 1", "Question 2", "Réponse 2",
+        ]
+        assert [m["role"] for m in history] == ["user", "assistant"] * 2
+    
+    @pytest.mark.asyncio
+    async def test_sessions_are_isolated_per_user(self):
+        """Un même session_id ne donne pas accès à l'historique d'un autre utilisateur."""
+        memory = _memory()
+        await memory.remember("s1", "u1", "Question", "Réponse")
+        
+        assert await memory.history("s1", "u2", MODEL) == []
+        assert await memory.history("s1", None, MODEL) == []
+    
+    @pytest.mark.asyncio
+    async def test_budget_keeps_most_recent_turns(self):
+        """Sous budget serré, seuls les échanges les plus récents sont injectés."""
+        memory = _memory(token_budget=120, max_turns=10)
+        for i in range(5):
+            await memory.remember("s1", None, f"Question {i}", f"Réponse {i} " + "détail " * 20)
+        
+        history = await memory.history("s1", None, MODEL)
+        
+        assert 0 < len(history) < 10
+        assert history[-1]["content"].startswith("Réponse 4")
+        assert all("Question 0" != m["content"] for m in history)
+    
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        """Mémoire désactivée : ni écriture ni historique."""
+        memory = _memory(enabled=False)
+        await memory.remember("s1", None, "Question", "Réponse")
+        
+        assert await memory.history("s1", None, MODEL) == []
+
+
+class TestRollingSummary:
+    """Tests du résumé glissant."""
+    
+    @pytest.mark.asyncio
+    async def test_overflow_is_summarized_in_background(self):
+        """Au-delà de max_turns, les plus anciens échanges passent dans le résumé."""
+        summarizer = AsyncMock(return_value="L'utilisateur s'appelle Alex.")
+        memory = _memory(summarizer, max_turns=2)
+        for i in range(3):
+            await memory.remember("s1", None, f"Question {i}", f"Réponse {i}")
+        await memory.stop()
+        
+        summarizer.assert_awaited_once()
+        summary, overflow = summarizer.await_args.args
+        assert summary == ""
+        assert overflow == [{"question": "Question 0", "answer": "Réponse 0"}]
+        
+        history = await memory.history("s1", None, MODEL)
+        assert "Alex" in history[0]["content"]
+        assert history[1]["content"] == SUMMARY_ACK
+        assert [m["content"] for m in history[2:]] == [
+            "Question 1", "Réponse 1", "Question 2", "Réponse 2",
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_remember_does_not_wait_for_summary(self):
+        """Le résumé (appel LLM) reste hors du chemin critique."""
+        release = asyncio.Event()
+        
+        async def slow_summary(summary, turns):
+            await release.wait()
+            return "Résumé."
+        
+        memory = _memory(slow_summary, max_turns=1)
+        await memory.remember("s1", None, "Question 0", "Réponse 0")
+        await asyncio.wait_for(
+            memory.remember("s1", None, "Question 1", "Réponse 1"),
+            timeout=0.5,
+        )
+        # Un seul résumé en cours par session
+        await memory.remember("s1", None, "Question 2", "Réponse 2")
+        assert len(memory._tasks) == 1
+        
+        release.set()
+        await memory.stop()
+        history = await memory.history("s1", None, MODEL)
+        assert [m["content"] for m in history[2:]] == ["Question 2", "Réponse 2"]
+    
+    @pytest.mark.asyncio
+    async def test_summary_failure_keeps_turns(self):
+        """Un résumé en échec conserve les échanges (nouvelle tentative au tour suivant)."""
+        memory = _memory(AsyncMock(side_effect=RuntimeError("provider down")), max_turns=1)
+        await memory.remember("s1", None, "Question 0", "Réponse 0")
+        await memory.remember("s1", None, "Question 1", "Réponse 1")
+        await memory.stop()
+        
+        history = await memory.history("s1", None, MODEL)
+        assert [m["content"] for m in history] == [
+            "Question 0", "Réponse 0", "Question 1", "Réponse 1",
+        ]
+
+
+class TestSummaryModel:
+    """Tests du modèle de résumé."""
+    
+    def test_follows_provider(self):
+        """Sans modèle configuré, le petit modèle du provider est utilisé."""
+        assert SessionMemory(SessionMemoryConfig()).summary_model == "mistral-small-latest"
+        assert SessionMemory(
+            SessionMemoryConfig(summary_provider="openai")
+        ).summary_model == "gpt-4o-mini"
+    
+    def test_provider_without_small_model(self):
+        """Un provider sans petit modèle garde son modèle de génération."""
+        memory = SessionMemory(SessionMemoryConfig(summary_provider="local", fallback_model="llama3"))
+        assert memory.summary_model == "llama3"
+    
+    @pytest.mark.asyncio
+    async def test_summary_uses_configured_provider(self):
+        """Le provider et le modèle du résumé sont appariés."""
+        provider = Mock(generate=AsyncMock(return_value=Mock(content="Résumé.")))
+        factory = Mock(get_provider=Mock(return_value=provider))
+        memory = SessionMemory(SessionMemoryConfig(summary_provider="openai"))
+        
+        with patch("src.services.session_memory.get_provider_factory", return_value=factory):
+            assert await memory._summarize_with_llm("", [{"question": "q", "answer": "a"}]) == "Résumé."
+        
+        name, config = factory.get_provider.call_args.args
+        assert name == "openai"
+        assert config.model == "gpt-4o-mini"
+
+
+class TestCompactionLock:
+    """Tests du verrou de résumé entre workers (Redis)."""
+    
+    KEY = "memory:v1:anonymous:s1"
+    
+    def _redis(self, acquired: bool, replaced: int = 1) -> Mock:
+        turns = [json.dumps({"question": f"Q{i}", "answer": f"R{i}"}) for i in range(3)]
+        pipe = Mock()
+        # Après le résumé, seul le dernier échange reste
+        pipe.execute = AsyncMock(side_effect=[[None, turns], ["Résumé.", turns[-1:]]])
+        redis = Mock()
+        redis.pipeline.return_value = pipe
+        redis.set = AsyncMock(return_value=True if acquired else None)
+        redis.register_script.side_effect = [
+            AsyncMock(return_value=replaced),
+            AsyncMock(return_value=1),
+        ]
+        return redis
+    
+    def _patch(self, redis: Mock):
+        return patch("src.services.session_memory.get_redis_client", AsyncMock(return_value=redis))
+    
+    @pytest.mark.asyncio
+    async def test_lock_held_by_another_worker(self):
+        """Un résumé en cours sur un autre worker n'est pas dupliqué."""
+        summarizer = AsyncMock(return_value="Résumé.")
+        memory = _memory(summarizer, max_turns=1)
+        redis = self._redis(acquired=False)
+        
+        with self._patch(redis):
+            await memory._compact(self.KEY)
+        
+        summarizer.assert_not_called()
+        lock_key, _ = redis.set.await_args.args
+        assert lock_key == f"{self.KEY}:compacting"
+        assert redis.set.await_args.kwargs["nx"] is True
+        assert self.KEY not in memory._summarizing
+    
+    @pytest.mark.asyncio
+    async def test_summary_written_under_lock(self):
+        """Le résumé est écrit avec le jeton du verrou, puis le verrou libéré."""
+        memory = _memory(max_turns=1)
+        redis = self._redis(acquired=True)
+        
+        with self._patch(redis):
+            await memory._compact(self.KEY)
+        
+        token = redis.set.await_args.args[1]
+        replace = memory._replace_script
+        assert replace.await_args.kwargs["args"][:3] == [token, "Résumé.", 2]
+        memory._release_script.assert_awaited_once_with(
+            keys=[f"{self.KEY}:compacting"], args=[token],
+        )
+    
+    @pytest.mark.asyncio
+    async def test_lost_lock_discards_summary(self):
+        """Un verrou expiré entre-temps arrête le résumé sans réessayer."""
+        summarizer = AsyncMock(return_value="Résumé.")
+        memory = _memory(summarizer, max_turns=1)
+        redis = self._redis(acquired=True, replaced=0)
+        
+        with self._patch(redis):
+            await memory._compact(self.KEY)
+        
+        summarizer.assert_awaited_once()
+        memory._replace_script.assert_awaited_once()
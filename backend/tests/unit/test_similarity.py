@@ -0,0 +1,88 @@
+"""
+Tests unitaires pour les noyaux de similarité vectorisés.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.services import similarity
+from src.services.embedding_service import EmbeddingService
+
+
+def _legacy_cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    return 0.0 if norm_a == 0 or norm_b == 0 else dot / (norm_a * norm_b)
+
+
+@pytest.fixture
+def docs() -> np.ndarray:
+    return np.random.default_rng(0).normal(size=(200, 64)).astype(np.float32)
+
+
+class TestKernels:
+    """Tests des produits vectorisés."""
+    
+    def test_compute_similarity_matches_legacy(self, docs):
+        """compute_similarity garde le comportement de la boucle Python pur."""
+        a, b = docs[0].tolist(), docs[1].tolist()
+        
+        assert EmbeddingService.compute_similarity(a, b) == pytest.approx(_legacy_cosine(a, b), abs=1e-6)
+        assert EmbeddingService.compute_similarity(a, a) == pytest.approx(1.0, abs=1e-6)
+        assert EmbeddingService.compute_similarity([0.0] * 64, a) == 0.0
+    
+    def test_as_matrix_is_normalized_float32_copy(self, docs):
+        matrix = similarity.as_matrix(docs)
+        
+        assert matrix.dtype == np.float32
+        assert matrix.flags["C_CONTIGUOUS"]
+        assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0, atol=1e-5)
+        assert not np.shares_memory(matrix, docs)
+    
+    def test_one_to_many_and_many_to_many(self, docs):
+        matrix = similarity.as_matrix(docs)
+        query = docs[3]
+        
+        scores = similarity.one_to_many(query, matrix)
+        expected = [_legacy_cosine(query.tolist(), d.tolist()) for d in docs]
+        assert np.allclose(scores, expected, atol=1e-5)
+        
+        pairwise = similarity.many_to_many(matrix[:10])
+        assert pairwise.shape == (10, 10)
+        assert np.allclose(pairwise[3], scores[:10], atol=1e-5)
+    
+    def test_top_k(self):
+        scores = np.array([0.1, 0.9, 0.3, 0.7, 0.5], dtype=np.float32)
+        
+        indices, top = similarity.top_k(scores, 3)
+        assert indices.tolist() == [1, 3, 4]
+        assert top.tolist() == pytest.approx([0.9, 0.7, 0.5])
+        assert similarity.top_k(scores, 10)[0].tolist() == [1, 3, 4, 2, 0]
+        assert similarity.top_k(scores, 0)[0].size == 0
+
+
+class TestQuantized:
+    """Tests du chemin int8."""
+    
+    def test_int8_scores_are_close(self, docs):
+        matrix = similarity.as_matrix(docs)
+        quantized = similarity.QuantizedMatrix.from_matrix(matrix)
+        
+        assert quantized.codes.dtype == np.int8
+        assert quantized.nbytes < matrix.nbytes / 3
+        assert np.allclose(
+            quantized.one_to_many(docs[5]),
+            similarity.one_to_many(docs[5], matrix),
+            atol=0.02,
+        )
+    
+    def test_int8_blocks_cover_all_rows(self, docs, monkeypatch):
+        """Le calcul par blocs couvre toutes les lignes, bloc partiel compris."""
+        monkeypatch.setattr(similarity, "INT8_BLOCK_ROWS", 64)
+        quantized = similarity.QuantizedMatrix.from_matrix(similarity.as_matrix(docs))
+        
+        scores = quantized.one_to_many(docs[199])
+        assert similarity.top_k(scores, 1)[0].tolist() == [199]
@@ -0,0 +1,162 @@
+"""
+Tests unitaires pour les compteurs d'usage et leur réconciliation.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from src.services.usage_meter import (
+    CLAIM_PREFIX,
+    UsageMeter,
+    _parse_deltas,
+    delta_field,
+)
+
+
+@pytest.fixture
+def no_redis():
+    with patch("src.services.usage_meter.get_redis_client", AsyncMock(return_value=None)):
+        yield
+
+
+class TestParseDeltas:
+    """Tests pour le décodage du hash des deltas."""
+    
+    def test_parse_fields(self):
+        """Les champs user|période|type sont décodés, les zéros ignorés."""
+        deltas = _parse_deltas({
+            "u1|2026-10|requests": "12",
+            "u2|2026-10|documents": "0",
+        })
+        
+        assert deltas == [{
+            "user_id": "u1",
+            "period": "2026-10",
+            "type": "requests",
+            "amount": 12,
+        }]
+
+
+class TestLocalFallback:
+    """Tests pour le comptage sans Redis."""
+    
+    @pytest.mark.asyncio
+    async def test_local_increments_are_reconciled(self, no_redis):
+        """Les incréments mémoire sont agrégés et appliqués en un lot."""
+        repo = Mock()
+        repo.apply_usage_deltas.return_value = True
+        meter = UsageMeter(repo=repo)
+        
+        assert await meter.increment("u1", "requests") is None
+        await meter.increment("u1", "requests", 2)
+        
+        assert await meter.reconcile() == 1
+        batch_id, deltas = repo.apply_usage_deltas.call_args.args
+        assert deltas[0]["amount"] == 3
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_keeps_its_id(self, no_redis):
+        """Un lot non acquitté est rejoué avec le même batch_id (idempotence)."""
+        repo = Mock()
+        repo.apply_usage_deltas.side_effect = [False, True]
+        meter = UsageMeter(repo=repo)
+        
+        meter.record_local("u1")
+        await meter.reconcile()
+        meter.record_local("u1")
+        await meter.reconcile()
+        
+        first, second = repo.apply_usage_deltas.call_args_list
+        assert first.args == second.args
+        # Le nouvel incrément attend le lot suivant
+        assert meter._local == {delta_field("u1", "requests"): 1}
+    
+    @pytest.mark.asyncio
+    async def test_unknown_type_rejected(self, no_redis):
+        """Seuls requests, documents et api_keys sont comptés."""
+        with pytest.raises(ValueError):
+            await UsageMeter(repo=Mock()).increment("u1", "tokens")
+
+
+class TestRedisReconciliation:
+    """Tests pour la réconciliation depuis Redis."""
+    
+    @pytest.mark.asyncio
+    async def test_claim_apply_and_ack(self):
+        """Le lot réclamé est appliqué puis supprimé."""
+        repo = Mock()
+        repo.apply_usage_deltas.return_value = True
+        meter = UsageMeter(repo=repo)
+        
+        redis = Mock()
+        claim_script = AsyncMock(return_value=1)
+        redis.register_script.side_effect = [AsyncMock(), claim_script]
+        redis.zrangebyscore = AsyncMock(return_value=[])
+        redis.hgetall = AsyncMock(return_value={"u1|2026-10|requests": "5"})
+        pipe = Mock()
+        pipe.execute = AsyncMock()
+        redis.pipeline.return_value = pipe
+        
+        with patch("src.services.usage_meter.get_redis_client", AsyncMock(return_value=redis)):
+            assert await meter.reconcile() == 1
+        
+        batch_id = claim_script.call_args.kwargs["args"][0]
+        assert repo.apply_usage_deltas.call_args.args[0] == batch_id
+        pipe.delete.assert_called_once_with(CLAIM_PREFIX + batch_id)
+        pipe.zrem.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_failed_apply_is_not_acked(self):
+        """Un échec laisse le lot en place pour reprise après le bail."""
+        repo = Mock()
+        repo.apply_usage_deltas.return_value = False
+        meter = UsageMeter(repo=repo)
+        
+        redis = Mock()
+        redis.register_script.side_effect = [AsyncMock(), AsyncMock(return_value=1)]
+        redis.zrangebyscore = AsyncMock(return_value=[])
+        redis.hgetall = AsyncMock(return_value={"u1|2026-10|requests": "5"})
+        
+        with patch("src.services.usage_meter.get_redis_client", AsyncMock(return_value=redis)):
+            assert await meter.reconcile() == 0
+        
+        redis.pipeline.assert_not_called()
+
+
+class TestResilience:
+    """Tests pour la robustesse de la réconciliation."""
+    
+    @pytest.mark.asyncio
+    async def test_local_error_is_contained(self, no_redis):
+        """Une erreur du lot mémoire est journalisée, pas propagée."""
+        meter = UsageMeter(repo=Mock())
+        meter._reconcile_local = AsyncMock(side_effect=RuntimeError("db down"))
+        
+        assert await meter.reconcile() == 0
+    
+    @pytest.mark.asyncio
+    async def test_redis_client_error_is_contained(self):
+        """Un client Redis indisponible n'interrompt pas la réconciliation."""
+        repo = Mock()
+        repo.apply_usage_deltas.return_value = True
+        meter = UsageMeter(repo=repo)
+        meter.record_local("u1")
+        
+        with patch(
+            "src.services.usage_meter.get_redis_client",
+            AsyncMock(side_effect=ConnectionError("refused")),
+        ):
+            assert await meter.reconcile() == 1
+    
+    @pytest.mark.asyncio
+    async def test_run_survives_failed_iteration(self):
+        """La tâche périodique continue après une itération en échec."""
+        meter = UsageMeter(repo=Mock(), interval=0)
+        meter.reconcile = AsyncMock(side_effect=[RuntimeError("boom"), asyncio.CancelledError()])
+        
+        with pytest.raises(asyncio.CancelledError):
+            await meter._run()
+        
+        assert meter.reconcile.await_count == 2
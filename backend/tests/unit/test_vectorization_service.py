@@ -0,0 +1,42 @@
+"""
+Tests unitaires pour le service de vectorisation.
+"""
+
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from src.models.document import DocumentCreate, SourceType
+from src.services.vectorization_service import VectorizationService
+
+
+@pytest.fixture
+def service():
+    """Service sans client Mistral ni Supabase."""
+    service = VectorizationService.__new__(VectorizationService)
+    service._embedding_service = Mock(embed_text=Mock(return_value=[3.0, 4.0]))
+    service._document_repo = Mock(exists_by_hash=Mock(return_value=False))
+    return service
+
+
+class TestNormalization:
+    """Tests de la normalisation des embeddings à l'ingestion."""
+    
+    def test_documents_are_stored_normalized(self, service):
+        """Les embeddings stockés ont une norme de 1 (produit scalaire = cosinus)."""
+        doc = DocumentCreate(content="Bonjour", source_type=SourceType.MANUAL)
+        
+        stats = service.ingest_documents([doc])
+        
+        assert stats.total_created == 1
+        embedding = service._document_repo.create_from_model.call_args.args[1]
+        assert embedding == pytest.approx([0.6, 0.8])
+        assert np.linalg.norm(embedding) == pytest.approx(1.0)
+    
+    def test_single_document_is_normalized(self, service):
+        """ingest_single normalise aussi l'embedding."""
+        service.ingest_single("Bonjour", "manual", "note-1")
+        
+        data = service._document_repo.create.call_args.args[0]
+        assert data["embedding"] == pytest.approx([0.6, 0.8])
@@ -58,6 +58,7 @@ export type StreamEventType =
   | "routing"
   | "search_start"
   | "search_complete"
+  | "web_chunk"
   | "generation_start"
   | "chunk"
   | "thought"
@@ -81,6 +82,7 @@ export interface SearchEvent {
   type: "rag" | "web";
   results?: number;
   found?: boolean;
+  partial?: boolean;
 }
 
 export interface ChunkEvent {